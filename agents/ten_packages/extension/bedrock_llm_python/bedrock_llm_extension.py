@@ -1,6 +1,9 @@
+import copy
 from .bedrock_llm import BedrockLLM, BedrockLLMConfig
+from .chat_memory import ChatMemory
+from .speculation import Speculator, Turn
 from datetime import datetime
-from threading import Thread
+from threading import Thread, Timer
 from ten import (
     Addon,
     Extension,
@@ -31,6 +34,10 @@ PROPERTY_TOP_P = "top_p"  # Optional
 PROPERTY_MAX_TOKENS = "max_tokens"  # Optional
 PROPERTY_GREETING = "greeting"  # Optional
 PROPERTY_MAX_MEMORY_LENGTH = "max_memory_length"  # Optional
+PROPERTY_MAX_MEMORY_TOKENS = "max_memory_tokens"  # Optional
+PROPERTY_SPECULATIVE = "speculative"  # Optional
+PROPERTY_SPECULATIVE_STABLE_MS = "speculative_stable_ms"  # Optional
+PROPERTY_SPECULATIVE_MATCH_THRESHOLD = "speculative_match_threshold"  # Optional
 
 
 def get_current_time():
@@ -47,6 +54,17 @@ def is_punctuation(char):
     return False
 
 
+def _append_message(memory, role, text):
+    if len(memory) and memory[-1]["role"] == role:
+        # if last user input got empty response, append current user input.
+        logger.debug(
+            f"found last message with role `{role}`, will append this input into last {role} input"
+        )
+        memory[-1]["content"].append({"text": text})
+    else:
+        memory.append({"role": role, "content": [{"text": text}]})
+
+
 def parse_sentence(sentence, content):
     remain = ""
     found_punc = False
@@ -64,10 +82,16 @@ def parse_sentence(sentence, content):
 
 
 class BedrockLLMExtension(Extension):
-    memory = []
-    max_memory_length = 10
-    outdate_ts = 0
-    bedrock_llm = None
+    def __init__(self, name: str):
+        super().__init__(name)
+
+        self.max_memory_length = 10
+        self.max_memory_tokens = 2048
+        self.memory = ChatMemory(self.max_memory_length, self.max_memory_tokens)
+        self.outdate_ts = 0
+        self.bedrock_llm = None
+        self.speculator = None
+        self.speculation_timer = None
 
     def on_start(self, ten: TenEnv) -> None:
         logger.info("BedrockLLMExtension on_start")
@@ -125,6 +149,44 @@ class BedrockLLMExtension(Extension):
                 f"GetProperty optional {PROPERTY_MAX_MEMORY_LENGTH} failed, err: {err}."
             )
 
+        try:
+            prop_max_memory_tokens = ten.get_property_int(PROPERTY_MAX_MEMORY_TOKENS)
+            if prop_max_memory_tokens > 0:
+                self.max_memory_tokens = int(prop_max_memory_tokens)
+        except Exception as err:
+            logger.debug(
+                f"GetProperty optional {PROPERTY_MAX_MEMORY_TOKENS} failed, err: {err}."
+            )
+
+        self.memory = ChatMemory(self.max_memory_length, self.max_memory_tokens)
+
+        try:
+            if ten.get_property_bool(PROPERTY_SPECULATIVE):
+                self.speculator = Speculator()
+        except Exception as err:
+            logger.debug(
+                f"GetProperty optional {PROPERTY_SPECULATIVE} failed, err: {err}."
+            )
+
+        if self.speculator:
+            try:
+                stable_ms = ten.get_property_int(PROPERTY_SPECULATIVE_STABLE_MS)
+                if stable_ms > 0:
+                    self.speculator.stable_ms = stable_ms
+            except Exception as err:
+                logger.debug(
+                    f"GetProperty optional {PROPERTY_SPECULATIVE_STABLE_MS} failed, err: {err}. Using default value: {self.speculator.stable_ms}"
+                )
+
+            try:
+                match_threshold = ten.get_property_float(PROPERTY_SPECULATIVE_MATCH_THRESHOLD)
+                if match_threshold > 0:
+                    self.speculator.match_threshold = match_threshold
+            except Exception as err:
+                logger.debug(
+                    f"GetProperty optional {PROPERTY_SPECULATIVE_MATCH_THRESHOLD} failed, err: {err}. Using default value: {self.speculator.match_threshold}"
+                )
+
         # Create bedrockLLM instance
         try:
             self.bedrock_llm = BedrockLLM(bedrock_llm_config)
@@ -163,6 +225,8 @@ class BedrockLLMExtension(Extension):
 
         if cmd_name == CMD_IN_FLUSH:
             self.outdate_ts = get_current_time()
+            if self.speculator:
+                self.speculator.interrupt()
             cmd_out = Cmd.create(CMD_OUT_FLUSH)
             ten.send_cmd(cmd_out, None)
             logger.info(f"BedrockLLMExtension on_cmd sent flush")
@@ -190,7 +254,7 @@ class BedrockLLMExtension(Extension):
         # Assume 'data' is an object from which we can get properties
         try:
             is_final = data.get_property_bool(DATA_IN_TEXT_DATA_PROPERTY_IS_FINAL)
-            if not is_final:
+            if not is_final and not self.speculator:
                 logger.info("ignore non-final input")
                 return
         except Exception as err:
@@ -212,158 +276,187 @@ class BedrockLLMExtension(Extension):
             )
             return
 
-        # Prepare memory. A conversation must alternate between user and assistant roles
-        while len(self.memory):
-            if len(self.memory) > self.max_memory_length:
-                logger.debug(
-                    f"pop out first message, reason: memory length limit: `{self.memory[0]}`"
-                )
-                self.memory.pop(0)
-            elif self.memory[0]["role"] == "assistant":
-                logger.debug(
-                    f"pop out first message, reason: messages can not start with assistant: `{self.memory[0]}`"
-                )
-                self.memory.pop(0)
-            else:
-                break
+        if not is_final:
+            self.speculator.on_partial(input_text)
+            self._schedule_speculation(ten)
+            return
 
-        if len(self.memory) and self.memory[-1]["role"] == "user":
-            # if last user input got empty response, append current user input.
-            logger.debug(
-                f"found last message with role `user`, will append this input into last user input"
-            )
-            self.memory[-1]["content"].append({"text": input_text})
+        if self.speculator:
+            committed = self.speculator.on_final(input_text)
+            logger.info(self.speculator.stats())
+            if committed:
+                return
+
+        self._start_turn(ten, Turn(input_text))
+        logger.info(f"BedrockLLMExtension on_data end")
+
+    def _schedule_speculation(self, ten: TenEnv) -> None:
+        if self.speculation_timer:
+            self.speculation_timer.cancel()
+        self.speculation_timer = Timer(
+            self.speculator.stable_ms / 1000, self._speculate, args=(ten,)
+        )
+        self.speculation_timer.daemon = True
+        self.speculation_timer.start()
+
+    def _speculate(self, ten: TenEnv) -> None:
+        turn = self.speculator.poll()
+        if turn:
+            logger.info(f"speculative converse for partial text: [{turn.text}]")
+            self._start_turn(ten, turn)
+
+    def _start_turn(self, ten: TenEnv, turn: Turn) -> None:
+        # Prepare memory, trimmed by whole turns so that it starts with a user
+        # message. The turn updates memory once it is committed, the request
+        # is built on a copy
+        memory = copy.deepcopy(self.memory.get())
+        _append_message(memory, "user", turn.text)
+        turn.output(self._append_memory, "user", turn.text)
+
+        # Start thread to request and read responses from Bedrock
+        start_time = get_current_time()
+        thread = Thread(
+            target=self._converse_stream_worker,
+            args=(ten, start_time, turn.text, memory, turn),
+        )
+        thread.start()
+
+    def _append_memory(self, role: str, text: str) -> None:
+        # A conversation must alternate between user and assistant roles
+        last = self.memory.last()
+        if last is not None and last["role"] == role:
+            self.memory.pop()
+            memory = [copy.deepcopy(last)]
         else:
-            self.memory.append({"role": "user", "content": [{"text": input_text}]})
+            memory = []
+        _append_message(memory, role, text)
+        self.memory.put(memory[0])
 
-        def converse_stream_worker(start_time, input_text, memory):
-            try:
+    def _converse_stream_worker(self, ten: TenEnv, start_time, input_text, memory, turn: Turn):
+        try:
+            logger.info(
+                f"GetConverseStream for input text: [{input_text}] memory: {memory}"
+            )
+
+            # Get result from Bedrock
+            resp = self.bedrock_llm.get_converse_stream(memory)
+            if resp is None or resp.get("stream") is None:
                 logger.info(
-                    f"GetConverseStream for input text: [{input_text}] memory: {memory}"
+                    f"GetConverseStream for input text: [{input_text}] failed"
                 )
+                return
+
+            stream = resp.get("stream")
+            sentence = ""
+            full_content = ""
+            first_sentence_sent = False
 
-                # Get result from Bedrock
-                resp = self.bedrock_llm.get_converse_stream(memory)
-                if resp is None or resp.get("stream") is None:
+            for event in stream:
+                if turn.cancelled or turn.interrupted:
                     logger.info(
-                        f"GetConverseStream for input text: [{input_text}] failed"
+                        f"GetConverseStream speculation stopped for input text: [{input_text}]"
                     )
-                    return
+                    break
 
-                stream = resp.get("stream")
-                sentence = ""
-                full_content = ""
-                first_sentence_sent = False
+                # allow 100ms buffer time, in case interruptor's flush cmd comes just after on_data event
+                # speculative turns start before the flushes of the speech they answer
+                if not turn.speculative and (start_time + 100_000) < self.outdate_ts:
+                    logger.info(
+                        f"GetConverseStream recv interrupt and flushing for input text: [{input_text}], startTs: {start_time}, outdateTs: {self.outdate_ts}, delta > 100ms"
+                    )
+                    break
+
+                if "contentBlockDelta" in event:
+                    delta_types = event["contentBlockDelta"]["delta"].keys()
+                    # ignore other types of content: e.g toolUse
+                    if "text" in delta_types:
+                        content = event["contentBlockDelta"]["delta"]["text"]
+                elif (
+                    "internalServerException" in event
+                    or "modelStreamErrorException" in event
+                    or "throttlingException" in event
+                    or "validationException" in event
+                ):
+                    logger.error(f"GetConverseStream Error occured: {event}")
+                    break
+                else:
+                    # ingore other events
+                    continue
 
-                for event in stream:
-                    # allow 100ms buffer time, in case interruptor's flush cmd comes just after on_data event
-                    if (start_time + 100_000) < self.outdate_ts:
-                        logger.info(
-                            f"GetConverseStream recv interrupt and flushing for input text: [{input_text}], startTs: {start_time}, outdateTs: {self.outdate_ts}, delta > 100ms"
-                        )
-                        break
+                full_content += content
 
-                    if "contentBlockDelta" in event:
-                        delta_types = event["contentBlockDelta"]["delta"].keys()
-                        # ignore other types of content: e.g toolUse
-                        if "text" in delta_types:
-                            content = event["contentBlockDelta"]["delta"]["text"]
-                    elif (
-                        "internalServerException" in event
-                        or "modelStreamErrorException" in event
-                        or "throttlingException" in event
-                        or "validationException" in event
-                    ):
-                        logger.error(f"GetConverseStream Error occured: {event}")
+                while True:
+                    sentence, content, sentence_is_final = parse_sentence(
+                        sentence, content
+                    )
+                    if not sentence or not sentence_is_final:
+                        logger.info(f"sentence [{sentence}] is empty or not final")
                         break
-                    else:
-                        # ingore other events
-                        continue
-
-                    full_content += content
+                    logger.info(
+                        f"GetConverseStream recv for input text: [{input_text}] got sentence: [{sentence}]"
+                    )
 
-                    while True:
-                        sentence, content, sentence_is_final = parse_sentence(
-                            sentence, content
+                    # send sentence
+                    try:
+                        output_data = Data.create("text_data")
+                        output_data.set_property_string(
+                            DATA_OUT_TEXT_DATA_PROPERTY_TEXT, sentence
                         )
-                        if not sentence or not sentence_is_final:
-                            logger.info(f"sentence [{sentence}] is empty or not final")
-                            break
+                        output_data.set_property_bool(
+                            DATA_OUT_TEXT_DATA_PROPERTY_TEXT_END_OF_SEGMENT, False
+                        )
+                        turn.output(ten.send_data, output_data)
+                        logger.info(
+                            f"GetConverseStream recv for input text: [{input_text}] sent sentence [{sentence}]"
+                        )
+                    except Exception as err:
                         logger.info(
-                            f"GetConverseStream recv for input text: [{input_text}] got sentence: [{sentence}]"
+                            f"GetConverseStream recv for input text: [{input_text}] send sentence [{sentence}] failed, err: {err}"
                         )
+                        break
 
-                        # send sentence
-                        try:
-                            output_data = Data.create("text_data")
-                            output_data.set_property_string(
-                                DATA_OUT_TEXT_DATA_PROPERTY_TEXT, sentence
-                            )
-                            output_data.set_property_bool(
-                                DATA_OUT_TEXT_DATA_PROPERTY_TEXT_END_OF_SEGMENT, False
-                            )
-                            ten.send_data(output_data)
-                            logger.info(
-                                f"GetConverseStream recv for input text: [{input_text}] sent sentence [{sentence}]"
-                            )
-                        except Exception as err:
-                            logger.info(
-                                f"GetConverseStream recv for input text: [{input_text}] send sentence [{sentence}] failed, err: {err}"
-                            )
-                            break
-
-                        sentence = ""
-                        if not first_sentence_sent:
-                            first_sentence_sent = True
-                            logger.info(
-                                f"GetConverseStream recv for input text: [{input_text}] first sentence sent, first_sentence_latency {get_current_time() - start_time}ms"
-                            )
-
-                if len(full_content.strip()):
-                    # remember response as assistant content in memory
-                    if memory and memory[-1]["role"] == "assistant":
-                        memory[-1]["content"].append({"text": full_content})
-                    else:
-                        memory.append(
-                            {"role": "assistant", "content": [{"text": full_content}]}
+                    sentence = ""
+                    if not first_sentence_sent:
+                        first_sentence_sent = True
+                        logger.info(
+                            f"GetConverseStream recv for input text: [{input_text}] first sentence sent, first_sentence_latency {get_current_time() - start_time}ms"
                         )
-                else:
-                    # can not put empty model response into memory
-                    logger.error(
-                        f"GetConverseStream recv for input text: [{input_text}] failed: empty response [{full_content}]"
-                    )
-                    return
 
-                # send end of segment
-                try:
-                    output_data = Data.create("text_data")
-                    output_data.set_property_string(
-                        DATA_OUT_TEXT_DATA_PROPERTY_TEXT, sentence
-                    )
-                    output_data.set_property_bool(
-                        DATA_OUT_TEXT_DATA_PROPERTY_TEXT_END_OF_SEGMENT, True
-                    )
-                    ten.send_data(output_data)
-                    logger.info(
-                        f"GetConverseStream for input text: [{input_text}] end of segment with sentence [{sentence}] sent"
-                    )
-                except Exception as err:
-                    logger.info(
-                        f"GetConverseStream for input text: [{input_text}] end of segment with sentence [{sentence}] send failed, err: {err}"
-                    )
+            if turn.cancelled:
+                return
+
+            if len(full_content.strip()):
+                # remember response as assistant content in memory
+                turn.output(self._append_memory, "assistant", full_content)
+            else:
+                # can not put empty model response into memory
+                logger.error(
+                    f"GetConverseStream recv for input text: [{input_text}] failed: empty response [{full_content}]"
+                )
+                return
 
-            except Exception as e:
+            # send end of segment
+            try:
+                output_data = Data.create("text_data")
+                output_data.set_property_string(
+                    DATA_OUT_TEXT_DATA_PROPERTY_TEXT, sentence
+                )
+                output_data.set_property_bool(
+                    DATA_OUT_TEXT_DATA_PROPERTY_TEXT_END_OF_SEGMENT, True
+                )
+                turn.output(ten.send_data, output_data)
+                logger.info(
+                    f"GetConverseStream for input text: [{input_text}] end of segment with sentence [{sentence}] sent"
+                )
+            except Exception as err:
                 logger.info(
-                    f"GetConverseStream for input text: [{input_text}] failed, err: {e}"
+                    f"GetConverseStream for input text: [{input_text}] end of segment with sentence [{sentence}] send failed, err: {err}"
                 )
 
-        # Start thread to request and read responses from OpenAI
-        start_time = get_current_time()
-        thread = Thread(
-            target=converse_stream_worker, args=(start_time, input_text, self.memory)
-        )
-        thread.start()
-        logger.info(f"BedrockLLMExtension on_data end")
+        except Exception as e:
+            logger.info(
+                f"GetConverseStream for input text: [{input_text}] failed, err: {e}"
+            )
 
 
 @register_addon_as_extension("bedrock_llm_python")
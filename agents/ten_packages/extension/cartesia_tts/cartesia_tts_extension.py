@@ -1,13 +1,12 @@
 # cartesia_tts_extension.py
 
-import queue
-import threading
-from datetime import datetime
 import asyncio
+from collections import deque
+from datetime import datetime
 import re
 from ten import (
-    Extension,
-    TenEnv,
+    AsyncExtension,
+    AsyncTenEnv,
     Cmd,
     AudioFrameDataFmt,
     AudioFrame,
@@ -17,10 +16,11 @@ from ten import (
 )
 from .cartesia_wrapper import CartesiaWrapper, CartesiaConfig, CartesiaError
 from .log import logger
+from .pcm import PcmFramer
 
 class CartesiaCallback:
     # Handles audio processing and interrupt checks
-    def __init__(self, ten: TenEnv, sample_rate: int, need_interrupt_callback):
+    def __init__(self, ten: AsyncTenEnv, sample_rate: int, need_interrupt_callback):
         self.ten = ten
         self.sample_rate = sample_rate
         self.need_interrupt_callback = need_interrupt_callback
@@ -55,20 +55,28 @@ class CartesiaCallback:
         audio_frame = self.create_audio_frame(audio_data)
         self.ten.send_audio_frame(audio_frame)
 
-class CartesiaTTSExtension(Extension):
+class CartesiaTTSExtension(AsyncExtension):
     def __init__(self, name: str):
         super().__init__(name)
         self.cartesia = None
-        self.loop = None
-        self.queue = queue.Queue()
         self.outdate_ts = datetime.now()
-        self.stopped = False
-        self.thread = None
+        # responses and pauses in playout order
+        self.queue = asyncio.Queue()
+        self.playout = None
+        self.prefetch_sentences = 2
+        # responses queued beyond the ones synthesized ahead
+        self.waiting = deque()
         self.callback = None
+        # the response being spoken, continued by its next sentences
+        self.context = None
+        self.frame_size = 0
         self.skip_patterns = [r'\bssml_\w+\b']  # List of patterns to skip
         self.ten = None
 
-    def on_start(self, ten: TenEnv) -> None:
+    async def on_init(self, ten: AsyncTenEnv) -> None:
+        ten.on_init_done()
+
+    async def on_start(self, ten: AsyncTenEnv) -> None:
         self.ten = ten
         try:
             # Initialize Cartesia config and wrapper
@@ -81,39 +89,42 @@ class CartesiaTTSExtension(Extension):
             )
             self.cartesia = CartesiaWrapper(cartesia_config)
             self.callback = CartesiaCallback(ten, cartesia_config.sample_rate, self.need_interrupt)
+            # 10ms frames of s16le mono
+            self.frame_size = cartesia_config.sample_rate // 100 * 2
 
-            # Set up asyncio event loop
-            self.loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(self.loop)
-
-            # Connect to Cartesia API
-            self.loop.run_until_complete(self.cartesia.connect())
-            logger.info("Successfully connected to Cartesia API")
+            try:
+                prefetch_sentences = ten.get_property_int("prefetch_sentences")
+                if prefetch_sentences > 0:
+                    self.prefetch_sentences = prefetch_sentences
+            except Exception as e:
+                logger.info(f"Using default prefetch_sentences: {self.prefetch_sentences}, {e}")
 
-            # Start async handling thread
-            self.thread = threading.Thread(target=self.async_handle, args=[ten])
-            self.thread.start()
+            self.playout = asyncio.create_task(self.play_all())
 
-            ten.on_start_done()
+            # Connect to Cartesia API, the first sentence connects again on failure
+            try:
+                await self.cartesia.connect()
+                logger.info("Successfully connected to Cartesia API")
+            except CartesiaError as e:
+                logger.error(f"Failed to connect to Cartesia API: {e}")
         except Exception as e:
             logger.error(f"Failed to start CartesiaTTSExtension: {e}")
-            ten.on_start_done()
-
-    def on_stop(self, ten: TenEnv) -> None:
-        # Clean up resources and stop thread
-        self.stopped = True
-        self.flush()
-        self.queue.put(None)
-        if self.thread is not None:
-            self.thread.join()
-            self.thread = None
+        ten.on_start_done()
 
+    async def on_stop(self, ten: AsyncTenEnv) -> None:
+        # Clean up resources and stop the playout
+        await self.flush()
+        if self.playout:
+            await self.queue.put(None)
+            await self.playout
+            self.playout = None
         if self.cartesia:
-            self.loop.run_until_complete(self.cartesia.close())
-        if self.loop:
-            self.loop.close()
+            await self.cartesia.close()
         ten.on_stop_done()
 
+    async def on_deinit(self, ten: AsyncTenEnv) -> None:
+        ten.on_deinit_done()
+
     def need_interrupt(self, ts: datetime) -> bool:
         # Check if task is outdated
         return self.outdate_ts > ts
@@ -128,60 +139,119 @@ class CartesiaTTSExtension(Extension):
         # Create pause text
         return f"PAUSE_{duration_ms}_MS"
 
-    def on_data(self, ten: TenEnv, data: Data) -> None:
+    async def on_data(self, ten: AsyncTenEnv, data: Data) -> None:
         # Queue incoming text for processing
         input_text = data.get_property_string("text")
+        try:
+            end_of_segment = data.get_property_bool("end_of_segment")
+        except Exception:
+            end_of_segment = False
+
         if not input_text:
+            if end_of_segment:
+                await self.end_context()
             return
 
         # Handle the case of just a period or comma
         if input_text.strip() in ['.', ',']:
             pause_duration = 150 if input_text.strip() == '.' else 150
             pause_text = self.create_pause_text(pause_duration)
-            self.queue.put(("PAUSE", pause_text, datetime.now()))
+            # the silence follows the sentences so far
+            await self.end_context()
+            self.queue.put_nowait(("PAUSE", pause_text, datetime.now()))
             return
 
         processed_text = self.process_input_text(input_text)
 
         if processed_text.strip():
-            self.queue.put(("TEXT", processed_text, datetime.now()))
+            await self.speak(processed_text, end_of_segment)
+        elif end_of_segment:
+            await self.end_context()
         else:
             logger.info("Processed text is empty. Skipping synthesis.")
 
-    def async_handle(self, ten: TenEnv):
-        # Process queue items asynchronously
-        while not self.stopped:
-            try:
-                value = self.queue.get()
-                if value is None:
-                    break
+    async def speak(self, text: str, last: bool):
+        # Continue the response with a sentence, so that it is spoken with the
+        # prosody of the ones before, its audio is queued at its first sentence
+        context = self.context
+        if context is None:
+            context = self.context = self.cartesia.new_context()
+            self.waiting.append(context)
+            self.queue.put_nowait(("TEXT", context, datetime.now()))
+        if last:
+            self.context = None
+        await context.push(text, last)
+        await self.start_waiting()
 
-                item_type, content, ts = value
+    async def end_context(self):
+        # Let the response end after the sentences sent so far
+        context, self.context = self.context, None
+        if context is not None:
+            await context.push("", True)
 
-                self.callback.set_input_ts(ts)
+    async def start_waiting(self):
+        # Synthesize the responses queued next while one is played, up to
+        # prefetch_sentences of them
+        while self.waiting:
+            started = sum(1 for context in self.cartesia.contexts.values() if context.started)
+            if started > self.prefetch_sentences:
+                return
+            await self.waiting.popleft().start()
 
-                if self.callback.need_interrupt():
-                    logger.info("Drop outdated input")
-                    continue
+    async def play_all(self):
+        # Plays the responses and pauses in order
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            item_type, content, ts = item
+            try:
+                if item_type == "PAUSE":
+                    await self.play(ts, _iterate([self.cartesia.pause(content)]))
+                else:
+                    await content.start()
+                    await self.play(ts, self.chunks(content))
+            except CartesiaError as e:
+                logger.error(f"Failed to synthesize: {str(e)}. Moving to next item.")
+            except Exception as e:
+                logger.exception(f"Failed to play: {e}")
+            finally:
+                if item_type == "TEXT":
+                    await content.cancel()
+                    await self.start_waiting()
 
-                try:
-                    audio_data = self.loop.run_until_complete(self.cartesia.synthesize(content))
-                    self.callback.process_audio(audio_data)
-                except CartesiaError as e:
-                    logger.error(f"Failed to synthesize: {str(e)}. Moving to next item.")
-                    # Optionally, you could add some fallback behavior here, like playing an error sound
+    async def chunks(self, context):
+        while True:
+            audio_data = await context.next_chunk()
+            if audio_data is None:
+                return
+            yield audio_data
 
-            except Exception as e:
-                logger.exception(f"Error in async_handle: {e}")
-                # Continue processing the next item instead of breaking the loop
+    async def play(self, ts: datetime, chunks):
+        # Sends the audio in 10ms frames as it arrives
+        self.callback.set_input_ts(ts)
+        framer = PcmFramer(self.frame_size)
+        first = True
+        async for audio_data in chunks:
+            for frame in framer.feed(audio_data):
+                if self.need_interrupt(ts):
+                    return
+                if first:
+                    first = False
+                    latency = (datetime.now() - ts).total_seconds() * 1000
+                    logger.info(f"first frame latency {latency:.0f}ms")
+                self.callback.process_audio(frame)
+        frame = framer.flush()
+        if frame is not None and not self.need_interrupt(ts):
+            self.callback.process_audio(frame)
 
-    def on_cmd(self, ten: TenEnv, cmd: Cmd) -> None:
+    async def on_cmd(self, ten: AsyncTenEnv, cmd: Cmd) -> None:
         # Handle incoming commands
         cmd_name = cmd.get_name()
 
         if cmd_name == "flush":
             self.outdate_ts = datetime.now()
-            self.flush()
+            await self.flush()
             cmd_result = CmdResult.create(StatusCode.OK)
             cmd_result.set_property_string("detail", "Flush command executed")
         else:
@@ -191,7 +261,17 @@ class CartesiaTTSExtension(Extension):
 
         ten.return_result(cmd_result, cmd)
 
-    def flush(self):
-        # Clear the queue
+    async def flush(self):
+        # Drop the queued responses and cancel their contexts
+        self.context = None
+        self.waiting.clear()
         while not self.queue.empty():
-            self.queue.get()
+            self.queue.get_nowait()
+        if self.cartesia:
+            for context in list(self.cartesia.contexts.values()):
+                await context.cancel()
+
+
+async def _iterate(chunks):
+    for chunk in chunks:
+        yield chunk
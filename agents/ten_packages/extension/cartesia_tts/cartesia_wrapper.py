@@ -10,6 +10,16 @@ from urllib.parse import urlparse
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+CARTESIA_WS_URL = "wss://api.cartesia.ai/tts/websocket"
+
+# Attempts to connect again after the connection dropped, waiting twice as
+# long after each failure
+RECONNECT_ATTEMPTS = 5
+RECONNECT_BACKOFF = 0.1
+RECONNECT_BACKOFF_MAX = 2.0
+# Times the sentences of a context are sent again after its connection dropped
+CONTEXT_RETRIES = 2
+
 class CartesiaError(Exception):
     """Custom exception class for Cartesia-related errors."""
     pass
@@ -23,42 +33,173 @@ class CartesiaConfig:
         self.sample_rate = sample_rate
         self.cartesia_version = cartesia_version
 
+class CartesiaContext:
+    # A response spoken over one continuation context: once started its
+    # sentences are sent as they come, its audio is streamed as it arrives
+    def __init__(self, wrapper, context_id: str):
+        self.wrapper = wrapper
+        self.context_id = context_id
+        self.transcripts = []
+        # no more sentences follow
+        self.last = False
+        self.started = False
+        self.websocket = None
+        self.queue = asyncio.Queue()
+        self.received = False
+        self.retries = 0
+        self.finished = False
+
+    async def start(self):
+        # Send the sentences so far, the next ones are sent as they come
+        if self.started or self.finished:
+            return
+        self.started = True
+        await self.wrapper._send(self, self.requests(len(self.transcripts)))
+
+    async def push(self, text: str, last: bool = False):
+        # Continue the context with a sentence, the last one closes it
+        if self.finished or self.last:
+            return
+        self.transcripts.append(text)
+        self.last = last
+        if self.started:
+            index = len(self.transcripts) - 1
+            await self.wrapper._send(self, self.requests(index + 1)[index:])
+
+    def requests(self, count: int):
+        # The requests of the first count sentences
+        return [
+            self.wrapper._request(self.context_id, text, not (self.last and i == len(self.transcripts) - 1))
+            for i, text in enumerate(self.transcripts[:count])
+        ]
+
+    async def next_chunk(self):
+        # The next audio chunk, None once the context is done or cancelled
+        if self.finished:
+            return None
+        try:
+            while True:
+                message = await self.queue.get()
+                if message is None:
+                    if self.finished:
+                        return None
+                    if self.received or self.retries >= CONTEXT_RETRIES:
+                        raise CartesiaError("Connection closed during synthesis")
+                    # Nothing was heard yet, so the context can start over
+                    self.retries += 1
+                    logger.error("WebSocket connection closed unexpectedly. Attempting to reconnect...")
+                    self.websocket = None
+                    await self.wrapper._send(self, self.requests(len(self.transcripts)))
+                    continue
+
+                if message['type'] == 'chunk':
+                    self.received = True
+                    return base64.b64decode(message['data'])
+                elif message['type'] == 'done':
+                    self._finish()
+                    return None
+                elif message['type'] == 'error':
+                    raise CartesiaError(f"Synthesis error: {message.get('error', 'Unknown error')}")
+                else:
+                    logger.warning(f"Unknown message type: {message['type']}")
+        except CartesiaError:
+            self._finish()
+            raise
+        except Exception as e:
+            self._finish()
+            logger.error(f"Error during synthesis: {str(e)}")
+            raise CartesiaError(f"Synthesis failed: {str(e)}")
+
+    async def cancel(self):
+        # Stop the generation of the context, e.g. on flush
+        if self.finished:
+            return
+        self._finish()
+        websocket = self.websocket
+        if websocket is not None and websocket is self.wrapper.websocket:
+            try:
+                await websocket.send(json.dumps({"context_id": self.context_id, "cancel": True}))
+            except websockets.exceptions.ConnectionClosed:
+                pass
+
+    def _finish(self):
+        self.finished = True
+        self.wrapper.contexts.pop(self.context_id, None)
+        # wake a reader of the context
+        self.queue.put_nowait(None)
+
 class CartesiaWrapper:
     # Wrapper class for Cartesia API interactions
     def __init__(self, config: CartesiaConfig):
         self.config = config
         self.websocket = None
         self.context_id = 0
+        # contexts in flight, by context id
+        self.contexts = {}
+        self.reader = None
+        self.connect_lock = asyncio.Lock()
+        # keeps the sentences of a context in order
+        self.send_lock = asyncio.Lock()
 
     async def connect(self):
         # Establish WebSocket connection to Cartesia API
-        ws_url = f"wss://api.cartesia.ai/tts/websocket?api_key={self.config.api_key}&cartesia_version={self.config.cartesia_version}"
+        ws_url = f"{CARTESIA_WS_URL}?api_key={self.config.api_key}&cartesia_version={self.config.cartesia_version}"
         try:
             self.websocket = await websockets.connect(ws_url)
+            self.reader = asyncio.create_task(self._read(self.websocket))
             logger.info("Connected to Cartesia WebSocket")
         except Exception as e:
             logger.error(f"Failed to connect to Cartesia API: {str(e)}")
             raise CartesiaError(f"Connection failed: {str(e)}")
 
-    async def synthesize(self, text: str):
-        # Synthesize speech from text using Cartesia API
-        if not self.websocket:
-            await self.connect()
+    async def _reconnect(self):
+        # Connect once for all the contexts that found the connection gone,
+        # backing off between a bounded number of attempts
+        async with self.connect_lock:
+            backoff = RECONNECT_BACKOFF
+            for attempt in range(RECONNECT_ATTEMPTS):
+                if self.websocket is not None:
+                    return
+                try:
+                    await self.connect()
+                    return
+                except CartesiaError:
+                    if attempt == RECONNECT_ATTEMPTS - 1:
+                        raise
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, RECONNECT_BACKOFF_MAX)
 
-        if text.startswith("PAUSE_"):
-            # Handle custom pause marker
-            try:
-                duration_ms = int(text.split("_")[1])
-                return self.generate_silence(duration_ms)
-            except (IndexError, ValueError):
-                logger.error(f"Invalid pause format: {text}")
-                raise CartesiaError(f"Invalid pause format: {text}")
+    async def _read(self, websocket):
+        # Route the messages of concurrent contexts to them
+        try:
+            async for response in websocket:
+                message = json.loads(response)
+                context = self.contexts.get(message.get("context_id"))
+                if context:
+                    context.queue.put_nowait(message)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            if self.websocket is websocket:
+                self.websocket = None
+            # wake the contexts waiting on the closed connection
+            for context in list(self.contexts.values()):
+                if context.websocket is websocket:
+                    context.queue.put_nowait(None)
 
+    def new_context(self) -> CartesiaContext:
+        # A context for a response, its sentences are spoken as one
         self.context_id += 1
-        request = {
-            "context_id": f"context_{self.context_id}",
+        context = CartesiaContext(self, f"context_{self.context_id}")
+        self.contexts[context.context_id] = context
+        return context
+
+    def _request(self, context_id: str, text: str, continue_: bool):
+        return {
+            "context_id": context_id,
             "model_id": self.config.model_id,
             "transcript": text,
+            "continue": continue_,
             "voice": {"mode": "id", "id": self.config.voice_id},
             "output_format": {
                 "container": "raw",
@@ -69,35 +210,38 @@ class CartesiaWrapper:
             "add_timestamps": False
         }
 
-        try:
-            # Send synthesis request
-            await self.websocket.send(json.dumps(request))
-
-            # Receive and process audio chunks
-            audio_data = bytearray()
-            while True:
-                response = await self.websocket.recv()
-                message = json.loads(response)
-
-                if message['type'] == 'chunk':
-                    chunk_data = base64.b64decode(message['data'])
-                    audio_data.extend(chunk_data)
-                elif message['type'] == 'done':
-                    break
-                elif message['type'] == 'error':
-                    raise CartesiaError(f"Synthesis error: {message.get('error', 'Unknown error')}")
-                else:
-                    logger.warning(f"Unknown message type: {message['type']}")
+    async def _send(self, context: CartesiaContext, requests):
+        async with self.send_lock:
+            if context.finished:
+                return
+            if context.websocket is None:
+                if not self.websocket:
+                    try:
+                        await self._reconnect()
+                    except CartesiaError:
+                        # next_chunk tries again or reports the error
+                        context.queue.put_nowait(None)
+                        return
+                context.websocket = self.websocket
+            elif context.websocket is not self.websocket:
+                # The connection of the context is gone, next_chunk sends the
+                # sentence again with the others on the new one
+                return
+            try:
+                for request in requests:
+                    await context.websocket.send(json.dumps(request))
+            except websockets.exceptions.ConnectionClosed:
+                # The reader wakes the context to start over
+                pass
 
-            return audio_data
-        except websockets.exceptions.ConnectionClosed:
-            # Handle connection errors and retry
-            logger.error("WebSocket connection closed unexpectedly. Attempting to reconnect...")
-            await self.connect()
-            return await self.synthesize(text)  # Retry the synthesis after reconnecting
-        except Exception as e:
-            logger.error(f"Error during synthesis: {str(e)}")
-            raise CartesiaError(f"Synthesis failed: {str(e)}")
+    def pause(self, text: str) -> bytes:
+        # Silence for a custom pause marker, e.g. PAUSE_150_MS
+        try:
+            duration_ms = int(text.split("_")[1])
+            return self.generate_silence(duration_ms)
+        except (IndexError, ValueError):
+            logger.error(f"Invalid pause format: {text}")
+            raise CartesiaError(f"Invalid pause format: {text}")
 
     def generate_silence(self, duration_ms: int) -> bytes:
         # Generate silent audio data
@@ -110,3 +254,5 @@ class CartesiaWrapper:
         if self.websocket:
             await self.websocket.close()
             logger.info("Closed WebSocket connection to Cartesia API")
+        if self.reader:
+            await self.reader
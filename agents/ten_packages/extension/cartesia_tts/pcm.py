@@ -0,0 +1,48 @@
+# pcm.py
+
+from typing import Iterator, Optional
+
+
+class PcmFramer:
+    """Cuts a stream of chunks of any size into frames of frame_size bytes.
+
+    Frames within a chunk are memoryviews of it, only the frames across two
+    chunks are copied, once, into a preallocated buffer, so the cost is
+    linear in the stream length. A frame is only valid until the next one
+    is read."""
+
+    def __init__(self, frame_size: int) -> None:
+        self.frame_size = frame_size
+        self.buf = bytearray(frame_size)
+        self.view = memoryview(self.buf)
+        self.filled = 0
+        # bytes fed so far, without padding
+        self.total = 0
+
+    def feed(self, data: bytes) -> Iterator[memoryview]:
+        src = memoryview(data)
+        self.total += len(src)
+        start = 0
+        if self.filled:
+            start = min(len(src), self.frame_size - self.filled)
+            self.view[self.filled:self.filled + start] = src[:start]
+            self.filled += start
+            if self.filled < self.frame_size:
+                return
+            self.filled = 0
+            yield self.view
+
+        end = len(src) - (len(src) - start) % self.frame_size
+        for i in range(start, end, self.frame_size):
+            yield src[i:i + self.frame_size]
+
+        self.filled = len(src) - end
+        self.view[:self.filled] = src[end:]
+
+    def flush(self) -> Optional[memoryview]:
+        """The last partial frame padded with silence, None if there is none."""
+        if not self.filled:
+            return None
+        self.view[self.filled:] = bytes(self.frame_size - self.filled)
+        self.filled = 0
+        return self.view
@@ -0,0 +1,11 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import sys
+from pathlib import Path
+
+# make `cartesia_tts` importable as a package
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
@@ -0,0 +1,244 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import asyncio
+import base64
+import json
+import time
+
+import pytest
+import websockets
+
+from cartesia_tts import cartesia_wrapper
+from cartesia_tts.cartesia_tts_extension import CartesiaTTSExtension
+from ten import Cmd, Data
+
+# 50ms of 16kHz s16le audio per chunk
+CHUNK = b"\x01\x00" * 800
+
+
+class StubCartesia:
+    """A Cartesia websocket streaming `chunks` chunks per transcript, one every
+    `interval` seconds, in order within a context and concurrently across
+    contexts. The first `drops` connections are closed on their first
+    request."""
+
+    def __init__(self, chunks: int = 5, interval: float = 0.05, drops: int = 0):
+        self.chunks = chunks
+        self.interval = interval
+        self.drops = drops
+        self.connections = 0
+        self.requests = []
+        self.cancelled = []
+        self.done = {}
+        self.server = None
+        self.url = None
+
+    async def start(self):
+        self.server = await websockets.serve(self._handle, "127.0.0.1", 0)
+        self.url = f"ws://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def _handle(self, websocket):
+        self.connections += 1
+        contexts = {}
+        async for message in websocket:
+            request = json.loads(message)
+            context_id = request["context_id"]
+            if request.get("cancel"):
+                self.cancelled.append(context_id)
+                contexts.pop(context_id).cancel()
+                continue
+            if self.drops:
+                self.drops -= 1
+                await websocket.close()
+                return
+            self.requests.append((time.monotonic(), request))
+            if context_id not in contexts:
+                queue = asyncio.Queue()
+                contexts[context_id] = asyncio.create_task(self._speak(websocket, context_id, queue))
+                contexts[context_id].queue = queue
+            contexts[context_id].queue.put_nowait(request)
+
+    async def _speak(self, websocket, context_id, queue):
+        while True:
+            request = await queue.get()
+            for _ in range(self.chunks if request["transcript"] else 0):
+                await asyncio.sleep(self.interval)
+                await websocket.send(json.dumps({
+                    "type": "chunk", "context_id": context_id, "data": base64.b64encode(CHUNK).decode()}))
+            if not request["continue"]:
+                self.done[context_id] = time.monotonic()
+                await websocket.send(json.dumps({"type": "done", "context_id": context_id}))
+                return
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+class Env:
+    def __init__(self):
+        self.properties = {
+            "api_key": "key", "model_id": "sonic", "voice_id": "voice",
+            "sample_rate": "16000", "cartesia_version": "2024-06-10"}
+        self.frames = []
+
+    def get_property_string(self, key):
+        return self.properties[key]
+
+    def get_property_int(self, key):
+        raise KeyError(key)
+
+    def send_audio_frame(self, frame):
+        self.frames.append((time.monotonic(), frame.get_buf()))
+
+    def on_init_done(self):
+        pass
+
+    on_start_done = on_stop_done = on_deinit_done = on_init_done
+
+    def return_result(self, result, cmd):
+        pass
+
+
+def _text(text: str, end_of_segment: bool) -> Data:
+    data = Data.create("text_data")
+    data.set_property_string("text", text)
+    data.set_property_bool("end_of_segment", end_of_segment)
+    return data
+
+
+async def _wait(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        await asyncio.sleep(0.005)
+    assert condition()
+
+
+def _speak(monkeypatch, scenario, **stub_args):
+    async def main():
+        stub = StubCartesia(**stub_args)
+        await stub.start()
+        monkeypatch.setattr(cartesia_wrapper, "CARTESIA_WS_URL", stub.url)
+        env = Env()
+        extension = CartesiaTTSExtension("cartesia_tts")
+        await extension.on_init(env)
+        await extension.on_start(env)
+        try:
+            await scenario(extension, env, stub)
+        finally:
+            await extension.on_stop(env)
+            await stub.close()
+
+    asyncio.run(main())
+
+
+def test_first_frame_as_the_first_chunk_arrives(monkeypatch):
+    async def scenario(extension, env, stub):
+        started = time.monotonic()
+        await extension.on_data(env, _text("Hello there.", True))
+        await _wait(lambda: len(env.frames) == 25)
+
+        first_frame_ms = (env.frames[0][0] - started) * 1000
+        last_frame_ms = (env.frames[-1][0] - started) * 1000
+        print(f"first frame {first_frame_ms:.0f}ms, last frame {last_frame_ms:.0f}ms")
+        # gathering the audio until done took the whole synthesis, 250ms
+        assert first_frame_ms < 120
+        assert last_frame_ms > 230
+        # 10ms frames
+        assert all(len(buf) == 320 for _, buf in env.frames)
+
+    _speak(monkeypatch, scenario)
+
+
+def test_sentences_of_a_response_continue_one_context(monkeypatch):
+    async def scenario(extension, env, stub):
+        await extension.on_data(env, _text("Hello there.", False))
+        await extension.on_data(env, _text("How are you?", False))
+        await extension.on_data(env, _text("", True))
+        await extension.on_data(env, _text("Next one.", True))
+        await _wait(lambda: len(env.frames) == 75)
+
+        requests = [(r["context_id"], r["transcript"], r["continue"]) for _, r in stub.requests]
+        assert requests == [
+            ("context_1", "Hello there.", True),
+            ("context_1", "How are you?", True),
+            ("context_1", "", False),
+            ("context_2", "Next one.", False),
+        ]
+        assert stub.connections == 1
+
+    _speak(monkeypatch, scenario)
+
+
+def test_contexts_are_synthesized_concurrently(monkeypatch):
+    async def scenario(extension, env, stub):
+        started = time.monotonic()
+        for text in ("One.", "Two.", "Three.", "Four."):
+            await extension.on_data(env, _text(text, True))
+        await _wait(lambda: len(env.frames) == 100)
+        elapsed = time.monotonic() - started
+
+        # the next prefetch_sentences responses are sent ahead, the last one
+        # once the first is played
+        sent = {r["context_id"]: ts for ts, r in stub.requests}
+        assert sent["context_3"] < stub.done["context_1"]
+        assert sent["context_4"] >= stub.done["context_1"]
+        # one after the other the responses took 1s
+        print(f"4 responses in {elapsed * 1000:.0f}ms on {stub.connections} connection")
+        assert elapsed < 0.7
+        assert stub.connections == 1
+        frames = [buf[0] for _, buf in env.frames]
+        assert frames == [1] * 100
+
+    _speak(monkeypatch, scenario)
+
+
+def test_flush_cancels_the_active_context(monkeypatch):
+    async def scenario(extension, env, stub):
+        await extension.on_data(env, _text("Hello there.", False))
+        await _wait(lambda: len(env.frames) > 0)
+        await extension.on_cmd(env, Cmd.create("flush"))
+        await _wait(lambda: stub.cancelled == ["context_1"])
+        frames = len(env.frames)
+        await asyncio.sleep(0.2)
+        assert len(env.frames) == frames
+
+        # the next response starts a new context
+        await extension.on_data(env, _text("Next one.", True))
+        await _wait(lambda: len(env.frames) == frames + 25)
+        assert stub.requests[-1][1]["context_id"] == "context_2"
+
+    _speak(monkeypatch, scenario)
+
+
+def test_context_sent_again_after_the_connection_dropped(monkeypatch):
+    async def scenario(extension, env, stub):
+        await extension.on_data(env, _text("Hello there.", True))
+        await _wait(lambda: len(env.frames) == 25)
+        assert stub.connections == 2
+
+    _speak(monkeypatch, scenario, drops=1)
+
+
+def test_reconnect_is_bounded_and_backs_off(monkeypatch):
+    attempts = []
+
+    async def refuse(url):
+        attempts.append(time.monotonic())
+        raise OSError("connection refused")
+
+    monkeypatch.setattr(cartesia_wrapper.websockets, "connect", refuse)
+    monkeypatch.setattr(cartesia_wrapper, "RECONNECT_BACKOFF", 0.01)
+    config = cartesia_wrapper.CartesiaConfig("key", "sonic", "voice", 16000, "2024-06-10")
+    wrapper = cartesia_wrapper.CartesiaWrapper(config)
+
+    with pytest.raises(cartesia_wrapper.CartesiaError):
+        asyncio.run(wrapper._reconnect())
+    assert len(attempts) == cartesia_wrapper.RECONNECT_ATTEMPTS
+    waits = [b - a for a, b in zip(attempts, attempts[1:])]
+    assert waits == sorted(waits)
+    assert waits[-1] >= 0.08
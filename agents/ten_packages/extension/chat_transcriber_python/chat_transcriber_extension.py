@@ -26,11 +26,13 @@ TEXT_DATA_FINAL_FIELD = "is_final"
 TEXT_DATA_STREAM_ID_FIELD = "stream_id"
 TEXT_DATA_END_OF_SEGMENT_FIELD = "end_of_segment"
 
-# record the cached text data for each stream id
-cached_text_map = {}
+class ChatTranscriberExtension(Extension):
+    def __init__(self, name: str):
+        super().__init__(name)
 
+        # record the cached text data for each stream id
+        self.cached_text_map = {}
 
-class ChatTranscriberExtension(Extension):
     def on_start(self, ten: TenEnv) -> None:
         logger.info("on_start")
         ten.on_start_done()
@@ -97,15 +99,15 @@ class ChatTranscriberExtension(Extension):
         # We cache all final text data and append the non-final text data to the cached data
         # until the end of the segment.
         if end_of_segment:
-            if stream_id in cached_text_map:
-                text = cached_text_map[stream_id] + text
-                del cached_text_map[stream_id]
+            if stream_id in self.cached_text_map:
+                text = self.cached_text_map[stream_id] + text
+                del self.cached_text_map[stream_id]
         else:
             if final:
-                if stream_id in cached_text_map:
-                    text = cached_text_map[stream_id] + text
+                if stream_id in self.cached_text_map:
+                    text = self.cached_text_map[stream_id] + text
 
-                cached_text_map[stream_id] = text
+                self.cached_text_map[stream_id] = text
 
         pb_text = pb.Text(
             uid=stream_id,
@@ -21,15 +21,30 @@ import dashscope
 import queue
 import threading
 from datetime import datetime
-from dashscope.audio.tts_v2 import ResultCallback, SpeechSynthesizer, AudioFormat
+from dashscope.audio.tts_v2 import ResultCallback, AudioFormat
 from .log import logger
+from .resampler import PcmConverter
+from .synthesizer_pool import SynthesizerPool, WarmSynthesizer
+
+# sample rates the vendor synthesizes in, others are resampled
+VENDOR_FORMATS = {
+    8000: AudioFormat.PCM_8000HZ_MONO_16BIT,
+    16000: AudioFormat.PCM_16000HZ_MONO_16BIT,
+    22050: AudioFormat.PCM_22050HZ_MONO_16BIT,
+    24000: AudioFormat.PCM_24000HZ_MONO_16BIT,
+    44100: AudioFormat.PCM_44100HZ_MONO_16BIT,
+    48000: AudioFormat.PCM_48000HZ_MONO_16BIT,
+}
 
 
 class CosyTTSCallback(ResultCallback):
-    def __init__(self, ten: TenEnv, sample_rate: int, need_interrupt_callback):
+    def __init__(self, ten: TenEnv, sample_rate: int, need_interrupt_callback, vendor_sample_rate: int = 0):
         super().__init__()
         self.ten = ten
         self.sample_rate = sample_rate
+        self.converter = None
+        if vendor_sample_rate and vendor_sample_rate != sample_rate:
+            self.converter = PcmConverter(vendor_sample_rate, sample_rate)
         self.frame_size = int(self.sample_rate * 1 * 2 / 100)
         self.ts = datetime.now()  # current task ts
         self.init_ts = datetime.now()
@@ -83,6 +98,8 @@ class CosyTTSCallback(ResultCallback):
 
         # logger.info("audio result length: %d, %d", len(data), self.frame_size)
         try:
+            if self.converter:
+                data = self.converter.process(data)
             f = self.get_frame(data)
             self.ten.send_audio_frame(f)
         except Exception as e:
@@ -96,9 +113,13 @@ class CosyTTSExtension(Extension):
         self.voice = ""
         self.model = ""
         self.sample_rate = 16000
+        self.vendor_sample_rate = 16000
         self.tts = None
         self.callback = None
         self.format = None
+        # synthesizers opened ahead of the next segments
+        self.warm_synthesizers = 1
+        self.pool = None
 
         self.outdate_ts = datetime.now()
 
@@ -114,24 +135,21 @@ class CosyTTSExtension(Extension):
         self.sample_rate = ten.get_property_int("sample_rate")
 
         dashscope.api_key = self.api_key
-        f = AudioFormat.PCM_16000HZ_MONO_16BIT
-        if self.sample_rate == 8000:
-            f = AudioFormat.PCM_8000HZ_MONO_16BIT
-        elif self.sample_rate == 16000:
-            f = AudioFormat.PCM_16000HZ_MONO_16BIT
-        elif self.sample_rate == 22050:
-            f = AudioFormat.PCM_22050HZ_MONO_16BIT
-        elif self.sample_rate == 24000:
-            f = AudioFormat.PCM_24000HZ_MONO_16BIT
-        elif self.sample_rate == 44100:
-            f = AudioFormat.PCM_44100HZ_MONO_16BIT
-        elif self.sample_rate == 48000:
-            f = AudioFormat.PCM_48000HZ_MONO_16BIT
-        else:
-            logger.error("unknown sample rate %d", self.sample_rate)
-            exit()
+        # synthesize in the lowest vendor rate that is not below the requested one
+        self.vendor_sample_rate = min(
+            (r for r in VENDOR_FORMATS if r >= self.sample_rate), default=max(VENDOR_FORMATS))
+        if self.vendor_sample_rate != self.sample_rate:
+            logger.info("resample %d to %d", self.vendor_sample_rate, self.sample_rate)
+
+        self.format = VENDOR_FORMATS[self.vendor_sample_rate]
+
+        try:
+            self.warm_synthesizers = ten.get_property_int("warm_synthesizers")
+        except Exception as e:
+            logger.info(f"GetProperty optional warm_synthesizers failed, err: {e}")
 
-        self.format = f
+        self.pool = SynthesizerPool(lambda: self.create_synthesizer(ten), self.warm_synthesizers)
+        self.pool.start()
 
         self.thread = threading.Thread(target=self.async_handle, args=[ten])
         self.thread.start()
@@ -146,11 +164,27 @@ class CosyTTSExtension(Extension):
         if self.thread is not None:
             self.thread.join()
             self.thread = None
+        if self.pool is not None:
+            logger.info(self.pool.stats())
+            self.pool.stop()
+            self.pool = None
         ten.on_stop_done()
 
     def need_interrupt(self, ts: datetime.time) -> bool:
         return self.outdate_ts > ts
 
+    def create_synthesizer(self, ten: TenEnv):
+        callback = CosyTTSCallback(
+            ten, self.sample_rate, self.need_interrupt, self.vendor_sample_rate
+        )
+        tts = WarmSynthesizer(
+            model=self.model,
+            voice=self.voice,
+            format=self.format,
+            callback=callback,
+        )
+        return tts, callback
+
     def async_handle(self, ten: TenEnv):
         try:
             tts = None
@@ -181,18 +215,15 @@ class CosyTTSExtension(Extension):
                         logger.info("drop outdated input")
                         continue
 
-                    # create new tts if needed
+                    # no segment to complete
+                    if tts is None and len(input_text) == 0:
+                        continue
+
+                    # take an open tts for the segment, kept until its end
                     if tts is None or callback is None:
-                        logger.info("creating tts")
-                        callback = CosyTTSCallback(
-                            ten, self.sample_rate, self.need_interrupt
-                        )
-                        tts = SpeechSynthesizer(
-                            model=self.model,
-                            voice=self.voice,
-                            format=self.format,
-                            callback=callback,
-                        )
+                        logger.info("taking tts")
+                        tts, callback = self.pool.take()
+                        callback.init_ts = datetime.now()
 
                     logger.info(
                         "on message [{}] ts [{}] end_of_segment [{}]".format(
@@ -207,8 +238,9 @@ class CosyTTSExtension(Extension):
                         # last segment may have empty text but is_end is true
                         tts.streaming_call(input_text)
 
-                    # complete the streaming call to drain remained audio
-                    if True:  # end_of_segment:
+                    # complete the streaming call at the end of the segment to
+                    # drain remained audio
+                    if end_of_segment:
                         try:
                             tts.streaming_complete()
                         except Exception as e:
@@ -218,6 +250,14 @@ class CosyTTSExtension(Extension):
                 except Exception as e:
                     logger.exception(e)
                     logger.exception(traceback.format_exc())
+                    # the next text takes a new tts
+                    if tts is not None:
+                        try:
+                            tts.discard()
+                        except Exception as e:
+                            logger.warning(e)
+                        tts = None
+                        callback = None
         finally:
             if tts is not None:
                 tts.streaming_cancel()
@@ -0,0 +1,161 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, List, Tuple
+
+from dashscope.audio.tts_v2 import SpeechSynthesizer
+
+from .log import logger
+
+# warm synthesizers are replaced before the vendor ends their idle task
+MAX_IDLE = 20.0
+# wait after a failed open, doubled on each failure in a row
+RETRY_DELAY = 0.5
+RETRY_DELAY_MAX = 10.0
+
+
+class WarmSynthesizer(SpeechSynthesizer):
+    """A SpeechSynthesizer whose connection and task can be set up ahead of
+    the first text."""
+
+    def open(self) -> None:
+        # streaming_call starts the task on its first call, dashscope 1.20 has
+        # no public method for it
+        self._is_first = False
+        self._SpeechSynthesizer__start_stream()
+
+    def discard(self) -> None:
+        # ends the task, or only the connection if the task did not start
+        if self._is_started:
+            self.streaming_cancel()
+        else:
+            self.close()
+
+    @property
+    def connected(self) -> bool:
+        sock = self.ws.sock
+        return bool(sock and sock.connected) and not self._stopped.is_set()
+
+
+class SynthesizerPool:
+    """Keeps `size` synthesizers open for the next segments, so that a
+    segment does not wait for the vendor's connection and task setup.
+
+    create() returns a new synthesizer and its callback. take() hands out a
+    warm one, or opens one there and then if there is none, and a background
+    thread opens the next. Synthesizers idle for max_idle seconds are
+    replaced."""
+
+    def __init__(self, create: Callable[[], Tuple[WarmSynthesizer, Any]], size: int = 1, max_idle: float = MAX_IDLE) -> None:
+        self.create = create
+        self.size = size
+        self.max_idle = max_idle
+        # (opened, synthesizer, callback), oldest first
+        self.idle: Deque[Tuple[float, WarmSynthesizer, Any]] = deque()
+        self.cond = threading.Condition()
+        self.stopped = False
+        self.thread = None
+
+        self.warm = 0
+        self.cold = 0
+        # time take() blocked, the setup paid by the segments
+        self.setup_ms = 0.0
+
+    def start(self) -> None:
+        if self.size > 0:
+            self.thread = threading.Thread(target=self._fill, daemon=True)
+            self.thread.start()
+
+    def take(self) -> Tuple[WarmSynthesizer, Any]:
+        started = time.monotonic()
+        with self.cond:
+            stale = self._expire()
+            entry = self.idle.popleft() if self.idle else None
+            self.cond.notify()
+        self._close(stale)
+
+        if entry is None:
+            tts, callback = self.create()
+            tts.open()
+            self.cold += 1
+        else:
+            _, tts, callback = entry
+            self.warm += 1
+        self.setup_ms += (time.monotonic() - started) * 1000
+        return tts, callback
+
+    def stop(self) -> None:
+        # the synthesizers left are closed before it returns
+        with self.cond:
+            self.stopped = True
+            self.cond.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        with self.cond:
+            stale = [tts for _, tts, _ in self.idle]
+            self.idle.clear()
+        self._cancel(stale)
+
+    def stats(self) -> str:
+        taken = self.warm + self.cold
+        avg = self.setup_ms / taken if taken else 0
+        return f"{self.warm} warm and {self.cold} cold synthesizers taken, setup avg {avg:.0f}ms"
+
+    def _expire(self) -> List[WarmSynthesizer]:
+        now = time.monotonic()
+        stale = [tts for opened, tts, _ in self.idle if now - opened > self.max_idle or not tts.connected]
+        if stale:
+            self.idle = deque(entry for entry in self.idle if entry[1] not in stale)
+        return stale
+
+    def _close(self, synthesizers: List[WarmSynthesizer]) -> None:
+        # closing waits for the vendor, not for take()
+        if synthesizers:
+            threading.Thread(target=self._cancel, args=[synthesizers], daemon=True).start()
+
+    def _cancel(self, synthesizers: List[WarmSynthesizer]) -> None:
+        for tts in synthesizers:
+            try:
+                tts.discard()
+            except Exception as e:
+                logger.warning(f"close synthesizer failed, {e}")
+
+    def _fill(self) -> None:
+        delay = 0.0
+        while True:
+            with self.cond:
+                if delay:
+                    self.cond.wait(delay)
+                stale = []
+                while not self.stopped and len(self.idle) >= self.size:
+                    # wakes up to replace the synthesizers about to expire
+                    self.cond.wait(self.max_idle / 4)
+                    stale += self._expire()
+                stopped = self.stopped
+            self._close(stale)
+            if stopped:
+                return
+
+            tts = None
+            try:
+                tts, callback = self.create()
+                tts.open()
+            except Exception as e:
+                if tts is not None:
+                    self._close([tts])
+                delay = min(max(delay * 2, RETRY_DELAY), RETRY_DELAY_MAX)
+                logger.warning(f"open synthesizer failed, retry in {delay}s, {e}")
+                continue
+            delay = 0.0
+
+            with self.cond:
+                if not self.stopped:
+                    self.idle.append((time.monotonic(), tts, callback))
+                    continue
+            self._close([tts])
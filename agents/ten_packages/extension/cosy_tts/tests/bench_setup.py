@@ -0,0 +1,110 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+"""Per sentence synthesis setup benchmark.
+
+    python tests/bench_setup.py [segments] [task start delay in seconds]
+
+Speaks segments of 3 sentences to a local DashScope websocket stub, whose
+tasks start after the given delay, as the vendor's do after a few round
+trips, and reports the time from handing a sentence to the synthesizer
+to its first audio:
+
+- a synthesizer per sentence, as the extension did
+- a synthesizer per segment, taken warm from SynthesizerPool
+"""
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+import dashscope
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from cosy_tts.synthesizer_pool import SynthesizerPool, WarmSynthesizer  # noqa: E402
+from test_synthesizer_pool import StubDashScope  # noqa: E402
+
+SENTENCES = ["Hello there.", "How are you?", "Bye."]
+
+
+class Callback:
+    closed = False
+
+    def __init__(self):
+        self.first_audio = threading.Event()
+
+    def on_data(self, data: bytes) -> None:
+        self.first_audio.set()
+
+    def __getattr__(self, name):
+        return lambda *args: None
+
+
+def _create():
+    callback = Callback()
+    return WarmSynthesizer(model="cosyvoice-v1", voice="longxiaochun", callback=callback), callback
+
+
+def _sentence(tts, callback, text):
+    started = time.perf_counter()
+    callback.first_audio.clear()
+    tts.streaming_call(text)
+    callback.first_audio.wait()
+    return time.perf_counter() - started
+
+
+def per_sentence(segments):
+    samples = []
+    for _ in range(segments):
+        for text in SENTENCES:
+            tts, callback = _create()
+            samples.append(_sentence(tts, callback, text))
+            tts.streaming_complete()
+    return samples
+
+
+def per_segment(segments):
+    pool = SynthesizerPool(_create, size=1)
+    pool.start()
+    samples = []
+    for _ in range(segments):
+        # the user speaks between the responses
+        time.sleep(0.5)
+        started = time.perf_counter()
+        tts, callback = pool.take()
+        setup = time.perf_counter() - started
+        for i, text in enumerate(SENTENCES):
+            samples.append(_sentence(tts, callback, text) + (setup if i == 0 else 0))
+        tts.streaming_complete()
+    print(pool.stats())
+    pool.stop()
+    return samples
+
+
+def _report(name, samples):
+    samples = sorted(s * 1000 for s in samples)
+    print(f"{name:28} median {statistics.median(samples):6.1f} ms"
+          f"  p90 {samples[int(len(samples) * 0.9)]:6.1f} ms  max {samples[-1]:6.1f} ms")
+
+
+def main(segments: int, start_delay: float):
+    stub = StubDashScope(start_delay=start_delay)
+    dashscope.api_key = "key"
+    dashscope.base_websocket_api_url = stub.url
+
+    print(f"{segments} segments of {len(SENTENCES)} sentences, task start delay {start_delay * 1000:.0f}ms")
+    _report("synthesizer per sentence", per_sentence(segments))
+    _report("warm synthesizer per segment", per_segment(segments))
+    stub.close()
+
+
+if __name__ == "__main__":
+    segments = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    start_delay = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    main(segments, start_delay)
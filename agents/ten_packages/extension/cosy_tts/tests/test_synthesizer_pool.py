@@ -0,0 +1,185 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import asyncio
+import json
+import threading
+import time
+
+import dashscope
+import pytest
+from aiohttp import WSMsgType, web
+
+from cosy_tts.cosy_tts_extension import CosyTTSExtension
+from cosy_tts.synthesizer_pool import SynthesizerPool, WarmSynthesizer
+from ten import Data
+
+# 50ms of 16kHz s16le audio
+AUDIO = b"\x01\x00" * 800
+
+
+class StubDashScope:
+    """A DashScope duplex websocket: a task starts `start_delay` seconds after
+    run-task, each continue-task is answered with AUDIO after `first_byte`
+    seconds."""
+
+    def __init__(self, start_delay: float = 0.1, first_byte: float = 0.02):
+        self.start_delay = start_delay
+        self.first_byte = first_byte
+        self.connections = 0
+        # actions by task id
+        self.tasks = {}
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
+        self.runner, self.url = asyncio.run_coroutine_threadsafe(self._serve(), self.loop).result()
+
+    async def _serve(self):
+        app = web.Application()
+        app.router.add_get("/", self._handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        return runner, f"ws://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/"
+
+    async def _handle(self, request):
+        self.connections += 1
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for message in ws:
+            if message.type != WSMsgType.TEXT:
+                continue
+            header = json.loads(message.data)["header"]
+            task_id, action = header["task_id"], header["action"]
+            self.tasks.setdefault(task_id, []).append(action)
+            if action == "run-task":
+                await asyncio.sleep(self.start_delay)
+                await self._event(ws, task_id, "task-started")
+            elif action == "continue-task":
+                await asyncio.sleep(self.first_byte)
+                await ws.send_bytes(AUDIO)
+            elif action == "finish-task":
+                await self._event(ws, task_id, "task-finished")
+                break
+        await ws.close()
+        return ws
+
+    async def _event(self, ws, task_id, event):
+        await ws.send_str(json.dumps({"header": {"task_id": task_id, "event": event}, "payload": {}}))
+
+    def used(self):
+        return [actions for actions in self.tasks.values() if "continue-task" in actions]
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class Callback:
+    closed = False
+
+    def __getattr__(self, name):
+        return lambda *args: None
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    stub = StubDashScope()
+    monkeypatch.setattr(dashscope, "api_key", "key")
+    monkeypatch.setattr(dashscope, "base_websocket_api_url", stub.url)
+    yield stub
+    stub.close()
+
+
+def _create():
+    callback = Callback()
+    return WarmSynthesizer(model="cosyvoice-v1", voice="longxiaochun", callback=callback), callback
+
+
+def _wait(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert condition()
+
+
+def test_warm_synthesizer_skips_setup(stub):
+    pool = SynthesizerPool(_create, size=1)
+    cold = time.monotonic()
+    pool.take()[0].discard()
+    cold = time.monotonic() - cold
+
+    pool.start()
+    _wait(lambda: len(pool.idle) == 1)
+    warm = time.monotonic()
+    tts, _ = pool.take()
+    warm = time.monotonic() - warm
+    assert cold > stub.start_delay
+    assert warm < 0.01
+    assert (pool.warm, pool.cold) == (1, 1)
+
+    # the next one is opened at once
+    _wait(lambda: len(pool.idle) == 1)
+    tts.discard()
+    pool.stop()
+    assert len(pool.idle) == 0
+
+
+def test_idle_synthesizers_are_replaced(stub):
+    pool = SynthesizerPool(_create, size=1, max_idle=0.3)
+    pool.start()
+    _wait(lambda: len(stub.tasks) == 1)
+    _wait(lambda: len(stub.tasks) >= 2, timeout=1.0)
+    # the expired task is ended
+    first = next(iter(stub.tasks.values()))
+    _wait(lambda: first == ["run-task", "finish-task"])
+    pool.stop()
+
+
+class Env:
+    def __init__(self):
+        self.properties = {"api_key": "key", "voice": "longxiaochun", "model": "cosyvoice-v1", "sample_rate": 16000}
+        self.frames = []
+
+    def get_property_string(self, key):
+        return self.properties[key]
+
+    get_property_int = get_property_string
+
+    def send_audio_frame(self, frame):
+        self.frames.append(frame.get_buf())
+
+    def on_start_done(self):
+        pass
+
+    on_stop_done = on_start_done
+
+
+def _text(text: str, end_of_segment: bool) -> Data:
+    data = Data.create("text_data")
+    data.set_property_string("text", text)
+    data.set_property_bool("end_of_segment", end_of_segment)
+    return data
+
+
+def test_segment_streams_into_one_warm_session(stub):
+    env = Env()
+    extension = CosyTTSExtension("cosy_tts")
+    extension.on_start(env)
+    _wait(lambda: len(extension.pool.idle) == 1)
+
+    for text, end_of_segment in (("Hello there.", False), ("How are you?", False), ("", True), ("Bye.", True)):
+        extension.on_data(env, _text(text, end_of_segment))
+    _wait(lambda: len(env.frames) == 3)
+    _wait(lambda: len(stub.used()) == 2)
+    extension.on_stop(env)
+
+    # a task per segment, not per sentence
+    assert stub.used() == [
+        ["run-task", "continue-task", "continue-task", "finish-task"],
+        ["run-task", "continue-task", "finish-task"],
+    ]
+    assert env.frames == [AUDIO] * 3
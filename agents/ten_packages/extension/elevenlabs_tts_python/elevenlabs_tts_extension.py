@@ -6,8 +6,6 @@
 #
 #
 
-import queue
-import threading
 import time
 
 from ten import (
@@ -20,6 +18,7 @@ from ten import (
 )
 from .elevenlabs_tts import default_elevenlabs_tts_config, ElevenlabsTTS
 from .pcm import PcmConfig, Pcm
+from .pipeline import SynthesisJob, SynthesisPipeline
 from .log import logger
 
 CMD_IN_FLUSH = "flush"
@@ -30,6 +29,7 @@ DATA_IN_TEXT_DATA_PROPERTY_TEXT = "text"
 PROPERTY_API_KEY = "api_key"  # Required
 PROPERTY_MODEL_ID = "model_id"  # Optional
 PROPERTY_OPTIMIZE_STREAMING_LATENCY = "optimize_streaming_latency"  # Optional
+PROPERTY_PREFETCH_SENTENCES = "prefetch_sentences"  # Optional
 PROPERTY_REQUEST_TIMEOUT_SECONDS = "request_timeout_seconds"  # Optional
 PROPERTY_SIMILARITY_BOOST = "similarity_boost"  # Optional
 PROPERTY_SPEAKER_BOOST = "speaker_boost"  # Optional
@@ -48,10 +48,9 @@ class ElevenlabsTTSExtension(Extension):
         logger.info("on_start")
 
         self.elevenlabs_tts = None
-        self.outdate_ts = 0
         self.pcm = None
-        self.pcm_frame_size = 0
-        self.text_queue = queue.Queue(maxsize=1024)
+        self.pipeline = None
+        prefetch_sentences = 2
 
         # prepare configuration
         elevenlabs_tts_config = default_elevenlabs_tts_config()
@@ -76,6 +75,13 @@ class ElevenlabsTTSExtension(Extension):
         except Exception as e:
             logger.warning(f"on_start get_property_int {PROPERTY_OPTIMIZE_STREAMING_LATENCY} error: {e}")
 
+        try:
+            value = ten.get_property_int(PROPERTY_PREFETCH_SENTENCES)
+            if value > 0:
+                prefetch_sentences = value
+        except Exception as e:
+            logger.warning(f"on_start get_property_int {PROPERTY_PREFETCH_SENTENCES} error: {e}")
+
         try:
             request_timeout_seconds = ten.get_property_int(PROPERTY_REQUEST_TIMEOUT_SECONDS)
             if request_timeout_seconds > 0:
@@ -110,14 +116,18 @@ class ElevenlabsTTSExtension(Extension):
 
         # create pcm instance
         self.pcm = Pcm(PcmConfig())
-        self.pcm_frame_size = self.pcm.get_pcm_frame_size()
 
-        threading.Thread(target=self.process_text_queue, args=(ten,)).start()
+        # synthesize the next sentences while one is sent
+        self.pipeline = SynthesisPipeline(self.synthesize, lambda job, chunks: self.play(ten, job, chunks), prefetch_sentences)
+        self.pipeline.start()
 
         ten.on_start_done()
 
     def on_stop(self, ten: TenEnv) -> None:
         logger.info("on_stop")
+        if self.pipeline:
+            self.pipeline.stop()
+            logger.info(self.pipeline.stats())
         ten.on_stop_done()
 
     def on_cmd(self, ten: TenEnv, cmd: Cmd) -> None:
@@ -133,8 +143,10 @@ class ElevenlabsTTSExtension(Extension):
 
         logger.info(f"on_cmd [{cmd_name}]")
 
-        if cmd_name is CMD_IN_FLUSH:
-            self.outdate_ts = int(time.time() * 1000000)
+        if cmd_name == CMD_IN_FLUSH:
+            # drops the queued sentences and cancels the ones in flight
+            if self.pipeline:
+                self.pipeline.flush()
 
             # send out
             out_cmd = Cmd.create(CMD_OUT_FLUSH)
@@ -166,63 +178,37 @@ class ElevenlabsTTSExtension(Extension):
 
         logger.info(f"OnData input text: [{text}]")
 
-        self.text_queue.put(Message(text, int(time.time() * 1000000)))
-
-    def process_text_queue(self, ten: TenEnv):
-        logger.info("process_text_queue")
-
-        while True:
-            msg = self.text_queue.get()
-            logger.debug(f"process_text_queue, text: [{msg.text}]")
-
-            if msg.received_ts < self.outdate_ts:
-                logger.info(f"textChan interrupt and flushing for input text: [{msg.text}], received_ts: {msg.received_ts}, outdate_ts: {self.outdate_ts}")
-                continue
-
-            start_time = time.time()
-            buf = self.pcm.new_buf()
-            first_frame_latency = 0
-            n = 0
-            pcm_frame_read = 0
-            read_bytes = 0
-            sent_frames = 0
-
-            audio_stream = self.elevenlabs_tts.text_to_speech_stream(msg.text)
-
-            for chunk in self.pcm.read_pcm_stream(audio_stream, self.pcm_frame_size):
-                if msg.received_ts < self.outdate_ts:
-                    logger.info(f"textChan interrupt and flushing for input text: [{msg.text}], received_ts: {msg.received_ts}, outdate_ts: {self.outdate_ts}")
-                    break
-
-                if not chunk:
-                    logger.info("read pcm stream EOF")
-                    break
+        self.pipeline.put(Message(text, int(time.time() * 1000000)))
 
-                n = len(chunk)
-                read_bytes += n
-                pcm_frame_read += n
+    def synthesize(self, job: SynthesisJob):
+        msg = job.item
+        logger.debug(f"synthesize, text: [{msg.text}]")
+        return self.elevenlabs_tts.text_to_speech_stream(msg.text)
 
-                if pcm_frame_read != self.pcm.get_pcm_frame_size():
-                    logger.debug(f"the number of bytes read is [{pcm_frame_read}] inconsistent with pcm frame size")
-                    continue
+    def play(self, ten: TenEnv, job: SynthesisJob, audio_stream):
+        msg = job.item
+        start_time = time.time()
+        framer = self.pcm.new_framer()
+        first_frame_latency = 0
+        sent_frames = 0
 
-                self.pcm.send(ten, buf)
-                buf = self.pcm.new_buf()
-                pcm_frame_read = 0
-                sent_frames += 1
+        for frame in self.pcm.read_pcm_stream(audio_stream, framer):
+            if job.cancelled:
+                logger.info(f"textChan interrupt and flushing for input text: [{msg.text}], received_ts: {msg.received_ts}")
+                break
 
-                if first_frame_latency == 0:
-                    first_frame_latency = int((time.time() - start_time) * 1000)
-                    logger.info(f"first frame available for text: [{msg.text}], received_ts: {msg.received_ts}, first_frame_latency: {first_frame_latency}ms")
+            self.pcm.send(ten, frame)
+            sent_frames += 1
 
-                logger.debug(f"sending pcm data, text: [{msg.text}]")
+            if first_frame_latency == 0:
+                # since the text was received, the synthesis may have started before
+                first_frame_latency = int(time.time() * 1000 - msg.received_ts / 1000)
+                logger.info(f"first frame available for text: [{msg.text}], received_ts: {msg.received_ts}, first_frame_latency: {first_frame_latency}ms")
 
-            if pcm_frame_read > 0:
-                self.pcm.send(ten, buf)
-                sent_frames += 1
-                logger.info(f"sending pcm remain data, text: [{msg.text}], pcm_frame_read: {pcm_frame_read}")
+            logger.debug(f"sending pcm data, text: [{msg.text}]")
 
-            finish_latency = int((time.time() - start_time) * 1000)
-            logger.info(f"send pcm data finished, text: [{msg.text}], received_ts: {msg.received_ts}, read_bytes: {read_bytes}, sent_frames: {sent_frames},
-                first_frame_latency: {first_frame_latency}ms, finish_latency: {finish_latency}ms"
-            )
+        finish_latency = int((time.time() - start_time) * 1000)
+        logger.info(
+            f"send pcm data finished, text: [{msg.text}], received_ts: {msg.received_ts}, read_bytes: {framer.total}, sent_frames: {sent_frames}, "
+            f"first_frame_latency: {first_frame_latency}ms, finish_latency: {finish_latency}ms, {self.pipeline.stats()}"
+        )
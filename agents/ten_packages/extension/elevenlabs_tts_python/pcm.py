@@ -7,10 +7,55 @@
 #
 
 import logging
-from typing import Iterator
+from typing import Iterator, Optional
 from ten import AudioFrame, TenEnv, AudioFrameDataFmt
 
 
+class PcmFramer:
+    """Cuts a stream of chunks of any size into frames of frame_size bytes.
+
+    Frames within a chunk are memoryviews of it, only the frames across two
+    chunks are copied, once, into a preallocated buffer, so the cost is
+    linear in the stream length. A frame is only valid until the next one
+    is read."""
+
+    def __init__(self, frame_size: int) -> None:
+        self.frame_size = frame_size
+        self.buf = bytearray(frame_size)
+        self.view = memoryview(self.buf)
+        self.filled = 0
+        # bytes fed so far, without padding
+        self.total = 0
+
+    def feed(self, data: bytes) -> Iterator[memoryview]:
+        src = memoryview(data)
+        self.total += len(src)
+        start = 0
+        if self.filled:
+            start = min(len(src), self.frame_size - self.filled)
+            self.view[self.filled:self.filled + start] = src[:start]
+            self.filled += start
+            if self.filled < self.frame_size:
+                return
+            self.filled = 0
+            yield self.view
+
+        end = len(src) - (len(src) - start) % self.frame_size
+        for i in range(start, end, self.frame_size):
+            yield src[i:i + self.frame_size]
+
+        self.filled = len(src) - end
+        self.view[:self.filled] = src[end:]
+
+    def flush(self) -> Optional[memoryview]:
+        """The last partial frame padded with silence, None if there is none."""
+        if not self.filled:
+            return None
+        self.view[self.filled:] = bytes(self.frame_size - self.filled)
+        self.filled = 0
+        return self.view
+
+
 class Pcm:
     def __init__(self, config) -> None:
         self.config = config
@@ -19,10 +64,10 @@ class Pcm:
         frame = AudioFrame.create(self.config.name)
         frame.set_bytes_per_sample(self.config.bytes_per_sample)
         frame.set_sample_rate(self.config.sample_rate)
-        frame.set_number_of_channels(self.config.num_channels)
+        frame.set_number_of_channels(self.config.channel)
         frame.set_timestamp(self.config.timestamp)
         frame.set_data_fmt(AudioFrameDataFmt.INTERLEAVE)
-        frame.set_samples_per_channel(self.config.samples_per_channel // self.config.channel)
+        frame.set_samples_per_channel(self.config.samples_per_channel)
 
         frame.alloc_buf(self.get_pcm_frame_size())
         frame_buf = frame.lock_buf()
@@ -35,19 +80,18 @@ class Pcm:
     def get_pcm_frame_size(self) -> int:
         return (self.config.samples_per_channel * self.config.channel * self.config.bytes_per_sample)
 
-    def new_buf(self) -> bytearray:
-        return bytearray(self.get_pcm_frame_size())
+    def new_framer(self) -> PcmFramer:
+        return PcmFramer(self.get_pcm_frame_size())
 
-    def read_pcm_stream(self, stream: Iterator[bytes], chunk_size: int) -> Iterator[bytes]:
-        chunk = b""
+    def read_pcm_stream(self, stream: Iterator[bytes], framer: PcmFramer) -> Iterator[memoryview]:
+        """Full frames of the stream, the last one padded with silence, each
+        valid until the next is read."""
         for data in stream:
-            chunk += data
-            while len(chunk) >= chunk_size:
-                yield chunk[:chunk_size]
-                chunk = chunk[chunk_size:]
+            yield from framer.feed(data)
 
-        if chunk:
-            yield chunk
+        last = framer.flush()
+        if last is not None:
+            yield last
 
     def send(self, ten: TenEnv, buf: memoryview) -> None:
         try:
@@ -0,0 +1,192 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, List
+
+from .log import logger
+
+_END = object()
+
+
+class SynthesisJob:
+    """A sentence being synthesized, its audio chunks are queued in order."""
+
+    def __init__(self, item: Any, queued: float) -> None:
+        self.item = item
+        self.queued = queued
+        self.chunks = queue.Queue()
+        self.cancelled = False
+        self.lock = threading.Lock()
+        self.cancel_callbacks: List[Callable[[], None]] = []
+
+    def on_cancel(self, callback: Callable[[], None]) -> None:
+        """Calls callback on cancel, e.g. to close the vendor stream, at once
+        if the job is cancelled already."""
+        with self.lock:
+            if not self.cancelled:
+                self.cancel_callbacks.append(callback)
+                return
+        callback()
+
+    def cancel(self) -> None:
+        with self.lock:
+            if self.cancelled:
+                return
+            self.cancelled = True
+            callbacks, self.cancel_callbacks = self.cancel_callbacks, []
+        self.chunks.put(_END)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"cancel synthesis failed, {e}")
+
+
+class SynthesisPipeline:
+    """Synthesizes the next `prefetch` queued sentences while one is played,
+    and plays them strictly in order.
+
+    synthesize(job) returns the audio chunks of job.item and runs on a worker
+    thread, play(job, chunks) sends them out and runs on the playout thread,
+    so that the next sentence is ready when the current one ends. A flush
+    drops the queued sentences and cancels all jobs at once."""
+
+    def __init__(self, synthesize: Callable[[SynthesisJob], Iterable[bytes]], play: Callable[[SynthesisJob, Iterator[bytes]], None], prefetch: int = 2) -> None:
+        self.synthesize = synthesize
+        self.play = play
+        self.prefetch = prefetch
+        self.pending = queue.Queue()
+        # jobs in playout order
+        self.jobs = queue.Queue()
+        # a slot per job synthesized or played
+        self.slots = threading.Semaphore(prefetch + 1)
+        self.executor = ThreadPoolExecutor(prefetch + 1, thread_name_prefix="synthesis")
+        self.lock = threading.Lock()
+        self.active: List[SynthesisJob] = []
+        self.generation = 0
+        self.threads: List[threading.Thread] = []
+
+        self.played = 0
+        # waits for the next sentence that was queued before the previous ended
+        self.gaps = 0
+        self.gap_ms = 0.0
+        self.max_gap_ms = 0.0
+
+    def start(self) -> None:
+        for target in (self._schedule, self._playout):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def put(self, item: Any) -> None:
+        with self.lock:
+            self.pending.put((item, self.generation, time.monotonic()))
+
+    def flush(self) -> None:
+        with self.lock:
+            self.generation += 1
+            active, self.active = self.active, []
+            while not self.pending.empty():
+                try:
+                    self.pending.get_nowait()
+                except queue.Empty:
+                    break
+        for job in active:
+            job.cancel()
+
+    def stop(self) -> None:
+        self.flush()
+        self.pending.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> str:
+        avg = self.gap_ms / self.gaps if self.gaps else 0
+        return f"played {self.played} sentences, gap between sentences avg {avg:.0f}ms max {self.max_gap_ms:.0f}ms"
+
+    def _schedule(self) -> None:
+        while True:
+            value = self.pending.get()
+            if value is None:
+                self.jobs.put(None)
+                return
+            item, generation, queued = value
+            self.slots.acquire()
+            with self.lock:
+                if generation != self.generation:
+                    self.slots.release()
+                    continue
+                job = SynthesisJob(item, queued)
+                self.active.append(job)
+            self.executor.submit(self._synthesize, job)
+            self.jobs.put(job)
+
+    def _synthesize(self, job: SynthesisJob) -> None:
+        if job.cancelled:
+            return
+        chunks = None
+        try:
+            chunks = self.synthesize(job)
+            for chunk in chunks:
+                if job.cancelled:
+                    break
+                job.chunks.put(chunk)
+        except Exception as e:
+            if not job.cancelled:
+                logger.exception(f"synthesis failed, {e}")
+        finally:
+            job.chunks.put(_END)
+            close = getattr(chunks, "close", None)
+            if close:
+                close()
+
+    def _chunks(self, job: SynthesisJob) -> Iterator[bytes]:
+        while not job.cancelled:
+            chunk = job.chunks.get()
+            if chunk is _END:
+                return
+            yield chunk
+
+    def _playout(self) -> None:
+        ended = None
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            try:
+                chunks = self._chunks(job)
+                if ended is not None and job.queued < ended:
+                    # waiting for the first chunk is the gap heard
+                    first = next(chunks, None)
+                    if first is not None:
+                        gap_ms = (time.monotonic() - ended) * 1000
+                        self.gaps += 1
+                        self.gap_ms += gap_ms
+                        self.max_gap_ms = max(self.max_gap_ms, gap_ms)
+                        chunks = _prepend(first, chunks)
+                self.play(job, chunks)
+                if not job.cancelled:
+                    self.played += 1
+            except Exception as e:
+                logger.exception(f"play failed, {e}")
+            finally:
+                # releases the vendor stream if play stopped early
+                job.cancel()
+                with self.lock:
+                    if job in self.active:
+                        self.active.remove(job)
+                self.slots.release()
+                ended = time.monotonic()
+
+
+def _prepend(first: bytes, rest: Iterator[bytes]) -> Iterator[bytes]:
+    yield first
+    yield from rest
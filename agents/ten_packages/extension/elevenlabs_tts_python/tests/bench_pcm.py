@@ -0,0 +1,64 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+"""PCM framing benchmark.
+
+    python tests/bench_pcm.py
+
+Cuts long utterances of 16 kHz mono audio into 10 ms frames, with the former
+framer, which appended to and sliced a bytes buffer, and with PcmFramer,
+for streams arriving in small chunks and in large ones, e.g. when a
+response is buffered by a proxy.
+"""
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from elevenlabs_tts_python.pcm import Pcm, PcmConfig  # noqa: E402
+
+BYTES_PER_SECOND = 16000 * 2
+
+
+def read_pcm_stream_former(stream, chunk_size):
+    chunk = b""
+    for data in stream:
+        chunk += data
+        while len(chunk) >= chunk_size:
+            yield chunk[:chunk_size]
+            chunk = chunk[chunk_size:]
+
+    if chunk:
+        yield chunk
+
+
+def _chunks(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def _time(frames) -> float:
+    started = time.perf_counter()
+    n = 0
+    for frame in frames:
+        n += len(frame)
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    pcm = Pcm(PcmConfig())
+    frame_size = pcm.get_pcm_frame_size()
+    for seconds in (10, 60, 300):
+        data = bytes(seconds * BYTES_PER_SECOND)
+        for chunk_size in (4096, 1 << 20):
+            chunks = _chunks(data, chunk_size)
+            former = _time(read_pcm_stream_former(chunks, frame_size))
+            framer = _time(pcm.read_pcm_stream(chunks, pcm.new_framer()))
+            print(f"{seconds:4d} s audio, {chunk_size:8d} B chunks: former {former:9.1f} ms, framer {framer:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
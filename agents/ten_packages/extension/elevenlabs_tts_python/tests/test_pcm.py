@@ -0,0 +1,61 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import random
+
+from elevenlabs_tts_python.pcm import Pcm, PcmConfig, PcmFramer
+
+
+def _chunks(data: bytes, seed: int):
+    rng = random.Random(seed)
+    i = 0
+    while i < len(data):
+        n = rng.choice([1, 7, 319, 320, 321, 4096, 10_000])
+        yield data[i:i + n]
+        i += n
+
+
+def _read(pcm: Pcm, chunks) -> list:
+    # frames share a buffer, copy each as send does
+    return [bytes(frame) for frame in pcm.read_pcm_stream(chunks, pcm.new_framer())]
+
+
+def test_frames_equal_input():
+    pcm = Pcm(PcmConfig())
+    size = pcm.get_pcm_frame_size()
+    assert size == 320
+    data = random.Random(0).randbytes(size * 50 + 123)
+    for seed in range(5):
+        frames = _read(pcm, _chunks(data, seed))
+        assert all(len(frame) == size for frame in frames)
+        assert len(frames) == 51
+        # the last frame is padded with silence
+        assert b"".join(frames) == data + bytes(size - 123)
+
+
+def test_exact_frames_are_not_padded():
+    pcm = Pcm(PcmConfig())
+    data = bytes(range(256)) * 5
+    frames = _read(pcm, [data[:100], data[100:]])
+    assert b"".join(frames) == data
+    assert _read(pcm, []) == []
+    assert _read(pcm, [b""]) == []
+
+
+def test_framer_counts_input():
+    framer = PcmFramer(4)
+    assert [bytes(f) for f in framer.feed(b"abcdefghij")] == [b"abcd", b"efgh"]
+    assert bytes(framer.flush()) == b"ij\x00\x00"
+    assert framer.flush() is None
+    assert framer.total == 10
+
+
+def test_frame_format():
+    pcm = Pcm(PcmConfig())
+    frame = pcm.get_pcm_frame(memoryview(bytes(range(160)) * 2))
+    assert frame.get_number_of_channels() == 1
+    assert frame.get_samples_per_channel() == 160
+    assert frame.get_buf() == bytes(range(160)) * 2
@@ -0,0 +1,99 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import threading
+import time
+
+from elevenlabs_tts_python.pcm import Pcm, PcmConfig
+from elevenlabs_tts_python.pipeline import SynthesisPipeline
+
+
+class StubVendor:
+    """Streams 3 frames of a sentence's index after an injected first byte
+    latency, records the streams closed."""
+
+    def __init__(self, first_byte: dict, chunk_interval: float = 0.01):
+        self.first_byte = first_byte
+        self.chunk_interval = chunk_interval
+        self.started = []
+        self.closed = []
+
+    def text_to_speech_stream(self, text):
+        self.started.append(text)
+        try:
+            time.sleep(self.first_byte.get(text, 0.1))
+            for _ in range(3):
+                yield bytes([int(text)]) * 320
+                time.sleep(self.chunk_interval)
+        finally:
+            self.closed.append(text)
+
+
+class Player:
+    def __init__(self, vendor: StubVendor, prefetch: int):
+        self.pcm = Pcm(PcmConfig())
+        self.frames = []
+        self.done = threading.Event()
+        self.pipeline = SynthesisPipeline(
+            lambda job: vendor.text_to_speech_stream(job.item), self.play, prefetch)
+        self.pipeline.start()
+
+    def play(self, job, chunks):
+        for frame in self.pcm.read_pcm_stream(chunks, self.pcm.new_framer()):
+            if job.cancelled:
+                break
+            self.frames.append(frame[0])
+        if job.item == "3":
+            self.done.set()
+
+
+def _speak(prefetch: int, first_byte: dict):
+    vendor = StubVendor(first_byte, chunk_interval=0.03)
+    player = Player(vendor, prefetch)
+    started = time.monotonic()
+    for text in "0123":
+        player.pipeline.put(text)
+    assert player.done.wait(2)
+    elapsed = time.monotonic() - started
+    player.pipeline.stop()
+    return player, elapsed
+
+
+def test_prefetch_plays_in_order_without_gaps():
+    # the second sentence is the slowest to start, the later ones the fastest
+    first_byte = {"0": 0.1, "1": 0.15, "2": 0.02, "3": 0.02}
+    player, elapsed = _speak(2, first_byte)
+    assert player.frames == [0] * 3 + [1] * 3 + [2] * 3 + [3] * 3
+    assert player.pipeline.played == 4
+    # the later sentences are synthesized while the first ones play
+    assert player.pipeline.gaps == 3
+    assert player.pipeline.max_gap_ms < 15
+    assert elapsed < 0.4
+
+    sequential, sequential_elapsed = _speak(0, first_byte)
+    assert sequential.frames == player.frames
+    assert sequential.pipeline.gap_ms / sequential.pipeline.gaps > 50
+    assert sequential_elapsed > 0.6
+
+
+def test_flush_cancels_all_in_flight():
+    vendor = StubVendor({"0": 0.05, "1": 0.05, "2": 0.05, "3": 0.05}, chunk_interval=0.1)
+    player = Player(vendor, 2)
+    for text in "0123":
+        player.pipeline.put(text)
+    time.sleep(0.1)
+    assert player.frames == [0]
+    player.pipeline.flush()
+    time.sleep(0.3)
+    # the sentences in flight are stopped, the queued one never started
+    assert player.frames == [0]
+    assert vendor.started == ["0", "1", "2"]
+    assert sorted(vendor.closed) == ["0", "1", "2"]
+
+    player.pipeline.put("4")
+    time.sleep(0.4)
+    assert player.frames == [0, 4, 4, 4]
+    player.pipeline.stop()
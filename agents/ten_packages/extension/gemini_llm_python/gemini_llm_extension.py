@@ -5,7 +5,7 @@
 # Copyright (c) 2024 Agora IO. All rights reserved.
 #
 #
-from threading import Thread
+from threading import Thread, Timer
 from ten import (
     Extension,
     TenEnv,
@@ -14,7 +14,9 @@ from ten import (
     StatusCode,
     CmdResult,
 )
+from .chat_memory import ChatMemory
 from .log import logger
+from .speculation import Speculator, Turn
 from .utils import get_micro_ts, parse_sentence
 
 
@@ -28,19 +30,29 @@ DATA_OUT_TEXT_DATA_PROPERTY_TEXT_END_OF_SEGMENT = "end_of_segment"
 PROPERTY_API_KEY = "api_key"  # Required
 PROPERTY_GREETING = "greeting"  # Optional
 PROPERTY_MAX_MEMORY_LENGTH = "max_memory_length"  # Optional
+PROPERTY_MAX_MEMORY_TOKENS = "max_memory_tokens"  # Optional
 PROPERTY_MAX_OUTPUT_TOKENS = "max_output_tokens"  # Optional
 PROPERTY_MODEL = "model"  # Optional
 PROPERTY_PROMPT = "prompt"  # Optional
+PROPERTY_SPECULATIVE = "speculative"  # Optional
+PROPERTY_SPECULATIVE_MATCH_THRESHOLD = "speculative_match_threshold"  # Optional
+PROPERTY_SPECULATIVE_STABLE_MS = "speculative_stable_ms"  # Optional
 PROPERTY_TEMPERATURE = "temperature"  # Optional
 PROPERTY_TOP_K = "top_k"  # Optional
 PROPERTY_TOP_P = "top_p"  # Optional
 
 
 class GeminiLLMExtension(Extension):
-    memory = []
-    max_memory_length = 10
-    outdate_ts = 0
-    gemini_llm = None
+    def __init__(self, name: str):
+        super().__init__(name)
+
+        self.max_memory_length = 10
+        self.max_memory_tokens = 2048
+        self.memory = ChatMemory(self.max_memory_length, self.max_memory_tokens)
+        self.outdate_ts = 0
+        self.gemini_llm = None
+        self.speculator = None
+        self.speculation_timer = None
 
     def on_start(self, ten: TenEnv) -> None:
         logger.info("GeminiLLMExtension on_start")
@@ -87,6 +99,40 @@ class GeminiLLMExtension(Extension):
                 f"GetProperty optional {PROPERTY_MAX_MEMORY_LENGTH} failed, err: {err}"
             )
 
+        try:
+            prop_max_memory_tokens = ten.get_property_int(PROPERTY_MAX_MEMORY_TOKENS)
+            if prop_max_memory_tokens > 0:
+                self.max_memory_tokens = int(prop_max_memory_tokens)
+        except Exception as err:
+            logger.warning(
+                f"GetProperty optional {PROPERTY_MAX_MEMORY_TOKENS} failed, err: {err}"
+            )
+
+        self.memory = ChatMemory(self.max_memory_length, self.max_memory_tokens)
+
+        try:
+            if ten.get_property_bool(PROPERTY_SPECULATIVE):
+                self.speculator = Speculator()
+        except Exception as err:
+            logger.warning(
+                f"GetProperty optional {PROPERTY_SPECULATIVE} failed, err: {err}"
+            )
+
+        if self.speculator:
+            try:
+                stable_ms = int(ten.get_property_int(PROPERTY_SPECULATIVE_STABLE_MS))
+                if stable_ms > 0:
+                    self.speculator.stable_ms = stable_ms
+            except Exception as e:
+                logger.warning(f"get_property_int optional {PROPERTY_SPECULATIVE_STABLE_MS} failed, err: {e}")
+
+            try:
+                match_threshold = float(ten.get_property_float(PROPERTY_SPECULATIVE_MATCH_THRESHOLD))
+                if match_threshold > 0:
+                    self.speculator.match_threshold = match_threshold
+            except Exception as e:
+                logger.warning(f"get_property_float optional {PROPERTY_SPECULATIVE_MATCH_THRESHOLD} failed, err: {e}")
+
         # Create GeminiLLM instance
         self.gemini_llm = GeminiLLM(gemini_llm_config)
         logger.info(
@@ -124,6 +170,8 @@ class GeminiLLMExtension(Extension):
 
         if cmd_name == CMD_IN_FLUSH:
             self.outdate_ts = get_micro_ts()
+            if self.speculator:
+                self.speculator.interrupt()
             cmd_out = Cmd.create(CMD_OUT_FLUSH)
             ten.send_cmd(cmd_out, None)
             logger.info(f"GeminiLLMExtension on_cmd sent flush")
@@ -151,7 +199,7 @@ class GeminiLLMExtension(Extension):
         # Assume 'data' is an object from which we can get properties
         try:
             is_final = data.get_property_bool(DATA_IN_TEXT_DATA_PROPERTY_IS_FINAL)
-            if not is_final:
+            if not is_final and not self.speculator:
                 logger.info("ignore non-final input")
                 return
         except Exception as e:
@@ -173,113 +221,156 @@ class GeminiLLMExtension(Extension):
             )
             return
 
-        # Prepare memory
-        if len(self.memory) > self.max_memory_length:
-            self.memory.pop(0)
-        self.memory.append({"role": "user", "parts": input_text})
+        if not is_final:
+            self.speculator.on_partial(input_text)
+            self._schedule_speculation(ten)
+            return
 
-        def chat_completions_stream_worker(start_time, input_text, memory):
-            try:
+        if self.speculator:
+            committed = self.speculator.on_final(input_text)
+            logger.info(self.speculator.stats())
+            if committed:
+                return
+
+        self._start_turn(ten, Turn(input_text))
+        logger.info(f"GeminiLLMExtension on_data end")
+
+    def _schedule_speculation(self, ten: TenEnv) -> None:
+        if self.speculation_timer:
+            self.speculation_timer.cancel()
+        self.speculation_timer = Timer(
+            self.speculator.stable_ms / 1000, self._speculate, args=(ten,)
+        )
+        self.speculation_timer.daemon = True
+        self.speculation_timer.start()
+
+    def _speculate(self, ten: TenEnv) -> None:
+        turn = self.speculator.poll()
+        if turn:
+            logger.info(f"speculative completion for partial text: [{turn.text}]")
+            self._start_turn(ten, turn)
+
+    def _start_turn(self, ten: TenEnv, turn: Turn) -> None:
+        # Prepare memory, the turn updates it once it is committed and the
+        # request is built on a copy
+        message = {"role": "user", "parts": turn.text}
+        memory = self.memory.get() + [message]
+        turn.output(self._append_memory, message)
+
+        # Start thread to request and read responses from GeminiLLM
+        start_time = get_micro_ts()
+        thread = Thread(
+            target=self._chat_completions_stream_worker,
+            args=(ten, start_time, turn.text, memory, turn),
+        )
+        thread.start()
+
+    def _append_memory(self, message: dict) -> None:
+        self.memory.put(message)
+
+    def _chat_completions_stream_worker(self, ten: TenEnv, start_time, input_text, memory, turn: Turn):
+        try:
+            logger.info(
+                f"chat_completions_stream_worker for input text: [{input_text}] memory: {memory}"
+            )
+
+            # Get result from AI
+            resp = self.gemini_llm.get_chat_completions_stream(memory)
+            if resp is None:
                 logger.info(
-                    f"chat_completions_stream_worker for input text: [{input_text}] memory: {memory}"
+                    f"chat_completions_stream_worker for input text: [{input_text}] failed"
                 )
+                return
+
+            sentence = ""
+            full_content = ""
+            first_sentence_sent = False
+
+            for chat_completions in resp:
+                if turn.cancelled or turn.interrupted:
+                    logger.info(
+                        f"chat_completions_stream_worker speculation stopped for input text: [{input_text}]"
+                    )
+                    break
 
-                # Get result from AI
-                resp = self.gemini_llm.get_chat_completions_stream(memory)
-                if resp is None:
+                # speculative turns start before the flushes of the speech they answer
+                if not turn.speculative and start_time < self.outdate_ts:
                     logger.info(
-                        f"chat_completions_stream_worker for input text: [{input_text}] failed"
+                        f"chat_completions_stream_worker recv interrupt and flushing for input text: [{input_text}], startTs: {start_time}, outdateTs: {self.outdate_ts}"
                     )
-                    return
+                    break
 
-                sentence = ""
-                full_content = ""
-                first_sentence_sent = False
+                if chat_completions.text is not None:
+                    content = chat_completions.text
+                else:
+                    content = ""
 
-                for chat_completions in resp:
-                    if start_time < self.outdate_ts:
-                        logger.info(
-                            f"chat_completions_stream_worker recv interrupt and flushing for input text: [{input_text}], startTs: {start_time}, outdateTs: {self.outdate_ts}"
-                        )
-                        break
+                full_content += content
+
+                while True:
+                    sentence, content, sentence_is_final = parse_sentence(
+                        sentence, content
+                    )
 
-                    if chat_completions.text is not None:
-                        content = chat_completions.text
-                    else:
-                        content = ""
+                    if len(sentence) == 0 or not sentence_is_final:
+                        logger.info(f"sentence {sentence} is empty or not final")
+                        break
 
-                    full_content += content
+                    logger.info(
+                        f"chat_completions_stream_worker recv for input text: [{input_text}] got sentence: [{sentence}]"
+                    )
 
-                    while True:
-                        sentence, content, sentence_is_final = parse_sentence(
-                            sentence, content
+                    # send sentence
+                    try:
+                        output_data = Data.create("text_data")
+                        output_data.set_property_string(
+                            DATA_OUT_TEXT_DATA_PROPERTY_TEXT, sentence
                         )
+                        output_data.set_property_bool(
+                            DATA_OUT_TEXT_DATA_PROPERTY_TEXT_END_OF_SEGMENT, False
+                        )
+                        turn.output(ten.send_data, output_data)
+                        logger.info(
+                            f"chat_completions_stream_worker recv for input text: [{input_text}] sent sentence [{sentence}]"
+                        )
+                    except Exception as e:
+                        logger.error(
+                            f"chat_completions_stream_worker recv for input text: [{input_text}] send sentence [{sentence}] failed, err: {e}"
+                        )
+                        break
 
-                        if len(sentence) == 0 or not sentence_is_final:
-                            logger.info(f"sentence {sentence} is empty or not final")
-                            break
-
+                    sentence = ""
+                    if not first_sentence_sent:
+                        first_sentence_sent = True
                         logger.info(
-                            f"chat_completions_stream_worker recv for input text: [{input_text}] got sentence: [{sentence}]"
+                            f"chat_completions_stream_worker recv for input text: [{input_text}] first sentence sent, first_sentence_latency {get_micro_ts() - start_time}ms"
                         )
 
-                        # send sentence
-                        try:
-                            output_data = Data.create("text_data")
-                            output_data.set_property_string(
-                                DATA_OUT_TEXT_DATA_PROPERTY_TEXT, sentence
-                            )
-                            output_data.set_property_bool(
-                                DATA_OUT_TEXT_DATA_PROPERTY_TEXT_END_OF_SEGMENT, False
-                            )
-                            ten.send_data(output_data)
-                            logger.info(
-                                f"chat_completions_stream_worker recv for input text: [{input_text}] sent sentence [{sentence}]"
-                            )
-                        except Exception as e:
-                            logger.error(
-                                f"chat_completions_stream_worker recv for input text: [{input_text}] send sentence [{sentence}] failed, err: {e}"
-                            )
-                            break
-
-                        sentence = ""
-                        if not first_sentence_sent:
-                            first_sentence_sent = True
-                            logger.info(
-                                f"chat_completions_stream_worker recv for input text: [{input_text}] first sentence sent, first_sentence_latency {get_micro_ts() - start_time}ms"
-                            )
-
-                # remember response as assistant content in memory
-                memory.append({"role": "model", "parts": full_content})
-
-                # send end of segment
-                try:
-                    output_data = Data.create("text_data")
-                    output_data.set_property_string(
-                        DATA_OUT_TEXT_DATA_PROPERTY_TEXT, sentence
-                    )
-                    output_data.set_property_bool(
-                        DATA_OUT_TEXT_DATA_PROPERTY_TEXT_END_OF_SEGMENT, True
-                    )
-                    ten.send_data(output_data)
-                    logger.info(
-                        f"chat_completions_stream_worker for input text: [{input_text}] end of segment with sentence [{sentence}] sent"
-                    )
-                except Exception as e:
-                    logger.error(
-                        f"chat_completions_stream_worker for input text: [{input_text}] end of segment with sentence [{sentence}] send failed, err: {e}"
-                    )
+            if turn.cancelled:
+                return
+
+            # remember response as assistant content in memory
+            turn.output(self._append_memory, {"role": "model", "parts": full_content})
 
+            # send end of segment
+            try:
+                output_data = Data.create("text_data")
+                output_data.set_property_string(
+                    DATA_OUT_TEXT_DATA_PROPERTY_TEXT, sentence
+                )
+                output_data.set_property_bool(
+                    DATA_OUT_TEXT_DATA_PROPERTY_TEXT_END_OF_SEGMENT, True
+                )
+                turn.output(ten.send_data, output_data)
+                logger.info(
+                    f"chat_completions_stream_worker for input text: [{input_text}] end of segment with sentence [{sentence}] sent"
+                )
             except Exception as e:
                 logger.error(
-                    f"chat_completions_stream_worker for input text: [{input_text}] failed, err: {e}"
+                    f"chat_completions_stream_worker for input text: [{input_text}] end of segment with sentence [{sentence}] send failed, err: {e}"
                 )
 
-        # Start thread to request and read responses from GeminiLLM
-        start_time = get_micro_ts()
-        thread = Thread(
-            target=chat_completions_stream_worker,
-            args=(start_time, input_text, self.memory),
-        )
-        thread.start()
-        logger.info(f"GeminiLLMExtension on_data end")
+        except Exception as e:
+            logger.error(
+                f"chat_completions_stream_worker for input text: [{input_text}] failed, err: {e}"
+            )
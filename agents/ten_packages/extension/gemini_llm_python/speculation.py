@@ -0,0 +1,158 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import re
+import threading
+import time
+from difflib import SequenceMatcher
+from typing import Callable
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def normalize(text: str) -> str:
+    return " ".join(_PUNCTUATION.sub(" ", text.lower()).split())
+
+
+class Turn:
+    """Side effects of one completion, i.e. sent text and memory updates.
+
+    A speculative turn holds them back until it is committed and drops them
+    once it is cancelled, a regular turn is committed from the start. Held
+    and later outputs run in the order they were made. An interrupted turn
+    stops generating like a flushed one but keeps its outputs."""
+
+    def __init__(self, text: str, speculative: bool = False):
+        self.text = text
+        self.speculative = speculative
+        self.committed = not speculative
+        self.cancelled = False
+        self.interrupted = False
+        self.held: list[tuple[Callable, tuple]] = []
+        self.lock = threading.Lock()
+
+    def output(self, fn: Callable, *args) -> None:
+        with self.lock:
+            if self.cancelled:
+                return
+            if not self.committed:
+                self.held.append((fn, args))
+                return
+            fn(*args)
+
+    def commit(self) -> None:
+        with self.lock:
+            if self.cancelled or self.committed:
+                return
+            self.committed = True
+            for fn, args in self.held:
+                fn(*args)
+            self.held.clear()
+
+    def cancel(self) -> None:
+        with self.lock:
+            self.cancelled = True
+            self.held.clear()
+
+    def interrupt(self) -> None:
+        self.interrupted = True
+
+
+class Speculator:
+    """Starts completions on stable partial transcripts.
+
+    A partial is stable once it has not changed for `stable_ms`. The turn
+    started on it is committed when the final transcript is at least
+    `match_threshold` similar to it, both normalized, and cancelled when a
+    later partial or the final moves away from it. The time between the start
+    of a committed turn and the final transcript is the latency saved.
+
+    A flush comes with every partial, so it only interrupts committed turns
+    and leaves the speculation on the ongoing speech running."""
+
+    def __init__(
+        self,
+        stable_ms: int = 300,
+        match_threshold: float = 0.9,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.stable_ms = stable_ms
+        self.match_threshold = match_threshold
+        self.clock = clock
+
+        self.partial = ""
+        self.normalized = ""
+        self.partial_ts = 0.0
+        self.turn: Turn | None = None
+        self.turn_ts = 0.0
+        self.committed: Turn | None = None
+
+        self.started = 0
+        self.hits = 0
+        self.saved_ms = 0.0
+        self.lock = threading.Lock()
+
+    def on_partial(self, text: str) -> None:
+        normalized = normalize(text)
+        with self.lock:
+            if normalized == self.normalized:
+                return
+            self.partial, self.normalized = text, normalized
+            self.partial_ts = self.clock()
+            if self.turn and not self._matches(self.turn, normalized):
+                self.turn.cancel()
+                self.turn = None
+
+    def poll(self) -> Turn | None:
+        """The turn to start if the partial has become stable."""
+        with self.lock:
+            if self.turn or not self.normalized:
+                return None
+            if (self.clock() - self.partial_ts) * 1000 < self.stable_ms:
+                return None
+            self.turn = Turn(self.partial, speculative=True)
+            self.turn_ts = self.clock()
+            self.started += 1
+            return self.turn
+
+    def on_final(self, text: str) -> bool:
+        """Whether the final transcript committed the speculative turn,
+        otherwise the caller starts a regular one."""
+        with self.lock:
+            turn, self.turn = self.turn, None
+            self.partial = self.normalized = ""
+            if turn is None:
+                return False
+            if not self._matches(turn, normalize(text)):
+                turn.cancel()
+                return False
+            self.hits += 1
+            self.saved_ms += (self.clock() - self.turn_ts) * 1000
+            self.committed = turn
+        turn.commit()
+        return True
+
+    def interrupt(self) -> None:
+        with self.lock:
+            if self.committed:
+                self.committed.interrupt()
+                self.committed = None
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.started if self.started else 0.0
+
+    def stats(self) -> str:
+        saved = self.saved_ms / self.hits if self.hits else 0.0
+        return (
+            f"speculation hits {self.hits}/{self.started} ({self.hit_rate:.0%}), "
+            f"latency saved {saved:.0f}ms per hit, {self.saved_ms:.0f}ms total"
+        )
+
+    def _matches(self, turn: Turn, normalized: str) -> bool:
+        expected = normalize(turn.text)
+        if expected == normalized:
+            return True
+        return SequenceMatcher(None, expected, normalized).ratio() >= self.match_threshold
@@ -0,0 +1,130 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import time
+from types import SimpleNamespace
+
+from ten import Cmd, Data
+
+from gemini_llm_python.gemini_llm_extension import GeminiLLMExtension
+from gemini_llm_python.speculation import Speculator
+
+
+class StubGeminiLLM:
+    """Stand-in for GeminiLLM, streams a sentence per word of the question
+    and records the questions."""
+
+    def __init__(self, delay: float = 0.03):
+        self.delay = delay
+        self.requests: list[str] = []
+
+    def get_chat_completions_stream(self, messages):
+        text = messages[-1]["parts"]
+        self.requests.append(text)
+
+        def stream():
+            for word in text.split():
+                time.sleep(self.delay)
+                yield SimpleNamespace(text=f"{word}.")
+
+        return stream()
+
+
+class Env:
+    def __init__(self):
+        self.texts: list[tuple[str, bool]] = []
+
+    def send_data(self, data: Data) -> None:
+        self.texts.append((data.get_property_string("text"), data.get_property_bool("end_of_segment")))
+
+    def send_cmd(self, cmd: Cmd, callback) -> None:
+        pass
+
+    def return_result(self, result, cmd: Cmd) -> None:
+        pass
+
+
+def _text(text: str, is_final: bool) -> Data:
+    data = Data.create("text_data")
+    data.set_property_string("text", text)
+    data.set_property_bool("is_final", is_final)
+    return data
+
+
+def _asr(ext: GeminiLLMExtension, env: Env, text: str, is_final: bool) -> None:
+    # the interrupt detector flushes before every result
+    ext.on_cmd(env, Cmd.create("flush"))
+    ext.on_data(env, _text(text, is_final))
+
+
+def _extension(speculative: bool = True) -> tuple[GeminiLLMExtension, Env]:
+    ext = GeminiLLMExtension("gemini_llm")
+    ext.gemini_llm = StubGeminiLLM()
+    if speculative:
+        ext.speculator = Speculator(stable_ms=50)
+    return ext, Env()
+
+
+def _memory(ext: GeminiLLMExtension) -> list[tuple[str, str]]:
+    return [(m["role"], m["parts"]) for m in ext.memory.get()]
+
+
+def test_regular_turn():
+    ext, env = _extension(speculative=False)
+    ext.on_data(env, _text("what", False))
+    ext.on_data(env, _text("what time", True))
+    time.sleep(0.2)
+
+    assert ext.gemini_llm.requests == ["what time"]
+    assert env.texts == [("what.", False), ("time.", False), ("", True)]
+    assert _memory(ext) == [("user", "what time"), ("model", "what.time.")]
+
+
+def test_matching_final_commits():
+    ext, env = _extension()
+    _asr(ext, env, "what", False)
+    time.sleep(0.02)
+    _asr(ext, env, "what time", False)
+    time.sleep(0.2)
+    # started on the stable partial, nothing sent yet
+    assert ext.gemini_llm.requests == ["what time"]
+    assert env.texts == [] and _memory(ext) == []
+
+    _asr(ext, env, "What time?", True)
+    time.sleep(0.1)
+    assert ext.gemini_llm.requests == ["what time"]
+    assert env.texts == [("what.", False), ("time.", False), ("", True)]
+    assert _memory(ext) == [("user", "what time"), ("model", "what.time.")]
+    assert ext.speculator.hits == 1 and ext.speculator.started == 1
+
+
+def test_different_final_cancels():
+    ext, env = _extension()
+    _asr(ext, env, "play some music", False)
+    time.sleep(0.1)
+    _asr(ext, env, "tell me a joke", True)
+    time.sleep(0.3)
+
+    assert ext.gemini_llm.requests == ["play some music", "tell me a joke"]
+    assert env.texts == [("tell.", False), ("me.", False), ("a.", False), ("joke.", False), ("", True)]
+    assert _memory(ext) == [("user", "tell me a joke"), ("model", "tell.me.a.joke.")]
+    assert ext.speculator.hits == 0 and ext.speculator.started == 1
+
+
+def test_flush_interrupts_committed_turn():
+    ext, env = _extension()
+    ext.gemini_llm.delay = 0.05
+    _asr(ext, env, "one two three four five six", False)
+    time.sleep(0.07)
+    _asr(ext, env, "One two three four five six.", True)
+    time.sleep(0.12)
+    # the user barges in
+    _asr(ext, env, "stop", False)
+    time.sleep(0.4)
+
+    sent = [text for text, _ in env.texts]
+    assert 0 < len(sent) < 6 and "six." not in sent
+    assert ext.gemini_llm.requests[0] == "one two three four five six"
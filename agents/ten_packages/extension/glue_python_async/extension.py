@@ -5,7 +5,6 @@
 #
 import asyncio
 import traceback
-import aiohttp
 
 from datetime import datetime
 from typing import List
@@ -21,10 +20,19 @@ from ten import (
     Data,
 )
 
+from . import http_client
+from .chat_memory import ChatMemory
+from .speculation import Speculator, Turn
+
 PROPERTY_API_URL = "api_url"
 PROPERTY_USER_ID = "user_id"
 PROPERTY_PROMPT = "prompt"
 PROPERTY_TOKEN = "token"
+PROPERTY_MAX_MEMORY_LENGTH = "max_memory_length"
+PROPERTY_MAX_MEMORY_TOKENS = "max_memory_tokens"
+PROPERTY_SPECULATIVE = "speculative"
+PROPERTY_SPECULATIVE_STABLE_MS = "speculative_stable_ms"
+PROPERTY_SPECULATIVE_MATCH_THRESHOLD = "speculative_match_threshold"
 
 DATA_IN_TEXT_DATA_PROPERTY_IS_FINAL = "is_final"
 DATA_IN_TEXT_DATA_PROPERTY_TEXT = "text"
@@ -52,19 +60,27 @@ def parse_sentences(sentence_fragment, content):
     return sentences, remain
 
 class AsyncGlueExtension(AsyncExtension):
-    api_url: str = "http://localhost:8000/chat/completions"
-    user_id: str = "TenAgent"
-    prompt: str = ""
-    token: str = ""
-    outdate_ts = datetime.now()
-    sentence_fragment: str = ""
-    ten_env: AsyncTenEnv = None
-    loop: asyncio.AbstractEventLoop = None
-    stopped: bool = False
-    queue = asyncio.Queue()
-    history: List[dict] = []
-    max_history: int = 10
-    session: aiohttp.ClientSession = None
+    def __init__(self, name: str):
+        super().__init__(name)
+
+        self.api_url: str = "http://localhost:8000/chat/completions"
+        self.user_id: str = "TenAgent"
+        self.prompt: str = ""
+        self.token: str = ""
+        self.outdate_ts = datetime.now()
+        self.ten_env: AsyncTenEnv = None
+        self.loop: asyncio.AbstractEventLoop = None
+        self.stopped: bool = False
+        self.queue = asyncio.Queue()
+        self.max_history: int = 10
+        self.max_history_tokens: int = 2048
+        self.history = ChatMemory(self.max_history, self.max_history_tokens)
+        self.http: http_client.SharedSession = None
+        self.chat_task: asyncio.Task = None
+        self.speculator: Speculator = None
+        self.speculation_timer: asyncio.TimerHandle = None
+        self.speculation_turn: Turn = None
+        self.speculation_task: asyncio.Task = None
 
     async def on_init(self, ten_env: AsyncTenEnv) -> None:
         ten_env.log_debug("on_init")
@@ -97,11 +113,41 @@ class AsyncGlueExtension(AsyncExtension):
             ten_env.log_error(f"GetProperty optional {PROPERTY_TOKEN} failed, err: {err}")
 
         try:
-            self.max_history = ten_env.get_property_int("max_memory_length")
+            self.max_history = ten_env.get_property_int(PROPERTY_MAX_MEMORY_LENGTH)
+        except Exception as err:
+            ten_env.log_error(f"GetProperty optional {PROPERTY_MAX_MEMORY_LENGTH} failed, err: {err}")
+
+        try:
+            self.max_history_tokens = ten_env.get_property_int(PROPERTY_MAX_MEMORY_TOKENS)
+        except Exception as err:
+            ten_env.log_error(f"GetProperty optional {PROPERTY_MAX_MEMORY_TOKENS} failed, err: {err}")
+
+        self.history = ChatMemory(self.max_history, self.max_history_tokens)
+
+        try:
+            if ten_env.get_property_bool(PROPERTY_SPECULATIVE):
+                self.speculator = Speculator()
         except Exception as err:
-            ten_env.log_error(f"GetProperty optional max_memory_length failed, err: {err}")
+            ten_env.log_error(f"GetProperty optional {PROPERTY_SPECULATIVE} failed, err: {err}")
+
+        if self.speculator:
+            try:
+                stable_ms = ten_env.get_property_int(PROPERTY_SPECULATIVE_STABLE_MS)
+                if stable_ms > 0:
+                    self.speculator.stable_ms = stable_ms
+            except Exception as err:
+                ten_env.log_error(f"GetProperty optional {PROPERTY_SPECULATIVE_STABLE_MS} failed, err: {err}")
+
+            try:
+                match_threshold = ten_env.get_property_float(PROPERTY_SPECULATIVE_MATCH_THRESHOLD)
+                if match_threshold > 0:
+                    self.speculator.match_threshold = match_threshold
+            except Exception as err:
+                ten_env.log_error(f"GetProperty optional {PROPERTY_SPECULATIVE_MATCH_THRESHOLD} failed, err: {err}")
 
         self.ten_env = ten_env
+        # connect ahead of the first turn, not waited for
+        self.loop.create_task(self._http().warm_up(self.api_url))
         self.loop.create_task(self._consume())
 
         ten_env.on_start_done()
@@ -112,6 +158,9 @@ class AsyncGlueExtension(AsyncExtension):
         self.stopped = True
         await self.queue.put(None)
         await self._flush()
+        if self.http:
+            await http_client.release(self.http)
+            self.http = None
 
         ten_env.on_stop_done()
 
@@ -125,6 +174,9 @@ class AsyncGlueExtension(AsyncExtension):
 
         if cmd_name == "flush":
             try:
+                if self.speculator:
+                    self.speculator.interrupt()
+                    self._stop_speculation()
                 await self._flush()
                 await ten_env.send_cmd(Cmd.create("flush"))
                 ten_env.log_info("on flush")
@@ -151,6 +203,11 @@ class AsyncGlueExtension(AsyncExtension):
             ten_env.log_info(f"GetProperty optional {DATA_IN_TEXT_DATA_PROPERTY_TEXT} failed, err: {err}")
 
         if not is_final:
+            if self.speculator and input_text:
+                self.speculator.on_partial(input_text)
+                self._stop_speculation()
+                self._schedule_speculation()
+                return
             ten_env.log_info("ignore non-final input")
             return
         if not input_text:
@@ -159,6 +216,13 @@ class AsyncGlueExtension(AsyncExtension):
 
         ten_env.log_info(f"OnData input text: [{input_text}]")
 
+        if self.speculator:
+            committed = self.speculator.on_final(input_text)
+            self._stop_speculation()
+            ten_env.log_info(self.speculator.stats())
+            if committed:
+                return
+
         ts = datetime.now()
         await self.queue.put((input_text, ts))
 
@@ -171,14 +235,38 @@ class AsyncGlueExtension(AsyncExtension):
     async def _flush(self):
         self.ten_env.log_info("flush")
         self.outdate_ts = datetime.now()
-        if self.session:
-            await self.session.close()
-            self.session = None
+        if self.chat_task:
+            self.chat_task.cancel()
+
+    def _http(self) -> http_client.SharedSession:
+        if self.http is None:
+            self.http = http_client.acquire()
+        return self.http
 
     def _need_interrrupt(self, ts: datetime) -> bool:
         return self.outdate_ts > ts
 
-    async def _send_text(self, text: str) -> None:
+    def _schedule_speculation(self) -> None:
+        if self.speculation_timer:
+            self.speculation_timer.cancel()
+        self.speculation_timer = self.loop.call_later(self.speculator.stable_ms / 1000, self._speculate)
+
+    def _speculate(self) -> None:
+        turn = self.speculator.poll()
+        if turn:
+            # not queued, the user is still speaking and the queue holds the
+            # previous turns which this one will replace
+            self.ten_env.log_info(f"speculative completion for partial text: [{turn.text}]")
+            self.speculation_turn = turn
+            self.speculation_task = self.loop.create_task(self._chat(turn.text, datetime.now(), turn))
+
+    def _stop_speculation(self) -> None:
+        turn = self.speculation_turn
+        if turn and (turn.cancelled or turn.interrupted):
+            self.speculation_task.cancel()
+            self.speculation_turn = self.speculation_task = None
+
+    def _send_text(self, text: str) -> None:
         data = Data.create("text_data")
         data.set_property_string(DATA_OUT_TEXT_DATA_PROPERTY_TEXT, text)
         data.set_property_bool(DATA_OUT_TEXT_DATA_PROPERTY_END_OF_SEGMENT, True)
@@ -196,28 +284,36 @@ class AsyncGlueExtension(AsyncExtension):
                 if self._need_interrrupt(ts):
                     continue
 
-                await self._chat(input, ts)
+                # a flush cancels the regular turn, a speculative one is
+                # stopped by the speculator instead
+                self.chat_task = self.loop.create_task(self._chat(input, ts, Turn(input)))
+                await self.chat_task
+            except asyncio.CancelledError:
+                if self.stopped:
+                    raise
+                self.ten_env.log_info("interrupted")
             except Exception as e:
                 self.ten_env.log_error(f"Failed to handle {e}")
+            finally:
+                self.chat_task = None
 
-    async def _add_to_history(self, role: str, content: str) -> None:
-        self.history.append({"role": role, "content": content})
-        if len(self.history) > self.max_history:
-            self.history = self.history[1:]
+    def _add_to_history(self, role: str, content: str) -> None:
+        self.history.put({"role": role, "content": content})
 
     async def _get_messages(self) -> List[dict]:
         messages = []
         if self.prompt:
             messages.append({"role": "system", "content": self.prompt})
-        messages.extend(self.history)
+        messages.extend(self.history.get())
         return messages
 
-    async def _chat(self, input: str, ts: datetime) -> None:
-        self.session = aiohttp.ClientSession()
+    async def _chat(self, input: str, ts: datetime, turn: Turn) -> None:
+        # pooled connections, shared with the other extensions of the loop
+        session = self._http().session
         try:
             messages = await self._get_messages()
             messages.append({"role": "user", "content": input})
-            await self._add_to_history("user", input)
+            turn.output(self._add_to_history, "user", input)
             payload = {
                 "messages": [{"role": msg["role"], "content": {"type": "text", "text": msg["content"]}} for msg in messages],
                 "model": "gpt-3.5-turbo",
@@ -230,9 +326,11 @@ class AsyncGlueExtension(AsyncExtension):
                 "Content-Type": "application/json"
             }
             total_output = ""
-            async with self.session.post(self.api_url, json=payload, headers=headers) as response:
+            # a speculative turn may run next to a regular one
+            sentence_fragment = ""
+            async with session.post(self.api_url, json=payload, headers=headers) as response:
                 async for line in response.content:
-                    if self._need_interrrupt(ts):
+                    if not turn.speculative and self._need_interrrupt(ts):
                         self.ten_env.log_info("interrupted")
                         total_output += "[interrupted]"
                         break
@@ -244,15 +342,12 @@ class AsyncGlueExtension(AsyncExtension):
                             if content == "[DONE]":
                                 break
                             self.ten_env.log_info(f"content: {content}")
-                            sentences, self.sentence_fragment = parse_sentences(self.sentence_fragment, content)
+                            sentences, sentence_fragment = parse_sentences(sentence_fragment, content)
                             for s in sentences:
-                                await self._send_text(s)
+                                turn.output(self._send_text, s)
                                 total_output += s
             self.ten_env.log_info(f"total_output: {total_output}")
-            await self._add_to_history("assistant", total_output)
+            turn.output(self._add_to_history, "assistant", total_output)
         except Exception as e:
             traceback.print_exc()
             self.ten_env.log_error(f"Failed to handle {e}")
-        finally:
-            await self.session.close()
-            self.session = None
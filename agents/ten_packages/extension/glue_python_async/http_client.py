@@ -0,0 +1,108 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import asyncio
+import time
+from typing import Dict, Set
+
+import aiohttp
+from yarl import URL
+
+from .log import logger
+
+# idle connections are closed by the pool after KEEPALIVE_EXPIRY seconds and
+# by most servers after about a minute, a ping every PING_INTERVAL seconds of
+# idleness keeps them open
+KEEPALIVE_EXPIRY = 90.0
+PING_INTERVAL = 30.0
+# seconds a ping may take, a hung server must not hold the pinger
+PING_TIMEOUT = 5.0
+
+
+class SharedSession:
+    """A pooled aiohttp.ClientSession shared by all extensions of an event
+    loop, kept warm while idle."""
+
+    def __init__(self, ping_interval: float = PING_INTERVAL, ping_timeout: float = PING_TIMEOUT):
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._on_request_start)
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, keepalive_timeout=KEEPALIVE_EXPIRY, ttl_dns_cache=300),
+            trace_configs=[trace],
+        )
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.users = 0
+        # urls to connect ahead of the first request and to ping
+        self.urls: Set[str] = set()
+        self.last_used = time.monotonic()
+        self.pings = 0
+        self.pinger: asyncio.Task = None
+
+    async def _on_request_start(self, session, context, params) -> None:
+        self.last_used = time.monotonic()
+
+    async def warm_up(self, url: str) -> None:
+        """Opens a connection to url, so that the first request does not pay
+        for DNS, TCP and TLS, and keeps it open from then on. The origin of
+        url is pinged, not url itself, which may only accept POST."""
+        url = str(URL(url).origin())
+        self.urls.add(url)
+        await self._ping(url)
+        if self.pinger is None and self.ping_interval > 0:
+            self.pinger = asyncio.create_task(self._ping_idle())
+
+    async def _ping(self, url: str) -> None:
+        try:
+            # any response will do, even an error one, not HEAD as aiohttp
+            # closes its connection
+            timeout = aiohttp.ClientTimeout(total=self.ping_timeout)
+            async with self.session.get(url, timeout=timeout) as response:
+                await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"ping {url} failed, err: {e}")
+
+    async def _ping_idle(self) -> None:
+        while True:
+            idle = time.monotonic() - self.last_used
+            if idle < self.ping_interval:
+                await asyncio.sleep(self.ping_interval - idle)
+                continue
+            for url in list(self.urls):
+                await self._ping(url)
+            self.pings += 1
+
+    async def close(self) -> None:
+        if self.pinger:
+            self.pinger.cancel()
+            await asyncio.gather(self.pinger, return_exceptions=True)
+            self.pinger = None
+        await self.session.close()
+
+
+# connections belong to the event loop they were opened on
+_sessions: Dict[asyncio.AbstractEventLoop, SharedSession] = {}
+
+
+def acquire() -> SharedSession:
+    """The shared session of the running event loop, created on first use.
+    Each acquire is paired with a release."""
+    loop = asyncio.get_running_loop()
+    shared = _sessions.get(loop)
+    if shared is None:
+        shared = _sessions[loop] = SharedSession()
+    shared.users += 1
+    return shared
+
+
+async def release(shared: SharedSession) -> None:
+    """Closes the shared session once its last user is done with it."""
+    shared.users -= 1
+    if shared.users > 0:
+        return
+    for loop, value in list(_sessions.items()):
+        if value is shared:
+            del _sessions[loop]
+    await shared.close()
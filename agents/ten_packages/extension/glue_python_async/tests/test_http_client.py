@@ -0,0 +1,136 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import asyncio
+from datetime import datetime
+
+from aiohttp import web
+from ten import Cmd
+
+from glue_python_async import http_client
+from glue_python_async.extension import AsyncGlueExtension
+from glue_python_async.speculation import Turn
+from test_speculation import FlushingEnv, _text
+
+
+class Server:
+    """Streams the words of the question slowly, records the client port and
+    the path of every request, one port per connection."""
+
+    def __init__(self):
+        self.ports = []
+        self.paths = []
+
+    async def echo(self, request: web.Request) -> web.StreamResponse:
+        self.ports.append(request.transport.get_extra_info("peername")[1])
+        self.paths.append(request.path)
+        if request.method == "GET":
+            return web.Response(status=405)
+        body = await request.json()
+        response = web.StreamResponse()
+        await response.prepare(request)
+        for word in body["messages"][-1]["content"]["text"].split():
+            await asyncio.sleep(0.02)
+            await response.write(f"data: {word}.\n".encode())
+        await response.write(b"data: [DONE]\n")
+        return response
+
+    async def __aenter__(self) -> str:
+        app = web.Application()
+        app.router.add_route("*", "/chat/completions", self.echo)
+        app.router.add_route("*", "/", self.echo)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/chat/completions"
+
+    async def __aexit__(self, *args) -> None:
+        await self.runner.cleanup()
+
+
+def _extension(url: str) -> AsyncGlueExtension:
+    ext = AsyncGlueExtension("glue")
+    ext.ten_env = FlushingEnv()
+    ext.api_url = url
+    ext.loop = asyncio.get_running_loop()
+    return ext
+
+
+def test_turns_reuse_warm_connection():
+    async def run():
+        server = Server()
+        async with server as url:
+            a, b = _extension(url), _extension(url)
+            assert a._http() is b._http()
+            await a._http().warm_up(url)
+            await a._chat("one two", datetime.now(), Turn("one two"))
+            await b._chat("three", datetime.now(), Turn("three"))
+            await a._chat("four", datetime.now(), Turn("four"))
+            await http_client.release(a.http)
+            await http_client.release(b.http)
+            assert a.http.session.closed
+
+        assert len(server.ports) == 4
+        assert len(set(server.ports)) == 1
+        # the warm up pings the origin, not the completions route
+        assert server.paths[0] == "/"
+        assert a.ten_env.texts == ["one.", "two.", "four."]
+
+    asyncio.run(run())
+
+
+def test_flush_cancels_turn_not_session():
+    async def run():
+        server = Server()
+        async with server as url:
+            ext = _extension(url)
+            consumer = ext.loop.create_task(ext._consume())
+            await ext.on_data(ext.ten_env, _text("one two three four five six", True))
+            await asyncio.sleep(0.07)
+            await ext.on_cmd(ext.ten_env, Cmd.create("flush"))
+            await asyncio.sleep(0.05)
+            sent = list(ext.ten_env.texts)
+            assert 1 <= len(sent) < 6
+            assert not ext.http.session.closed
+
+            await ext.on_data(ext.ten_env, _text("seven", True))
+            await asyncio.sleep(0.1)
+            assert ext.ten_env.texts == sent + ["seven."]
+            ext.stopped = True
+            await ext.queue.put(None)
+            await consumer
+            await http_client.release(ext.http)
+
+    asyncio.run(run())
+
+
+def test_ping_of_hung_server_times_out():
+    async def run():
+        released = asyncio.Event()
+
+        async def hang(request: web.Request) -> web.Response:
+            await released.wait()
+            return web.Response()
+
+        app = web.Application()
+        app.router.add_get("/", hang)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+
+        shared = http_client.SharedSession(ping_interval=0, ping_timeout=0.1)
+        try:
+            await asyncio.wait_for(shared.warm_up(f"http://127.0.0.1:{port}/chat/completions"), 2)
+        finally:
+            released.set()
+            await shared.close()
+            await runner.cleanup()
+
+    asyncio.run(run())
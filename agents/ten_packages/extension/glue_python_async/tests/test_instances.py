@@ -0,0 +1,84 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import asyncio
+from datetime import datetime
+
+from aiohttp import web
+
+from glue_python_async.extension import AsyncGlueExtension
+from glue_python_async.speculation import Turn
+
+
+class Env:
+    def __init__(self):
+        self.texts: list[str] = []
+
+    def send_data(self, data) -> None:
+        self.texts.append(data.get_property_string("text"))
+
+    def log_debug(self, msg: str) -> None:
+        pass
+
+    def log_info(self, msg: str) -> None:
+        pass
+
+    def log_error(self, msg: str) -> None:
+        pass
+
+
+async def _echo(request: web.Request) -> web.StreamResponse:
+    body = await request.json()
+    text = body["messages"][-1]["content"]["text"]
+    response = web.StreamResponse()
+    await response.prepare(request)
+    for word in text.split():
+        # interleave the sessions
+        await asyncio.sleep(0.01)
+        await response.write(f"data: {word}.\n".encode())
+    await response.write(b"data: [DONE]\n")
+    return response
+
+
+def _extension(name: str, url: str) -> tuple[AsyncGlueExtension, Env]:
+    ext = AsyncGlueExtension(name)
+    ext.ten_env = Env()
+    ext.api_url = url
+    return ext, ext.ten_env
+
+
+def test_sessions_do_not_share_state():
+    async def run():
+        app = web.Application()
+        app.router.add_post("/chat/completions", _echo)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        url = f"http://127.0.0.1:{port}/chat/completions"
+        try:
+            a, env_a = _extension("a", url)
+            b, env_b = _extension("b", url)
+            assert a.queue is not b.queue
+            assert a.history is not b.history
+
+            await asyncio.gather(
+                a._chat("one two", datetime.now(), Turn("one two")),
+                b._chat("three four", datetime.now(), Turn("three four")),
+            )
+        finally:
+            await runner.cleanup()
+
+        assert env_a.texts == ["one.", "two."]
+        assert a.history.get() == [
+            {"role": "user", "content": "one two"},
+            {"role": "assistant", "content": "one.two."},
+        ]
+        assert env_b.texts == ["three.", "four."]
+        assert [m["content"] for m in b.history.get()] == ["three four", "three.four."]
+
+    asyncio.run(run())
@@ -0,0 +1,122 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import asyncio
+
+from aiohttp import web
+from ten import Cmd, Data
+
+from glue_python_async.extension import AsyncGlueExtension
+from glue_python_async.speculation import Speculator
+from test_instances import Env
+
+
+class FlushingEnv(Env):
+    async def send_cmd(self, cmd: Cmd) -> None:
+        pass
+
+    def return_result(self, result, cmd: Cmd) -> None:
+        pass
+
+
+class Server:
+    def __init__(self):
+        self.requests: list[str] = []
+
+    async def echo(self, request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        text = body["messages"][-1]["content"]["text"]
+        self.requests.append(text)
+        response = web.StreamResponse()
+        await response.prepare(request)
+        for word in text.split():
+            await asyncio.sleep(0.03)
+            await response.write(f"data: {word}.\n".encode())
+        await response.write(b"data: [DONE]\n")
+        return response
+
+    async def __aenter__(self) -> str:
+        app = web.Application()
+        app.router.add_post("/chat/completions", self.echo)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/chat/completions"
+
+    async def __aexit__(self, *args) -> None:
+        await self.runner.cleanup()
+
+
+async def _asr(ext: AsyncGlueExtension, text: str, is_final: bool) -> None:
+    # the interrupt detector flushes before every result
+    await ext.on_cmd(ext.ten_env, Cmd.create("flush"))
+    await ext.on_data(ext.ten_env, _text(text, is_final))
+
+
+def _text(text: str, is_final: bool) -> Data:
+    data = Data.create("text_data")
+    data.set_property_string("text", text)
+    data.set_property_bool("is_final", is_final)
+    return data
+
+
+async def _extension(url: str) -> tuple[AsyncGlueExtension, Env]:
+    ext = AsyncGlueExtension("glue")
+    ext.ten_env = FlushingEnv()
+    ext.api_url = url
+    ext.loop = asyncio.get_running_loop()
+    ext.speculator = Speculator(stable_ms=50)
+    ext.loop.create_task(ext._consume())
+    return ext, ext.ten_env
+
+
+def test_matching_final_commits():
+    async def run():
+        server = Server()
+        async with server as url:
+            ext, env = await _extension(url)
+            await _asr(ext, "what", False)
+            await asyncio.sleep(0.02)
+            await _asr(ext, "what time", False)
+            await asyncio.sleep(0.15)
+            # started on the stable partial, nothing sent yet
+            assert server.requests == ["what time"]
+            assert env.texts == [] and ext.history.get() == []
+
+            await _asr(ext, "What time?", True)
+            await asyncio.sleep(0.1)
+            ext.stopped = True
+            await ext.queue.put(None)
+
+        assert server.requests == ["what time"]
+        assert env.texts == ["what.", "time."]
+        assert [m["content"] for m in ext.history.get()] == ["what time", "what.time."]
+        assert ext.speculator.hits == 1 and ext.speculator.started == 1
+        assert ext.speculator.saved_ms >= 100
+
+    asyncio.run(run())
+
+
+def test_different_final_restarts():
+    async def run():
+        server = Server()
+        async with server as url:
+            ext, env = await _extension(url)
+            await _asr(ext, "play some", False)
+            await asyncio.sleep(0.1)
+            await _asr(ext, "tell me a joke", True)
+            await asyncio.sleep(0.3)
+            ext.stopped = True
+            await ext.queue.put(None)
+
+        assert server.requests == ["play some", "tell me a joke"]
+        assert env.texts == ["tell.", "me.", "a.", "joke."]
+        assert [m["content"] for m in ext.history.get()] == ["tell me a joke", "tell.me.a.joke."]
+        assert ext.speculator.hits == 0 and ext.speculator.started == 1
+
+    asyncio.run(run())
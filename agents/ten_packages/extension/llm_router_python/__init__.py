@@ -0,0 +1,9 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+from . import addon
+from .log import logger
+
+logger.info("llm_router_python extension loaded")
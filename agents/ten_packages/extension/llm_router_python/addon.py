@@ -0,0 +1,20 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+from ten import (
+    Addon,
+    register_addon_as_extension,
+    TenEnv,
+)
+
+
+@register_addon_as_extension("llm_router_python")
+class LLMRouterExtensionAddon(Addon):
+
+    def on_create_instance(self, ten_env: TenEnv, name: str, context) -> None:
+        from .extension import LLMRouterExtension
+        from .log import logger
+        logger.info("LLMRouterExtensionAddon on_create_instance")
+        ten_env.on_create_instance_done(LLMRouterExtension(name), context)
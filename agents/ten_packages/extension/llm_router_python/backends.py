@@ -0,0 +1,61 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import json
+from typing import AsyncGenerator, List
+
+import aiohttp
+
+from .log import logger
+
+
+class OpenAICompatibleBackend:
+    """Streaming chat completions of an OpenAI compatible endpoint, as served
+    by OpenAI, Qwen (DashScope compatible mode), Gemini (OpenAI
+    compatibility) or a Bedrock access gateway."""
+
+    def __init__(self, session: aiohttp.ClientSession, name: str, base_url: str, api_key: str = "", model: str = "", max_tokens: int = 512, temperature: float = 0.1):
+        self.session = session
+        self.name = name
+        self.url = base_url.rstrip("/") + "/chat/completions"
+        self.api_key = api_key
+        self.model = model
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+
+    @classmethod
+    def from_config(cls, session: aiohttp.ClientSession, config: dict) -> "OpenAICompatibleBackend":
+        return cls(session, **config)
+
+    async def stream(self, messages: List[dict]) -> AsyncGenerator[str, None]:
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature,
+            "stream": True,
+        }
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+
+        async with self.session.post(self.url, json=payload, headers=headers) as response:
+            response.raise_for_status()
+            async for line in response.content:
+                line = line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(data)
+                except ValueError:
+                    logger.warning(f"{self.name} sent an invalid chunk: {data}")
+                    continue
+                for choice in chunk.get("choices", []):
+                    content = (choice.get("delta") or {}).get("content")
+                    if content:
+                        yield content
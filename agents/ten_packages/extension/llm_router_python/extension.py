@@ -0,0 +1,270 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import asyncio
+import json
+import traceback
+import aiohttp
+
+from typing import List
+
+from ten import (
+    AudioFrame,
+    VideoFrame,
+    AsyncExtension,
+    AsyncTenEnv,
+    Cmd,
+    StatusCode,
+    CmdResult,
+    Data,
+)
+
+from .backends import OpenAICompatibleBackend
+from .chat_memory import ChatMemory
+from .hedging import HedgedRouter
+
+CMD_IN_FLUSH = "flush"
+CMD_IN_ROUTER_STATS = "router_stats"
+CMD_OUT_FLUSH = "flush"
+
+PROPERTY_BACKENDS = "backends"  # Required, JSON list of backends, the first is the primary
+PROPERTY_HEDGE_DELAY_MS = "hedge_delay_ms"  # Optional
+PROPERTY_PROMPT = "prompt"  # Optional
+PROPERTY_MAX_MEMORY_LENGTH = "max_memory_length"  # Optional
+PROPERTY_MAX_MEMORY_TOKENS = "max_memory_tokens"  # Optional
+
+DATA_IN_TEXT_DATA_PROPERTY_IS_FINAL = "is_final"
+DATA_IN_TEXT_DATA_PROPERTY_TEXT = "text"
+
+DATA_OUT_TEXT_DATA_PROPERTY_TEXT = "text"
+DATA_OUT_TEXT_DATA_PROPERTY_END_OF_SEGMENT = "end_of_segment"
+
+CMD_RESULT_PROPERTY_STATS = "stats"
+
+
+def is_punctuation(char):
+    if char in [",", "，", ".", "。", "?", "？", "!", "！"]:
+        return True
+    return False
+
+
+def parse_sentences(sentence_fragment, content):
+    sentences = []
+    current_sentence = sentence_fragment
+    for char in content:
+        current_sentence += char
+        if is_punctuation(char):
+            stripped_sentence = current_sentence
+            if any(c.isalnum() for c in stripped_sentence):
+                sentences.append(stripped_sentence)
+            current_sentence = ""
+
+    remain = current_sentence
+    return sentences, remain
+
+
+class LLMRouterExtension(AsyncExtension):
+    def __init__(self, name: str):
+        super().__init__(name)
+
+        self.backends: List[dict] = []
+        self.hedge_delay_ms: int = 500
+        self.prompt: str = ""
+        self.max_history: int = 10
+        self.max_history_tokens: int = 2048
+        self.memory = ChatMemory(self.max_history, self.max_history_tokens)
+        self.ten_env: AsyncTenEnv = None
+        self.stopped: bool = False
+        self.queue = asyncio.Queue()
+        self.session: aiohttp.ClientSession = None
+        self.router: HedgedRouter = None
+        self.consumer: asyncio.Task = None
+        self.current_task: asyncio.Task = None
+
+    async def on_init(self, ten_env: AsyncTenEnv) -> None:
+        ten_env.log_debug("on_init")
+        ten_env.on_init_done()
+
+    async def on_start(self, ten_env: AsyncTenEnv) -> None:
+        ten_env.log_debug("on_start")
+
+        try:
+            self.backends = json.loads(ten_env.get_property_string(PROPERTY_BACKENDS))
+        except Exception as err:
+            ten_env.log_error(f"GetProperty required {PROPERTY_BACKENDS} failed, err: {err}")
+            ten_env.on_start_done()
+            return
+
+        try:
+            self.hedge_delay_ms = ten_env.get_property_int(PROPERTY_HEDGE_DELAY_MS)
+        except Exception as err:
+            ten_env.log_error(f"GetProperty optional {PROPERTY_HEDGE_DELAY_MS} failed, err: {err}")
+
+        try:
+            self.prompt = ten_env.get_property_string(PROPERTY_PROMPT)
+        except Exception as err:
+            ten_env.log_error(f"GetProperty optional {PROPERTY_PROMPT} failed, err: {err}")
+
+        try:
+            self.max_history = ten_env.get_property_int(PROPERTY_MAX_MEMORY_LENGTH)
+        except Exception as err:
+            ten_env.log_error(f"GetProperty optional {PROPERTY_MAX_MEMORY_LENGTH} failed, err: {err}")
+
+        try:
+            self.max_history_tokens = ten_env.get_property_int(PROPERTY_MAX_MEMORY_TOKENS)
+        except Exception as err:
+            ten_env.log_error(f"GetProperty optional {PROPERTY_MAX_MEMORY_TOKENS} failed, err: {err}")
+
+        self.memory = ChatMemory(self.max_history, self.max_history_tokens)
+
+        self.session = aiohttp.ClientSession()
+        try:
+            self.router = HedgedRouter(
+                [OpenAICompatibleBackend.from_config(self.session, config) for config in self.backends],
+                self.hedge_delay_ms / 1000,
+            )
+        except Exception as err:
+            ten_env.log_error(f"invalid {PROPERTY_BACKENDS}, err: {err}")
+            await self.session.close()
+            self.session = None
+            ten_env.on_start_done()
+            return
+
+        ten_env.log_info(f"routing to {[b.name for b in self.router.backends]}, hedge after {self.hedge_delay_ms}ms")
+        self.ten_env = ten_env
+        self.consumer = asyncio.create_task(self._consume())
+
+        ten_env.on_start_done()
+
+    async def on_stop(self, ten_env: AsyncTenEnv) -> None:
+        ten_env.log_debug("on_stop")
+
+        self.stopped = True
+        if self.consumer:
+            self.consumer.cancel()
+            if self.current_task:
+                self.current_task.cancel()
+            await asyncio.gather(self.consumer, return_exceptions=True)
+        if self.session:
+            await self.session.close()
+            self.session = None
+        if self.router:
+            ten_env.log_info(f"router stats: {self.router.summary()}")
+
+        ten_env.on_stop_done()
+
+    async def on_deinit(self, ten_env: AsyncTenEnv) -> None:
+        ten_env.log_debug("on_deinit")
+        ten_env.on_deinit_done()
+
+    async def on_cmd(self, ten_env: AsyncTenEnv, cmd: Cmd) -> None:
+        cmd_name = cmd.get_name()
+        ten_env.log_debug("on_cmd name {}".format(cmd_name))
+
+        cmd_result = CmdResult.create(StatusCode.OK)
+        if cmd_name == CMD_IN_FLUSH:
+            try:
+                await self._flush()
+                await ten_env.send_cmd(Cmd.create(CMD_OUT_FLUSH))
+                ten_env.log_info("on flush")
+            except Exception as e:
+                ten_env.log_error(f"{traceback.format_exc()} \n Failed to handle {e}")
+        elif cmd_name == CMD_IN_ROUTER_STATS:
+            stats = self.router.to_dict() if self.router else {}
+            cmd_result.set_property_string(CMD_RESULT_PROPERTY_STATS, json.dumps(stats))
+        else:
+            ten_env.log_info(f"unknown cmd {cmd_name}")
+            cmd_result = CmdResult.create(StatusCode.ERROR)
+
+        ten_env.return_result(cmd_result, cmd)
+
+    async def on_data(self, ten_env: AsyncTenEnv, data: Data) -> None:
+        data_name = data.get_name()
+        ten_env.log_debug("on_data name {}".format(data_name))
+
+        is_final = False
+        input_text = ""
+        try:
+            is_final = data.get_property_bool(DATA_IN_TEXT_DATA_PROPERTY_IS_FINAL)
+        except Exception as err:
+            ten_env.log_info(f"GetProperty optional {DATA_IN_TEXT_DATA_PROPERTY_IS_FINAL} failed, err: {err}")
+
+        try:
+            input_text = data.get_property_string(DATA_IN_TEXT_DATA_PROPERTY_TEXT)
+        except Exception as err:
+            ten_env.log_info(f"GetProperty optional {DATA_IN_TEXT_DATA_PROPERTY_TEXT} failed, err: {err}")
+
+        if not is_final:
+            ten_env.log_info("ignore non-final input")
+            return
+        if not input_text:
+            ten_env.log_info("ignore empty text")
+            return
+
+        ten_env.log_info(f"OnData input text: [{input_text}]")
+        await self.queue.put(input_text)
+
+    async def on_audio_frame(self, ten_env: AsyncTenEnv, audio_frame: AudioFrame) -> None:
+        pass
+
+    async def on_video_frame(self, ten_env: AsyncTenEnv, video_frame: VideoFrame) -> None:
+        pass
+
+    async def _flush(self) -> None:
+        self.ten_env.log_info("flush")
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        if self.current_task:
+            # cancelling the turn cancels the streams of all backends asked
+            self.current_task.cancel()
+
+    async def _consume(self) -> None:
+        self.ten_env.log_info("start async loop")
+        while not self.stopped:
+            input = await self.queue.get()
+            self.current_task = asyncio.create_task(self._chat(input))
+            try:
+                await self.current_task
+            except asyncio.CancelledError:
+                if self.stopped:
+                    raise
+                self.ten_env.log_info("turn cancelled")
+            except Exception as e:
+                self.ten_env.log_error(f"Failed to handle {e}")
+            finally:
+                self.current_task = None
+
+    def _send_text(self, text: str, end_of_segment: bool) -> None:
+        data = Data.create("text_data")
+        data.set_property_string(DATA_OUT_TEXT_DATA_PROPERTY_TEXT, text)
+        data.set_property_bool(DATA_OUT_TEXT_DATA_PROPERTY_END_OF_SEGMENT, end_of_segment)
+        self.ten_env.send_data(data)
+
+    async def _chat(self, input: str) -> None:
+        messages = []
+        if self.prompt:
+            messages.append({"role": "system", "content": self.prompt})
+        messages.extend(self.memory.get())
+        messages.append({"role": "user", "content": input})
+
+        total_output = ""
+        sentence_fragment = ""
+        try:
+            async for content in self.router.stream(messages):
+                sentences, sentence_fragment = parse_sentences(sentence_fragment, content)
+                for s in sentences:
+                    self._send_text(s, False)
+                total_output += content
+            if sentence_fragment.strip():
+                self._send_text(sentence_fragment, False)
+            self._send_text("", True)
+        except asyncio.CancelledError:
+            total_output += "[interrupted]"
+            raise
+        finally:
+            self.memory.put({"role": "user", "content": input})
+            if total_output:
+                self.memory.put({"role": "assistant", "content": total_output})
+            self.ten_env.log_info(f"total_output: {total_output}, router stats: {self.router.summary()}")
@@ -0,0 +1,208 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import asyncio
+import bisect
+from typing import AsyncGenerator, AsyncIterator, Dict, List, Protocol
+
+# upper bounds of the time to first token buckets in ms, the last is open
+TTFT_BUCKETS_MS = (50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 10000)
+
+
+class Backend(Protocol):
+    name: str
+
+    def stream(self, messages: List[dict]) -> AsyncIterator[str]:
+        """Content deltas of the completion of messages."""
+        ...
+
+
+class Histogram:
+    """Counts of samples in fixed buckets, percentiles are bucket bounds."""
+
+    def __init__(self, bounds=TTFT_BUCKETS_MS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, p: float) -> float:
+        """Upper bound of the bucket holding the p-th percentile, inf if it
+        is the open one and 0 without samples."""
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return self.bounds[i] if i < len(self.bounds) else float("inf")
+        return float("inf")
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": {**{str(b): c for b, c in zip(self.bounds, self.counts)}, "+Inf": self.counts[-1]},
+        }
+
+
+class BackendStats:
+    def __init__(self):
+        # time to first token of the requests the backend answered, won or
+        # not
+        self.ttft_ms = Histogram()
+        self.started = 0
+        self.wins = 0
+        self.errors = 0
+        # requests cancelled before their first token, slower than the winner,
+        # with the time they had run, a lower bound of their ttft
+        self.cancelled = 0
+        self.cancelled_ms = Histogram()
+
+    def to_dict(self) -> dict:
+        return {
+            "started": self.started,
+            "wins": self.wins,
+            "errors": self.errors,
+            "cancelled": self.cancelled,
+            "ttft_ms": self.ttft_ms.to_dict(),
+            "cancelled_ms": self.cancelled_ms.to_dict(),
+        }
+
+
+class _Done:
+    pass
+
+
+_DONE = _Done()
+
+
+class HedgedRouter:
+    """Streams a completion from the first of several backends to answer.
+
+    The first backend is asked first. Whenever `hedge_delay` passes without
+    a first token, or the backends asked so far have all failed, the next
+    one is asked as well. The first backend to produce a token wins and is
+    streamed, the others are cancelled."""
+
+    def __init__(self, backends: List[Backend], hedge_delay: float):
+        if not backends:
+            raise ValueError("no backends")
+        self.backends = backends
+        self.hedge_delay = hedge_delay
+        self.stats: Dict[str, BackendStats] = {b.name: BackendStats() for b in backends}
+        # time to first token seen by the caller, hedging included
+        self.ttft_ms = Histogram()
+        self.hedged = 0
+
+    async def stream(self, messages: List[dict]) -> AsyncGenerator[str, None]:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        tasks: Dict[str, asyncio.Task] = {}
+        started: Dict[str, float] = {}
+        cancelled_at: Dict[str, float] = {}
+        answered = set()
+        waiting = list(self.backends)
+        failed: List[Exception] = []
+
+        async def pump(backend: Backend) -> None:
+            deltas = backend.stream(messages)
+            try:
+                async for delta in deltas:
+                    if backend.name not in answered:
+                        answered.add(backend.name)
+                        self.stats[backend.name].ttft_ms.observe((loop.time() - started[backend.name]) * 1000)
+                    await queue.put((backend, delta))
+                await queue.put((backend, _DONE))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await queue.put((backend, e))
+            finally:
+                await deltas.aclose()
+
+        def ask(backend: Backend) -> None:
+            started[backend.name] = loop.time()
+            self.stats[backend.name].started += 1
+            tasks[backend.name] = asyncio.create_task(pump(backend))
+
+        begin = loop.time()
+        ask(waiting.pop(0))
+        next_hedge = begin + self.hedge_delay
+        winner = None
+        try:
+            while True:
+                if winner is None and waiting:
+                    try:
+                        backend, item = await asyncio.wait_for(
+                            queue.get(), max(0, next_hedge - loop.time()))
+                    except asyncio.TimeoutError:
+                        self.hedged += 1
+                        ask(waiting.pop(0))
+                        next_hedge = loop.time() + self.hedge_delay
+                        continue
+                else:
+                    backend, item = await queue.get()
+
+                if winner is None:
+                    if isinstance(item, (Exception, _Done)):
+                        # an empty completion counts as a failure too
+                        self.stats[backend.name].errors += 1
+                        failed.append(item if isinstance(item, Exception) else RuntimeError(f"{backend.name} returned nothing"))
+                        tasks.pop(backend.name)
+                        if not tasks:
+                            if not waiting:
+                                raise failed[-1]
+                            ask(waiting.pop(0))
+                            next_hedge = loop.time() + self.hedge_delay
+                        continue
+                    winner = backend
+                    self.stats[backend.name].wins += 1
+                    self.ttft_ms.observe((loop.time() - begin) * 1000)
+                    for name, task in tasks.items():
+                        if name != backend.name:
+                            cancelled_at[name] = loop.time()
+                            task.cancel()
+                elif backend is not winner:
+                    continue
+
+                if isinstance(item, _Done):
+                    return
+                if isinstance(item, Exception):
+                    self.stats[backend.name].errors += 1
+                    raise item
+                yield item
+        finally:
+            now = loop.time()
+            for name, task in tasks.items():
+                cancelled_at.setdefault(name, now)
+                task.cancel()
+            if tasks:
+                await asyncio.wait(tasks.values())
+            for name, task in tasks.items():
+                if task.cancelled() and name not in answered:
+                    self.stats[name].cancelled += 1
+                    self.stats[name].cancelled_ms.observe((cancelled_at[name] - started[name]) * 1000)
+
+    def to_dict(self) -> dict:
+        return {
+            "hedged": self.hedged,
+            "ttft_ms": self.ttft_ms.to_dict(),
+            "backends": {name: s.to_dict() for name, s in self.stats.items()},
+        }
+
+    def summary(self) -> str:
+        return f"ttft p50 <= {self.ttft_ms.percentile(50):.0f}ms p99 <= {self.ttft_ms.percentile(99):.0f}ms, hedged {self.hedged}; " + ", ".join(
+            f"{name}: won {s.wins}/{s.started}, errors {s.errors}, "
+            f"cancelled {s.cancelled} after p50 <= {s.cancelled_ms.percentile(50):.0f}ms, "
+            f"ttft p50 <= {s.ttft_ms.percentile(50):.0f}ms p99 <= {s.ttft_ms.percentile(99):.0f}ms"
+            for name, s in self.stats.items()
+        )
@@ -0,0 +1,98 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import asyncio
+import json
+
+from aiohttp import web
+
+from llm_router_python.extension import LLMRouterExtension
+from ten import Cmd, Data
+
+
+class Env:
+    def __init__(self, properties):
+        self.properties = properties
+        self.sent = []
+        self.cmds = []
+
+    def _get(self, key):
+        return self.properties[key]
+
+    get_property_string = get_property_int = _get
+
+    def log_debug(self, msg):
+        pass
+
+    log_info = log_error = log_debug
+
+    def on_start_done(self):
+        pass
+
+    on_stop_done = on_start_done
+
+    def send_data(self, data):
+        self.sent.append((data.get_property_string("text"), data.get_property_bool("end_of_segment")))
+
+    async def send_cmd(self, cmd):
+        self.cmds.append(cmd.get_name())
+
+    def return_result(self, result, cmd):
+        self.result = result
+
+
+async def _serve(name, ttft):
+    """An OpenAI compatible endpoint streaming after ttft seconds."""
+
+    async def completions(request):
+        await asyncio.sleep(ttft)
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for token in (f"{name} here.", " Bye."):
+            chunk = {"choices": [{"delta": {"content": token}}]}
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        return response
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", completions)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, {"name": name, "base_url": f"http://127.0.0.1:{port}/v1", "model": name}
+
+
+def test_routes_to_fastest_backend():
+    async def run():
+        slow, slow_config = await _serve("slow", 1.0)
+        fast, fast_config = await _serve("fast", 0.0)
+        env = Env({"backends": json.dumps([slow_config, fast_config]), "hedge_delay_ms": 50})
+        ext = LLMRouterExtension("llm_router")
+        await ext.on_start(env)
+        try:
+            data = Data.create("text_data")
+            data.set_property_bool("is_final", True)
+            data.set_property_string("text", "hi")
+            await ext.on_data(env, data)
+            for _ in range(100):
+                if env.sent and env.sent[-1][1]:
+                    break
+                await asyncio.sleep(0.01)
+            assert env.sent == [("fast here.", False), (" Bye.", False), ("", True)]
+            assert ext.memory.get()[-1] == {"role": "assistant", "content": "fast here. Bye."}
+
+            await ext.on_cmd(env, Cmd.create("router_stats"))
+            stats = json.loads(env.result.get_property_string("stats"))
+            assert stats["hedged"] == 1
+            assert stats["backends"]["fast"]["wins"] == 1
+        finally:
+            await ext.on_stop(env)
+            await slow.cleanup()
+            await fast.cleanup()
+
+    asyncio.run(run())
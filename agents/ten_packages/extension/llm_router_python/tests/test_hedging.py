@@ -0,0 +1,175 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import asyncio
+
+import pytest
+
+from llm_router_python.hedging import HedgedRouter, Histogram
+
+
+class StubBackend:
+    """Streams tokens after an injected time to first token, or once `ready`
+    is set, or fails."""
+
+    def __init__(self, name, ttft, tokens=("Hello", " world."), error=None, ready=None):
+        self.name = name
+        self.ttft = ttft
+        self.ready = ready
+        self.tokens = tokens
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+
+    async def stream(self, messages):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.ttft)
+            if self.ready:
+                await self.ready.wait()
+            if self.error:
+                raise self.error
+            for token in self.tokens:
+                yield f"{self.name}:{token}"
+                await asyncio.sleep(0.001)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+async def _collect(router):
+    return [token async for token in router.stream([{"role": "user", "content": "hi"}])]
+
+
+def test_fast_primary_is_not_hedged():
+    async def run():
+        primary, secondary = StubBackend("a", 0.01), StubBackend("b", 0.01)
+        router = HedgedRouter([primary, secondary], 0.1)
+        assert await _collect(router) == ["a:Hello", "a: world."]
+        assert secondary.calls == 0
+        assert router.hedged == 0
+        assert router.stats["a"].wins == 1
+
+    asyncio.run(run())
+
+
+def test_slow_primary_is_hedged():
+    async def run():
+        primary, secondary = StubBackend("a", 1.0), StubBackend("b", 0.01)
+        router = HedgedRouter([primary, secondary], 0.05)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        assert await _collect(router) == ["b:Hello", "b: world."]
+        assert loop.time() - started < 0.2
+        # the loser is cancelled as soon as the winner is known
+        assert primary.cancelled == 1
+        assert router.hedged == 1
+        assert router.stats["b"].wins == 1 and router.stats["a"].wins == 0
+        # a backend's own ttft counts from its request, the caller's from the first
+        assert router.stats["b"].ttft_ms.sum < 50
+        assert 50 < router.ttft_ms.sum < 100
+        # the primary had not answered, it is counted apart from the samples
+        assert router.stats["a"].ttft_ms.count == 0
+        assert router.stats["a"].cancelled == 1
+        # but the time it ran is, as a lower bound of its ttft
+        assert router.stats["a"].cancelled_ms.count == 1
+        assert 50 < router.stats["a"].cancelled_ms.sum < 150
+
+    asyncio.run(run())
+
+
+def test_primary_wins_over_slower_hedge():
+    async def run():
+        primary, secondary = StubBackend("a", 0.08), StubBackend("b", 0.5)
+        router = HedgedRouter([primary, secondary], 0.05)
+        assert await _collect(router) == ["a:Hello", "a: world."]
+        assert secondary.calls == 1 and secondary.cancelled == 1
+        assert router.stats["b"].cancelled == 1
+
+    asyncio.run(run())
+
+
+def test_loser_ttft_is_recorded():
+    async def run():
+        ready = asyncio.Event()
+        primary = StubBackend("a", 0.0, ready=ready)
+        secondary = StubBackend("b", 0.0, ready=ready)
+        router = HedgedRouter([primary, secondary], 0.02)
+        task = asyncio.create_task(_collect(router))
+        await asyncio.sleep(0.1)
+        # both answer at once, the primary is streamed
+        ready.set()
+        assert await task == ["a:Hello", "a: world."]
+
+        a, b = router.stats["a"], router.stats["b"]
+        assert (a.wins, b.wins) == (1, 0)
+        assert a.ttft_ms.count == b.ttft_ms.count == 1
+        # each from its own request, the secondary was asked 20ms later
+        assert a.ttft_ms.sum > b.ttft_ms.sum + 10
+        assert a.cancelled == b.cancelled == 0
+        assert router.to_dict()["backends"]["b"]["ttft_ms"]["count"] == 1
+
+    asyncio.run(run())
+
+
+def test_failure_asks_next_at_once():
+    async def run():
+        primary = StubBackend("a", 0.0, error=RuntimeError("503"))
+        secondary = StubBackend("b", 0.01)
+        router = HedgedRouter([primary, secondary], 1.0)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        assert await _collect(router) == ["b:Hello", "b: world."]
+        assert loop.time() - started < 0.1
+        assert router.stats["a"].errors == 1
+
+    asyncio.run(run())
+
+
+def test_empty_completion_counts_as_failure():
+    async def run():
+        router = HedgedRouter([StubBackend("a", 0.0, tokens=()), StubBackend("b", 0.0)], 1.0)
+        assert await _collect(router) == ["b:Hello", "b: world."]
+
+    asyncio.run(run())
+
+
+def test_all_failed_raises_last_error():
+    async def run():
+        router = HedgedRouter([
+            StubBackend("a", 0.0, error=RuntimeError("a down")),
+            StubBackend("b", 0.01, error=RuntimeError("b down")),
+        ], 0.005)
+        with pytest.raises(RuntimeError, match="b down"):
+            await _collect(router)
+
+    asyncio.run(run())
+
+
+def test_cancel_stops_all_backends():
+    async def run():
+        primary, secondary = StubBackend("a", 1.0), StubBackend("b", 1.0)
+        router = HedgedRouter([primary, secondary], 0.01)
+        task = asyncio.create_task(_collect(router))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert primary.cancelled == 1 and secondary.cancelled == 1
+
+    asyncio.run(run())
+
+
+def test_histogram_percentiles():
+    histogram = Histogram((10, 100, 1000))
+    assert histogram.percentile(50) == 0
+    for value in (5, 5, 50, 500, 5000):
+        histogram.observe(value)
+    assert histogram.percentile(40) == 10
+    assert histogram.percentile(50) == 100
+    assert histogram.percentile(80) == 1000
+    assert histogram.percentile(99) == float("inf")
+    assert histogram.to_dict()["buckets"] == {"10": 2, "100": 1, "1000": 1, "+Inf": 1}
@@ -33,8 +33,6 @@ TEXT_DATA_FINAL_FIELD = "is_final"
 TEXT_DATA_STREAM_ID_FIELD = "stream_id"
 TEXT_DATA_END_OF_SEGMENT_FIELD = "end_of_segment"
 
-# record the cached text data for each stream id
-cached_text_map = {}
 MAX_CHUNK_SIZE_BYTES = 1024
 
 def _text_to_base64_chunks(text: str, msg_id: str) -> list:
@@ -96,8 +94,13 @@ def _text_to_base64_chunks(text: str, msg_id: str) -> list:
     return updated_chunks
 
 class MessageCollectorExtension(Extension):
-    # Create the queue for message processing
-    queue = asyncio.Queue()
+    def __init__(self, name: str):
+        super().__init__(name)
+
+        # Create the queue for message processing
+        self.queue = asyncio.Queue()
+        # record the cached text data for each stream id
+        self.cached_text_map = {}
 
     def on_init(self, ten_env: TenEnv) -> None:
         logger.info("MessageCollectorExtension on_init")
@@ -120,7 +123,8 @@ class MessageCollectorExtension(Extension):
     def on_stop(self, ten_env: TenEnv) -> None:
         logger.info("MessageCollectorExtension on_stop")
 
-        # TODO: clean up resources
+        # the loop thread belongs to this instance, end it with the session
+        asyncio.run_coroutine_threadsafe(self._queue_message(None), self.loop)
 
         ten_env.on_stop_done()
 
@@ -183,15 +187,15 @@ class MessageCollectorExtension(Extension):
         # We cache all final text data and append the non-final text data to the cached data
         # until the end of the segment.
         if end_of_segment:
-            if stream_id in cached_text_map:
-                text = cached_text_map[stream_id] + text
-                del cached_text_map[stream_id]
+            if stream_id in self.cached_text_map:
+                text = self.cached_text_map[stream_id] + text
+                del self.cached_text_map[stream_id]
         else:
             if final:
-                if stream_id in cached_text_map:
-                    text = cached_text_map[stream_id] + text
+                if stream_id in self.cached_text_map:
+                    text = self.cached_text_map[stream_id] + text
 
-                cached_text_map[stream_id] = text
+                self.cached_text_map[stream_id] = text
 
         # Generate a unique message ID for this batch of parts
         message_id = str(uuid.uuid4())[:8]
@@ -231,6 +235,7 @@ class MessageCollectorExtension(Extension):
         while True:
             data = await self.queue.get()
             if data is None:
+                self.loop.stop()
                 break
             # process data
             ten_data = Data.create("data")
@@ -0,0 +1,62 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import base64
+import json
+import threading
+
+from ten import Data
+
+from message_collector.src.extension import MessageCollectorExtension
+
+
+class Env:
+    def __init__(self):
+        self.messages: list[dict] = []
+        self.received = threading.Event()
+
+    def send_data(self, data: Data) -> None:
+        _, _, _, content = data.get_property_buf("data").decode().split("|", 3)
+        self.messages.append(json.loads(base64.b64decode(content)))
+        self.received.set()
+
+    def on_start_done(self) -> None:
+        pass
+
+    def on_stop_done(self) -> None:
+        pass
+
+
+def _text(text: str, end_of_segment: bool) -> Data:
+    data = Data.create("text_data")
+    data.set_property_string("text", text)
+    data.set_property_bool("is_final", True)
+    data.set_property_int("stream_id", 1)
+    data.set_property_bool("end_of_segment", end_of_segment)
+    return data
+
+
+def test_sessions_do_not_share_state():
+    a, b = MessageCollectorExtension("a"), MessageCollectorExtension("b")
+    env_a, env_b = Env(), Env()
+    a.on_start(env_a)
+    b.on_start(env_b)
+    try:
+        assert a.queue is not b.queue
+        assert a.cached_text_map is not b.cached_text_map
+
+        # same stream id in both sessions, b's segment must not pick up a's text
+        a.on_data(env_a, _text("hello ", False))
+        b.on_data(env_b, _text("world", True))
+        assert env_b.received.wait(5)
+        assert env_a.received.wait(5)
+        assert [m["text"] for m in env_b.messages] == ["world"]
+        assert [m["text"] for m in env_a.messages] == ["hello "]
+        assert a.cached_text_map == {1: "hello "}
+        assert b.cached_text_map == {}
+    finally:
+        a.on_stop(env_a)
+        b.on_stop(env_b)
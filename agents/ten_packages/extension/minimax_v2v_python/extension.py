@@ -16,11 +16,11 @@ from ten import (
 )
 from .util import duration_in_ms, duration_in_ms_since, Role
 from .chat_memory import ChatMemory
+from .flight_recorder import FlightRecorder
 from dataclasses import dataclass, fields
 import builtins
 import httpx
 from datetime import datetime
-import aiofiles
 import asyncio
 from typing import Iterator, List, Dict, Tuple, Any
 import base64
@@ -41,7 +41,10 @@ class MinimaxV2VConfig:
     )
     greeting: str = ""
     max_memory_length: int = 10
+    max_memory_tokens: int = 2048
     dump: bool = False
+    dump_seconds: int = 30
+    dump_path: str = "."
 
     def read_from_property(self, ten_env: AsyncTenEnv):
         for field in fields(self):
@@ -75,9 +78,10 @@ class MinimaxV2VExtension(AsyncExtension):
 
         self.config = MinimaxV2VConfig()
         self.client = httpx.AsyncClient(timeout=httpx.Timeout(5))
-        self.memory = ChatMemory(self.config.max_memory_length)
+        self.memory = ChatMemory(self.config.max_memory_length, self.config.max_memory_tokens)
         self.remote_stream_id = 0
         self.ten_env = None
+        self.recorder = None
 
         # able to cancel
         self.curr_task = None   
@@ -90,11 +94,17 @@ class MinimaxV2VExtension(AsyncExtension):
         self.config.read_from_property(ten_env=ten_env)
         ten_env.log_info(f"config: {self.config}")
 
-        self.memory = ChatMemory(self.config.max_memory_length)
+        self.memory = ChatMemory(self.config.max_memory_length, self.config.max_memory_tokens)
         self.ten_env = ten_env
         ten_env.on_init_done()
 
     async def on_start(self, ten_env: AsyncTenEnv) -> None:
+        if self.config.dump:
+            self.recorder = FlightRecorder(
+                {"in": self.config.in_sample_rate, "out": self.config.out_sample_rate},
+                seconds=self.config.dump_seconds,
+                directory=self.config.dump_path,
+            )
         self.process_input_task = asyncio.create_task(self._process_input(ten_env=ten_env, queue=self.queue), name="process_input")
 
         ten_env.on_start_done()
@@ -108,6 +118,11 @@ class MinimaxV2VExtension(AsyncExtension):
             await asyncio.gather(self.process_input_task, return_exceptions=True)
             self.process_input_task = None
 
+        if self.recorder:
+            await self._snapshot_audio(ten_env, "stop")
+            self.recorder.close()
+            self.recorder = None
+
         ten_env.on_stop_done()
 
     async def on_deinit(self, ten_env: AsyncTenEnv) -> None:
@@ -130,6 +145,8 @@ class MinimaxV2VExtension(AsyncExtension):
                     await self._flush(ten_env=ten_env)
                     _result = await ten_env.send_cmd(Cmd.create("flush"))
                     ten_env.log_debug("flush done")
+                case "snapshot_audio":
+                    await self._snapshot_audio(ten_env, "cmd")
                 case _:
                     pass
             ten_env.return_result(CmdResult.create(StatusCode.OK), cmd)
@@ -164,7 +181,7 @@ class MinimaxV2VExtension(AsyncExtension):
             # await self._complete_with_history(ts, frame_buf)
 
             # dump input audio if need
-            await self._dump_audio_if_need(frame_buf, "in")
+            self._dump_audio_if_need(frame_buf, "in")
             
             # ten_env.log_debug(f"on audio frame {len(frame_buf)} {stream_id} put done")
         except asyncio.CancelledError:
@@ -310,7 +327,7 @@ class MinimaxV2VExtension(AsyncExtension):
                                 # send out
                                 base64_str = delta["audio_content"]
                                 buff = base64.b64decode(base64_str)
-                                await self._dump_audio_if_need(buff, "out")
+                                self._dump_audio_if_need(buff, "out")
                                 self._send_audio_frame(ten_env=ten_env, audio_data=buff)
 
                             # tool calls
@@ -345,10 +362,13 @@ class MinimaxV2VExtension(AsyncExtension):
 
         except httpx.TimeoutException:
             ten_env.log_warn("http timeout")
+            await self._snapshot_audio(ten_env, "error")
         except httpx.HTTPStatusError as e:
             ten_env.log_warn(f"http status error: {e}")
+            await self._snapshot_audio(ten_env, "error")
         except httpx.RequestError as e:
             ten_env.log_warn(f"http request error: {e}")
+            await self._snapshot_audio(ten_env, "error")
         finally:
             ten_env.log_info(
                 f"http loop done, cost_time {duration_in_ms_since(start_time)}ms"
@@ -476,9 +496,19 @@ class MinimaxV2VExtension(AsyncExtension):
             await asyncio.gather(self.curr_task, return_exceptions=True)
             self.curr_task = None
 
-    async def _dump_audio_if_need(self, buf: bytearray, suffix: str) -> None:
-        if not self.config.dump:
+    def _dump_audio_if_need(self, buf: bytearray, suffix: str) -> None:
+        if not self.recorder:
             return
 
-        async with aiofiles.open(f"minimax_v2v_{suffix}.pcm", "ab") as f:
-            await f.write(buf)
+        self.recorder.record(suffix, buf)
+
+    async def _snapshot_audio(self, ten_env: AsyncTenEnv, reason: str) -> None:
+        if not self.recorder:
+            return
+
+        name = f"minimax_v2v_{datetime.now().strftime('%Y%m%d%H%M%S')}_{reason}"
+        try:
+            paths = await asyncio.wrap_future(self.recorder.snapshot(name))
+            ten_env.log_info(f"audio snapshot saved to {paths}")
+        except Exception as e:
+            ten_env.log_warn(f"audio snapshot {name} failed, err {e}")
@@ -0,0 +1,64 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import os
+import threading
+import wave
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .audio_buffer import AudioRingBuffer
+
+
+class FlightRecorder:
+    """Keeps the last few seconds of each audio track in preallocated memory.
+
+    Recording is a memory copy on the audio path; WAV files are only written
+    when a snapshot is taken, by a background writer thread."""
+
+    def __init__(
+        self,
+        tracks: dict[str, int],
+        seconds: int = 30,
+        directory: str = ".",
+        bytes_per_sample: int = 2,
+    ):
+        # track name -> (sample rate, ring buffer)
+        self.tracks = {
+            name: (sample_rate, AudioRingBuffer(sample_rate * bytes_per_sample * seconds))
+            for name, sample_rate in tracks.items()
+        }
+        self.directory = directory
+        self.bytes_per_sample = bytes_per_sample
+        self.lock = threading.Lock()
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="flight_recorder")
+
+    def record(self, track: str, buf: bytes) -> None:
+        with self.lock:
+            self.tracks[track][1].write(buf)
+
+    def snapshot(self, name: str) -> Future:
+        """Write every track to `<directory>/<name>_<track>.wav`, resolves to the paths."""
+        with self.lock:
+            audio = [
+                (track, sample_rate, ring.peek())
+                for track, (sample_rate, ring) in self.tracks.items()
+            ]
+        return self.writer.submit(self._write, name, audio)
+
+    def close(self) -> None:
+        self.writer.shutdown(wait=True)
+
+    def _write(self, name: str, audio: list[tuple[str, int, bytes]]) -> list[str]:
+        os.makedirs(self.directory, exist_ok=True)
+        paths = []
+        for track, sample_rate, data in audio:
+            path = os.path.join(self.directory, f"{name}_{track}.wav")
+            with wave.open(path, "wb") as f:
+                f.setnchannels(1)
+                f.setsampwidth(self.bytes_per_sample)
+                f.setframerate(sample_rate)
+                f.writeframes(data)
+            paths.append(path)
+        return paths
@@ -0,0 +1,111 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import re
+import threading
+from collections import deque
+from typing import Any
+
+# a token per CJK character, otherwise pieces of about four characters of a
+# word, and a token per punctuation mark
+_TOKEN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]|\w+|[^\w\s]")
+# role and separators of every message
+MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate BPE token count of text, without a tokenizer."""
+    return sum((len(m) + 3) // 4 for m in _TOKEN.findall(text))
+
+
+def message_tokens(message: Any) -> int:
+    """Approximate tokens of all text in a message, whatever its layout,
+    e.g. OpenAI content parts, Bedrock content blocks or Gemini parts."""
+    if isinstance(message, str):
+        return estimate_tokens(message)
+    if isinstance(message, dict):
+        return sum(message_tokens(v) for k, v in message.items() if k != "role")
+    if isinstance(message, (list, tuple)):
+        return sum(message_tokens(v) for v in message)
+    return 0
+
+
+class ChatMemory:
+    """Chat history bounded by a message count and a token budget.
+
+    Tokens are estimated once per message and kept as a running total. The
+    oldest turns, a user message with the replies after it, are dropped
+    whole until both bounds hold, which is O(1) amortized per message. The
+    latest turn is always kept and the history never starts with a reply.
+    A max_tokens of 0 disables the budget."""
+
+    def __init__(self, max_history_length: int, max_tokens: int = 0):
+        self.max_history_length = max_history_length
+        self.max_tokens = max_tokens
+        # messages with their token counts
+        self.history: deque[tuple[Any, int]] = deque()
+        self.tokens = 0
+        self.turns = 0
+        self.mutex = threading.Lock()
+
+    def put(self, message):
+        tokens = message_tokens(message) + MESSAGE_OVERHEAD
+        with self.mutex:
+            if self._is_user(message):
+                self.turns += 1
+            elif not self.history:
+                # we cannot have an assistant message at the start of the chat history
+                return
+            self.history.append((message, tokens))
+            self.tokens += tokens
+
+            while self.turns > 1 and self._exceeded():
+                self._pop_turn()
+
+    def pop(self):
+        """Removes and returns the latest message, None if there is none."""
+        with self.mutex:
+            if not self.history:
+                return None
+            message, tokens = self.history.pop()
+            self.tokens -= tokens
+            if self._is_user(message):
+                self.turns -= 1
+            return message
+
+    def last(self):
+        with self.mutex:
+            return self.history[-1][0] if self.history else None
+
+    def get(self):
+        with self.mutex:
+            return [message for message, _ in self.history]
+
+    def count(self):
+        with self.mutex:
+            return len(self.history)
+
+    def clear(self):
+        with self.mutex:
+            self.history.clear()
+            self.tokens = 0
+            self.turns = 0
+
+    def _exceeded(self) -> bool:
+        if len(self.history) > self.max_history_length:
+            return True
+        return self.max_tokens > 0 and self.tokens > self.max_tokens
+
+    def _pop_turn(self) -> None:
+        _, tokens = self.history.popleft()
+        self.tokens -= tokens
+        self.turns -= 1
+        while self.history and not self._is_user(self.history[0][0]):
+            _, tokens = self.history.popleft()
+            self.tokens -= tokens
+
+    @staticmethod
+    def _is_user(message) -> bool:
+        return message["role"] == "user"
@@ -8,9 +8,14 @@
 import asyncio
 import json
 import traceback
+from functools import partial
 
-from .helper import AsyncEventEmitter, AsyncQueue, get_current_time, get_property_bool, get_property_float, get_property_int, get_property_string, parse_sentences, rgb2base64jpeg
+from .helper import EVENT_CONTENT_UPDATE, EVENT_TOOL_CALL, AsyncQueue, buffered, get_current_time, get_property_bool, get_property_float, get_property_int, get_property_string, parse_sentences
 from .openai import OpenAIChatGPT, OpenAIChatGPTConfig
+from .chat_memory import ChatMemory
+from .speculation import Speculator, Turn
+from .tools import ToolCall, ToolRegistry
+from .vision import VisionCapture
 from ten import (
     AudioFrame,
     VideoFrame,
@@ -26,12 +31,21 @@ from .log import logger
 CMD_IN_FLUSH = "flush"
 CMD_IN_ON_USER_JOINED = "on_user_joined"
 CMD_IN_ON_USER_LEFT = "on_user_left"
+CMD_IN_TOOL_REGISTER = "tool_register"
 CMD_OUT_FLUSH = "flush"
+CMD_OUT_TOOL_CALL = "tool_call"
+CMD_PROPERTY_NAME = "name"
+CMD_PROPERTY_ARGS = "args"
 DATA_IN_TEXT_DATA_PROPERTY_TEXT = "text"
 DATA_IN_TEXT_DATA_PROPERTY_IS_FINAL = "is_final"
 DATA_OUT_TEXT_DATA_PROPERTY_TEXT = "text"
 DATA_OUT_TEXT_DATA_PROPERTY_TEXT_END_OF_SEGMENT = "end_of_segment"
 
+TOOL_REGISTER_PROPERTY_NAME = "name"
+TOOL_REGISTER_PROPERTY_DESCRIPTON = "description"
+TOOL_REGISTER_PROPERTY_PARAMETERS = "parameters"
+TOOL_REGISTER_PROPERTY_TIMEOUT_MS = "timeout_ms"
+
 PROPERTY_BASE_URL = "base_url"  # Optional
 PROPERTY_API_KEY = "api_key"  # Required
 PROPERTY_MODEL = "model"  # Optional
@@ -45,40 +59,59 @@ PROPERTY_GREETING = "greeting"  # Optional
 PROPERTY_ENABLE_TOOLS = "enable_tools"  # Optional
 PROPERTY_PROXY_URL = "proxy_url"  # Optional
 PROPERTY_MAX_MEMORY_LENGTH = "max_memory_length"  # Optional
+PROPERTY_MAX_MEMORY_TOKENS = "max_memory_tokens"  # Optional
 PROPERTY_CHECKING_VISION_TEXT_ITEMS = "checking_vision_text_items"  # Optional
+PROPERTY_SPECULATIVE = "speculative"  # Optional
+PROPERTY_SPECULATIVE_STABLE_MS = "speculative_stable_ms"  # Optional
+PROPERTY_SPECULATIVE_MATCH_THRESHOLD = "speculative_match_threshold"  # Optional
+PROPERTY_VISION_CAPTURE_INTERVAL_MS = "vision_capture_interval_ms"  # Optional
 
 
 TASK_TYPE_CHAT_COMPLETION = "chat_completion"
-TASK_TYPE_CHAT_COMPLETION_WITH_VISION = "chat_completion_with_vision"
 
+TOOL_GET_VISION_IMAGE = "get_vision_image"
+# completions with tool results before the model has to answer
+MAX_TOOL_ROUNDS = 3
 
-class OpenAIChatGPTExtension(AsyncExtension):
-    memory = []
-    max_memory_length = 10
-    openai_chatgpt = None
-    enable_tools = False
-    image_data = None
-    image_width = 0
-    image_height = 0
-    checking_vision_text_items = []
-    loop = None
-    sentence_fragment = ""
-
-    # Create the queue for message processing
-    queue = AsyncQueue()
+# stream events read ahead of the sentence handling
+STREAM_BUFFER_SIZE = 32
 
+
+class OpenAIChatGPTExtension(AsyncExtension):
     available_tools = [
         {
             "type": "function",
             "function": {
                 # ensure you use gpt-4o or later model if you need image recognition, gpt-4o-mini does not work quite well in this case
-                "name": "get_vision_image",
+                "name": TOOL_GET_VISION_IMAGE,
                 "description": "Get the image from camera. Call this whenever you need to understand the input camera image like you have vision capability, for example when user asks 'What can you see?' or 'Can you see me?'",
             },
             "strict": True,
         }
     ]
 
+    def __init__(self, name: str):
+        super().__init__(name)
+
+        self.max_memory_length = 10
+        self.max_memory_tokens = 2048
+        self.memory = ChatMemory(self.max_memory_length, self.max_memory_tokens)
+        self.openai_chatgpt = None
+        self.enable_tools = False
+        self.vision = VisionCapture()
+        self.registry = ToolRegistry()
+        self.checking_vision_text_items = []
+        self.loop = None
+
+        # Create the queue for message processing
+        self.queue = AsyncQueue()
+        self.current_task = None
+
+        self.speculator = None
+        self.speculation_timer = None
+        self.speculation_turn = None
+        self.speculation_task = None
+
     async def on_init(self, ten_env: TenEnv) -> None:
         ten_env.log_info("on_init")
         ten_env.on_init_done()
@@ -123,7 +156,10 @@ class OpenAIChatGPTExtension(AsyncExtension):
         self.greeting = get_property_string(ten_env, PROPERTY_GREETING)
         self.enable_tools = get_property_bool(ten_env, PROPERTY_ENABLE_TOOLS)
         self.max_memory_length = get_property_int(
-            ten_env, PROPERTY_MAX_MEMORY_LENGTH)
+            ten_env, PROPERTY_MAX_MEMORY_LENGTH) or self.max_memory_length
+        self.max_memory_tokens = get_property_int(
+            ten_env, PROPERTY_MAX_MEMORY_TOKENS) or self.max_memory_tokens
+        self.memory = ChatMemory(self.max_memory_length, self.max_memory_tokens)
         checking_vision_text_items_str = get_property_string(
             ten_env, PROPERTY_CHECKING_VISION_TEXT_ITEMS)
         if checking_vision_text_items_str:
@@ -135,11 +171,24 @@ class OpenAIChatGPTExtension(AsyncExtension):
                     f"Error parsing {PROPERTY_CHECKING_VISION_TEXT_ITEMS}: {err}")
         self.users_count = 0
 
+        if get_property_bool(ten_env, PROPERTY_SPECULATIVE):
+            self.speculator = Speculator()
+            stable_ms = get_property_int(ten_env, PROPERTY_SPECULATIVE_STABLE_MS)
+            if stable_ms > 0:
+                self.speculator.stable_ms = stable_ms
+            match_threshold = get_property_float(ten_env, PROPERTY_SPECULATIVE_MATCH_THRESHOLD)
+            if match_threshold > 0:
+                self.speculator.match_threshold = match_threshold
+        self.vision.interval_ms = get_property_int(
+            ten_env, PROPERTY_VISION_CAPTURE_INTERVAL_MS) or self.vision.interval_ms
+
         # Create instance
         try:
             self.openai_chatgpt = OpenAIChatGPT(openai_chatgpt_config)
             ten_env.log_info(
                 f"initialized with max_tokens: {openai_chatgpt_config.max_tokens}, model: {openai_chatgpt_config.model}")
+            # connect ahead of the first request, not waited for
+            self.loop.create_task(self.openai_chatgpt.warm_up())
         except Exception as err:
             ten_env.log_info(f"Failed to initialize OpenAIChatGPT: {err}")
 
@@ -148,7 +197,10 @@ class OpenAIChatGPTExtension(AsyncExtension):
     async def on_stop(self, ten_env: TenEnv) -> None:
         ten_env.log_info("on_stop")
 
-        # TODO: clean up resources
+        ten_env.log_info(self.vision.stats())
+        self.vision.close()
+        if self.openai_chatgpt:
+            await self.openai_chatgpt.close()
 
         ten_env.on_stop_done()
 
@@ -161,6 +213,9 @@ class OpenAIChatGPTExtension(AsyncExtension):
         ten_env.log_info(f"on_cmd name: {cmd_name}")
 
         if cmd_name == CMD_IN_FLUSH:
+            if self.speculator:
+                self.speculator.interrupt()
+                self._stop_speculation()
             await self._flush_queue(ten_env)
             ten_env.send_cmd(Cmd.create(CMD_OUT_FLUSH), None)
             ten_env.log_info("on_cmd sent flush")
@@ -185,6 +240,8 @@ class OpenAIChatGPTExtension(AsyncExtension):
         elif cmd_name == CMD_IN_ON_USER_LEFT:
             self.users_count -= 1
             status_code, detail = StatusCode.OK, "success"
+        elif cmd_name == CMD_IN_TOOL_REGISTER:
+            status_code, detail = self._on_tool_register(ten_env, cmd)
         else:
             ten_env.log_info(f"on_cmd unknown cmd: {cmd_name}")
             status_code, detail = StatusCode.ERROR, "unknown cmd"
@@ -199,6 +256,11 @@ class OpenAIChatGPTExtension(AsyncExtension):
         input_text = get_property_string(data, DATA_IN_TEXT_DATA_PROPERTY_TEXT)
 
         if not is_final:
+            if self.speculator and input_text:
+                self.speculator.on_partial(input_text)
+                self._stop_speculation()
+                self._schedule_speculation(ten_env)
+                return
             ten_env.log_info("ignore non-final input")
             return
         if not input_text:
@@ -207,6 +269,13 @@ class OpenAIChatGPTExtension(AsyncExtension):
 
         ten_env.log_info(f"OnData input text: [{input_text}]")
 
+        if self.speculator:
+            committed = self.speculator.on_final(input_text)
+            self._stop_speculation()
+            ten_env.log_info(self.speculator.stats())
+            if committed:
+                return
+
         # Start an asynchronous task for handling chat completion
         await self.queue.put([TASK_TYPE_CHAT_COMPLETION, input_text])
 
@@ -216,10 +285,8 @@ class OpenAIChatGPTExtension(AsyncExtension):
 
     async def on_video_frame(self, ten_env: TenEnv, video_frame: VideoFrame) -> None:
         # ten_env.log_info(f"OpenAIChatGPTExtension on_video_frame {frame.get_width()} {frame.get_height()}")
-        self.image_data = video_frame.get_buf()
-        self.image_width = video_frame.get_width()
-        self.image_height = video_frame.get_height()
-        return
+        # frames are only copied when an image is needed
+        self.vision.on_video_frame(video_frame)
 
     async def _process_queue(self, ten_env: TenEnv):
         """Asynchronously process queue items one by one."""
@@ -229,7 +296,7 @@ class OpenAIChatGPTExtension(AsyncExtension):
             try:
                 # Create a new task for the new message
                 self.current_task = asyncio.create_task(
-                    self._run_chatflow(ten_env, task_type, message, self.memory))
+                    self._run_chatflow(ten_env, task_type, message, self.memory.get(), Turn(message)))
                 await self.current_task  # Wait for the current task to finish or be cancelled
             except asyncio.CancelledError:
                 ten_env.log_info(f"Task cancelled: {message}")
@@ -244,88 +311,194 @@ class OpenAIChatGPTExtension(AsyncExtension):
             ten_env.log_info("Cancelling the current task during flush.")
             self.current_task.cancel()
 
-    async def _run_chatflow(self, ten_env: TenEnv, task_type: str, input_text: str, memory):
+    def _schedule_speculation(self, ten_env: TenEnv):
+        if self.speculation_timer:
+            self.speculation_timer.cancel()
+        self.speculation_timer = self.loop.call_later(
+            self.speculator.stable_ms / 1000, self._speculate, ten_env)
+
+    def _speculate(self, ten_env: TenEnv):
+        turn = self.speculator.poll()
+        if turn:
+            # not queued, the user is still speaking and the queue holds the
+            # previous turns which this one will replace
+            ten_env.log_info(f"speculative completion for partial text: [{turn.text}]")
+            self.speculation_turn = turn
+            self.speculation_task = self.loop.create_task(
+                self._run_chatflow(ten_env, TASK_TYPE_CHAT_COMPLETION, turn.text, self.memory.get(), turn))
+
+    def _stop_speculation(self):
+        turn = self.speculation_turn
+        if turn and (turn.cancelled or turn.interrupted):
+            self.speculation_task.cancel()
+            self.speculation_turn = self.speculation_task = None
+
+    async def _run_chatflow(self, ten_env: TenEnv, task_type: str, input_text: str, memory, turn: Turn):
         """Run the chatflow asynchronously."""
         memory_cache = []
         try:
             ten_env.log_info(f"for input text: [{input_text}] memory: {memory}")
-            message = None
-            tools = None
-
-            # Prepare the message and tools based on the task type
-            if task_type == TASK_TYPE_CHAT_COMPLETION:
-                message = {"role": "user", "content": input_text}
-                memory_cache = memory_cache + \
-                    [message, {"role": "assistant", "content": ""}]
-                tools = self.available_tools if self.enable_tools else None
-            elif task_type == TASK_TYPE_CHAT_COMPLETION_WITH_VISION:
-                message = {"role": "user", "content": input_text}
-                memory_cache = memory_cache + \
-                    [message, {"role": "assistant", "content": ""}]
-                tools = self.available_tools if self.enable_tools else None
-                if self.image_data is not None:
-                    url = rgb2base64jpeg(
-                        self.image_data, self.image_width, self.image_height)
-                    message = {
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": input_text},
-                            {"type": "image_url", "image_url": {"url": url}},
-                        ],
-                    }
-                    ten_env.log_info(f"msg with vision data: {message}")
-
-            self.sentence_fragment = ""
-
-            # Create an asyncio.Event to signal when content is finished
-            content_finished_event = asyncio.Event()
-
-            # Create an async listener to handle tool calls and content updates
-            async def handle_tool_call(tool_call):
-                ten_env.log_info(f"tool_call: {tool_call}")
-                if tool_call.function.name == "get_vision_image":
-                    # Append the vision image to the last assistant message
-                    await self.queue.put([TASK_TYPE_CHAT_COMPLETION_WITH_VISION, input_text], True)
-
-            async def handle_content_update(content: str):
-                # Append the content to the last assistant message
-                for item in reversed(memory_cache):
-                    if item.get('role') == 'assistant':
-                        item['content'] = item['content'] + content
-                        break
-                sentences, self.sentence_fragment = parse_sentences(
-                    self.sentence_fragment, content)
-                for s in sentences:
-                    self._send_data(ten_env, s, False)
-
-            async def handle_content_finished(full_content: str):
-                content_finished_event.set()
-
-            listener = AsyncEventEmitter()
-            listener.on("tool_call", handle_tool_call)
-            listener.on("content_update", handle_content_update)
-            listener.on("content_finished", handle_content_finished)
-
-            # Make an async API call to get chat completions
-            await self.openai_chatgpt.get_chat_completions_stream(memory + [message], tools, listener)
-
-            # Wait for the content to be finished
-            await content_finished_event.wait()
+            message = {"role": "user", "content": input_text}
+            memory_cache = memory_cache + \
+                [message, {"role": "assistant", "content": ""}]
+            tools = self._get_tools()
+            # tool calls and results, not kept in memory
+            exchange = []
+
+            # a speculative turn may run next to a regular one
+            sentence_fragment = ""
+
+            for round in range(MAX_TOOL_ROUNDS + 1):
+                calls: list[tuple[ToolCall, asyncio.Task]] = []
+                # Stream events are handled one by one in order, the reader stops
+                # once STREAM_BUFFER_SIZE events are waiting. A flush cancels this
+                # task, which closes the pipeline and the completion stream.
+                stream = self.openai_chatgpt.get_chat_completions_stream(
+                    memory + [message] + exchange, tools if round < MAX_TOOL_ROUNDS else None)
+                events = buffered(stream, STREAM_BUFFER_SIZE)
+                try:
+                    async for event in events:
+                        if event.type == EVENT_TOOL_CALL:
+                            calls.append((event.value, self._handle_tool_call(ten_env, event.value, turn)))
+                        elif event.type == EVENT_CONTENT_UPDATE:
+                            sentence_fragment = self._handle_content_update(
+                                ten_env, event.value, sentence_fragment, memory_cache, turn)
+                except BaseException:
+                    for _, task in calls:
+                        task.cancel()
+                    raise
+                finally:
+                    await events.aclose()
+                if not calls:
+                    break
+
+                # the calls have been running since their arguments were complete
+                results = await asyncio.gather(*(task for _, task in calls))
+                message, exchange = self._add_tool_results(ten_env, message, exchange, calls, results)
         except asyncio.CancelledError:
             ten_env.log_info(f"Task cancelled: {input_text}")
         except Exception as e:
             logger.error(
                 f"Error in chat_completion: {traceback.format_exc()} for input text: {input_text}")
         finally:
-            self._send_data(ten_env, "", True)
+            turn.output(self._send_data, ten_env, "", True)
             # always append the memory
             for m in memory_cache:
-                self._append_memory(m)
-
-    def _append_memory(self, message: str):
-        if len(self.memory) > self.max_memory_length:
-            self.memory.pop(0)
-        self.memory.append(message)
+                turn.output(self._append_memory, m)
+
+    def _get_tools(self) -> list | None:
+        tools = self.available_tools if self.enable_tools else []
+        tools = tools + self.registry.get_tools()
+        return tools or None
+
+    def _handle_tool_call(self, ten_env: TenEnv, tool_call: ToolCall, turn: Turn) -> asyncio.Task:
+        ten_env.log_info(f"tool_call: {tool_call}")
+        if tool_call.name == TOOL_GET_VISION_IMAGE:
+            return asyncio.create_task(self.vision.get_image_url())
+        return asyncio.create_task(self._call_registered_tool(tool_call, turn))
+
+    async def _call_registered_tool(self, tool_call: ToolCall, turn: Turn) -> str | None:
+        # registered tools are remote cmds which may have side effects, so a
+        # speculative turn holds them like its other outputs until committed
+        committed = self.loop.create_future()
+
+        def set_committed():
+            if not committed.done():
+                committed.set_result(None)
+
+        turn.output(self.loop.call_soon_threadsafe, set_committed)
+        await committed
+        return await self.registry.on_func_call(tool_call.name, tool_call.arguments)
+
+    def _add_tool_results(self, ten_env: TenEnv, message, exchange, calls: list[tuple[ToolCall, asyncio.Task]], results: list):
+        """The user message and the tool exchange for the next completion."""
+        tool_calls = []
+        outputs = []
+        for (call, _), result in zip(calls, results):
+            tool_calls.append({
+                "id": call.id,
+                "type": "function",
+                "function": {"name": call.name, "arguments": call.arguments},
+            })
+            if call.name == TOOL_GET_VISION_IMAGE:
+                # images can not be tool outputs, attach it to the question;
+                # the call is answered either way so that it is not repeated
+                output = "no camera image available"
+                if result:
+                    text = message["content"] if isinstance(message["content"], str) else message["content"][0]["text"]
+                    message = {
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": text},
+                            {"type": "image_url", "image_url": {"url": result}},
+                        ],
+                    }
+                    output = "the camera image is attached to the question"
+                    ten_env.log_info("msg with vision data")
+            else:
+                output = result if result is not None else "{\"success\":false}"
+            outputs.append({
+                "role": "tool",
+                "tool_call_id": call.id,
+                "content": output,
+            })
+        if tool_calls:
+            exchange = exchange + [{"role": "assistant", "content": None, "tool_calls": tool_calls}] + outputs
+        return message, exchange
+
+    def _on_tool_register(self, ten_env: TenEnv, cmd: Cmd) -> tuple[StatusCode, str]:
+        try:
+            name = cmd.get_property_string(TOOL_REGISTER_PROPERTY_NAME)
+            description = cmd.get_property_string(
+                TOOL_REGISTER_PROPERTY_DESCRIPTON)
+            parameters = json.loads(cmd.get_property_string(TOOL_REGISTER_PROPERTY_PARAMETERS))
+            self.registry.register(
+                name=name, description=description,
+                callback=partial(self._remote_tool_call, ten_env),
+                parameters=parameters)
+            try:
+                timeout_ms = cmd.get_property_int(TOOL_REGISTER_PROPERTY_TIMEOUT_MS)
+                if timeout_ms > 0:
+                    self.registry.timeouts[name] = timeout_ms / 1000
+            except Exception:
+                pass
+            return StatusCode.OK, "success"
+        except Exception as err:
+            logger.error(f"Failed to register tool: {err}")
+            return StatusCode.ERROR, "invalid tool"
+
+    async def _remote_tool_call(self, ten_env: TenEnv, name: str, args: str) -> str | None:
+        c = Cmd.create(f"{CMD_OUT_TOOL_CALL}_{name}")
+        c.set_property_string(CMD_PROPERTY_NAME, name)
+        c.set_property_string(CMD_PROPERTY_ARGS, args)
+        fut = self.loop.create_future()
+
+        def set_result(result: CmdResult):
+            if not fut.done():
+                fut.set_result(result)
+
+        ten_env.send_cmd(c, lambda ten, result: self.loop.call_soon_threadsafe(
+            set_result, result))
+        result = await fut
+        ten_env.log_info(f"tool call {name} {args} finished")
+        if result.get_status_code() != StatusCode.OK:
+            return None
+        return result.get_property_string("response")
+
+    def _handle_content_update(self, ten_env: TenEnv, content: str, sentence_fragment: str, memory_cache, turn: Turn) -> str:
+        # Append the content to the last assistant message
+        for item in reversed(memory_cache):
+            if item.get('role') == 'assistant':
+                item['content'] = item['content'] + content
+                break
+        sentences, sentence_fragment = parse_sentences(
+            sentence_fragment, content)
+        for s in sentences:
+            turn.output(self._send_data, ten_env, s, False)
+        return sentence_fragment
+
+    def _append_memory(self, message: dict):
+        self.memory.put(message)
 
     def _send_data(self, ten_env: TenEnv, sentence: str, end_of_segment: bool):
         try:
@@ -7,12 +7,10 @@
 #
 import asyncio
 from collections import deque
+from typing import Any, AsyncGenerator, NamedTuple
 from ten.data import Data
 from .log import logger
-from PIL import Image
 from datetime import datetime
-from io import BytesIO
-from base64 import b64encode
 
 
 def get_property_bool(data: Data, property_name: str) -> bool:
@@ -78,80 +76,51 @@ def parse_sentences(sentence_fragment, content):
     return sentences, remain
 
 
+class ChatEvent(NamedTuple):
+    type: str  # EVENT_CONTENT_UPDATE or EVENT_TOOL_CALL
+    value: Any
 
-def rgb2base64jpeg(rgb_data, width, height):
-    # Convert the RGB image to a PIL Image
-    pil_image = Image.frombytes("RGBA", (width, height), bytes(rgb_data))
-    pil_image = pil_image.convert("RGB")
 
-    # Resize the image while maintaining its aspect ratio
-    pil_image = resize_image_keep_aspect(pil_image, 320)
+EVENT_CONTENT_UPDATE = "content_update"
+EVENT_TOOL_CALL = "tool_call"
 
-    # Save the image to a BytesIO object in JPEG format
-    buffered = BytesIO()
-    pil_image.save(buffered, format="JPEG")
-    # pil_image.save("test.jpg", format="JPEG")
 
-    # Get the byte data of the JPEG image
-    jpeg_image_data = buffered.getvalue()
+class _End(NamedTuple):
+    error: Exception | None
 
-    # Convert the JPEG byte data to a Base64 encoded string
-    base64_encoded_image = b64encode(jpeg_image_data).decode("utf-8")
 
-    # Create the data URL
-    mime_type = "image/jpeg"
-    base64_url = f"data:{mime_type};base64,{base64_encoded_image}"
-    return base64_url
+async def buffered(source: AsyncGenerator, maxsize: int) -> AsyncGenerator:
+    """Read `source` ahead of the consumer, keeping at most `maxsize` items.
 
+    Items are yielded in order. The source is not read while the buffer is
+    full, so a slow consumer slows the stream down instead of growing memory.
+    Errors of the source are raised to the consumer. Closing or cancelling the
+    consumer cancels the reader and closes the source."""
+    queue = asyncio.Queue(maxsize)
 
-def resize_image_keep_aspect(image, max_size=512):
-    """
-    Resize an image while maintaining its aspect ratio, ensuring the larger dimension is max_size.
-    If both dimensions are smaller than max_size, the image is not resized.
+    async def read():
+        error = None
+        try:
+            async for item in source:
+                await queue.put(item)
+        except Exception as e:
+            error = e
+        finally:
+            await source.aclose()
+        await queue.put(_End(error))
 
-    :param image: A PIL Image object
-    :param max_size: The maximum size for the larger dimension (width or height)
-    :return: A PIL Image object (resized or original)
-    """
-    # Get current width and height
-    width, height = image.size
-
-    # If both dimensions are already smaller than max_size, return the original image
-    if width <= max_size and height <= max_size:
-        return image
-
-    # Calculate the aspect ratio
-    aspect_ratio = width / height
-
-    # Determine the new dimensions
-    if width > height:
-        new_width = max_size
-        new_height = int(max_size / aspect_ratio)
-    else:
-        new_height = max_size
-        new_width = int(max_size * aspect_ratio)
-
-    # Resize the image with the new dimensions
-    resized_image = image.resize((new_width, new_height))
-
-    return resized_image
-
-
-class AsyncEventEmitter:
-    def __init__(self):
-        self.listeners = {}
-
-    def on(self, event_name, listener):
-        """Register an event listener."""
-        if event_name not in self.listeners:
-            self.listeners[event_name] = []
-        self.listeners[event_name].append(listener)
-
-    def emit(self, event_name, *args, **kwargs):
-        """Fire the event without waiting for listeners to finish."""
-        if event_name in self.listeners:
-            for listener in self.listeners[event_name]:
-                asyncio.create_task(listener(*args, **kwargs))
+    reader = asyncio.create_task(read())
+    try:
+        while True:
+            item = await queue.get()
+            if isinstance(item, _End):
+                if item.error:
+                    raise item.error
+                return
+            yield item
+    finally:
+        reader.cancel()
+        await asyncio.wait([reader])
 
 
 class AsyncQueue:
@@ -0,0 +1,108 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import asyncio
+import time
+from typing import Dict, Set, Tuple
+
+import httpx
+
+from .log import logger
+
+# idle connections are closed by the pool after KEEPALIVE_EXPIRY seconds and
+# by most servers after about a minute, a ping every PING_INTERVAL seconds of
+# idleness keeps them open
+KEEPALIVE_EXPIRY = 90.0
+PING_INTERVAL = 30.0
+
+try:
+    import h2  # noqa: F401
+    HTTP2 = True
+except ImportError:
+    HTTP2 = False
+
+
+class SharedClient:
+    """A pooled httpx.AsyncClient shared by all chat clients of an event loop
+    with the same proxy, kept warm while idle."""
+
+    def __init__(self, proxy_url: str = "", ping_interval: float = PING_INTERVAL):
+        self.client = httpx.AsyncClient(
+            http2=HTTP2,
+            proxy=proxy_url or None,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=KEEPALIVE_EXPIRY),
+            timeout=httpx.Timeout(60.0, connect=5.0),
+            follow_redirects=True,
+            event_hooks={"request": [self._on_request]},
+        )
+        self.ping_interval = ping_interval
+        self.users = 0
+        # base urls to connect ahead of the first request and to ping
+        self.urls: Set[str] = set()
+        self.last_used = time.monotonic()
+        self.pings = 0
+        self.pinger: asyncio.Task = None
+
+    async def _on_request(self, request: httpx.Request) -> None:
+        self.last_used = time.monotonic()
+
+    async def warm_up(self, url: str) -> None:
+        """Opens a connection to url, so that the first request does not pay
+        for DNS, TCP and TLS, and keeps it open from then on."""
+        self.urls.add(url)
+        await self._ping(url)
+        if self.pinger is None and self.ping_interval > 0:
+            self.pinger = asyncio.create_task(self._ping_idle())
+
+    async def _ping(self, url: str) -> None:
+        try:
+            # any response will do, even an error one
+            await self.client.head(url)
+        except httpx.HTTPError as e:
+            logger.warning(f"ping {url} failed, err: {e}")
+
+    async def _ping_idle(self) -> None:
+        while True:
+            idle = time.monotonic() - self.last_used
+            if idle < self.ping_interval:
+                await asyncio.sleep(self.ping_interval - idle)
+                continue
+            for url in list(self.urls):
+                await self._ping(url)
+            self.pings += 1
+
+    async def aclose(self) -> None:
+        if self.pinger:
+            self.pinger.cancel()
+            await asyncio.gather(self.pinger, return_exceptions=True)
+            self.pinger = None
+        await self.client.aclose()
+
+
+# connections belong to the event loop they were opened on
+_clients: Dict[Tuple[asyncio.AbstractEventLoop, str], SharedClient] = {}
+
+
+def acquire(proxy_url: str = "") -> SharedClient:
+    """The shared client of the running event loop for proxy_url, created on
+    first use. Each acquire is paired with a release."""
+    key = (asyncio.get_running_loop(), proxy_url or "")
+    shared = _clients.get(key)
+    if shared is None:
+        logger.info(f"new shared http client, http2: {HTTP2}, proxy: {proxy_url}")
+        shared = _clients[key] = SharedClient(proxy_url)
+    shared.users += 1
+    return shared
+
+
+async def release(shared: SharedClient) -> None:
+    """Closes the shared client once its last user is done with it."""
+    shared.users -= 1
+    if shared.users > 0:
+        return
+    for key, value in list(_clients.items()):
+        if value is shared:
+            del _clients[key]
+    await shared.aclose()
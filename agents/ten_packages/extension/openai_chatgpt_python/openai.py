@@ -6,9 +6,11 @@
 #
 #
 import random
-import requests
 from openai import AsyncOpenAI
-from typing import List, Dict, Any, Optional
+from typing import AsyncGenerator, List, Dict, Any, Optional
+from . import http_client
+from .helper import EVENT_CONTENT_UPDATE, EVENT_TOOL_CALL, ChatEvent
+from .tools import ToolCallBuilder
 from .log import logger
 
 
@@ -59,21 +61,25 @@ class OpenAIChatGPT:
     def __init__(self, config: OpenAIChatGPTConfig):
         self.config = config
         logger.info(f"OpenAIChatGPT initialized with config: {config.api_key}")
+        if config.proxy_url:
+            logger.info(f"Setting proxy: {config.proxy_url}")
+        # pooled connections, shared with the other clients of the event loop
+        self.http = http_client.acquire(config.proxy_url)
         self.client = AsyncOpenAI(
             api_key=config.api_key,
-            base_url=config.base_url
+            base_url=config.base_url,
+            http_client=self.http.client,
         )
-        self.session = requests.Session()
-        if config.proxy_url:
-            proxies = {
-                "http": config.proxy_url,
-                "https": config.proxy_url,
-            }
-            logger.info(f"Setting proxies: {proxies}")
-            self.session.proxies.update(proxies)
-        self.client.session = self.session
 
-    async def get_chat_completions_stream(self, messages, tools = None, listener = None):
+    async def warm_up(self):
+        await self.http.warm_up(self.config.base_url)
+
+    async def close(self):
+        await http_client.release(self.http)
+
+    async def get_chat_completions_stream(self, messages, tools = None) -> AsyncGenerator[ChatEvent, None]:
+        """Content deltas and complete tool calls, each call as soon as its
+        arguments are, so that it can run while the stream goes on."""
         req = {
             "model": self.config.model,
             "messages": [
@@ -97,30 +103,36 @@ class OpenAIChatGPT:
             response = await self.client.chat.completions.create(**req)
         except Exception as e:
             raise Exception(f"CreateChatCompletionStream failed, err: {e}")
-        
-        full_content = ""
 
-        async for chat_completion in response:
-            choice = chat_completion.choices[0]
-            delta = choice.delta
-
-            content = delta.content if delta and delta.content else ""
-
-            # Emit content update event (fire-and-forget)
-            if listener and content:
-                listener.emit('content_update', content)
-
-            full_content += content
+        # fragments of parallel tool calls by index
+        builders: Dict[int, ToolCallBuilder] = {}
+        try:
+            async for chat_completion in response:
+                if not chat_completion.choices:
+                    continue
+                choice = chat_completion.choices[0]
+                delta = choice.delta
 
-            # Check for tool calls
-            if delta.tool_calls:
-                for tool_call in delta.tool_calls:
-                    logger.info(f"tool_call: {tool_call}")
+                content = delta.content if delta and delta.content else ""
+                if content:
+                    yield ChatEvent(EVENT_CONTENT_UPDATE, content)
 
-                    # Emit tool call event (fire-and-forget)
-                    if listener:
-                        listener.emit('tool_call', tool_call)
+                # Check for tool calls
+                if delta and delta.tool_calls:
+                    for fragment in delta.tool_calls:
+                        builder = builders.setdefault(fragment.index, ToolCallBuilder())
+                        if fragment.id:
+                            builder.id = fragment.id
+                        if fragment.function and fragment.function.name:
+                            builder.name = fragment.function.name
+                        if fragment.function and fragment.function.arguments:
+                            if builder.feed(fragment.function.arguments) and not builder.emitted:
+                                yield ChatEvent(EVENT_TOOL_CALL, builder.build())
 
-        # Emit content finished event after the loop completes
-        if listener:
-            listener.emit('content_finished', full_content)
+            # calls without arguments or with malformed ones
+            for builder in builders.values():
+                if not builder.emitted:
+                    yield ChatEvent(EVENT_TOOL_CALL, builder.build())
+        finally:
+            # release the connection when the consumer stops early
+            await response.close()
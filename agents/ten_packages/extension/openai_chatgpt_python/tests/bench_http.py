@@ -0,0 +1,137 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+"""Time to first streamed byte of a chat completion request.
+
+    python tests/bench_http.py [turns] [idle seconds between turns]
+
+Runs a local HTTPS stub serving an SSE completion, with a self signed
+certificate made by the openssl command, and compares:
+
+- a new aiohttp session per turn, as the glue extension did
+- a new httpx client per turn, as a client without a pool would
+- the shared, warmed up client of http_client
+
+On loopback only the TCP and TLS handshakes are saved, over a real network
+every round trip they take is saved as well.
+"""
+import asyncio
+import functools
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import aiohttp
+import httpx
+from aiohttp import web
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from openai_chatgpt_python import http_client  # noqa: E402
+
+CHUNK = b'data: {"choices": [{"delta": {"content": "Hi."}}]}\n\n'
+
+
+def _certificate(directory: str):
+    cert, key = f"{directory}/cert.pem", f"{directory}/key.pem"
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=127.0.0.1", "-addext", "subjectAltName=IP:127.0.0.1",
+         "-keyout", key, "-out", cert],
+        check=True, capture_output=True)
+    server = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    server.load_cert_chain(cert, key)
+    client = ssl.create_default_context(cafile=cert)
+    return server, client
+
+
+async def _completions(request: web.Request) -> web.StreamResponse:
+    await request.read()
+    response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+    await response.prepare(request)
+    await response.write(CHUNK)
+    await response.write(b"data: [DONE]\n\n")
+    return response
+
+
+async def _first_byte(response: httpx.Response, started: float) -> float:
+    elapsed = None
+    async for _ in response.aiter_raw():
+        if elapsed is None:
+            elapsed = time.perf_counter() - started
+    return elapsed
+
+
+async def _aiohttp_per_turn(url, client_ssl):
+    started = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        async with session.post(url, json={}, ssl=client_ssl) as response:
+            await response.content.readline()
+            elapsed = time.perf_counter() - started
+            await response.read()
+    return elapsed
+
+
+async def _httpx_per_turn(url, client_ssl):
+    started = time.perf_counter()
+    async with httpx.AsyncClient(verify=client_ssl) as client:
+        async with client.stream("POST", url, json={}) as response:
+            return await _first_byte(response, started)
+
+
+async def _shared(shared, url):
+    started = time.perf_counter()
+    async with shared.client.stream("POST", url, json={}) as response:
+        return await _first_byte(response, started)
+
+
+def _report(name, samples):
+    samples = sorted(s * 1000 for s in samples)
+    print(f"{name:24} median {statistics.median(samples):6.2f} ms"
+          f"  p90 {samples[int(len(samples) * 0.9)]:6.2f} ms  min {samples[0]:6.2f} ms")
+
+
+async def main(turns: int, idle: float):
+    with tempfile.TemporaryDirectory() as directory:
+        server_ssl, client_ssl = _certificate(directory)
+
+    app = web.Application()
+    app.router.add_route("*", "/v1/chat/completions", _completions)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0, ssl_context=server_ssl)
+    await site.start()
+    base_url = f"https://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/v1"
+    url = base_url + "/chat/completions"
+
+    # trust the stub's certificate
+    http_client.httpx.AsyncClient = functools.partial(httpx.AsyncClient, verify=client_ssl)
+    shared = http_client.acquire()
+    await shared.warm_up(base_url)
+
+    results = {"aiohttp session per turn": [], "httpx client per turn": [], "shared warm client": []}
+    for _ in range(turns):
+        results["aiohttp session per turn"].append(await _aiohttp_per_turn(url, client_ssl))
+        results["httpx client per turn"].append(await _httpx_per_turn(url, client_ssl))
+        results["shared warm client"].append(await _shared(shared, url))
+        await asyncio.sleep(idle)
+
+    print(f"{turns} turns, http2: {http_client.HTTP2} (the stub speaks HTTP/1.1)")
+    for name, samples in results.items():
+        _report(name, samples)
+
+    await http_client.release(shared)
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    idle = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    asyncio.run(main(turns, idle))
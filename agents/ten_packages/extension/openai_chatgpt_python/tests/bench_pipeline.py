@@ -0,0 +1,131 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+"""Streaming completion to sentence benchmark.
+
+    python tests/bench_pipeline.py
+
+Compares the former event emitter, which started one task per content delta,
+with the buffered async generator pipeline, both splitting the deltas into
+sentences with parse_sentences:
+
+- per token overhead, with a stream that yields deltas back to back
+- time to first sentence, with deltas arriving every 2 ms while other tasks
+  keep the event loop busy, as other extensions do in a running graph
+"""
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from openai_chatgpt_python.helper import buffered, parse_sentences  # noqa: E402
+
+TOKENS = 100_000
+# a sentence every 12 deltas
+WORDS = ["Well", " I", " think", " the", " weather", " today", " is", " nice", " and", " warm", " too", "."]
+
+
+class Emitter:
+    """The former AsyncEventEmitter."""
+
+    def __init__(self):
+        self.listeners = {}
+
+    def on(self, event_name, listener):
+        self.listeners.setdefault(event_name, []).append(listener)
+
+    def emit(self, event_name, *args):
+        for listener in self.listeners.get(event_name, []):
+            asyncio.create_task(listener(*args))
+
+
+async def deltas(count: int, interval: float = 0):
+    for i in range(count):
+        if interval:
+            await asyncio.sleep(interval)
+        yield WORDS[i % len(WORDS)]
+
+
+class Sink:
+    def __init__(self):
+        self.fragment = ""
+        self.sentences = []
+        self.first = None
+
+    def update(self, content: str):
+        sentences, self.fragment = parse_sentences(self.fragment, content)
+        if sentences and self.first is None:
+            self.first = time.perf_counter()
+        self.sentences += sentences
+
+
+async def run_emitter(count: int, interval: float = 0) -> Sink:
+    sink = Sink()
+    finished = asyncio.Event()
+
+    async def update(content):
+        sink.update(content)
+
+    async def done(_):
+        finished.set()
+
+    emitter = Emitter()
+    emitter.on("content_update", update)
+    emitter.on("content_finished", done)
+    async for delta in deltas(count, interval):
+        emitter.emit("content_update", delta)
+    emitter.emit("content_finished", "")
+    await finished.wait()
+    return sink
+
+
+async def run_pipeline(count: int, interval: float = 0) -> Sink:
+    sink = Sink()
+    events = buffered(deltas(count, interval), 32)
+    try:
+        async for delta in events:
+            sink.update(delta)
+    finally:
+        await events.aclose()
+    return sink
+
+
+async def busy(stop: asyncio.Event):
+    # short callbacks of other work on the loop
+    while not stop.is_set():
+        time.sleep(0.0002)
+        await asyncio.sleep(0)
+
+
+async def first_sentence(run) -> float:
+    stop = asyncio.Event()
+    others = [asyncio.create_task(busy(stop)) for _ in range(5)]
+    start = time.perf_counter()
+    sink = await run(len(WORDS) * 3, 0.002)
+    stop.set()
+    await asyncio.gather(*others)
+    return (sink.first - start) * 1000
+
+
+def main():
+    expected = TOKENS // len(WORDS)
+    for name, run in (("emitter", run_emitter), ("pipeline", run_pipeline)):
+        start = time.perf_counter()
+        sink = asyncio.run(run(TOKENS))
+        per_token = (time.perf_counter() - start) / TOKENS * 1e6
+        ordered = sink.sentences == [sink.sentences[0]] * expected
+        ttfs = sorted(asyncio.run(first_sentence(run)) for _ in range(5))[2]
+        print(
+            f"{name:9s} per token {per_token:5.2f} us  "
+            f"sentences {len(sink.sentences)}/{expected} ordered {ordered}  "
+            f"first sentence {ttfs:5.1f} ms (ideal {len(WORDS) * 2} ms)"
+        )
+
+
+if __name__ == "__main__":
+    main()
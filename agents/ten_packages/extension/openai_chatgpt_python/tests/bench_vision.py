@@ -0,0 +1,115 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+"""Camera frame handling benchmark, needs Pillow.
+
+    python tests/bench_vision.py
+
+Feeds 60 s of 30 fps 1280x720 RGBA frames with a vision tool call every 5 s
+to the former handling, which copied every frame and converted, resized and
+encoded it with PIL on the event loop, and to VisionCapture. Reports the CPU
+time of both, all threads included, and the time spent on the event loop.
+"""
+import asyncio
+import sys
+import time
+from base64 import b64encode
+from io import BytesIO
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from openai_chatgpt_python.vision import VisionCapture  # noqa: E402
+
+WIDTH, HEIGHT, FPS = 1280, 720, 30
+SECONDS = 60
+REQUEST_EVERY = 5 * FPS
+
+
+class Frame:
+    def __init__(self, buf: bytes):
+        self.buf = buf
+
+    def get_width(self) -> int:
+        return WIDTH
+
+    def get_height(self) -> int:
+        return HEIGHT
+
+    def get_buf(self) -> bytearray:
+        # the binding copies the frame into a new bytearray
+        return bytearray(self.buf)
+
+
+def frames() -> list[Frame]:
+    # a still scene with sensor noise, the camera of a video call
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:HEIGHT, 0:WIDTH]
+    scene = np.stack([x % 256, y % 256, (x + y) % 256, np.full_like(x, 255)], axis=-1)
+    out = []
+    for _ in range(FPS):
+        noisy = scene + rng.integers(-2, 3, scene.shape) * [1, 1, 1, 0]
+        out.append(Frame(np.clip(noisy, 0, 255).astype(np.uint8).tobytes()))
+    return out
+
+
+def rgb2base64jpeg(rgb_data, width, height):
+    """The former helper."""
+    pil_image = Image.frombytes("RGBA", (width, height), bytes(rgb_data))
+    pil_image = pil_image.convert("RGB")
+    pil_image = pil_image.resize((320, int(320 / (width / height))))
+    buffered = BytesIO()
+    pil_image.save(buffered, format="JPEG")
+    return f"data:image/jpeg;base64,{b64encode(buffered.getvalue()).decode('utf-8')}"
+
+
+async def former(source: list[Frame]) -> float:
+    loop_time = 0.0
+    image_data = None
+    for i in range(SECONDS * FPS):
+        start = time.perf_counter()
+        image_data = source[i % FPS].get_buf()
+        if i % REQUEST_EVERY == REQUEST_EVERY - 1:
+            rgb2base64jpeg(image_data, WIDTH, HEIGHT)
+        loop_time += time.perf_counter() - start
+    return loop_time
+
+
+async def capture(source: list[Frame]) -> float:
+    vision = VisionCapture()
+    loop_time = 0.0
+    request = None
+    for i in range(SECONDS * FPS):
+        start = time.perf_counter()
+        if i % REQUEST_EVERY == REQUEST_EVERY - 1:
+            request = asyncio.ensure_future(vision.get_image_url())
+            await asyncio.sleep(0)
+        vision.on_video_frame(source[i % FPS])
+        loop_time += time.perf_counter() - start
+        if request:
+            await request
+            request = None
+    print(f"  {vision.stats()}")
+    vision.close()
+    return loop_time
+
+
+def main():
+    source = frames()
+    for name, fn in (("former", former), ("VisionCapture", capture)):
+        print(name)
+        cpu = time.process_time()
+        loop_time = asyncio.run(fn(source))
+        cpu = time.process_time() - cpu
+        print(f"  cpu {cpu * 1000:.0f} ms, on the event loop {loop_time * 1000:.0f} ms "
+              f"for {SECONDS} s of video ({cpu / SECONDS * 100:.1f}% of a core)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+from openai_chatgpt_python.chat_memory import MESSAGE_OVERHEAD, ChatMemory, estimate_tokens, message_tokens
+
+
+def _user(text):
+    return {"role": "user", "content": text}
+
+
+def _assistant(text):
+    return {"role": "assistant", "content": text}
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 0
+    # words of up to four characters and punctuation are a token each
+    assert estimate_tokens("How is the day?") == 5
+    assert estimate_tokens("weather") == 2
+    assert estimate_tokens("今天天气") == 4
+
+
+def test_message_tokens_of_any_layout():
+    assert message_tokens(_user("how are you")) == 3
+    assert message_tokens({"role": "user", "content": [{"text": "how are"}, {"text": "you"}]}) == 3
+    assert message_tokens({"role": "model", "parts": "how are you"}) == 3
+
+
+def test_trims_whole_turns_by_tokens():
+    turn = 2 * (4 + MESSAGE_OVERHEAD)
+    memory = ChatMemory(100, max_tokens=2 * turn)
+    for i in range(5):
+        memory.put(_user(f"q{i} a b c"))
+        memory.put(_assistant(f"a{i} a b c"))
+        assert memory.tokens == sum(message_tokens(m) + MESSAGE_OVERHEAD for m in memory.get())
+    assert [m["content"][:2] for m in memory.get()] == ["q3", "a3", "q4", "a4"]
+    assert memory.tokens == 2 * turn
+
+
+def test_trims_whole_turns_by_count():
+    memory = ChatMemory(3)
+    memory.put(_user("one"))
+    memory.put(_assistant("1"))
+    memory.put(_user("two"))
+    memory.put(_assistant("2"))
+    # the first reply is not left without its question
+    assert memory.get() == [_user("two"), _assistant("2")]
+
+
+def test_keeps_latest_turn_over_budget():
+    memory = ChatMemory(10, max_tokens=10)
+    memory.put(_user("short"))
+    memory.put(_user("a much longer question than the budget allows for"))
+    memory.put(_assistant("and an equally long answer to it, still kept"))
+    assert [m["role"] for m in memory.get()] == ["user", "assistant"]
+    assert memory.turns == 1
+
+
+def test_never_starts_with_reply():
+    memory = ChatMemory(10)
+    memory.put(_assistant("hello there"))
+    assert memory.count() == 0
+    memory.put(_user("hi"))
+    assert memory.count() == 1
+
+
+def test_pop_and_last():
+    memory = ChatMemory(10)
+    memory.put(_user("hi"))
+    memory.put(_assistant("hello"))
+    assert memory.last() == _assistant("hello")
+    assert memory.pop() == _assistant("hello")
+    assert memory.pop() == _user("hi")
+    assert memory.pop() is None
+    assert memory.tokens == 0 and memory.turns == 0
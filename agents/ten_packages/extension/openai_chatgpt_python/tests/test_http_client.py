@@ -0,0 +1,93 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import asyncio
+
+from aiohttp import web
+
+from openai_chatgpt_python import http_client
+from openai_chatgpt_python.openai import OpenAIChatGPT, OpenAIChatGPTConfig
+
+
+class Server:
+    """Records the client port of every request, one per connection."""
+
+    def __init__(self):
+        self.requests = []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests.append((request.method, request.transport.get_extra_info("peername")[1]))
+        return web.json_response({})
+
+    async def __aenter__(self) -> str:
+        app = web.Application()
+        app.router.add_route("*", "/{tail:.*}", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        return f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/v1"
+
+    async def __aexit__(self, *args) -> None:
+        await self.runner.cleanup()
+
+
+def test_shared_per_loop_and_proxy():
+    async def run():
+        a = http_client.acquire()
+        b = http_client.acquire()
+        c = http_client.acquire("http://127.0.0.1:3128")
+        assert a is b and a is not c
+        await http_client.release(a)
+        assert not a.client.is_closed
+        await http_client.release(b)
+        await http_client.release(c)
+        assert a.client.is_closed and c.client.is_closed
+        assert http_client.acquire() is not a
+        await http_client.release(http_client.acquire())
+
+    asyncio.run(run())
+
+
+def test_warm_up_connection_is_reused():
+    async def run():
+        server = Server()
+        async with server as url:
+            config = OpenAIChatGPTConfig.default_config()
+            config.base_url = url
+            a = OpenAIChatGPT(config)
+            b = OpenAIChatGPT(config)
+            await a.warm_up()
+            await b.http.client.get(url + "/models")
+            await a.http.client.get(url + "/models")
+            await a.close()
+            await b.close()
+
+        assert [method for method, _ in server.requests] == ["HEAD", "GET", "GET"]
+        # a single connection for both clients, opened by the warm up
+        assert len({port for _, port in server.requests}) == 1
+
+    asyncio.run(run())
+
+
+def test_pings_only_while_idle():
+    async def run():
+        server = Server()
+        async with server as url:
+            shared = http_client.SharedClient(ping_interval=0.05)
+            await shared.warm_up(url)
+            for _ in range(6):
+                await asyncio.sleep(0.02)
+                await shared.client.get(url)
+            # busy, no pings
+            assert shared.pings == 0
+            await asyncio.sleep(0.12)
+            assert shared.pings >= 1
+            await shared.aclose()
+
+        assert len({port for _, port in server.requests}) == 1
+
+    asyncio.run(run())
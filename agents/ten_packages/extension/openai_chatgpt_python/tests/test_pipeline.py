@@ -0,0 +1,92 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import asyncio
+
+import pytest
+
+from openai_chatgpt_python.helper import buffered
+
+
+class Source:
+    def __init__(self, count: int, fail_at: int = -1):
+        self.count = count
+        self.fail_at = fail_at
+        self.produced = 0
+        self.closed = False
+
+    async def stream(self):
+        try:
+            for i in range(self.count):
+                if i == self.fail_at:
+                    raise RuntimeError("stream broken")
+                self.produced += 1
+                yield i
+                await asyncio.sleep(0)
+        finally:
+            self.closed = True
+
+
+def test_in_order():
+    async def run():
+        source = Source(1000)
+        assert [i async for i in buffered(source.stream(), 8)] == list(range(1000))
+        assert source.closed
+
+    asyncio.run(run())
+
+
+def test_back_pressure():
+    async def run():
+        source = Source(1000)
+        events = buffered(source.stream(), 8)
+        assert await events.__anext__() == 0
+        await asyncio.sleep(0.05)
+        # the buffer plus the item the reader is blocked on
+        assert source.produced <= 1 + 8 + 1
+        await events.aclose()
+        assert source.closed
+
+    asyncio.run(run())
+
+
+def test_error_after_items():
+    async def run():
+        received = []
+        with pytest.raises(RuntimeError, match="stream broken"):
+            async for i in buffered(Source(10, fail_at=5).stream(), 2):
+                received.append(i)
+        assert received == [0, 1, 2, 3, 4]
+
+    asyncio.run(run())
+
+
+def test_cancel_closes_source():
+    async def run():
+        source = Source(10**9)
+        received = []
+
+        async def consume():
+            events = buffered(source.stream(), 4)
+            try:
+                async for i in events:
+                    received.append(i)
+                    await asyncio.sleep(0.001)
+            finally:
+                await events.aclose()
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert source.closed
+        assert received == list(range(len(received)))
+        produced = source.produced
+        await asyncio.sleep(0.01)
+        assert source.produced == produced
+
+    asyncio.run(run())
@@ -0,0 +1,139 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+from openai_chatgpt_python.speculation import Speculator, Turn, normalize
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _speculator() -> tuple[Speculator, Clock]:
+    clock = Clock()
+    return Speculator(stable_ms=300, match_threshold=0.9, clock=clock), clock
+
+
+def test_normalize():
+    assert normalize("  What's the Weather,  today? ") == "what s the weather today"
+
+
+def test_turn_holds_output_until_commit():
+    out = []
+    turn = Turn("hi", speculative=True)
+    turn.output(out.append, 1)
+    turn.output(out.append, 2)
+    assert out == []
+    turn.commit()
+    turn.output(out.append, 3)
+    assert out == [1, 2, 3]
+
+    regular = Turn("hi")
+    regular.output(out.append, 4)
+    assert out == [1, 2, 3, 4]
+
+
+def test_cancelled_turn_drops_output():
+    out = []
+    turn = Turn("hi", speculative=True)
+    turn.output(out.append, 1)
+    turn.cancel()
+    turn.commit()
+    turn.output(out.append, 2)
+    assert out == []
+    assert turn.cancelled
+
+
+def test_stable_partial_starts_turn_once():
+    speculator, clock = _speculator()
+    speculator.on_partial("what is the weather")
+    clock.now = 0.2
+    assert speculator.poll() is None
+    clock.now = 0.3
+    turn = speculator.poll()
+    assert turn.text == "what is the weather" and turn.speculative
+    assert speculator.poll() is None
+    # punctuation only changes keep the speculation
+    speculator.on_partial("What is the weather?")
+    assert not turn.cancelled
+
+
+def test_changed_partial_restarts_stability():
+    speculator, clock = _speculator()
+    speculator.on_partial("what is")
+    clock.now = 0.25
+    speculator.on_partial("what is the weather")
+    clock.now = 0.5
+    assert speculator.poll() is None
+    clock.now = 0.55
+    assert speculator.poll().text == "what is the weather"
+
+
+def test_hit_commits_and_counts_saved_latency():
+    speculator, clock = _speculator()
+    speculator.on_partial("what is the weather in london")
+    clock.now = 0.3
+    turn = speculator.poll()
+    out = []
+    turn.output(out.append, "It is sunny.")
+
+    clock.now = 0.8
+    assert speculator.on_final("What is the weather in London?")
+    assert turn.committed
+    assert out == ["It is sunny."]
+    assert speculator.hits == 1 and speculator.hit_rate == 1.0
+    assert round(speculator.saved_ms) == 500
+
+
+def test_miss_cancels():
+    speculator, clock = _speculator()
+    speculator.on_partial("what is the weather")
+    clock.now = 0.3
+    turn = speculator.poll()
+    clock.now = 0.8
+    assert not speculator.on_final("what is the weather going to be like tomorrow in paris")
+    assert turn.cancelled
+    assert speculator.started == 1 and speculator.hits == 0
+    assert speculator.hit_rate == 0.0
+
+
+def test_later_partial_cancels():
+    speculator, clock = _speculator()
+    speculator.on_partial("what is the")
+    clock.now = 0.3
+    turn = speculator.poll()
+    speculator.on_partial("what is the weather in london")
+    assert turn.cancelled
+    clock.now = 0.6
+    assert speculator.poll().text == "what is the weather in london"
+    assert speculator.started == 2
+
+
+def test_final_without_speculation():
+    speculator, _ = _speculator()
+    speculator.on_partial("hello")
+    assert not speculator.on_final("hello")
+    assert speculator.started == 0
+    assert "0/0" in speculator.stats()
+
+
+def test_interrupt_spares_pending_turn():
+    speculator, clock = _speculator()
+    speculator.on_partial("what time is it")
+    clock.now = 0.3
+    turn = speculator.poll()
+    speculator.interrupt()
+    assert not turn.interrupted and not turn.cancelled
+
+    assert speculator.on_final("what time is it")
+    speculator.interrupt()
+    assert turn.interrupted and not turn.cancelled
+    out = []
+    turn.output(out.append, "end")
+    assert out == ["end"]
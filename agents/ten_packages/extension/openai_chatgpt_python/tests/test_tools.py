@@ -0,0 +1,242 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import asyncio
+import time
+from types import SimpleNamespace
+
+from openai_chatgpt_python.extension import OpenAIChatGPTExtension
+from openai_chatgpt_python.helper import EVENT_TOOL_CALL
+from openai_chatgpt_python.openai import OpenAIChatGPT, OpenAIChatGPTConfig
+from openai_chatgpt_python.speculation import Turn
+from openai_chatgpt_python.tools import ToolCallBuilder
+
+
+def _chunk(content=None, tool_calls=None):
+    delta = SimpleNamespace(content=content, tool_calls=tool_calls)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta)])
+
+
+def _fragment(index, id=None, name=None, arguments=None):
+    return SimpleNamespace(index=index, id=id, function=SimpleNamespace(name=name, arguments=arguments))
+
+
+class Stream:
+    def __init__(self, chunks, delay: float):
+        self.chunks = chunks
+        self.delay = delay
+        self.closed = False
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(self.delay)
+            yield chunk
+
+    async def close(self):
+        self.closed = True
+
+
+class Completions:
+    """Stand-in for client.chat.completions, streams the scripted responses
+    in turn and records the requests."""
+
+    def __init__(self, responses, delay: float = 0.001):
+        self.responses = list(responses)
+        self.delay = delay
+        self.requests = []
+
+    async def create(self, **req):
+        self.requests.append(req)
+        return Stream(self.responses.pop(0), self.delay)
+
+
+def _client(responses) -> OpenAIChatGPT:
+    client = OpenAIChatGPT(OpenAIChatGPTConfig.default_config())
+    client.client = SimpleNamespace(chat=SimpleNamespace(completions=Completions(responses)))
+    return client
+
+
+PARALLEL_CALLS = [
+    _chunk(tool_calls=[_fragment(0, "call_a", "get_weather", '{"loca')]),
+    _chunk(tool_calls=[_fragment(1, "call_b", "get_time", '{"zone": "U')]),
+    _chunk(tool_calls=[_fragment(0, arguments='tion": "Paris {1}"}')]),
+    _chunk(tool_calls=[_fragment(1, arguments='TC"}')]),
+] + [_chunk()] * 20
+
+
+class Env:
+    def __init__(self):
+        self.sent = []
+
+    def log_info(self, msg):
+        pass
+
+    def send_data(self, data):
+        self.sent.append(data.get_property_string("text"))
+
+
+def test_builder():
+    builder = ToolCallBuilder()
+    assert not builder.feed('{"q": "a } \\" {')
+    assert not builder.feed('", "l": [1, {"x": 2}]')
+    assert builder.feed("}")
+    builder.id, builder.name = "id", "search"
+    call = builder.build()
+    assert call.arguments == '{"q": "a } \\" {", "l": [1, {"x": 2}]}'
+    assert ToolCallBuilder().build().arguments == "{}"
+
+
+def test_stream_assembles_calls_by_index():
+    async def run():
+        client = _client([PARALLEL_CALLS])
+        events = []
+        async for event in client.get_chat_completions_stream([]):
+            events.append(event)
+        assert [e.type for e in events] == [EVENT_TOOL_CALL, EVENT_TOOL_CALL]
+        assert events[0].value == ("call_a", "get_weather", '{"location": "Paris {1}"}')
+        assert events[1].value == ("call_b", "get_time", '{"zone": "UTC"}')
+
+    asyncio.run(run())
+
+
+def test_calls_start_before_stream_ends():
+    async def run():
+        client = _client([PARALLEL_CALLS])
+        started = time.monotonic()
+        async for event in client.get_chat_completions_stream([]):
+            if event.type == EVENT_TOOL_CALL:
+                assert time.monotonic() - started < 0.015
+                break
+
+    asyncio.run(run())
+
+
+def test_parallel_tools_and_follow_up():
+    async def run():
+        ext = OpenAIChatGPTExtension("openai_chatgpt")
+        ext.loop = asyncio.get_running_loop()
+        ext.openai_chatgpt = _client([
+            PARALLEL_CALLS,
+            [_chunk("It is sunny in Paris. "), _chunk("Noon in UTC.")],
+        ])
+        calls = []
+
+        async def tool(name, args):
+            calls.append(name)
+            await asyncio.sleep(0.1)
+            return f"{name} result"
+
+        ext.registry.register("get_weather", "weather", tool, {"type": "object"})
+        ext.registry.register("get_time", "time", tool, {"type": "object"})
+
+        env = Env()
+        started = time.monotonic()
+        await ext._run_chatflow(env, "chat_completion", "weather and time?", ext.memory.get(), Turn("weather and time?"))
+        elapsed = time.monotonic() - started
+
+        assert sorted(calls) == ["get_time", "get_weather"]
+        assert elapsed < 0.18
+        assert env.sent == ["It is sunny in Paris.", " Noon in UTC.", ""]
+
+        requests = ext.openai_chatgpt.client.chat.completions.requests
+        assert [t["function"]["name"] for t in requests[0]["tools"]] == ["get_weather", "get_time"]
+        follow_up = requests[1]["messages"]
+        assert follow_up[-3]["tool_calls"][0]["function"]["arguments"] == '{"location": "Paris {1}"}'
+        assert follow_up[-2:] == [
+            {"role": "tool", "tool_call_id": "call_a", "content": "get_weather result"},
+            {"role": "tool", "tool_call_id": "call_b", "content": "get_time result"},
+        ]
+        # only the question and the answer are remembered
+        assert ext.memory.get() == [
+            {"role": "user", "content": "weather and time?"},
+            {"role": "assistant", "content": "It is sunny in Paris. Noon in UTC."},
+        ]
+
+    asyncio.run(run())
+
+
+def test_cancel_stops_tools():
+    async def run():
+        ext = OpenAIChatGPTExtension("openai_chatgpt")
+        ext.loop = asyncio.get_running_loop()
+        ext.openai_chatgpt = _client([PARALLEL_CALLS])
+        cancelled = []
+
+        async def tool(name, args):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(name)
+                raise
+
+        ext.registry.register("get_weather", "weather", tool)
+        ext.registry.register("get_time", "time", tool)
+        task = asyncio.create_task(
+            ext._run_chatflow(Env(), "chat_completion", "q", ext.memory.get(), Turn("q")))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await task
+        await asyncio.sleep(0)
+        assert sorted(cancelled) == ["get_time", "get_weather"]
+
+    asyncio.run(run())
+
+
+def test_speculative_turn_calls_tools_once_committed():
+    async def run():
+        ext = OpenAIChatGPTExtension("openai_chatgpt")
+        ext.loop = asyncio.get_running_loop()
+        ext.openai_chatgpt = _client([PARALLEL_CALLS, PARALLEL_CALLS, [_chunk("Sunny.")]])
+        calls = []
+
+        async def tool(name, args):
+            calls.append(name)
+            return f"{name} result"
+
+        ext.registry.register("get_weather", "weather", tool)
+        ext.registry.register("get_time", "time", tool)
+
+        # a cancelled speculation never calls them
+        turn = Turn("q", speculative=True)
+        task = asyncio.create_task(ext._run_chatflow(Env(), "chat_completion", "q", ext.memory.get(), turn))
+        await asyncio.sleep(0.1)
+        assert calls == []
+        turn.cancel()
+        task.cancel()
+        await task
+        assert calls == []
+
+        env = Env()
+        turn = Turn("q", speculative=True)
+        task = asyncio.create_task(ext._run_chatflow(env, "chat_completion", "q", ext.memory.get(), turn))
+        await asyncio.sleep(0.1)
+        assert calls == []
+        turn.commit()
+        await task
+        assert sorted(calls) == ["get_time", "get_weather"]
+        assert env.sent == ["Sunny.", ""]
+
+    asyncio.run(run())
+
+
+def test_vision_call_without_camera_is_answered():
+    async def run():
+        ext = OpenAIChatGPTExtension("openai_chatgpt")
+        ext.loop = asyncio.get_running_loop()
+        ext.openai_chatgpt = _client([
+            [_chunk(tool_calls=[_fragment(0, "call_v", "get_vision_image", "{}")])] + [_chunk()] * 2,
+            [_chunk("I can not see you.")],
+        ])
+        env = Env()
+        await ext._run_chatflow(env, "chat_completion", "can you see me?", ext.memory.get(), Turn("can you see me?"))
+
+        follow_up = ext.openai_chatgpt.client.chat.completions.requests[1]["messages"]
+        assert follow_up[-3] == {"role": "user", "content": "can you see me?"}
+        assert follow_up[-2]["tool_calls"][0]["function"]["name"] == "get_vision_image"
+        assert follow_up[-1] == {"role": "tool", "tool_call_id": "call_v", "content": "no camera image available"}
+        assert env.sent == ["I can not see you.", ""]
+
+    asyncio.run(run())
@@ -0,0 +1,119 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from openai_chatgpt_python.vision import VisionCapture, downscale, perceptual_hash
+
+
+class Frame:
+    """VideoFrame with RGBA pixels, counting the copies of its buffer."""
+
+    copies = 0
+
+    def __init__(self, rgba: np.ndarray):
+        self.rgba = rgba
+
+    def get_width(self) -> int:
+        return self.rgba.shape[1]
+
+    def get_height(self) -> int:
+        return self.rgba.shape[0]
+
+    def get_buf(self) -> bytearray:
+        Frame.copies += 1
+        return bytearray(self.rgba.tobytes())
+
+
+def _image(seed: int, width: int = 128, height: int = 72) -> np.ndarray:
+    # smooth gradients, a different picture per seed
+    y, x = np.mgrid[0:height, 0:width]
+    rgb = np.stack([x * (seed + 1), y * (seed + 2), (x + y) * (7 - seed)], axis=-1) % 256
+    alpha = np.full((height, width, 1), 255)
+    return np.concatenate([rgb, alpha], axis=-1).astype(np.uint8)
+
+
+def _capture(**kwargs) -> tuple[VisionCapture, list]:
+    encoded = []
+
+    def encode(rgb):
+        encoded.append(rgb)
+        return f"url{len(encoded)}"
+
+    return VisionCapture(max_size=32, timeout=0.05, executor=ThreadPoolExecutor(1), encode=encode, **kwargs), encoded
+
+
+def test_downscale():
+    rgba = np.zeros((8, 12, 4), dtype=np.uint8)
+    rgba[:4, :4, 0] = 200
+    rgba[:4, 4:8, 0] = 100
+    rgb = downscale(rgba, 3)
+    assert rgb.shape == (2, 3, 3)
+    assert rgb[0, :, 0].tolist() == [200, 100, 0]
+    assert downscale(rgba, 12).shape == (8, 12, 3)
+
+
+def test_perceptual_hash():
+    image = downscale(_image(1), 32)
+    noisy = np.clip(image.astype(int) + np.random.default_rng(0).integers(-3, 4, image.shape), 0, 255).astype(np.uint8)
+    other = downscale(_image(4), 32)
+    assert (perceptual_hash(image) ^ perceptual_hash(noisy)).bit_count() <= 4
+    assert (perceptual_hash(image) ^ perceptual_hash(other)).bit_count() > 4
+
+
+def test_frames_copied_on_demand():
+    async def run():
+        vision, encoded = _capture()
+        Frame.copies = 0
+        for _ in range(30):
+            vision.on_video_frame(Frame(_image(1)))
+        assert Frame.copies == 0
+
+        request = asyncio.create_task(vision.get_image_url())
+        await asyncio.sleep(0)
+        vision.on_video_frame(Frame(_image(1)))
+        vision.on_video_frame(Frame(_image(1)))
+        assert await request == "url1"
+        assert Frame.copies == 1
+        assert encoded[0].shape == (18, 32, 3)
+        vision.close()
+
+    asyncio.run(run())
+
+
+def test_unchanged_frames_reuse_encoding():
+    async def run():
+        vision, encoded = _capture(interval_ms=1)
+        vision.on_video_frame(Frame(_image(1)))
+        assert await vision.get_image_url() == "url1"
+        # same sequence, nothing to process
+        assert await vision.get_image_url() == "url1"
+
+        await asyncio.sleep(0.002)
+        vision.on_video_frame(Frame(_image(1)))
+        assert await vision.get_image_url() == "url1"
+        assert vision.skipped == 1
+
+        await asyncio.sleep(0.002)
+        vision.on_video_frame(Frame(_image(4)))
+        assert await vision.get_image_url() == "url2"
+        assert len(encoded) == 2
+        vision.close()
+
+    asyncio.run(run())
+
+
+def test_without_camera():
+    async def run():
+        vision, _ = _capture()
+        assert await vision.get_image_url() is None
+        assert vision.waiters == []
+        vision.close()
+
+    asyncio.run(run())
@@ -0,0 +1,98 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, NamedTuple
+
+from .log import logger
+
+
+class ToolCall(NamedTuple):
+    id: str
+    name: str
+    arguments: str
+
+
+class ToolCallBuilder:
+    """Assembles one tool call from the fragments of a completion stream.
+
+    The JSON nesting of the arguments is tracked as they arrive, so the call
+    is known to be complete once its top level object closes, without
+    waiting for the end of the stream."""
+
+    def __init__(self):
+        self.id = ""
+        self.name = ""
+        self.arguments: list[str] = []
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.complete = False
+        self.emitted = False
+
+    def feed(self, fragment: str) -> bool:
+        """Whether the arguments are complete after this fragment."""
+        self.arguments.append(fragment)
+        for char in fragment:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    self.complete = True
+        return self.complete
+
+    def build(self) -> ToolCall:
+        self.emitted = True
+        return ToolCall(self.id, self.name, "".join(self.arguments) or "{}")
+
+
+class ToolRegistry:
+    """Tools registered by other extensions, called concurrently with a
+    timeout each."""
+
+    def __init__(self, timeout: float = 10):
+        self.tools: Dict[str, dict[str, Any]] = {}
+        self.timeout = timeout
+        self.timeouts: Dict[str, float] = {}
+
+    def register(self, name: str, description: str, callback: Callable[[str, str], Awaitable[str | None]], parameters: Any = None) -> None:
+        function = {"name": name, "description": description}
+        if parameters:
+            function["parameters"] = parameters
+        self.tools[name] = {"type": "function", "function": function, "callback": callback}
+        logger.info(f"register tool {name} {description}")
+
+    def unregister(self, name: str) -> None:
+        if name in self.tools:
+            del self.tools[name]
+            logger.info(f"unregister tool {name}")
+
+    def get_tools(self) -> list[dict[str, Any]]:
+        """Definitions for the chat completions request."""
+        return [{"type": t["type"], "function": t["function"]} for t in self.tools.values()]
+
+    async def on_func_call(self, name: str, args: str) -> str | None:
+        """Call the tool and return its response, None if it can not be called."""
+        if name not in self.tools:
+            logger.warning(f"Failed to find func {name}")
+            return None
+        try:
+            return await asyncio.wait_for(
+                self.tools[name]["callback"](name, args), self.timeouts.get(name, self.timeout))
+        except asyncio.TimeoutError:
+            logger.warning(f"Timeout calling func {name}")
+        except Exception:
+            logger.exception(f"Failed to call func {name}")
+        return None
@@ -0,0 +1,170 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import asyncio
+import time
+from base64 import b64encode
+from concurrent.futures import Executor, ThreadPoolExecutor
+from io import BytesIO
+from typing import Callable, NamedTuple
+
+import numpy as np
+from PIL import Image
+from ten import VideoFrame
+
+# luma weights of ITU-R BT.601
+_LUMA = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+class Snapshot(NamedTuple):
+    # number of the frame since the start
+    sequence: int
+    width: int
+    height: int
+    # RGBA pixels
+    buf: bytes
+
+
+def downscale(rgba: np.ndarray, max_size: int) -> np.ndarray:
+    """RGB image whose larger side is at most max_size, by averaging boxes of
+    k x k pixels for the smallest integer k that fits."""
+    h, w = rgba.shape[:2]
+    k = -(-max(h, w) // max_size)
+    if k <= 1:
+        return np.ascontiguousarray(rgba[..., :3])
+    h, w = h // k * k, w // k * k
+    boxes = rgba[:h, :w].reshape(h // k, k, w // k, k, 4)
+    # adding up strided views is several times faster than sum(axis=...)
+    rows = boxes[:, 0].astype(np.uint16 if k <= 16 else np.uint32)
+    for i in range(1, k):
+        rows += boxes[:, i]
+    out = rows[:, :, 0, :3].copy()
+    for j in range(1, k):
+        out += rows[:, :, j, :3]
+    return (out // (k * k)).astype(np.uint8)
+
+
+def perceptual_hash(rgb: np.ndarray) -> int:
+    """64 bit difference hash, whether each cell of an 8 x 9 grid of mean
+    luma is brighter than its left neighbour."""
+    gray = rgb.astype(np.float32) @ _LUMA
+    h, w = gray.shape
+    rows = np.linspace(0, h, 9, dtype=int)[:-1]
+    cols = np.linspace(0, w, 10, dtype=int)[:-1]
+    cells = np.add.reduceat(np.add.reduceat(gray, rows, axis=0), cols, axis=1)
+    cells /= np.diff(np.append(rows, h))[:, None] * np.diff(np.append(cols, w))
+    return int.from_bytes(np.packbits(cells[:, 1:] > cells[:, :-1]).tobytes(), "big")
+
+
+def encode_jpeg(rgb: np.ndarray) -> str:
+    buffered = BytesIO()
+    Image.fromarray(rgb).save(buffered, format="JPEG")
+    return f"data:image/jpeg;base64,{b64encode(buffered.getvalue()).decode('utf-8')}"
+
+
+class VisionCapture:
+    """The camera image for the vision tool, as a base64 JPEG data URL.
+
+    Video frames are only counted until an image is needed, then the next
+    frame is copied, or every `interval_ms` if set so that an image is ready
+    at once. Downscaling and encoding run in the executor. The URL is cached
+    by frame sequence and reused while the perceptual hash of the latest
+    snapshot stays within `hash_distance` bits of the encoded one."""
+
+    def __init__(
+        self,
+        max_size: int = 320,
+        interval_ms: int = 0,
+        hash_distance: int = 4,
+        timeout: float = 0.5,
+        executor: Executor | None = None,
+        encode: Callable[[np.ndarray], str] = encode_jpeg,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_size = max_size
+        self.interval_ms = interval_ms
+        self.hash_distance = hash_distance
+        self.timeout = timeout
+        self.executor = executor or ThreadPoolExecutor(1, thread_name_prefix="vision")
+        self.encode = encode
+        self.clock = clock
+
+        self.sequence = 0
+        self.snapshot: Snapshot | None = None
+        self.snapshot_ts = 0.0
+        self.waiters: list[asyncio.Future] = []
+
+        self.url: str | None = None
+        self.url_sequence = 0
+        self.url_hash: int | None = None
+
+        self.captured = 0
+        self.encoded = 0
+        self.skipped = 0
+
+    def on_video_frame(self, frame: VideoFrame) -> None:
+        self.sequence += 1
+        due = self.interval_ms and (self.clock() - self.snapshot_ts) * 1000 >= self.interval_ms
+        if not self.waiters and not due:
+            return
+
+        self.snapshot = Snapshot(self.sequence, frame.get_width(), frame.get_height(), frame.get_buf())
+        self.snapshot_ts = self.clock()
+        self.captured += 1
+        waiters, self.waiters = self.waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def get_image_url(self) -> str | None:
+        """URL of the latest frame, None if there is no camera."""
+        if not self.interval_ms or self.snapshot is None:
+            await self._next_snapshot()
+        snapshot = self.snapshot
+        if snapshot is None:
+            return None
+        if snapshot.sequence == self.url_sequence:
+            return self.url
+
+        loop = asyncio.get_running_loop()
+        url, image_hash = await loop.run_in_executor(
+            self.executor, self._process, snapshot, self.url_hash)
+        if url is None:
+            self.skipped += 1
+            url = self.url
+        else:
+            self.encoded += 1
+            self.url_hash = image_hash
+        self.url, self.url_sequence = url, snapshot.sequence
+        return url
+
+    def stats(self) -> str:
+        return (
+            f"vision frames {self.sequence}, captured {self.captured}, "
+            f"encoded {self.encoded}, unchanged {self.skipped}"
+        )
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _next_snapshot(self) -> None:
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            # without new frames the last snapshot, if any, is used
+            await asyncio.wait_for(waiter, self.timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+
+    def _process(self, snapshot: Snapshot, last_hash: int | None) -> tuple[str | None, int]:
+        rgba = np.frombuffer(snapshot.buf, dtype=np.uint8).reshape(snapshot.height, snapshot.width, 4)
+        rgb = downscale(rgba, self.max_size)
+        image_hash = perceptual_hash(rgb)
+        if last_hash is not None and (image_hash ^ last_hash).bit_count() <= self.hash_distance:
+            return None, last_hash
+        return self.encode(rgb), image_hash
@@ -0,0 +1,74 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+
+
+class AudioRingBuffer:
+    """Preallocated byte ring buffer, when full the oldest bytes are overwritten."""
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError(f"invalid capacity {capacity}")
+        self._buf = bytearray(capacity)
+        self._view = memoryview(self._buf)
+        self._start = 0
+        self._size = 0
+        # total bytes overwritten before being read
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        return len(self._buf)
+
+    def write(self, data: bytes) -> int:
+        """Append data, returns the number of older bytes dropped to make room."""
+        capacity = len(self._buf)
+        n = len(data)
+        if n >= capacity:
+            dropped = self._size + n - capacity
+            self._view[:] = memoryview(data)[n - capacity:]
+            self._start = 0
+            self._size = capacity
+            self.dropped += dropped
+            return dropped
+
+        dropped = max(0, self._size + n - capacity)
+        if dropped:
+            self._start = (self._start + dropped) % capacity
+            self._size -= dropped
+            self.dropped += dropped
+
+        end = (self._start + self._size) % capacity
+        first = min(n, capacity - end)
+        self._view[end:end + first] = data[:first]
+        if first < n:
+            self._view[:n - first] = data[first:]
+        self._size += n
+        return dropped
+
+    def read(self, n: int = -1) -> bytes:
+        """Remove and return up to n bytes from the head, all if n < 0."""
+        data = self.peek(n)
+        n = len(data)
+        self._start = (self._start + n) % len(self._buf)
+        self._size -= n
+        return data
+
+    def peek(self, n: int = -1) -> bytes:
+        """Return up to n bytes from the head without removing them, all if n < 0."""
+        if n < 0 or n > self._size:
+            n = self._size
+        first = min(n, len(self._buf) - self._start)
+        data = self._view[self._start:self._start + first].tobytes()
+        if first < n:
+            data += self._view[:n - first].tobytes()
+        return data
+
+    def clear(self) -> None:
+        self._start = 0
+        self._size = 0
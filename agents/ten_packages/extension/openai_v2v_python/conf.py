@@ -1,5 +1,5 @@
 
-from .realtime.struct import Voices
+from .realtime.struct import AudioFormats, Voices
 
 DEFAULT_MODEL = "gpt-4o-realtime-preview"
 
@@ -27,7 +27,8 @@ class RealtimeApiConfig:
             voice: Voices = Voices.Alloy,
             server_vad: bool = True,
             audio_out: bool = True,
-            input_transcript: bool = True
+            input_transcript: bool = True,
+            audio_format: AudioFormats = AudioFormats.PCM16
         ):
         self.base_uri = base_uri
         self.api_key = api_key
@@ -42,6 +43,7 @@ class RealtimeApiConfig:
         self.server_vad = server_vad
         self.audio_out = audio_out
         self.input_transcript = input_transcript
+        self.audio_format = audio_format
     
     def build_ctx(self) -> dict:
         return {
@@ -7,9 +7,9 @@
 #
 import asyncio
 import threading
-import base64
+import binascii
+import time
 from datetime import datetime
-from typing import Awaitable
 from functools import partial
 
 from ten import (
@@ -25,11 +25,17 @@ from ten import (
 from ten.audio_frame import AudioFrameDataFmt
 from .log import logger
 
-from .tools import ToolRegistry
+from .audio_buffer import AudioRingBuffer
+from .flight_recorder import FlightRecorder
+from .g711 import G711_SAMPLE_RATE, G711Codec
+from .greeting_cache import CachedGreeting, GreetingCache, GreetingRecording
+from .playback import PlaybackTracker
+from .resampler import PcmConverter
+from .tools import ToolCallScheduler, ToolRegistry
+from .vad import EnergyVad
 from .conf import RealtimeApiConfig, BASIC_PROMPT, DEFAULT_GREETING
-from .realtime.connection import RealtimeApiConnection
+from .realtime.connection import RealtimeApiConnection, close_shared_client_session
 from .realtime.struct import *
-from .tools import ToolRegistry
 
 # properties
 PROPERTY_API_KEY = "api_key"  # Required
@@ -44,16 +50,40 @@ PROPERTY_ENABLE_STORAGE = "enable_storage"  # Optional
 PROPERTY_VOICE = "voice"  # Optional
 PROPERTY_AUDIO_OUT = "audio_out"  # Optional
 PROPERTY_INPUT_TRANSCRIPT = "input_transcript"
+PROPERTY_AUDIO_FORMAT = "audio_format"  # Optional
+PROPERTY_OUT_SAMPLE_RATE = "out_sample_rate"  # Optional
 PROPERTY_SERVER_VAD = "server_vad"  # Optional
+PROPERTY_VAD_THRESHOLD_DB = "vad_threshold_db"  # Optional
+PROPERTY_VAD_HANGOVER_MS = "vad_hangover_ms"  # Optional
+PROPERTY_VAD_PREROLL_MS = "vad_preroll_ms"  # Optional
 PROPERTY_STREAM_ID = "stream_id"
 PROPERTY_LANGUAGE = "language"
 PROPERTY_DUMP = "dump"
+PROPERTY_DUMP_SECONDS = "dump_seconds"  # Optional
+PROPERTY_DUMP_PATH = "dump_path"  # Optional
 PROPERTY_GREETING = "greeting"
+PROPERTY_GREETING_CACHE_PATH = "greeting_cache_path"  # Optional
 PROPERTY_HISTORY = "history"
+PROPERTY_AUDIO_FLUSH_INTERVAL_MS = "audio_flush_interval_ms"  # Optional
+PROPERTY_MAX_BUFFERED_AUDIO_MS = "max_buffered_audio_ms"  # Optional
+PROPERTY_PREWARM = "prewarm"  # Optional
+PROPERTY_MAX_RECONNECT_ATTEMPTS = "max_reconnect_attempts"  # Optional
+PROPERTY_TOOL_TIMEOUT_MS = "tool_timeout_ms"  # Optional
+PROPERTY_MAX_CONCURRENT_TOOLS = "max_concurrent_tools"  # Optional
+PROPERTY_TOOL_CACHE_TTL_MS = "tool_cache_ttl_ms"  # Optional
+
+RECONNECT_BASE_DELAY = 0.5
+RECONNECT_MAX_DELAY = 8
+# seconds on_stop waits for the connection to close
+CLOSE_TIMEOUT = 5
 
 DEFAULT_VOICE = Voices.Alloy
 
+# cached greeting audio is sent downstream in frames of this duration
+GREETING_FRAME_MS = 100
+
 CMD_TOOL_REGISTER = "tool_register"
+CMD_SNAPSHOT_AUDIO = "snapshot_audio"
 CMD_TOOL_CALL = "tool_call"
 CMD_PROPERTY_NAME = "name"
 CMD_PROPERTY_ARGS = "args"
@@ -61,6 +91,7 @@ CMD_PROPERTY_ARGS = "args"
 TOOL_REGISTER_PROPERTY_NAME = "name"
 TOOL_REGISTER_PROPERTY_DESCRIPTON = "description"
 TOOL_REGISTER_PROPERTY_PARAMETERS = "parameters"
+TOOL_REGISTER_PROPERTY_TIMEOUT_MS = "timeout_ms"
 
 
 class Role(str, Enum):
@@ -80,6 +111,14 @@ class OpenAIV2VExtension(Extension):
         self.config: RealtimeApiConfig = RealtimeApiConfig()
         self.conn: RealtimeApiConnection = None
         self.connected: bool = False
+        self.stopped: bool = False
+        self.client_loop_running: bool = False
+        # connect and configure the session in on_start instead of on the first audio frame
+        self.prewarm: bool = False
+        self.max_reconnect_attempts: int = 5
+        self.reconnect_attempts: int = 0
+        self.reconnect_delay: float = RECONNECT_BASE_DELAY
+        self.greeted: bool = False
         self.session_id: str = ""
         self.session: SessionUpdateParams = None
         self.last_updated = None
@@ -87,28 +126,101 @@ class OpenAIV2VExtension(Extension):
 
         # audo related
         self.sample_rate: int = 24000
-        self.out_audio_buff: bytearray = b''
-        self.audio_len_threshold: int = 10240
+        # sample rate, bytes per sample, channels of outgoing frames
+        self.audio_frame_template: tuple[int, int, int] = (self.sample_rate, 2, 1)
+        # G.711 on the wire, pcm16 at 8 kHz in and out of the extension
+        self.codec: G711Codec = None
+        # input frames of other formats are converted to the session's pcm16
+        # mono, output frames are resampled to out_sample_rate if set
+        self.in_converter: PcmConverter = None
+        self.out_sample_rate: int = 0
+        self.out_converter: PcmConverter = None
+        # uplink audio is batched and sent every flush interval; at most
+        # max_buffered_audio_ms is kept while the session is not ready or the
+        # websocket is slow, older audio is dropped
+        self.audio_flush_interval_ms: int = 100
+        self.max_buffered_audio_ms: int = 1000
+        self.out_audio_buff: AudioRingBuffer = None
+        self.out_audio_sending: bool = False
+        self.out_audio_flushed_at: float = 0
         self.transcript: str = ''
+        # with server_vad off, turns are detected here and only speech is sent
+        self.vad: EnergyVad = None
+        self.vad_threshold_db: float = -40.0
+        self.vad_hangover_ms: int = 500
+        self.vad_preroll_ms: int = 300
+        # buffered bytes up to the end of each ended turn, a turn is committed
+        # once its audio is sent, before any audio of the next one
+        self.turn_ends: list[int] = []
+        self.response_id: str = ""
+        self.playback: PlaybackTracker = PlaybackTracker(self.sample_rate)
 
         # misc.
         self.greeting : str = DEFAULT_GREETING
+        # greeting audio of the first session is stored here and played right
+        # away in later sessions, empty disables the cache
+        self.greeting_cache_path: str = ""
+        self.greeting_cache: GreetingCache = None
+        self.greeting_key: str = ""
+        self.cached_greeting: CachedGreeting = None
+        self.greeting_played: bool = False
+        self.greeting_recording: GreetingRecording = None
         self.vendor: str = ""
-        # max history store in context
+        # max history store in context, items are kept to be replayed on reconnect
         self.max_history = 0
-        self.history = []
+        self.history: list[dict] = []
         self.enable_storage: bool = False
         self.retrieved = []
         self.remote_stream_id: int = 0
         self.stream_id: int = 0
         self.channel_name: str = ""
+        # keep the last dump_seconds of audio in memory, written to dump_path
+        # on snapshot_audio, on error and at session end
         self.dump: bool = False
+        self.dump_seconds: int = 30
+        self.dump_path: str = "."
+        self.recorder: FlightRecorder = None
         self.registry = ToolRegistry()
+        self.tool_timeout_ms: int = 10000
+        self.max_concurrent_tools: int = 4
+        # 0 disables caching of tool results
+        self.tool_cache_ttl_ms: int = 0
+        self.tool_scheduler: ToolCallScheduler = None
+        # a new response is created for the tool outputs once the response
+        # calling the tools is done and the outputs of all its calls are in
+        self.tool_response_id: str = ""
+        self.tool_response_done: bool = False
+        self.tool_calls_pending: int = 0
 
     def on_start(self, ten_env: TenEnv) -> None:
         logger.info("OpenAIV2VExtension on_start")
 
         self._fetch_properties(ten_env)
+        if self.config.audio_format != AudioFormats.PCM16:
+            self.codec = G711Codec(self.config.audio_format)
+            self.sample_rate = G711_SAMPLE_RATE
+            self.audio_frame_template = (self.sample_rate, 2, 1)
+            self.playback = PlaybackTracker(self.sample_rate)
+        if self.out_sample_rate and self.out_sample_rate != self.sample_rate:
+            self.out_converter = PcmConverter(self.sample_rate, self.out_sample_rate)
+            self.audio_frame_template = (self.out_sample_rate, 2, 1)
+        self.out_audio_buff = AudioRingBuffer(
+            self._audio_bytes(self.max_buffered_audio_ms))
+        if not self.config.server_vad:
+            self.vad = EnergyVad(
+                self.sample_rate, threshold_db=self.vad_threshold_db,
+                hangover_ms=self.vad_hangover_ms, preroll_ms=self.vad_preroll_ms)
+        if self.dump:
+            self.recorder = FlightRecorder(
+                {Role.User.value: self.sample_rate, Role.Assistant.value: self.sample_rate},
+                seconds=self.dump_seconds, directory=self.dump_path)
+        self.tool_scheduler = ToolCallScheduler(
+            self.registry, self._on_tool_output,
+            max_concurrent=self.max_concurrent_tools,
+            timeout=self.tool_timeout_ms / 1000,
+            cache_ttl=self.tool_cache_ttl_ms / 1000)
+        if self.greeting_cache_path and self.config.audio_out:
+            self._load_cached_greeting()
 
         # Start async handler
         def start_event_loop(loop):
@@ -126,6 +238,8 @@ class OpenAIV2VExtension(Extension):
         # self._register_local_tools()
 
         asyncio.run_coroutine_threadsafe(self._init_connection(), self.loop)
+        if self.prewarm:
+            self._start_client_loop(ten_env)
 
         ten_env.on_start_done()
 
@@ -133,14 +247,32 @@ class OpenAIV2VExtension(Extension):
         logger.info("OpenAIV2VExtension on_stop")
 
         self.connected = False
+        self.stopped = True
 
         if self.thread:
+            future = asyncio.run_coroutine_threadsafe(self._close(), self.loop)
+            try:
+                future.result(CLOSE_TIMEOUT)
+            except Exception:
+                logger.exception("Failed to close the connection")
             self.loop.call_soon_threadsafe(self.loop.stop)
             self.thread.join()
             self.thread = None
 
+        if self.recorder:
+            self._snapshot_audio("stop")
+            self.recorder.close()
+
         ten_env.on_stop_done()
 
+    async def _close(self) -> None:
+        self._cancel_tool_calls()
+        if self.conn:
+            await self.conn.close()
+        # the client session is bound to the loop, its sockets leak once the
+        # loop is stopped
+        await close_shared_client_session()
+
     def on_retrieved(self, ten_env:TenEnv, result:CmdResult) -> None:
         if result.get_status_code() == StatusCode.OK:
             try:
@@ -166,16 +298,24 @@ class OpenAIV2VExtension(Extension):
                 self.channel_name = audio_frame.get_property_string("channel")
 
             if self.remote_stream_id == 0:
+                # the user hears the greeting while the session is set up
+                self._play_cached_greeting(ten_env)
                 self.remote_stream_id = stream_id
-                asyncio.run_coroutine_threadsafe(
-                    self._run_client_loop(ten_env), self.loop)
+                if not self.client_loop_running:
+                    self._start_client_loop(ten_env)
+                else:
+                    # pre-warmed session, greet now that the user is here
+                    asyncio.run_coroutine_threadsafe(self._greet(), self.loop)
                 logger.info(f"Start session for {stream_id}")
 
-            frame_buf = audio_frame.get_buf()
+            frame_buf = self._convert_input(audio_frame)
             self._dump_audio_if_need(frame_buf, Role.User)
 
-            asyncio.run_coroutine_threadsafe(
-                self._on_audio(frame_buf), self.loop)
+            if self.vad:
+                self._detect_turn(ten_env, frame_buf)
+            else:
+                asyncio.run_coroutine_threadsafe(
+                    self._on_audio(frame_buf), self.loop)
         except:
             logger.exception(f"OpenAIV2VExtension on audio frame failed")
 
@@ -189,6 +329,8 @@ class OpenAIV2VExtension(Extension):
 
         if cmd_name == CMD_TOOL_REGISTER:
             self._on_tool_register(ten_env, cmd)
+        elif cmd_name == CMD_SNAPSHOT_AUDIO:
+            self._snapshot_audio("cmd")
 
         cmd_result = CmdResult.create(StatusCode.OK)
         ten_env.return_result(cmd_result, cmd)
@@ -209,186 +351,379 @@ class OpenAIV2VExtension(Extension):
         except:
             logger.exception(f"Failed to create client {self.config}")
 
+    def _start_client_loop(self, ten_env: TenEnv) -> None:
+        self.client_loop_running = True
+        asyncio.run_coroutine_threadsafe(
+            self._run_client_loop(ten_env), self.loop)
+
     async def _run_client_loop(self, ten_env: TenEnv):
-        def get_time_ms() -> int:
-            current_time = datetime.now()
-            return current_time.microsecond // 1000
-
-        try:
-            await self.conn.connect()
-            self.connected = True
-            item_id = ""  # For truncate
-            response_id = ""
-            content_index = 0
-            relative_start_ms = get_time_ms()
-            flushed = set()
-
-            logger.info("Client loop started")
-            async for message in self.conn.listen():
-                try:
-                    logger.info(f"Received message: {message.type}")
-                    match message:
-                        case SessionCreated():
-                            logger.info(
-                                f"Session is created: {message.session}")
-                            self.session_id = message.session.id
-                            self.session = message.session
-                            update_msg = self._update_session()
-                            await self.conn.send_request(update_msg)
-
-                            if self.retrieved:
-                                await self._append_retrieve()
-                                logger.info(f"after append retrieve: {len(self.retrieved)}")
-
-                            text = self._greeting_text()
-                            await self.conn.send_request(ItemCreate(item=UserMessageItemParam(content=[{"type": ContentType.InputText, "text": text}])))
-                            await self.conn.send_request(ResponseCreate())
-
-                            # update_conversation = self.update_conversation()
-                            # await self.conn.send_request(update_conversation)
-                        case ItemInputAudioTranscriptionCompleted():
-                            logger.info(
-                                f"On request transcript {message.transcript}")
-                            self._send_transcript(
-                                ten_env, message.transcript, Role.User, True)
-                            self._append_context(ten_env, message.transcript, self.remote_stream_id, Role.User)
-                        case ItemInputAudioTranscriptionFailed():
-                            logger.warning(
-                                f"On request transcript failed {message.item_id} {message.error}")
-                        case ItemCreated():
-                            logger.info(f"On item created {message.item}")
-
-                            if self.max_history and ("status" not in message.item or message.item["status"] == "completed"):
-                                # need maintain the history
-                                await self._append_history(message.item)
-                        case ResponseCreated():
-                            response_id = message.response.id
-                            logger.info(
-                                f"On response created {response_id}")
-                        case ResponseDone():
-                            id = message.response.id
-                            status = message.response.status
-                            logger.info(
-                                f"On response done {id} {status}")
-                            for item in message.response.output:
-                                await self._append_history(item)
-                            if id == response_id:
-                                response_id = ""
-                        case ResponseAudioTranscriptDelta():
-                            logger.info(
-                                f"On response transcript delta {message.response_id} {message.output_index} {message.content_index} {message.delta}")
-                            if message.response_id in flushed:
-                                logger.warning(
-                                    f"On flushed transcript delta {message.response_id} {message.output_index} {message.content_index} {message.delta}")
-                                continue
-                            self._send_transcript(
-                                ten_env, message.delta, Role.Assistant, False)
-                        case ResponseTextDelta():
-                            logger.info(
-                                f"On response text delta {message.response_id} {message.output_index} {message.content_index} {message.delta}")
-                            if message.response_id in flushed:
-                                logger.warning(
-                                    f"On flushed text delta {message.response_id} {message.output_index} {message.content_index} {message.delta}")
-                                continue
-                            self._send_transcript(
-                                ten_env, message.delta, Role.Assistant, False)
-                        case ResponseAudioTranscriptDone():
-                            logger.info(
-                                f"On response transcript done {message.output_index} {message.content_index} {message.transcript}")
-                            if message.response_id in flushed:
-                                logger.warning(
-                                    f"On flushed transcript done {message.response_id}")
-                                continue
-                            self._append_context(ten_env, message.transcript, self.stream_id, Role.Assistant)
-                            self.transcript = ""
-                            self._send_transcript(
-                                ten_env, "", Role.Assistant, True)
-                        case ResponseTextDone():
-                            logger.info(
-                                f"On response text done {message.output_index} {message.content_index} {message.text}")
-                            if message.response_id in flushed:
-                                logger.warning(
-                                    f"On flushed text done {message.response_id}")
-                                continue
-                            self.transcript = ""
-                            self._send_transcript(
-                                ten_env, "", Role.Assistant, True)
-                        case ResponseOutputItemDone():
-                            logger.info(f"Output item done {message.item}")
-                        case ResponseOutputItemAdded():
-                            logger.info(
-                                f"Output item added {message.output_index} {message.item}")
-                        case ResponseAudioDelta():
-                            if message.response_id in flushed:
-                                logger.warning(
-                                    f"On flushed audio delta {message.response_id} {message.item_id} {message.content_index}")
-                                continue
-                            item_id = message.item_id
-                            content_index = message.content_index
-                            self._on_audio_delta(ten_env, message.delta)
-                        case InputAudioBufferSpeechStarted():
-                            logger.info(
-                                f"On server listening, in response {response_id}, last item {item_id}")
-                            # Tuncate the on-going audio stream
-                            end_ms = get_time_ms() - relative_start_ms
-                            if item_id:
-                                truncate = ItemTruncate(
-                                    item_id=item_id, content_index=content_index, audio_end_ms=end_ms)
-                                await self.conn.send_request(truncate)
-                            self._flush(ten_env)
-                            if response_id and self.transcript:
-                                transcript = self.transcript + "[interrupted]"
-                                self._send_transcript(
-                                    ten_env, transcript, Role.Assistant, True)
-                                self.transcript = ""
-                                # memory leak, change to lru later
-                                flushed.add(response_id)
-                            item_id = ""
-                        case InputAudioBufferSpeechStopped():
-                            relative_start_ms = get_time_ms() - message.audio_end_ms
-                            logger.info(
-                                f"On server stop listening, {message.audio_end_ms}, relative {relative_start_ms}")
-                        case ResponseFunctionCallArgumentsDone():
-                            tool_call_id = message.call_id
-                            name = message.name
-                            arguments = message.arguments
-                            logger.info(f"need to call func {name}")
-                            # TODO rebuild this into async, or it will block the thread
-                            await self.registry.on_func_call(tool_call_id, name, arguments, self._on_tool_output)
-                        case ErrorMessage():
-                            logger.error(
-                                f"Error message received: {message.error}")
-                        case _:
-                            logger.debug(f"Not handled message {message}")
-                except:
-                    logger.exception(
-                        f"Error processing message: {message}")
-
-            logger.info("Client loop finished")
-        except:
-            logger.exception(f"Failed to handle loop")
+        while not self.stopped:
+            try:
+                await self.conn.connect()
+                self.connected = True
+                await self._run_session(ten_env)
+            except:
+                logger.exception(f"Failed to handle loop")
+                self._snapshot_audio("error")
+
+            self.connected = False
+            self.session_id = ""
+            # calls and audio of the closed session are gone with it
+            self._cancel_tool_calls()
+            self.playback = PlaybackTracker(self.sample_rate)
+            if self.stopped or self.reconnect_attempts >= self.max_reconnect_attempts:
+                break
+            delay = min(self.reconnect_delay * 2 ** self.reconnect_attempts, RECONNECT_MAX_DELAY)
+            self.reconnect_attempts += 1
+            logger.warning(
+                f"Connection closed, reconnect in {delay}s, attempt {self.reconnect_attempts}")
+            await asyncio.sleep(delay)
 
         # clear so that new session can be triggered
-        self.connected = False
+        self.client_loop_running = False
+        self.reconnect_attempts = 0
         self.remote_stream_id = 0
+
+    async def _run_session(self, ten_env: TenEnv):
+        self.response_id = ""
+
+        logger.info("Client loop started")
+        async for message in self.conn.listen():
+            try:
+                logger.debug("Received message: %s", message.type)
+                match message:
+                    case SessionCreated():
+                        logger.info(
+                            f"Session is created: {message.session}")
+                        self.session_id = message.session.id
+                        self.session = message.session
+                        self.reconnect_attempts = 0
+                        update_msg = self._update_session()
+                        await self.conn.send_request(update_msg)
+
+                        if self.greeted:
+                            # reconnected, restore the conversation
+                            await self._replay_history()
+                            continue
+
+                        if self.retrieved:
+                            await self._append_retrieve()
+                            logger.info(f"after append retrieve: {len(self.retrieved)}")
+
+                        # wait for the user to join if pre-warmed
+                        if self.remote_stream_id:
+                            await self._greet()
+
+                        # update_conversation = self.update_conversation()
+                        # await self.conn.send_request(update_conversation)
+                    case ItemInputAudioTranscriptionCompleted():
+                        logger.info(
+                            f"On request transcript {message.transcript}")
+                        self._send_transcript(
+                            ten_env, message.transcript, Role.User, True)
+                        self._append_context(ten_env, message.transcript, self.remote_stream_id, Role.User)
+                        self._update_history_transcript(message.item_id, message.content_index, message.transcript)
+                    case ItemInputAudioTranscriptionFailed():
+                        logger.warning(
+                            f"On request transcript failed {message.item_id} {message.error}")
+                    case ItemCreated():
+                        logger.info(f"On item created {message.item}")
+
+                        if self.max_history and ("status" not in message.item or message.item["status"] == "completed"):
+                            # need maintain the history
+                            await self._append_history(message.item)
+                    case ResponseCreated():
+                        self.response_id = message.response.id
+                        logger.info(
+                            f"On response created {self.response_id}")
+                        if self.greeting_recording and not self.greeting_recording.response_id:
+                            self.greeting_recording.response_id = self.response_id
+                    case ResponseDone():
+                        id = message.response.id
+                        status = message.response.status
+                        logger.info(
+                            f"On response done {id} {status}")
+                        for item in message.response.output:
+                            await self._append_history(item)
+                        if self.greeting_recording and id == self.greeting_recording.response_id:
+                            await self._store_greeting(status)
+                        if id == self.response_id:
+                            self.response_id = ""
+                        self.playback.on_done(id)
+                        if id == self.tool_response_id:
+                            self.tool_response_done = True
+                            await self._respond_to_tools()
+                    case ResponseAudioTranscriptDelta():
+                        logger.info(
+                            f"On response transcript delta {message.response_id} {message.output_index} {message.content_index} {message.delta}")
+                        if self.playback.is_flushed(message.response_id):
+                            logger.warning(
+                                f"On flushed transcript delta {message.response_id} {message.output_index} {message.content_index} {message.delta}")
+                            continue
+                        self._send_transcript(
+                            ten_env, message.delta, Role.Assistant, False)
+                    case ResponseTextDelta():
+                        logger.info(
+                            f"On response text delta {message.response_id} {message.output_index} {message.content_index} {message.delta}")
+                        if self.playback.is_flushed(message.response_id):
+                            logger.warning(
+                                f"On flushed text delta {message.response_id} {message.output_index} {message.content_index} {message.delta}")
+                            continue
+                        self._send_transcript(
+                            ten_env, message.delta, Role.Assistant, False)
+                    case ResponseAudioTranscriptDone():
+                        logger.info(
+                            f"On response transcript done {message.output_index} {message.content_index} {message.transcript}")
+                        if self.playback.is_flushed(message.response_id):
+                            logger.warning(
+                                f"On flushed transcript done {message.response_id}")
+                            continue
+                        self._append_context(ten_env, message.transcript, self.stream_id, Role.Assistant)
+                        if self.greeting_recording and message.response_id == self.greeting_recording.response_id:
+                            self.greeting_recording.transcript = message.transcript
+                        self.transcript = ""
+                        self._send_transcript(
+                            ten_env, "", Role.Assistant, True)
+                    case ResponseTextDone():
+                        logger.info(
+                            f"On response text done {message.output_index} {message.content_index} {message.text}")
+                        if self.playback.is_flushed(message.response_id):
+                            logger.warning(
+                                f"On flushed text done {message.response_id}")
+                            continue
+                        self.transcript = ""
+                        self._send_transcript(
+                            ten_env, "", Role.Assistant, True)
+                    case ResponseOutputItemDone():
+                        logger.info(f"Output item done {message.item}")
+                    case ResponseOutputItemAdded():
+                        logger.info(
+                            f"Output item added {message.output_index} {message.item}")
+                    case ResponseAudioDelta():
+                        if self.playback.is_flushed(message.response_id):
+                            logger.warning(
+                                f"On flushed audio delta {message.response_id} {message.item_id} {message.content_index}")
+                            continue
+                        audio_len = self._on_audio_delta(ten_env, message.delta)
+                        if self.greeting_recording and message.response_id == self.greeting_recording.response_id:
+                            self.greeting_recording.deltas.append(message.delta)
+                        self.playback.on_audio(
+                            message.item_id, message.content_index, audio_len, message.response_id)
+                    case InputAudioBufferSpeechStarted():
+                        logger.info(
+                            f"On server listening, in response {self.response_id}, last item {self.playback.item_id}")
+                        await self._interrupt(ten_env)
+                    case InputAudioBufferSpeechStopped():
+                        logger.info(
+                            f"On server stop listening, {message.audio_end_ms}")
+                    case ResponseFunctionCallArgumentsDone():
+                        tool_call_id = message.call_id
+                        name = message.name
+                        arguments = message.arguments
+                        logger.info(f"need to call func {name}")
+                        if message.response_id != self.tool_response_id:
+                            self.tool_response_id = message.response_id
+                            self.tool_response_done = False
+                        self.tool_calls_pending += 1
+                        self.tool_scheduler.submit(tool_call_id, name, arguments)
+                    case ErrorMessage():
+                        logger.error(
+                            f"Error message received: {message.error}")
+                        self._snapshot_audio("error")
+                    case _:
+                        logger.debug(f"Not handled message {message}")
+            except:
+                logger.exception(
+                    f"Error processing message: {message}")
+
+        logger.info("Client loop finished")
+        self._snapshot_audio("session_end")
     
+    async def _interrupt(self, ten_env: TenEnv) -> None:
+        if self.vad and self.response_id:
+            # server vad cancels the response itself
+            await self.conn.send_request(ResponseCancel())
+        # Tuncate the on-going audio stream where the user stopped hearing it
+        truncate = self.playback.interrupt(self.response_id)
+        if truncate:
+            logger.info(f"Truncate {truncate}")
+            await self.conn.send_request(ItemTruncate(
+                item_id=truncate.item_id, content_index=truncate.content_index, audio_end_ms=truncate.audio_end_ms))
+        self._flush(ten_env)
+        if self.out_converter:
+            self.out_converter.reset()
+        if self.response_id and self.transcript:
+            transcript = self.transcript + "[interrupted]"
+            self._send_transcript(
+                ten_env, transcript, Role.Assistant, True)
+            self.transcript = ""
+
+    def _detect_turn(self, ten_env: TenEnv, buff: bytes) -> None:
+        for event in self.vad.process(buff):
+            if event.started:
+                logger.info("On client listening")
+                if self.session_id:
+                    asyncio.run_coroutine_threadsafe(self._interrupt(ten_env), self.loop)
+            if event.ended:
+                logger.info("On client stop listening")
+            asyncio.run_coroutine_threadsafe(
+                self._on_audio(event.audio, event.ended), self.loop)
+
+    async def _greet(self) -> None:
+        if self.greeted or not self.session_id:
+            return
+        self.greeted = True
+        text = self._greeting_text()
+        await self.conn.send_request(ItemCreate(item=UserMessageItemParam(content=[{"type": ContentType.InputText, "text": text}])))
+        if self.greeting_played:
+            # already heard by the user, only tell the model what it said
+            await self.conn.send_request(ItemCreate(item=AssistantMessageItemParam(
+                content=[{"type": ContentType.Text, "text": self.cached_greeting.transcript}])))
+            return
+        if self.greeting_cache:
+            self.greeting_recording = GreetingRecording()
+        await self.conn.send_request(ResponseCreate())
+
+    def _load_cached_greeting(self) -> None:
+        self.greeting_cache = GreetingCache(self.greeting_cache_path)
+        voice = self.config.voice or DEFAULT_VOICE
+        self.greeting_key = GreetingCache.key(
+            getattr(voice, "value", voice), self.config.language, self.greeting, self.sample_rate)
+        self.cached_greeting = self.greeting_cache.get(self.greeting_key)
+        logger.info(f"greeting cache {self.greeting_key} hit {self.cached_greeting is not None}")
+
+    def _play_cached_greeting(self, ten_env: TenEnv) -> None:
+        if not self.cached_greeting or self.greeting_played:
+            return
+        self.greeting_played = True
+
+        audio = memoryview(self.cached_greeting.audio)
+        frame_bytes = self._audio_bytes(GREETING_FRAME_MS)
+        for i in range(0, len(audio), frame_bytes):
+            chunk = audio[i:i + frame_bytes]
+            self._dump_audio_if_need(chunk, Role.Assistant)
+            self._send_audio_frame(ten_env, chunk)
+
+        transcript = self.cached_greeting.transcript
+        self._send_transcript(ten_env, transcript, Role.Assistant, True)
+        self._append_context(ten_env, transcript, self.stream_id, Role.Assistant)
+        logger.info(f"played cached greeting {len(audio)} bytes: {transcript}")
+
+    async def _store_greeting(self, status: str) -> None:
+        recording, self.greeting_recording = self.greeting_recording, None
+        if status != "completed" or self.playback.is_flushed(recording.response_id) \
+                or not recording.deltas or not recording.transcript:
+            logger.info(f"greeting not cached, status {status}")
+            return
+
+        audio = b"".join(binascii.a2b_base64(d) for d in recording.deltas)
+        if self.codec:
+            audio = self.codec.decode(audio)
+        greeting = CachedGreeting(audio, recording.transcript)
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.greeting_cache.put, self.greeting_key, greeting)
+            logger.info(f"greeting cached {self.greeting_key} {len(greeting.audio)} bytes")
+        except:
+            logger.exception("Failed to cache greeting")
+
     async def _append_history(self, item: ItemParam) -> None:
         logger.info(f"append item {item}")
-        self.history.append(item["id"])
+        if any(h["id"] == item["id"] for h in self.history):
+            return
+        self.history.append(item)
         if len(self.history) > self.max_history:
-            to_remove = self.history[0]
+            to_remove = self.history[0]["id"]
             logger.info(f"remove history {to_remove}")
             await self.conn.send_request(ItemDelete(item_id=to_remove))
             self.history = self.history[1:]
 
-    async def _on_audio(self, buff: bytearray):
-        self.out_audio_buff += buff
-        # Buffer audio
-        if len(self.out_audio_buff) >= self.audio_len_threshold and self.session_id != "":
-            await self.conn.send_audio_data(self.out_audio_buff)
-            # logger.info(
-            #     f"Send audio frame to OpenAI: {len(self.out_audio_buff)}")
-            self.out_audio_buff = b''
+    def _update_history_transcript(self, item_id: str, content_index: int, transcript: str) -> None:
+        for h in self.history:
+            if h["id"] == item_id:
+                content = h.get("content") or []
+                if content_index < len(content):
+                    content[content_index]["transcript"] = transcript
+                return
+
+    async def _replay_history(self) -> None:
+        logger.info(f"replay history {len(self.history)}")
+        previous_item_id = None
+        for h in self.history:
+            item = self._history_item_param(h)
+            if not item:
+                continue
+            await self.conn.send_request(ItemCreate(item=item, previous_item_id=previous_item_id))
+            previous_item_id = item.id
+
+    def _history_item_param(self, item: dict) -> ItemParam | None:
+        """Convert an item received from the server into one that can be created again."""
+        match item.get("type"):
+            case ItemType.Message:
+                role = item.get("role")
+                content_type = ContentType.Text if role == MessageRole.Assistant else ContentType.InputText
+                content = []
+                for c in item.get("content") or []:
+                    text = c.get("text") or c.get("transcript")
+                    if text:
+                        content.append({"type": content_type, "text": text})
+                if not content:
+                    return None
+                if role == MessageRole.Assistant:
+                    return AssistantMessageItemParam(id=item["id"], content=content)
+                elif role == MessageRole.System:
+                    return SystemMessageItemParam(id=item["id"], content=content)
+                return UserMessageItemParam(id=item["id"], content=content)
+            case ItemType.FunctionCall:
+                return FunctionCallItemParam(
+                    id=item["id"], name=item["name"], call_id=item["call_id"], arguments=item["arguments"])
+            case ItemType.FunctionCallOutput:
+                return FunctionCallOutputItemParam(
+                    id=item["id"], call_id=item["call_id"], output=item["output"])
+        return None
+
+    async def _on_audio(self, buff: bytearray, end_of_turn: bool = False):
+        dropped = self.out_audio_buff.write(buff)
+        if dropped:
+            if self.session_id != "":
+                logger.warning(f"Uplink is behind, drop {dropped} bytes of audio")
+            self.turn_ends = [max(0, end - dropped) for end in self.turn_ends]
+        if end_of_turn:
+            self.turn_ends.append(len(self.out_audio_buff))
+
+        # Previous send still in flight, it picks up this audio when done
+        if self.out_audio_sending or self.session_id == "":
+            return
+
+        flush_bytes = self._audio_bytes(self.audio_flush_interval_ms)
+        flush_interval = self.audio_flush_interval_ms / 1000
+        self.out_audio_sending = True
+        try:
+            # Everything buffered while waiting on the websocket is merged into one append
+            # but never across the end of a turn
+            while True:
+                turn_ended = bool(self.turn_ends)
+                available = self.turn_ends[0] if turn_ended else len(self.out_audio_buff)
+                if available >= flush_bytes or (available and (
+                        turn_ended or time.monotonic() - self.out_audio_flushed_at >= flush_interval)):
+                    self.out_audio_flushed_at = time.monotonic()
+                    audio = self.out_audio_buff.read(available)
+                    self.turn_ends = [end - len(audio) for end in self.turn_ends]
+                    if self.codec:
+                        audio = self.codec.encode(audio)
+                    await self.conn.send_audio_data(audio)
+                elif turn_ended:
+                    # all audio of the turn is sent
+                    self.turn_ends.pop(0)
+                    await self.conn.send_request(InputAudioBufferCommit())
+                    await self.conn.send_request(ResponseCreate())
+                else:
+                    break
+        finally:
+            self.out_audio_sending = False
+
+    def _audio_bytes(self, ms: int) -> int:
+        # pcm16 mono
+        return self.sample_rate * ms // 1000 * 2
 
     def _fetch_properties(self, ten_env: TenEnv):
         try:
@@ -458,6 +793,22 @@ class OpenAIV2VExtension(Extension):
                 f"GetProperty optional {PROPERTY_INPUT_TRANSCRIPT} failed, err: {err}"
             )
 
+        try:
+            audio_format = ten_env.get_property_string(PROPERTY_AUDIO_FORMAT)
+            if audio_format:
+                self.config.audio_format = AudioFormats(audio_format)
+        except Exception as err:
+            logger.info(
+                f"GetProperty optional {PROPERTY_AUDIO_FORMAT} failed, err: {err}"
+            )
+
+        try:
+            self.out_sample_rate = ten_env.get_property_int(PROPERTY_OUT_SAMPLE_RATE)
+        except Exception as err:
+            logger.info(
+                f"GetProperty optional {PROPERTY_OUT_SAMPLE_RATE} failed, err: {err}"
+            )
+
         try:
             max_tokens = ten_env.get_property_int(PROPERTY_MAX_TOKENS)
             if max_tokens > 0:
@@ -504,6 +855,14 @@ class OpenAIV2VExtension(Extension):
             logger.info(
                 f"GetProperty optional {PROPERTY_GREETING} error: {err}")
 
+        try:
+            greeting_cache_path = ten_env.get_property_string(PROPERTY_GREETING_CACHE_PATH)
+            if greeting_cache_path:
+                self.greeting_cache_path = greeting_cache_path
+        except Exception as err:
+            logger.info(
+                f"GetProperty optional {PROPERTY_GREETING_CACHE_PATH} error: {err}")
+
         try:
             server_vad = ten_env.get_property_bool(PROPERTY_SERVER_VAD)
             self.config.server_vad = server_vad
@@ -512,11 +871,47 @@ class OpenAIV2VExtension(Extension):
                 f"GetProperty optional {PROPERTY_SERVER_VAD} failed, err: {err}"
             )
 
+        try:
+            self.vad_threshold_db = ten_env.get_property_float(PROPERTY_VAD_THRESHOLD_DB)
+        except Exception as err:
+            logger.info(
+                f"GetProperty optional {PROPERTY_VAD_THRESHOLD_DB} failed, err: {err}")
+
+        try:
+            vad_hangover_ms = ten_env.get_property_int(PROPERTY_VAD_HANGOVER_MS)
+            if vad_hangover_ms > 0:
+                self.vad_hangover_ms = vad_hangover_ms
+        except Exception as err:
+            logger.info(
+                f"GetProperty optional {PROPERTY_VAD_HANGOVER_MS} failed, err: {err}")
+
+        try:
+            self.vad_preroll_ms = ten_env.get_property_int(PROPERTY_VAD_PREROLL_MS)
+        except Exception as err:
+            logger.info(
+                f"GetProperty optional {PROPERTY_VAD_PREROLL_MS} failed, err: {err}")
+
         try:
             self.dump = ten_env.get_property_bool(PROPERTY_DUMP)
         except Exception as err:
             logger.info(
                 f"GetProperty optional {PROPERTY_DUMP} error: {err}")
+
+        try:
+            dump_seconds = ten_env.get_property_int(PROPERTY_DUMP_SECONDS)
+            if dump_seconds > 0:
+                self.dump_seconds = dump_seconds
+        except Exception as err:
+            logger.info(
+                f"GetProperty optional {PROPERTY_DUMP_SECONDS} error: {err}")
+
+        try:
+            dump_path = ten_env.get_property_string(PROPERTY_DUMP_PATH)
+            if dump_path:
+                self.dump_path = dump_path
+        except Exception as err:
+            logger.info(
+                f"GetProperty optional {PROPERTY_DUMP_PATH} error: {err}")
         
         try:
             history = ten_env.get_property_int(PROPERTY_HISTORY)
@@ -526,6 +921,59 @@ class OpenAIV2VExtension(Extension):
             logger.info(
                 f"GetProperty optional {PROPERTY_HISTORY} error: {err}")
 
+        try:
+            audio_flush_interval_ms = ten_env.get_property_int(PROPERTY_AUDIO_FLUSH_INTERVAL_MS)
+            if audio_flush_interval_ms > 0:
+                self.audio_flush_interval_ms = audio_flush_interval_ms
+        except Exception as err:
+            logger.info(
+                f"GetProperty optional {PROPERTY_AUDIO_FLUSH_INTERVAL_MS} error: {err}")
+
+        try:
+            max_buffered_audio_ms = ten_env.get_property_int(PROPERTY_MAX_BUFFERED_AUDIO_MS)
+            if max_buffered_audio_ms > 0:
+                self.max_buffered_audio_ms = max_buffered_audio_ms
+        except Exception as err:
+            logger.info(
+                f"GetProperty optional {PROPERTY_MAX_BUFFERED_AUDIO_MS} error: {err}")
+        self.max_buffered_audio_ms = max(self.max_buffered_audio_ms, self.audio_flush_interval_ms)
+
+        try:
+            self.prewarm = ten_env.get_property_bool(PROPERTY_PREWARM)
+        except Exception as err:
+            logger.info(
+                f"GetProperty optional {PROPERTY_PREWARM} error: {err}")
+
+        try:
+            max_reconnect_attempts = ten_env.get_property_int(PROPERTY_MAX_RECONNECT_ATTEMPTS)
+            if max_reconnect_attempts >= 0:
+                self.max_reconnect_attempts = max_reconnect_attempts
+        except Exception as err:
+            logger.info(
+                f"GetProperty optional {PROPERTY_MAX_RECONNECT_ATTEMPTS} error: {err}")
+
+        try:
+            tool_timeout_ms = ten_env.get_property_int(PROPERTY_TOOL_TIMEOUT_MS)
+            if tool_timeout_ms > 0:
+                self.tool_timeout_ms = tool_timeout_ms
+        except Exception as err:
+            logger.info(
+                f"GetProperty optional {PROPERTY_TOOL_TIMEOUT_MS} error: {err}")
+
+        try:
+            max_concurrent_tools = ten_env.get_property_int(PROPERTY_MAX_CONCURRENT_TOOLS)
+            if max_concurrent_tools > 0:
+                self.max_concurrent_tools = max_concurrent_tools
+        except Exception as err:
+            logger.info(
+                f"GetProperty optional {PROPERTY_MAX_CONCURRENT_TOOLS} error: {err}")
+
+        try:
+            self.tool_cache_ttl_ms = ten_env.get_property_int(PROPERTY_TOOL_CACHE_TTL_MS)
+        except Exception as err:
+            logger.info(
+                f"GetProperty optional {PROPERTY_TOOL_CACHE_TTL_MS} error: {err}")
+
         self.ctx = self.config.build_ctx()
         self.ctx["greeting"] = self.greeting
 
@@ -544,6 +992,14 @@ class OpenAIV2VExtension(Extension):
         else:
             su.session.modalities=["text"]
         
+        if not self.config.server_vad:
+            # turns are detected and committed by the client
+            su.session.turn_detection = NULL
+
+        if self.config.audio_format != AudioFormats.PCM16:
+            su.session.input_audio_format = self.config.audio_format
+            su.session.output_audio_format = self.config.audio_format
+
         if self.config.input_transcript:
             su.session.input_audio_transcription=InputAudioTranscription(
                     model="whisper-1")
@@ -576,24 +1032,52 @@ class OpenAIV2VExtension(Extension):
             result = result.replace("{"+token+"}", value)
         return result
 
-    def _on_audio_delta(self, ten_env: TenEnv, delta: bytes) -> None:
-        audio_data = base64.b64decode(delta)
-        logger.debug("on_audio_delta audio_data len {} samples {}".format(
-            len(audio_data), len(audio_data) // 2))
+    def _on_audio_delta(self, ten_env: TenEnv, delta: str) -> int:
+        # a2b_base64 reads the str directly, b64decode would copy it to bytes first
+        audio_data = binascii.a2b_base64(delta)
+        if self.codec:
+            audio_data = self.codec.decode(audio_data)
+        audio_len = len(audio_data)
+        logger.debug("on_audio_delta audio_data len %d samples %d",
+                     audio_len, audio_len // 2)
         self._dump_audio_if_need(audio_data, Role.Assistant)
+        self._send_audio_frame(ten_env, audio_data)
+        return audio_len
 
-        f = AudioFrame.create("pcm_frame")
-        f.set_sample_rate(self.sample_rate)
-        f.set_bytes_per_sample(2)
-        f.set_number_of_channels(1)
-        f.set_data_fmt(AudioFrameDataFmt.INTERLEAVE)
-        f.set_samples_per_channel(len(audio_data) // 2)
-        f.alloc_buf(len(audio_data))
+    def _send_audio_frame(self, ten_env: TenEnv, audio_data: bytes) -> None:
+        if self.out_converter:
+            audio_data = self.out_converter.process(audio_data)
+        f = self._new_audio_frame(len(audio_data))
         buff = f.lock_buf()
         buff[:] = audio_data
         f.unlock_buf(buff)
         ten_env.send_audio_frame(f)
 
+    def _convert_input(self, audio_frame: AudioFrame) -> bytes:
+        frame_buf = audio_frame.get_buf()
+        fmt = (audio_frame.get_sample_rate(), audio_frame.get_number_of_channels(),
+               audio_frame.get_bytes_per_sample())
+        if fmt == (self.sample_rate, 1, 2):
+            return frame_buf
+
+        c = self.in_converter
+        if not c or (c.in_rate, c.in_channels, c.in_width) != fmt:
+            logger.info(f"Convert input audio of {fmt} to {self.sample_rate}")
+            self.in_converter = PcmConverter(
+                fmt[0], self.sample_rate, in_channels=fmt[1], in_width=fmt[2])
+        return self.in_converter.process(frame_buf)
+
+    def _new_audio_frame(self, audio_len: int) -> AudioFrame:
+        sample_rate, bytes_per_sample, channels = self.audio_frame_template
+        f = AudioFrame.create("pcm_frame")
+        f.set_sample_rate(sample_rate)
+        f.set_bytes_per_sample(bytes_per_sample)
+        f.set_number_of_channels(channels)
+        f.set_data_fmt(AudioFrameDataFmt.INTERLEAVE)
+        f.set_samples_per_channel(audio_len // (bytes_per_sample * channels))
+        f.alloc_buf(audio_len)
+        return f
+
     def _append_context(self, ten_env: TenEnv, sentence: str, stream_id: int, role: str):
         if not self.enable_storage:
             return
@@ -662,11 +1146,25 @@ class OpenAIV2VExtension(Extension):
             logger.exception(f"Error flush")
 
     def _dump_audio_if_need(self, buf: bytearray, role: Role) -> None:
-        if not self.dump:
+        if not self.recorder:
             return
 
-        with open("{}_{}.pcm".format(role, self.channel_name), "ab") as dump_file:
-            dump_file.write(buf)
+        self.recorder.record(role, buf)
+
+    def _snapshot_audio(self, reason: str) -> None:
+        if not self.recorder:
+            return
+
+        name = "openai_v2v_{}_{}_{}".format(
+            self.channel_name, datetime.now().strftime("%Y%m%d%H%M%S"), reason)
+
+        def on_done(f):
+            if f.exception():
+                logger.error(f"Failed to snapshot audio {f.exception()}")
+            else:
+                logger.info(f"audio snapshot {f.result()}")
+
+        self.recorder.snapshot(name).add_done_callback(on_done)
 
     #def _register_local_tools(self) -> None:
     #    self.ctx["tools"] = self.registry.to_prompt()
@@ -678,27 +1176,43 @@ class OpenAIV2VExtension(Extension):
                 TOOL_REGISTER_PROPERTY_DESCRIPTON)
             pstr = cmd.get_property_string(TOOL_REGISTER_PROPERTY_PARAMETERS)
             parameters = json.loads(pstr)
+            timeout_ms = 0
+            try:
+                timeout_ms = cmd.get_property_int(TOOL_REGISTER_PROPERTY_TIMEOUT_MS)
+            except Exception as err:
+                logger.info(f"GetProperty optional {TOOL_REGISTER_PROPERTY_TIMEOUT_MS} error: {err}")
             p = partial(self._remote_tool_call, ten_env)
             self.registry.register(
                 name=name, description=description,
                 callback=p,
-                parameters=parameters)
+                parameters=parameters,
+                timeout=timeout_ms / 1000)
             logger.info(f"on tool register {name} {description}")
             self.on_config_changed()
         except:
             logger.exception(f"Failed to register")
 
-    async def _remote_tool_call(self, ten_env: TenEnv, name: str, args: str, callback: Awaitable):
+    async def _remote_tool_call(self, ten_env: TenEnv, name: str, args: str) -> str | None:
         logger.info(f"_remote_tool_call {name} {args}")
         c = Cmd.create(f"{CMD_TOOL_CALL}_{name}")
         c.set_property_string(CMD_PROPERTY_NAME, name)
         c.set_property_string(CMD_PROPERTY_ARGS, args)
-        ten_env.send_cmd(c, lambda ten, result: asyncio.run_coroutine_threadsafe(
-                callback(result), self.loop))
+        fut = self.loop.create_future()
+
+        def set_result(result: CmdResult):
+            if not fut.done():
+                fut.set_result(result)
+
+        ten_env.send_cmd(c, lambda ten, result: self.loop.call_soon_threadsafe(
+                set_result, result))
+        result = await fut
         logger.info(f"_remote_tool_call finish {name} {args}")
-    
-    async def _on_tool_output(self, tool_call_id:str,  result:CmdResult):
-        state = result.get_status_code()
+        if result.get_status_code() != StatusCode.OK:
+            return None
+        return result.get_property_string("response")
+
+    async def _on_tool_output(self, tool_call_id: str, response: str | None):
+        self.tool_calls_pending -= 1
         tool_response = ItemCreate(
             item=FunctionCallOutputItemParam(
                 call_id=tool_call_id,
@@ -706,10 +1220,9 @@ class OpenAIV2VExtension(Extension):
             )
         )
         try:
-            if state == StatusCode.OK:
-                response = result.get_property_string("response")
+            if response is not None:
                 logger.info(f"_on_tool_output {tool_call_id} {response}")
-            
+
                 tool_response = ItemCreate(
                     item=FunctionCallOutputItemParam(
                         call_id=tool_call_id,
@@ -718,12 +1231,28 @@ class OpenAIV2VExtension(Extension):
                 )
             else:
                 logger.error(f"Failed to call function {tool_call_id}")
-                
+
             await self.conn.send_request(tool_response)
-            await self.conn.send_request(ResponseCreate())
+            await self._respond_to_tools()
         except:
             logger.exception("Failed to handle tool output")
 
+    async def _respond_to_tools(self) -> None:
+        # a fast call can be done before the next call of the same response
+        # is received, so wait for the response to be done too
+        if not self.tool_response_done or self.tool_calls_pending:
+            return
+        self.tool_response_id = ""
+        self.tool_response_done = False
+        await self.conn.send_request(ResponseCreate())
+
+    def _cancel_tool_calls(self) -> None:
+        if self.tool_scheduler:
+            self.tool_scheduler.cancel()
+        self.tool_response_id = ""
+        self.tool_response_done = False
+        self.tool_calls_pending = 0
+
     def _greeting_text(self) -> str:
         text = "Hi, there."
         if self.config.language == "zh-CN":
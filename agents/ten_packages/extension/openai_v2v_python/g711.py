@@ -0,0 +1,73 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import numpy as np
+
+from .realtime.struct import AudioFormats
+
+# G.711 is always 8 kHz mono
+G711_SAMPLE_RATE = 8000
+
+_ULAW_SEG_END = np.array([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF])
+_ALAW_SEG_END = np.array([0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF])
+
+
+def _ulaw_tables() -> tuple[np.ndarray, np.ndarray]:
+    # Same quantization as the reference g711.c, every int16 value is
+    # encoded once so that encoding is a single table lookup per sample
+    pcm = np.arange(65536, dtype=np.uint32).astype(np.uint16).view(np.int16).astype(np.int32) >> 2
+    mask = np.where(pcm < 0, 0x7F, 0xFF)
+    val = np.minimum(np.abs(pcm), 8159) + 0x21
+    seg = np.searchsorted(_ULAW_SEG_END, val)
+    uval = (np.minimum(seg, 7) << 4) | ((val >> (seg + 1)) & 0xF)
+    uval = np.where(seg >= 8, 0x7F, uval)
+    encode = (uval ^ mask).astype(np.uint8)
+
+    u = ~np.arange(256) & 0xFF
+    t = (((u & 0xF) << 3) + 0x84) << ((u & 0x70) >> 4)
+    decode = np.where(u & 0x80, 0x84 - t, t - 0x84).astype(np.int16)
+    return encode, decode
+
+
+def _alaw_tables() -> tuple[np.ndarray, np.ndarray]:
+    pcm = np.arange(65536, dtype=np.uint32).astype(np.uint16).view(np.int16).astype(np.int32) >> 3
+    mask = np.where(pcm >= 0, 0xD5, 0x55)
+    val = np.where(pcm >= 0, pcm, -pcm - 1)
+    seg = np.searchsorted(_ALAW_SEG_END, val)
+    shift = np.where(seg < 2, 1, seg)
+    aval = (np.minimum(seg, 7) << 4) | ((val >> shift) & 0xF)
+    aval = np.where(seg >= 8, 0x7F, aval)
+    encode = (aval ^ mask).astype(np.uint8)
+
+    a = np.arange(256) ^ 0x55
+    seg = (a & 0x70) >> 4
+    t = ((a & 0xF) << 4) + np.where(seg == 0, 8, 0x108)
+    t = np.where(seg > 1, t << np.maximum(seg - 1, 0), t)
+    decode = np.where(a & 0x80, t, -t).astype(np.int16)
+    return encode, decode
+
+
+class G711Codec:
+    """Vectorized G.711 μ-law/A-law codec between pcm16 and 8 bit samples."""
+
+    _tables: dict[AudioFormats, tuple[np.ndarray, np.ndarray]] = {}
+
+    def __init__(self, audio_format: AudioFormats):
+        if audio_format not in self._tables:
+            match audio_format:
+                case AudioFormats.G711_ULAW:
+                    self._tables[audio_format] = _ulaw_tables()
+                case AudioFormats.G711_ALAW:
+                    self._tables[audio_format] = _alaw_tables()
+                case _:
+                    raise ValueError(f"Not a G.711 format: {audio_format}")
+        self.audio_format = audio_format
+        self.encode_table, self.decode_table = self._tables[audio_format]
+
+    def encode(self, pcm: bytes) -> bytes:
+        return self.encode_table[np.frombuffer(pcm, dtype=np.uint16, count=len(pcm) // 2)].tobytes()
+
+    def decode(self, data: bytes) -> bytes:
+        return self.decode_table[np.frombuffer(data, dtype=np.uint8)].tobytes()
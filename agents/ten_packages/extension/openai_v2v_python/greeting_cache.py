@@ -0,0 +1,76 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import NamedTuple
+
+
+class CachedGreeting(NamedTuple):
+    audio: bytes
+    transcript: str
+
+
+@dataclass
+class GreetingRecording:
+    """Greeting response being generated by the model, stored once it is done."""
+
+    response_id: str = ""
+    # base64 audio deltas, decoded only when the greeting is stored
+    deltas: list[str] = field(default_factory=list)
+    transcript: str = ""
+
+
+class GreetingCache:
+    """Content-addressed store of greeting audio.
+
+    An entry is `<key>.pcm` with the raw audio and `<key>.json` with the
+    transcript, the json is written last so a partial entry is never read."""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    @staticmethod
+    def key(voice: str, language: str, text: str, sample_rate: int) -> str:
+        h = hashlib.sha256()
+        for part in (voice, language, text, str(sample_rate)):
+            h.update(part.encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def get(self, key: str) -> CachedGreeting | None:
+        try:
+            with open(self._path(key, "json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(self._path(key, "pcm"), "rb") as f:
+                audio = f.read()
+        except (OSError, ValueError):
+            return None
+        if not audio or len(audio) != meta.get("bytes"):
+            return None
+        return CachedGreeting(audio, meta.get("transcript", ""))
+
+    def put(self, key: str, greeting: CachedGreeting) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._write(self._path(key, "pcm"), greeting.audio)
+        meta = {"transcript": greeting.transcript, "bytes": len(greeting.audio)}
+        self._write(self._path(key, "json"), json.dumps(meta).encode("utf-8"))
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.directory, f"{key}.{ext}")
+
+    def _write(self, path: str, data: bytes) -> None:
+        # write aside and rename, concurrent sessions may store the same greeting
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except:
+            os.unlink(tmp)
+            raise
@@ -0,0 +1,92 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+import time
+from collections import OrderedDict
+from typing import Callable, NamedTuple
+
+
+class TruncatePoint(NamedTuple):
+    item_id: str
+    content_index: int
+    audio_end_ms: int
+
+
+class PlaybackTracker:
+    """Tracks the assistant audio sent downstream, so that on barge-in the item
+    can be truncated where the user actually stopped hearing it.
+
+    Audio is pushed downstream faster than real time, so the played position
+    is the sent duration capped by the wall clock time since the first frame
+    of the item. Once the response is done and all of its audio has played,
+    there is nothing left to truncate."""
+
+    def __init__(
+        self,
+        sample_rate: int,
+        bytes_per_sample: int = 2,
+        max_flushed: int = 32,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.bytes_per_ms = sample_rate * bytes_per_sample / 1000
+        self.max_flushed = max_flushed
+        self.clock = clock
+
+        self.item_id = ""
+        self.content_index = 0
+        self.sent_bytes = 0
+        self.started_at = 0.0
+        self.response_id = ""
+        # no more audio of the item is coming
+        self.done = False
+        # LRU of interrupted responses whose remaining deltas must be dropped
+        self.flushed: OrderedDict[str, None] = OrderedDict()
+
+    def on_audio(self, item_id: str, content_index: int, audio_len: int, response_id: str = "") -> None:
+        if item_id != self.item_id or content_index != self.content_index:
+            self.item_id = item_id
+            self.content_index = content_index
+            self.sent_bytes = 0
+            self.started_at = self.clock()
+            self.response_id = response_id
+            self.done = False
+        self.sent_bytes += audio_len
+
+    def on_done(self, response_id: str) -> None:
+        if response_id == self.response_id:
+            self.done = True
+
+    def played_ms(self) -> int:
+        if not self.item_id:
+            return 0
+        # the sent audio is floored so as not to pass the end of the item,
+        # the float clock is rounded as it can land just below a whole ms
+        sent_ms = int(self.sent_bytes / self.bytes_per_ms)
+        elapsed_ms = round((self.clock() - self.started_at) * 1000)
+        return min(sent_ms, elapsed_ms)
+
+    def interrupt(self, response_id: str = "") -> TruncatePoint | None:
+        """Mark the response as flushed and return where to truncate the item
+        being played, if any."""
+        if response_id:
+            self.flushed[response_id] = None
+            self.flushed.move_to_end(response_id)
+            while len(self.flushed) > self.max_flushed:
+                self.flushed.popitem(last=False)
+
+        if not self.item_id:
+            return None
+        played_ms = self.played_ms()
+        played_out = self.done and played_ms >= int(self.sent_bytes / self.bytes_per_ms)
+        point = TruncatePoint(self.item_id, self.content_index, played_ms)
+        self.item_id = ""
+        self.content_index = 0
+        self.sent_bytes = 0
+        self.response_id = ""
+        self.done = False
+        return None if played_out else point
+
+    def is_flushed(self, response_id: str) -> bool:
+        return response_id in self.flushed
@@ -1,18 +1,75 @@
 import asyncio
-import base64
 import json
 import os
+import socket
+import ssl
+import time
+import weakref
 import aiohttp
 import uuid
 
 from typing import Any, AsyncGenerator
-from .struct import InputAudioBufferAppend, ClientToServerMessage, ServerToClientMessage, parse_server_message, to_json
+from aiohttp.abc import AbstractResolver
+from aiohttp.resolver import DefaultResolver
+from .struct import ClientToServerMessage, ServerToClientMessage, input_audio_buffer_append_json, parse_server_message, to_json
 from ..log import logger
 
 DEFAULT_VIRTUAL_MODEL = "gpt-4o-realtime-preview"
 
 VENDOR_AZURE = "azure"
 
+DNS_CACHE_TTL = 300
+
+
+class CachedResolver(AbstractResolver):
+    """Resolver sharing its results process wide, unlike the per connector
+    aiohttp dns cache, so every session skips the lookup after the first one."""
+
+    cache: dict[tuple[str, int, int], tuple[float, list[dict[str, Any]]]] = {}
+
+    def __init__(self, ttl: float = DNS_CACHE_TTL):
+        self.ttl = ttl
+        self.resolver = DefaultResolver()
+
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET) -> list[dict[str, Any]]:
+        key = (host, port, family)
+        cached = self.cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        hosts = await self.resolver.resolve(host, port, family)
+        self.cache[key] = (time.monotonic() + self.ttl, hosts)
+        return hosts
+
+    async def close(self) -> None:
+        await self.resolver.close()
+
+
+_ssl_context: ssl.SSLContext | None = None
+_sessions: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession] = weakref.WeakKeyDictionary()
+
+
+def shared_client_session() -> aiohttp.ClientSession:
+    """Client session shared by all connections on the running loop.
+
+    Sessions are bound to a loop, the TLS context (loading the CA bundle is
+    slow) and the dns cache are shared by the whole process."""
+    global _ssl_context
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        if _ssl_context is None:
+            _ssl_context = ssl.create_default_context()
+        connector = aiohttp.TCPConnector(ssl=_ssl_context, resolver=CachedResolver())
+        session = aiohttp.ClientSession(connector=connector)
+        _sessions[loop] = session
+    return session
+
+
+async def close_shared_client_session() -> None:
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session:
+        await session.close()
+
 def smart_str(s: str, max_field_len: int = 128) -> str:
     """parse string as json, truncate data field to 128 characters, reserialize"""
     try:
@@ -40,6 +97,7 @@ class RealtimeApiConnection:
         model: str = DEFAULT_VIRTUAL_MODEL,
         vendor: str = "",
         verbose: bool = False,
+        session: aiohttp.ClientSession | None = None,
     ):
         self.vendor = vendor
         self.url = f"{base_uri}{path}"
@@ -49,7 +107,7 @@ class RealtimeApiConnection:
         self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
         self.websocket: aiohttp.ClientWebSocketResponse | None = None
         self.verbose = verbose
-        self.session = aiohttp.ClientSession()
+        self.session = session or shared_client_session()
 
     async def __aenter__(self) -> "RealtimeApiConnection":
         await self.connect()
@@ -68,6 +126,7 @@ class RealtimeApiConnection:
             auth = aiohttp.BasicAuth("", self.api_key) if self.api_key else None
             headers = {"OpenAI-Beta": "realtime=v1"}
 
+        await self.close()
         self.websocket = await self.session.ws_connect(
             url=self.url,
             auth=auth,
@@ -76,9 +135,11 @@ class RealtimeApiConnection:
 
     async def send_audio_data(self, audio_data: bytes):
         """audio_data is assumed to be pcm16 24kHz mono little-endian"""
-        base64_audio_data = base64.b64encode(audio_data).decode("utf-8")
-        message = InputAudioBufferAppend(audio=base64_audio_data)
-        await self.send_request(message)
+        assert self.websocket is not None
+        message_str = input_audio_buffer_append_json(audio_data)
+        if self.verbose:
+            logger.info(f"-> {smart_str(message_str)}")
+        await self.websocket.send_str(message_str)
 
     async def send_request(self, message: ClientToServerMessage):
         assert self.websocket is not None
@@ -1,6 +1,7 @@
+import binascii
 import json
 
-from dataclasses import dataclass, asdict, field, is_dataclass
+from dataclasses import MISSING, dataclass, field, fields, is_dataclass
 from typing import Any, Dict, Literal, Optional, List, Set, Union
 from enum import Enum
 import uuid
@@ -625,108 +626,179 @@ ClientToServerMessages = Union[
     SessionUpdate
 ]
 
+_FIELD_TYPES: Dict[type, Dict[str, Any]] = {}
+
+def _field_types(data_class) -> Dict[str, Any]:
+    types = _FIELD_TYPES.get(data_class)
+    if types is None:
+        types = {f.name: f.type for f in fields(data_class)}
+        _FIELD_TYPES[data_class] = types
+    return types
+
 def from_dict(data_class, data):
     """Recursively convert a dictionary to a dataclass instance."""
     if is_dataclass(data_class):  # Check if the target class is a dataclass
-        fieldtypes = {f.name: f.type for f in data_class.__dataclass_fields__.values()}
+        fieldtypes = _field_types(data_class)
         return data_class(**{f: from_dict(fieldtypes[f], data[f]) for f in data})
     elif isinstance(data, list):  # Handle lists of nested dataclass objects
         return [from_dict(data_class.__args__[0], item) for item in data]
     else:  # For primitive types (str, int, float, etc.), return the value as-is
         return data
 
+CLIENT_MESSAGE_TYPES: Dict[str, type] = {
+    EventType.INPUT_AUDIO_BUFFER_APPEND: InputAudioBufferAppend,
+    EventType.INPUT_AUDIO_BUFFER_COMMIT: InputAudioBufferCommit,
+    EventType.INPUT_AUDIO_BUFFER_CLEAR: InputAudioBufferClear,
+    EventType.ITEM_CREATE: ItemCreate,
+    EventType.ITEM_TRUNCATE: ItemTruncate,
+    EventType.ITEM_DELETE: ItemDelete,
+    EventType.RESPONSE_CREATE: ResponseCreate,
+    EventType.RESPONSE_CANCEL: ResponseCancel,
+    EventType.UPDATE_CONVERSATION_CONFIG: UpdateConversationConfig,
+    EventType.SESSION_UPDATE: SessionUpdate,
+}
+
 def parse_client_message(unparsed_string: str) -> ClientToServerMessage:
     data = json.loads(unparsed_string)
-    
-    # Dynamically select the correct message class based on the `type` field, using from_dict
-    if data["type"] == EventType.INPUT_AUDIO_BUFFER_APPEND:
-        return from_dict(InputAudioBufferAppend, data)
-    elif data["type"] == EventType.INPUT_AUDIO_BUFFER_COMMIT:
-        return from_dict(InputAudioBufferCommit, data)
-    elif data["type"] == EventType.INPUT_AUDIO_BUFFER_CLEAR:
-        return from_dict(InputAudioBufferClear, data)
-    elif data["type"] == EventType.ITEM_CREATE:
-        return from_dict(ItemCreate, data)
-    elif data["type"] == EventType.ITEM_TRUNCATE:
-        return from_dict(ItemTruncate, data)
-    elif data["type"] == EventType.ITEM_DELETE:
-        return from_dict(ItemDelete, data)
-    elif data["type"] == EventType.RESPONSE_CREATE:
-        return from_dict(ResponseCreate, data)
-    elif data["type"] == EventType.RESPONSE_CANCEL:
-        return from_dict(ResponseCancel, data)
-    elif data["type"] == EventType.UPDATE_CONVERSATION_CONFIG:
-        return from_dict(UpdateConversationConfig, data)
-    elif data["type"] == EventType.SESSION_UPDATE:
-        return from_dict(SessionUpdate, data)
-    
-    raise ValueError(f"Unknown message type: {data['type']}")
 
+    # Dynamically select the correct message class based on the `type` field, using from_dict
+    data_class = CLIENT_MESSAGE_TYPES.get(data["type"])
+    if data_class is None:
+        raise ValueError(f"Unknown message type: {data['type']}")
+    return from_dict(data_class, data)
+
+
+def _lazy_view(data_class):
+    """Build a subclass of a flat event dataclass that reads its fields from the
+    decoded json dict on access instead of copying them into a new instance.
+
+    The view is still an instance of `data_class`, so `match`/`isinstance`
+    checks in the caller keep working unchanged."""
+    defaults = {
+        f.name: None if f.default is MISSING else f.default
+        for f in fields(data_class)
+    }
+
+    def getter(name, default):
+        return property(lambda self: self._data.get(name, default))
+
+    def __init__(self, data: dict):
+        self._data = data
+
+    namespace = {"__slots__": ("_data",), "__init__": __init__}
+    for name, default in defaults.items():
+        namespace[name] = getter(name, default)
+    return type(f"{data_class.__name__}View", (data_class,), namespace)
+
+# Hot-path events, ~50 per second per session while the assistant speaks.
+# They carry only scalar fields, so they are served as views over the decoded
+# dict without building dataclasses or touching the (large) base64 payload.
+ResponseAudioDeltaView = _lazy_view(ResponseAudioDelta)
+ResponseAudioTranscriptDeltaView = _lazy_view(ResponseAudioTranscriptDelta)
+ResponseTextDeltaView = _lazy_view(ResponseTextDelta)
+
+SERVER_MESSAGE_VIEWS: Dict[str, type] = {
+    EventType.RESPONSE_AUDIO_DELTA: ResponseAudioDeltaView,
+    EventType.RESPONSE_AUDIO_TRANSCRIPT_DELTA: ResponseAudioTranscriptDeltaView,
+    EventType.RESPONSE_TEXT_DELTA: ResponseTextDeltaView,
+}
+
+SERVER_MESSAGE_TYPES: Dict[str, type] = {
+    EventType.ERROR: ErrorMessage,
+    EventType.SESSION_CREATED: SessionCreated,
+    EventType.SESSION_UPDATED: SessionUpdated,
+    EventType.INPUT_AUDIO_BUFFER_COMMITTED: InputAudioBufferCommitted,
+    EventType.INPUT_AUDIO_BUFFER_CLEARED: InputAudioBufferCleared,
+    EventType.INPUT_AUDIO_BUFFER_SPEECH_STARTED: InputAudioBufferSpeechStarted,
+    EventType.INPUT_AUDIO_BUFFER_SPEECH_STOPPED: InputAudioBufferSpeechStopped,
+    EventType.ITEM_CREATED: ItemCreated,
+    EventType.ITEM_TRUNCATED: ItemTruncated,
+    EventType.ITEM_DELETED: ItemDeleted,
+    EventType.RESPONSE_CREATED: ResponseCreated,
+    EventType.RESPONSE_DONE: ResponseDone,
+    EventType.RESPONSE_TEXT_DELTA: ResponseTextDelta,
+    EventType.RESPONSE_TEXT_DONE: ResponseTextDone,
+    EventType.RESPONSE_AUDIO_TRANSCRIPT_DELTA: ResponseAudioTranscriptDelta,
+    EventType.RESPONSE_AUDIO_TRANSCRIPT_DONE: ResponseAudioTranscriptDone,
+    EventType.RESPONSE_AUDIO_DELTA: ResponseAudioDelta,
+    EventType.RESPONSE_AUDIO_DONE: ResponseAudioDone,
+    EventType.RESPONSE_FUNCTION_CALL_ARGUMENTS_DELTA: ResponseFunctionCallArgumentsDelta,
+    EventType.RESPONSE_FUNCTION_CALL_ARGUMENTS_DONE: ResponseFunctionCallArgumentsDone,
+    EventType.RATE_LIMITS_UPDATED: RateLimitsUpdated,
+    EventType.RESPONSE_OUTPUT_ITEM_ADDED: ResponseOutputItemAdded,
+    EventType.RESPONSE_CONTENT_PART_ADDED: ResponseContentPartAdded,
+    EventType.RESPONSE_CONTENT_PART_DONE: ResponseContentPartDone,
+    EventType.RESPONSE_OUTPUT_ITEM_DONE: ResponseOutputItemDone,
+    EventType.ITEM_INPUT_AUDIO_TRANSCRIPTION_COMPLETED: ItemInputAudioTranscriptionCompleted,
+    EventType.ITEM_INPUT_AUDIO_TRANSCRIPTION_FAILED: ItemInputAudioTranscriptionFailed,
+}
 
-# Assuming all necessary classes and enums (EventType, ServerToClientMessages, etc.) are imported
-# Here’s how you can dynamically parse a server-to-client message based on the `type` field:
 
 def parse_server_message(unparsed_string: str) -> ServerToClientMessage:
     data = json.loads(unparsed_string)
 
-    # Dynamically select the correct message class based on the `type` field, using from_dict
-    if data["type"] == EventType.ERROR:
-        return from_dict(ErrorMessage, data)
-    elif data["type"] == EventType.SESSION_CREATED:
-        return from_dict(SessionCreated, data)
-    elif data["type"] == EventType.SESSION_UPDATED:
-        return from_dict(SessionUpdated, data)
-    elif data["type"] == EventType.INPUT_AUDIO_BUFFER_COMMITTED:
-        return from_dict(InputAudioBufferCommitted, data)
-    elif data["type"] == EventType.INPUT_AUDIO_BUFFER_CLEARED:
-        return from_dict(InputAudioBufferCleared, data)
-    elif data["type"] == EventType.INPUT_AUDIO_BUFFER_SPEECH_STARTED:
-        return from_dict(InputAudioBufferSpeechStarted, data)
-    elif data["type"] == EventType.INPUT_AUDIO_BUFFER_SPEECH_STOPPED:
-        return from_dict(InputAudioBufferSpeechStopped, data)
-    elif data["type"] == EventType.ITEM_CREATED:
-        return from_dict(ItemCreated, data)
-    elif data["type"] == EventType.ITEM_TRUNCATED:
-        return from_dict(ItemTruncated, data)
-    elif data["type"] == EventType.ITEM_DELETED:
-        return from_dict(ItemDeleted, data)
-    elif data["type"] == EventType.RESPONSE_CREATED:
-        return from_dict(ResponseCreated, data)
-    elif data["type"] == EventType.RESPONSE_DONE:
-        return from_dict(ResponseDone, data)
-    elif data["type"] == EventType.RESPONSE_TEXT_DELTA:
-        return from_dict(ResponseTextDelta, data)
-    elif data["type"] == EventType.RESPONSE_TEXT_DONE:
-        return from_dict(ResponseTextDone, data)
-    elif data["type"] == EventType.RESPONSE_AUDIO_TRANSCRIPT_DELTA:
-        return from_dict(ResponseAudioTranscriptDelta, data)
-    elif data["type"] == EventType.RESPONSE_AUDIO_TRANSCRIPT_DONE:
-        return from_dict(ResponseAudioTranscriptDone, data)
-    elif data["type"] == EventType.RESPONSE_AUDIO_DELTA:
-        return from_dict(ResponseAudioDelta, data)
-    elif data["type"] == EventType.RESPONSE_AUDIO_DONE:
-        return from_dict(ResponseAudioDone, data)
-    elif data["type"] == EventType.RESPONSE_FUNCTION_CALL_ARGUMENTS_DELTA:
-        return from_dict(ResponseFunctionCallArgumentsDelta, data)
-    elif data["type"] == EventType.RESPONSE_FUNCTION_CALL_ARGUMENTS_DONE:
-        return from_dict(ResponseFunctionCallArgumentsDone, data)
-    elif data["type"] == EventType.RATE_LIMITS_UPDATED:
-        return from_dict(RateLimitsUpdated, data)
-    elif data["type"] == EventType.RESPONSE_OUTPUT_ITEM_ADDED:
-        return from_dict(ResponseOutputItemAdded, data)
-    elif data["type"] == EventType.RESPONSE_CONTENT_PART_ADDED:
-        return from_dict(ResponseContentPartAdded, data)
-    elif data["type"] == EventType.RESPONSE_CONTENT_PART_DONE:
-        return from_dict(ResponseContentPartDone, data)
-    elif data["type"] == EventType.RESPONSE_OUTPUT_ITEM_DONE:
-        return from_dict(ResponseOutputItemDone, data)
-    elif data["type"] == EventType.ITEM_INPUT_AUDIO_TRANSCRIPTION_COMPLETED:
-        return from_dict(ItemInputAudioTranscriptionCompleted, data)
-    elif data["type"] == EventType.ITEM_INPUT_AUDIO_TRANSCRIPTION_FAILED:
-        return from_dict(ItemInputAudioTranscriptionFailed, data)
-
-    raise ValueError(f"Unknown message type: {data['type']}")
-    
+    # Fast path for streaming deltas, no dataclass construction
+    view = SERVER_MESSAGE_VIEWS.get(data["type"])
+    if view is not None:
+        return view(data)
+
+    data_class = SERVER_MESSAGE_TYPES.get(data["type"])
+    if data_class is None:
+        raise ValueError(f"Unknown message type: {data['type']}")
+    return from_dict(data_class, data)
+
+class _Null:
+    """Set on an optional field to send an explicit null, None leaves it out."""
+
+    def __repr__(self) -> str:
+        return "NULL"
+
+NULL = _Null()
+
+_SERIALIZERS: Dict[type, Any] = {}
+
+def _serializer(data_class):
+    """Compile a dataclass into a function producing the same dict as
+    `asdict` with None values dropped, without the deep copy."""
+    serializer = _SERIALIZERS.get(data_class)
+    if serializer is None:
+        names = tuple(f.name for f in fields(data_class))
+
+        def serializer(obj) -> dict:
+            result = {}
+            for name in names:
+                value = getattr(obj, name)
+                if value is not None:
+                    result[name] = _to_primitive(value)
+            return result
+
+        _SERIALIZERS[data_class] = serializer
+    return serializer
+
+def _to_primitive(value):
+    if isinstance(value, (str, int, float)):
+        return value
+    if value is NULL:
+        return None
+    if is_dataclass(value):
+        return _serializer(type(value))(value)
+    if isinstance(value, (list, tuple)):
+        return type(value)(_to_primitive(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _to_primitive(v) for k, v in value.items()}
+    return value
+
 def to_json(obj: Union[ClientToServerMessage, ServerToClientMessage]) -> str:
     # ignore none value
-    return json.dumps(asdict(obj, dict_factory=lambda x: {k: v for (k, v) in x if v is not None}))
\ No newline at end of file
+    return json.dumps(_serializer(type(obj))(obj))
+
+def input_audio_buffer_append_json(audio_data: bytes) -> str:
+    """Serialize an `input_audio_buffer.append` event straight from pcm bytes.
+
+    Produces the same string as `to_json(InputAudioBufferAppend(audio=...))`;
+    every part but the base64 payload has a fixed shape, so it is filled into
+    a template instead of going through a dataclass and `json.dumps`."""
+    audio = binascii.b2a_base64(audio_data, newline=False).decode("ascii")
+    return f'{{"event_id": "{generate_event_id()}", "audio": "{audio}{_APPEND_SUFFIX}'
+
+_APPEND_SUFFIX = f'", "type": "{EventType.INPUT_AUDIO_BUFFER_APPEND.value}"}}'
@@ -0,0 +1,139 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+from math import gcd
+
+import numpy as np
+
+# sample width in bytes -> numpy dtype, 8 bit pcm is unsigned
+_DTYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+# scale of each width relative to 16 bit
+_SCALES = {1: 256.0, 2: 1.0, 4: 1 / 65536}
+_OFFSETS = {1: 128.0, 2: 0.0, 4: 0.0}
+
+
+class Resampler:
+    """Streaming polyphase resampler over float32 arrays of shape (frames, channels).
+
+    The ratio out_rate / in_rate is reduced to up / down, the Kaiser windowed
+    sinc lowpass for the upsampled rate is split into `up` phases and every
+    output sample is the dot product of one phase with the latest input
+    samples. The last input samples and the output position are carried over
+    between calls, so audio can be fed in frames of any size, e.g. 10 ms."""
+
+    def __init__(
+        self,
+        in_rate: int,
+        out_rate: int,
+        channels: int = 1,
+        zero_crossings: int = 16,
+        rolloff: float = 0.9,
+        beta: float = 8.6,
+    ):
+        g = gcd(in_rate, out_rate)
+        self.up = out_rate // g
+        self.down = in_rate // g
+        self.channels = channels
+
+        # filter spans 2 * zero_crossings samples of the lower rate
+        taps = 2 * zero_crossings * max(self.up, self.down)
+        taps += -taps % self.up
+        cutoff = rolloff * min(in_rate, out_rate) / 2 / (in_rate * self.up)
+        n = np.arange(taps) - (taps - 1) / 2
+        h = 2 * cutoff * np.sinc(2 * cutoff * n) * np.kaiser(taps, beta) * self.up
+        # phases[p, k] = h[p + k * up], reversed so windows are read forward
+        self.taps_per_phase = taps // self.up
+        self.phases = h.reshape(self.taps_per_phase, self.up).T[:, ::-1].astype(np.float32)
+        # input delay in output samples, half the filter
+        self.delay = (taps - 1) / 2 / self.down
+
+        self.history = np.zeros((self.taps_per_phase - 1, channels), dtype=np.float32)
+        # position of the next output sample in the upsampled domain, relative
+        # to the first new input sample
+        self.offset = 0
+
+    def process(self, x: np.ndarray) -> np.ndarray:
+        n_in = len(x)
+        count = max(0, -(-(n_in * self.up - self.offset) // self.down))
+        pos = self.offset + np.arange(count) * self.down
+        self.offset += count * self.down - n_in * self.up
+
+        buf = np.concatenate((self.history, x.astype(np.float32, copy=False)))
+        self.history = buf[len(buf) - len(self.history):]
+        if count == 0:
+            return np.zeros((0, self.channels), dtype=np.float32)
+
+        # window of every output sample ends at its input sample
+        windows = np.lib.stride_tricks.sliding_window_view(buf, self.taps_per_phase, axis=0)
+        return np.einsum("nk,nck->nc", self.phases[pos % self.up], windows[pos // self.up])
+
+    def reset(self) -> None:
+        self.history[:] = 0
+        self.offset = 0
+
+
+class PcmConverter:
+    """Converts interleaved pcm between sample rates, channel layouts and
+    sample widths (1, 2 or 4 bytes), in a stream of chunks of any size."""
+
+    def __init__(
+        self,
+        in_rate: int,
+        out_rate: int,
+        in_channels: int = 1,
+        out_channels: int = 1,
+        in_width: int = 2,
+        out_width: int = 2,
+    ):
+        if in_width not in _DTYPES or out_width not in _DTYPES:
+            raise ValueError(f"unsupported sample width {in_width} -> {out_width}")
+        self.in_rate = in_rate
+        self.out_rate = out_rate
+        self.in_channels = in_channels
+        self.out_channels = out_channels
+        self.in_width = in_width
+        self.out_width = out_width
+        self.in_frame_bytes = in_width * in_channels
+        # resample after downmixing, before upmixing
+        self.resampler = None
+        if in_rate != out_rate:
+            self.resampler = Resampler(in_rate, out_rate, min(in_channels, out_channels))
+        self.pending = b""
+
+    @property
+    def passthrough(self) -> bool:
+        return (self.in_rate, self.in_channels, self.in_width) == (
+            self.out_rate, self.out_channels, self.out_width)
+
+    def process(self, data: bytes) -> bytes:
+        if self.passthrough:
+            return bytes(data)
+
+        if self.pending:
+            data = self.pending + data
+        usable = len(data) - len(data) % self.in_frame_bytes
+        self.pending = bytes(data[usable:])
+
+        x = np.frombuffer(data, dtype=_DTYPES[self.in_width], count=usable // self.in_width)
+        # to 16 bit scale floats
+        x = (x.astype(np.float32) - _OFFSETS[self.in_width]) * _SCALES[self.in_width]
+        x = x.reshape(-1, self.in_channels)
+
+        if self.out_channels < self.in_channels:
+            x = x.mean(axis=1, keepdims=True) if self.out_channels == 1 else x[:, :self.out_channels]
+        if self.resampler:
+            x = self.resampler.process(x)
+        if self.out_channels > x.shape[1]:
+            x = np.repeat(x[:, :1], self.out_channels, axis=1) if x.shape[1] == 1 else np.pad(
+                x, ((0, 0), (0, self.out_channels - x.shape[1])))
+
+        x = x / _SCALES[self.out_width] + _OFFSETS[self.out_width]
+        info = np.iinfo(_DTYPES[self.out_width])
+        return np.rint(x).clip(info.min, info.max).astype(_DTYPES[self.out_width]).tobytes()
+
+    def reset(self) -> None:
+        self.pending = b""
+        if self.resampler:
+            self.resampler.reset()
@@ -0,0 +1,100 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+"""Allocation and latency of turning a `response.audio.delta` into an
+AudioFrame, with and without `dump` (per-frame pcm files before, the
+in-memory flight recorder after).
+
+    python tests/bench_audio_delta.py
+"""
+import base64
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from ten import AudioFrame  # noqa: E402
+from ten.audio_frame import AudioFrameDataFmt  # noqa: E402
+
+from openai_v2v_python.extension import OpenAIV2VExtension, Role  # noqa: E402
+from openai_v2v_python.flight_recorder import FlightRecorder  # noqa: E402
+
+# 20 ms of pcm16 24 kHz, the usual delta size
+DELTA = base64.b64encode(os.urandom(960)).decode("utf-8")
+
+
+class Sink:
+    def send_audio_frame(self, frame) -> None:
+        pass
+
+
+def legacy_dump_audio_if_need(self, buf, role) -> None:
+    if not self.dump:
+        return
+
+    with open("{}_{}.pcm".format(role, self.channel_name), "ab") as dump_file:
+        dump_file.write(buf)
+
+
+def legacy_on_audio_delta(self, ten_env, delta) -> None:
+    audio_data = base64.b64decode(delta)
+    legacy_dump_audio_if_need(self, audio_data, Role.Assistant)
+
+    f = AudioFrame.create("pcm_frame")
+    f.set_sample_rate(self.sample_rate)
+    f.set_bytes_per_sample(2)
+    f.set_number_of_channels(1)
+    f.set_data_fmt(AudioFrameDataFmt.INTERLEAVE)
+    f.set_samples_per_channel(len(audio_data) // 2)
+    f.alloc_buf(len(audio_data))
+    buff = f.lock_buf()
+    buff[:] = audio_data
+    f.unlock_buf(buff)
+    ten_env.send_audio_frame(f)
+
+
+def measure(on_audio_delta, ext, rounds: int = 5000) -> tuple[float, float]:
+    sink = Sink()
+    tracemalloc.start()
+    for _ in range(100):
+        on_audio_delta(ext, sink, DELTA)
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    on_audio_delta(ext, sink, DELTA)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            on_audio_delta(ext, sink, DELTA)
+        best = min(best, (time.perf_counter() - start) / rounds)
+    return best, peak - before
+
+
+def main():
+    ext = OpenAIV2VExtension("bench")
+    ext.channel_name = "bench"
+    os.chdir(tempfile.mkdtemp())
+    for dump in (False, True):
+        ext.dump = dump
+        ext.recorder = FlightRecorder(
+            {Role.User.value: 24000, Role.Assistant.value: 24000}) if dump else None
+        print(f"dump={dump}")
+        for name, fn in (("before", legacy_on_audio_delta),
+                         ("after", OpenAIV2VExtension._on_audio_delta)):
+            latency, alloc = measure(fn, ext)
+            print(f"  {name:<6} {latency * 1e6:7.2f} us/delta, "
+                  f"peak {alloc} bytes of python allocations/delta")
+
+
+if __name__ == "__main__":
+    main()
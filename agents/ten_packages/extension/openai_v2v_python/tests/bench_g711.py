@@ -0,0 +1,83 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+"""Compare the pcm16 and G.711 audio paths.
+
+    python tests/bench_g711.py
+
+For 100 ms chunks, uplink is encode + `input_audio_buffer.append` JSON and
+downlink is base64 + decode of a delta. Both are reported per second of audio
+with the bytes on the wire. pcm16 is 24 kHz and G.711 is 8 kHz.
+"""
+import binascii
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from openai_v2v_python.g711 import G711Codec  # noqa: E402
+from openai_v2v_python.realtime.struct import (  # noqa: E402
+    AudioFormats,
+    input_audio_buffer_append_json,
+)
+
+
+def chunk(sample_rate: int) -> bytes:
+    rng = np.random.default_rng(0)
+    return rng.normal(0, 3000, sample_rate // 10).astype(np.int16).tobytes()
+
+
+def best(fn, rounds: int = 5, n: int = 2000) -> float:
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(n):
+            fn()
+        times.append((time.perf_counter() - start) / n)
+    return min(times)
+
+
+def main():
+    pcm24, pcm8 = chunk(24000), chunk(8000)
+    print("per second of audio (10 chunks of 100 ms):")
+
+    delta = binascii.b2a_base64(pcm24, newline=False).decode()
+    up = best(lambda: input_audio_buffer_append_json(pcm24)) * 10
+    down = best(lambda: binascii.a2b_base64(delta)) * 10
+    wire_up = len(input_audio_buffer_append_json(pcm24)) * 10
+    print(f"pcm16 24k: uplink {up * 1e6:.1f} us {wire_up} B, downlink {down * 1e6:.1f} us {len(delta) * 10} B")
+
+    for audio_format in (AudioFormats.G711_ULAW, AudioFormats.G711_ALAW):
+        codec = G711Codec(audio_format)
+        delta = binascii.b2a_base64(codec.encode(pcm8), newline=False).decode()
+        up = best(lambda: input_audio_buffer_append_json(codec.encode(pcm8))) * 10
+        down = best(lambda: codec.decode(binascii.a2b_base64(delta))) * 10
+        wire_up = len(input_audio_buffer_append_json(codec.encode(pcm8))) * 10
+        print(f"{audio_format.value}: uplink {up * 1e6:.1f} us {wire_up} B, downlink {down * 1e6:.1f} us {len(delta) * 10} B")
+
+    # codec throughput against the stdlib reference, removed in Python 3.13
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        try:
+            import audioop
+        except ImportError:
+            return
+    second = chunk(80000)
+    codec = G711Codec(AudioFormats.G711_ULAW)
+    encoded = codec.encode(second)
+    print("μ-law codec on 10 s of 8 kHz audio:")
+    print(f"numpy encode {best(lambda: codec.encode(second), n=200) * 1e6:.1f} us, "
+          f"decode {best(lambda: codec.decode(encoded), n=200) * 1e6:.1f} us")
+    print(f"audioop encode {best(lambda: audioop.lin2ulaw(second, 2), n=200) * 1e6:.1f} us, "
+          f"decode {best(lambda: audioop.ulaw2lin(encoded, 2), n=200) * 1e6:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
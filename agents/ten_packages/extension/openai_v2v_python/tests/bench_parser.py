@@ -0,0 +1,85 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+"""Replay a realtime server event stream through the parser.
+
+    python tests/bench_parser.py [events.jsonl]
+
+The recording holds one server event per line, e.g. captured with
+`RealtimeApiConnection(verbose=True)`. Without a recording, a synthetic
+20 second response (audio deltas at 50/s plus transcript deltas) is used.
+"""
+import base64
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from openai_v2v_python.realtime.struct import (  # noqa: E402
+    SERVER_MESSAGE_TYPES,
+    from_dict,
+    parse_server_message,
+)
+
+
+def synthesize(seconds: int = 20) -> list[str]:
+    ids = {"response_id": "resp_1", "item_id": "item_1",
+           "output_index": 0, "content_index": 0}
+    events = [
+        {"type": "session.created", "event_id": "e",
+         "session": {"id": "sess_1", "model": "gpt-4o-realtime-preview",
+                     "expires_at": 0}},
+        {"type": "response.created", "event_id": "e",
+         "response": {"id": "resp_1", "output": []}},
+    ]
+    # 20 ms of pcm16 24 kHz per delta
+    audio = base64.b64encode(os.urandom(960)).decode("utf-8")
+    for i in range(seconds * 50):
+        events.append({"type": "response.audio.delta", "event_id": f"e{i}",
+                       **ids, "delta": audio})
+        if i % 5 == 0:
+            events.append({"type": "response.audio_transcript.delta",
+                           "event_id": f"t{i}", **ids, "delta": "word "})
+    events.append({"type": "response.audio.done", "event_id": "e", **ids})
+    events.append({"type": "response.done", "event_id": "e",
+                   "response": {"id": "resp_1", "status": "completed",
+                                "output": []}})
+    return [json.dumps(e) for e in events]
+
+
+def parse_full(message: str):
+    data = json.loads(message)
+    return from_dict(SERVER_MESSAGE_TYPES[data["type"]], data)
+
+
+def run(parse, events: list[str], rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for e in events:
+            parse(e)
+    return (time.perf_counter() - start) / (rounds * len(events))
+
+
+def main():
+    if len(sys.argv) > 1:
+        with open(sys.argv[1]) as f:
+            events = [line for line in f if line.strip()]
+    else:
+        events = synthesize()
+    rounds = 20
+
+    full = run(parse_full, events, rounds)
+    fast = run(parse_server_message, events, rounds)
+    print(f"events: {len(events)}")
+    print(f"dataclass parser: {full * 1e6:.2f} us/event")
+    print(f"table parser:     {fast * 1e6:.2f} us/event ({full / fast:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
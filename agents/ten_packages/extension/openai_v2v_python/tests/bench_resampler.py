@@ -0,0 +1,81 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+"""Quality and CPU of the streaming resampler fed with 10 ms frames.
+
+    python tests/bench_resampler.py
+
+Quality is the SNR of a 1 kHz tone against the ideal tone at the output
+rate, and the level left of a tone above the output nyquist (alias). Linear
+interpolation with `np.interp` is reported as a baseline.
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from openai_v2v_python.resampler import PcmConverter, Resampler  # noqa: E402
+
+PAIRS = [(16000, 24000), (24000, 16000), (32000, 24000), (48000, 16000),
+         (22050, 16000), (44100, 48000), (24000, 48000)]
+
+
+def tone(rate: int, freq: float, seconds: float = 2) -> np.ndarray:
+    return 10000 * np.sin(2 * np.pi * freq * np.arange(int(rate * seconds)) / rate)
+
+
+def polyphase(in_rate: int, out_rate: int, x: np.ndarray) -> tuple[np.ndarray, float]:
+    r = Resampler(in_rate, out_rate)
+    frame = in_rate // 100
+    y = np.concatenate([r.process(x[i:i + frame, None]) for i in range(0, len(x), frame)])[:, 0]
+    return y, r.delay
+
+
+def linear(in_rate: int, out_rate: int, x: np.ndarray) -> tuple[np.ndarray, float]:
+    t = np.arange(len(x) * out_rate // in_rate) * in_rate / out_rate
+    return np.interp(t, np.arange(len(x)), x), 0
+
+
+def quality(method, in_rate: int, out_rate: int) -> tuple[float, float]:
+    y, delay = method(in_rate, out_rate, tone(in_rate, 1000))
+    ideal = 10000 * np.sin(2 * np.pi * 1000 * (np.arange(len(y)) - delay) / out_rate)
+    s = slice(out_rate // 10, len(y) - out_rate // 10)
+    snr = 10 * np.log10(np.mean(ideal[s] ** 2) / np.mean((y[s] - ideal[s]) ** 2))
+    # only downsampling can alias
+    alias_db = float("nan")
+    if out_rate < in_rate:
+        y, _ = method(in_rate, out_rate, tone(in_rate, 0.6 * out_rate))
+        alias_db = 20 * np.log10(np.abs(y[out_rate // 10:]).max() / 10000)
+    return snr, alias_db
+
+
+def cpu(in_rate: int, out_rate: int) -> float:
+    c = PcmConverter(in_rate, out_rate)
+    pcm = tone(in_rate, 1000, 1).astype(np.int16).tobytes()
+    frames = [pcm[i:i + in_rate // 50] for i in range(0, len(pcm), in_rate // 50)]
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for f in frames:
+            c.process(f)
+        best = min(best, (time.perf_counter() - start) / len(frames))
+    return best
+
+
+def main():
+    print("pair             polyphase snr/alias      linear snr/alias     us per 10 ms frame")
+    for in_rate, out_rate in PAIRS:
+        snr, alias = quality(polyphase, in_rate, out_rate)
+        lsnr, lalias = quality(linear, in_rate, out_rate)
+        print(f"{in_rate:>5} -> {out_rate:<5}  {snr:6.1f} dB {alias:7.1f} dB    "
+              f"{lsnr:6.1f} dB {lalias:7.1f} dB    {cpu(in_rate, out_rate) * 1e6:6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+"""Cost of serializing uplink audio, per 100 ms of pcm16 24 kHz mono.
+
+    python tests/bench_serializer.py
+"""
+import base64
+import json
+import os
+import sys
+import time
+from dataclasses import asdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from openai_v2v_python.realtime.struct import (  # noqa: E402
+    InputAudioBufferAppend,
+    input_audio_buffer_append_json,
+    to_json,
+)
+
+CHUNK = os.urandom(4800)  # 100 ms at 24 kHz, 2 bytes per sample
+
+
+def legacy(audio_data: bytes) -> str:
+    message = InputAudioBufferAppend(
+        audio=base64.b64encode(audio_data).decode("utf-8"))
+    return json.dumps(asdict(
+        message,
+        dict_factory=lambda x: {k: v for (k, v) in x if v is not None}))
+
+
+def compiled(audio_data: bytes) -> str:
+    return to_json(InputAudioBufferAppend(
+        audio=base64.b64encode(audio_data).decode("utf-8")))
+
+
+def run(serialize, rounds: int = 20000) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        serialize(CHUNK)
+    return (time.perf_counter() - start) / rounds
+
+
+def main():
+    base = run(legacy)
+    print(f"asdict + json.dumps:  {base * 1e6:.2f} us/100ms")
+    for name, serialize in (("compiled serializer", compiled),
+                            ("append template", input_audio_buffer_append_json)):
+        t = run(serialize)
+        print(f"{name + ':':<21} {t * 1e6:.2f} us/100ms ({base / t:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
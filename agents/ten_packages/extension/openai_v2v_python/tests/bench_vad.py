@@ -0,0 +1,102 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+"""Offline endpointing benchmark of the client side VAD.
+
+    python tests/bench_vad.py [recording.pcm]
+
+The recording is pcm16 mono 24 kHz, e.g. the user track of the flight
+recorder. The reference end of speech is the last 10 ms window above the
+threshold before each detected end of turn, so for recordings the delay is
+what the hangover adds on top. Without a recording, a synthetic conversation
+(utterances of 4 Hz modulated tones with short pauses, over a noise floor)
+with known speech ends is used.
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from openai_v2v_python.vad import EnergyVad  # noqa: E402
+
+SAMPLE_RATE = 24000
+FRAME_BYTES = SAMPLE_RATE // 100 * 2
+
+
+def synthesize(turns: int = 40) -> tuple[bytes, list[float]]:
+    rng = np.random.default_rng(1)
+    parts, ends, t = [], [], 0.0
+
+    def add(samples: np.ndarray):
+        nonlocal t
+        parts.append(samples)
+        t += len(samples) / SAMPLE_RATE
+
+    for _ in range(turns):
+        add(rng.normal(0, 30, int(SAMPLE_RATE * rng.uniform(1, 3))))
+        # a few words separated by pauses shorter than the hangover
+        for _ in range(rng.integers(1, 4)):
+            n = int(SAMPLE_RATE * rng.uniform(0.4, 1.5))
+            x = np.arange(n) / SAMPLE_RATE
+            envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * x)
+            add(8000 * envelope * np.sin(2 * np.pi * rng.uniform(120, 250) * x) + rng.normal(0, 30, n))
+            add(rng.normal(0, 30, int(SAMPLE_RATE * rng.uniform(0.05, 0.2))))
+        t -= len(parts.pop()) / SAMPLE_RATE
+        ends.append(t)
+    add(rng.normal(0, 30, SAMPLE_RATE * 2))
+    return np.concatenate(parts).clip(-32768, 32767).astype(np.int16).tobytes(), ends
+
+
+def reference_ends(pcm: bytes, detected: list[float], threshold_db: float) -> list[float]:
+    samples = np.frombuffer(pcm, dtype=np.int16)
+    windows = samples[:len(samples) // 240 * 240].reshape(-1, 240).astype(np.float32)
+    loud = np.sqrt((windows ** 2).mean(axis=1)) > 10 ** (threshold_db / 20) * 32768
+    ends = []
+    for d in detected:
+        idx = np.nonzero(loud[:int(d * 100)])[0]
+        ends.append((idx[-1] + 1) / 100 if len(idx) else d)
+    return ends
+
+
+def run(pcm: bytes, hangover_ms: int, threshold_db: float):
+    vad = EnergyVad(SAMPLE_RATE, threshold_db=threshold_db, hangover_ms=hangover_ms)
+    detected, sent = [], 0
+    start = time.perf_counter()
+    for i in range(0, len(pcm), FRAME_BYTES):
+        for e in vad.process(pcm[i:i + FRAME_BYTES]):
+            sent += len(e.audio)
+            if e.ended:
+                detected.append((i + FRAME_BYTES) / (SAMPLE_RATE * 2))
+    cost = (time.perf_counter() - start) / (len(pcm) / FRAME_BYTES)
+    return detected, sent, cost
+
+
+def main():
+    threshold_db = -40.0
+    if len(sys.argv) > 1:
+        pcm = Path(sys.argv[1]).read_bytes()
+        truth = None
+    else:
+        pcm, truth = synthesize()
+    print(f"audio: {len(pcm) / (SAMPLE_RATE * 2):.1f}s")
+
+    for hangover_ms in (300, 500, 700):
+        detected, sent, cost = run(pcm, hangover_ms, threshold_db)
+        ends = truth if truth and len(truth) == len(detected) else reference_ends(pcm, detected, threshold_db)
+        delays = np.array(detected) - np.array(ends) if detected else np.zeros(1)
+        turns = f"{len(detected)} turns" + (f" of {len(truth)}" if truth else "")
+        print(f"hangover {hangover_ms} ms: {turns}, "
+              f"endpoint delay mean {delays.mean() * 1000:.0f} ms p95 {np.percentile(delays, 95) * 1000:.0f} ms, "
+              f"uplink {sent / len(pcm):.0%} of the audio, {cost * 1e6:.1f} us per 10 ms frame")
+    print("server vad streams 100% of the audio and ends turns after silence_duration_ms "
+          "(500 ms by default) plus the round trip of the speech_stopped event")
+
+
+if __name__ == "__main__":
+    main()
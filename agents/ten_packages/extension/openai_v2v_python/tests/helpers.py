@@ -0,0 +1,31 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import asyncio
+
+
+class TenEnvRecorder:
+    def __init__(self):
+        self.data = []
+        self.cmds = []
+        self.audio_frames = []
+
+    def send_data(self, data) -> None:
+        self.data.append(data)
+
+    def send_cmd(self, cmd, callback=None) -> None:
+        self.cmds.append(cmd)
+
+    def send_audio_frame(self, frame) -> None:
+        self.audio_frames.append(frame)
+
+
+async def wait_for(predicate, timeout: float = 5):
+    async def wait():
+        while not predicate():
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(wait(), timeout)
@@ -0,0 +1,93 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import asyncio
+
+from openai_v2v_python.audio_buffer import AudioRingBuffer
+from openai_v2v_python.extension import OpenAIV2VExtension
+
+
+def test_ring_buffer_wraps_in_order():
+    rb = AudioRingBuffer(10)
+    assert rb.write(b"abcdef") == 0
+    assert rb.read(4) == b"abcd"
+    assert rb.write(b"ghijkl") == 0
+    assert len(rb) == 8
+    assert rb.read() == b"efghijkl"
+    assert len(rb) == 0
+    assert rb.read() == b""
+
+
+def test_ring_buffer_drops_oldest():
+    rb = AudioRingBuffer(8)
+    rb.write(b"0123")
+    assert rb.write(b"456789") == 2
+    assert rb.read() == b"23456789"
+    assert rb.write(b"abcdefghijkl") == 4
+    assert rb.read() == b"efghijkl"
+    assert rb.dropped == 6
+
+
+class SlowConnection:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.sent: list[bytes] = []
+
+    async def send_audio_data(self, audio_data: bytes):
+        await asyncio.sleep(self.delay)
+        self.sent.append(audio_data)
+
+
+def _extension(conn) -> OpenAIV2VExtension:
+    ext = OpenAIV2VExtension("test")
+    ext.audio_flush_interval_ms = 100
+    ext.max_buffered_audio_ms = 500
+    ext.out_audio_buff = AudioRingBuffer(ext._audio_bytes(500))
+    ext.conn = conn
+    return ext
+
+
+def _frame(i: int) -> bytes:
+    # 10 ms of pcm16 24 kHz
+    return bytes([i % 256]) * 480
+
+
+def test_pre_session_audio_is_capped():
+    async def run():
+        conn = SlowConnection(0)
+        ext = _extension(conn)
+        for i in range(300):
+            await ext._on_audio(_frame(i))
+        assert conn.sent == []
+        assert len(ext.out_audio_buff) == ext._audio_bytes(500)
+
+        ext.session_id = "session"
+        await ext._on_audio(_frame(300))
+        sent = b"".join(conn.sent)
+        # only the latest 500 ms survive, in order
+        assert sent == b"".join(_frame(i) for i in range(251, 301))
+
+    asyncio.run(run())
+
+
+def test_slow_send_merges_chunks():
+    async def run():
+        conn = SlowConnection(0.05)
+        ext = _extension(conn)
+        ext.session_id = "session"
+        frames = [_frame(i) for i in range(100)]
+        for f in frames:
+            asyncio.ensure_future(ext._on_audio(f))
+            await asyncio.sleep(0.001)
+        while ext.out_audio_sending:
+            await asyncio.sleep(0.01)
+
+        assert b"".join(conn.sent) + ext.out_audio_buff.read() == b"".join(frames)
+        # fewer, larger appends than one per 100 ms of audio
+        assert len(conn.sent) < 10
+        assert all(len(s) <= ext._audio_bytes(500) for s in conn.sent)
+
+    asyncio.run(run())
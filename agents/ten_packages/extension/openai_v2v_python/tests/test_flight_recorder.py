@@ -0,0 +1,38 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import wave
+
+from openai_v2v_python.flight_recorder import FlightRecorder
+
+
+def _read_wav(path: str) -> tuple[int, bytes]:
+    with wave.open(path, "rb") as f:
+        return f.getframerate(), f.readframes(f.getnframes())
+
+
+def test_snapshot_keeps_last_seconds(tmp_path):
+    recorder = FlightRecorder({"in": 100, "out": 200}, seconds=2, directory=str(tmp_path))
+    # 10 chunks of 0.5 s for each track, only the last 2 s are kept
+    for i in range(10):
+        recorder.record("in", bytes([i]) * 100)
+        recorder.record("out", bytes([i]) * 200)
+
+    paths = recorder.snapshot("session").result()
+    assert paths == [str(tmp_path / "session_in.wav"), str(tmp_path / "session_out.wav")]
+
+    rate, data = _read_wav(paths[0])
+    assert rate == 100
+    assert data == b"".join(bytes([i]) * 100 for i in range(6, 10))
+    rate, data = _read_wav(paths[1])
+    assert rate == 200
+    assert data == b"".join(bytes([i]) * 200 for i in range(6, 10))
+
+    # a snapshot does not consume the recording
+    recorder.record("in", bytes([10]) * 100)
+    _, data = _read_wav(recorder.snapshot("again").result()[0])
+    assert data == b"".join(bytes([i]) * 100 for i in range(7, 11))
+    recorder.close()
@@ -0,0 +1,89 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import base64
+import json
+import warnings
+
+import numpy as np
+import pytest
+
+from openai_v2v_python.extension import OpenAIV2VExtension
+from openai_v2v_python.g711 import G711_SAMPLE_RATE, G711Codec
+from openai_v2v_python.realtime.struct import AudioFormats, to_json
+
+from helpers import TenEnvRecorder
+
+FORMATS = [AudioFormats.G711_ULAW, AudioFormats.G711_ALAW]
+ALL_SAMPLES = np.arange(-32768, 32768, dtype=np.int16)
+
+
+@pytest.mark.parametrize("audio_format", FORMATS)
+def test_matches_reference(audio_format):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        audioop = pytest.importorskip("audioop")
+    encode, decode = {
+        AudioFormats.G711_ULAW: (audioop.lin2ulaw, audioop.ulaw2lin),
+        AudioFormats.G711_ALAW: (audioop.lin2alaw, audioop.alaw2lin),
+    }[audio_format]
+    codec = G711Codec(audio_format)
+    pcm = ALL_SAMPLES.tobytes()
+    assert codec.encode(pcm) == encode(pcm, 2)
+    codes = bytes(range(256))
+    assert codec.decode(codes) == decode(codes, 2)
+
+
+@pytest.mark.parametrize("audio_format", FORMATS)
+def test_codes_round_trip(audio_format):
+    codec = G711Codec(audio_format)
+    codes = bytes(range(256))
+    round_trip = codec.encode(codec.decode(codes))
+    if audio_format == AudioFormats.G711_ULAW:
+        # negative zero decodes to 0, which is encoded as positive zero
+        assert round_trip == codes.replace(b"\x7f", b"\xff")
+    else:
+        assert round_trip == codes
+
+
+@pytest.mark.parametrize("audio_format", FORMATS)
+def test_samples_round_trip(audio_format):
+    codec = G711Codec(audio_format)
+    decoded = np.frombuffer(codec.decode(codec.encode(ALL_SAMPLES.tobytes())), dtype=np.int16)
+    # quantization keeps the order of samples
+    assert np.all(np.diff(decoded.astype(np.int32)) >= 0)
+
+    t = np.arange(G711_SAMPLE_RATE) / G711_SAMPLE_RATE
+    tone = (16000 * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+    decoded = np.frombuffer(codec.decode(codec.encode(tone.tobytes())), dtype=np.int16)
+    noise = decoded.astype(np.float64) - tone
+    snr = 10 * np.log10(np.mean(tone.astype(np.float64) ** 2) / np.mean(noise ** 2))
+    assert snr > 35
+
+
+def test_not_g711():
+    with pytest.raises(ValueError):
+        G711Codec(AudioFormats.PCM16)
+
+
+def test_session_uses_g711():
+    ext = OpenAIV2VExtension("test")
+    ext.config.audio_format = AudioFormats.G711_ALAW
+    session = json.loads(to_json(ext._update_session()))["session"]
+    assert session["input_audio_format"] == "g711_alaw"
+    assert session["output_audio_format"] == "g711_alaw"
+
+
+def test_downlink_is_decoded():
+    ext = OpenAIV2VExtension("test")
+    ext.codec = G711Codec(AudioFormats.G711_ULAW)
+    ext.audio_frame_template = (G711_SAMPLE_RATE, 2, 1)
+    env = TenEnvRecorder()
+    codes = bytes(range(256))
+    assert ext._on_audio_delta(env, base64.b64encode(codes).decode()) == 512
+    frame = env.audio_frames[0]
+    assert frame.get_sample_rate() == G711_SAMPLE_RATE
+    assert frame.get_buf() == ext.codec.decode(codes)
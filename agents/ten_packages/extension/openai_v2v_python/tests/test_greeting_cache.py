@@ -0,0 +1,165 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import asyncio
+import base64
+import json
+import os
+
+from aiohttp import web
+
+from openai_v2v_python.extension import OpenAIV2VExtension
+from openai_v2v_python.greeting_cache import CachedGreeting, GreetingCache
+from openai_v2v_python.realtime.connection import close_shared_client_session
+
+from helpers import TenEnvRecorder, wait_for
+
+GREETING_AUDIO = bytes(range(256)) * 40
+
+
+def test_cache_roundtrip(tmp_path):
+    cache = GreetingCache(str(tmp_path / "greetings"))
+    key = GreetingCache.key("alloy", "en-US", "Hi", 24000)
+    assert cache.get(key) is None
+
+    cache.put(key, CachedGreeting(b"\x01\x02" * 10, "Hello!"))
+    assert cache.get(key) == CachedGreeting(b"\x01\x02" * 10, "Hello!")
+    assert sorted(os.listdir(tmp_path / "greetings")) == [f"{key}.json", f"{key}.pcm"]
+
+
+def test_cache_key_is_content_addressed():
+    key = GreetingCache.key("alloy", "en-US", "Hi", 24000)
+    assert key == GreetingCache.key("alloy", "en-US", "Hi", 24000)
+    assert len({
+        key,
+        GreetingCache.key("echo", "en-US", "Hi", 24000),
+        GreetingCache.key("alloy", "zh-CN", "Hi", 24000),
+        GreetingCache.key("alloy", "en-US", "Hello", 24000),
+        GreetingCache.key("alloy", "en-US", "Hi", 16000),
+        # parts are delimited
+        GreetingCache.key("alloyen-US", "", "Hi", 24000),
+    }) == 6
+
+
+def test_cache_ignores_partial_entry(tmp_path):
+    cache = GreetingCache(str(tmp_path))
+    key = GreetingCache.key("alloy", "en-US", "Hi", 24000)
+    cache.put(key, CachedGreeting(b"\x01\x02" * 10, "Hello!"))
+    with open(tmp_path / f"{key}.pcm", "wb") as f:
+        f.write(b"\x01\x02")
+    assert cache.get(key) is None
+
+
+class GreetingServer:
+    """Local stand-in for the realtime API that speaks the greeting on response.create."""
+
+    def __init__(self):
+        self.sessions: list[list[dict]] = []
+        self.runner: web.AppRunner = None
+        self.port = 0
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/v1/realtime", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    async def handle(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        received = []
+        self.sessions.append(received)
+        await ws.send_json({
+            "type": "session.created", "event_id": "e",
+            "session": {"id": f"sess_{len(self.sessions)}", "model": "m", "expires_at": 0}})
+
+        async for msg in ws:
+            event = json.loads(msg.data)
+            received.append(event)
+            if event["type"] != "response.create":
+                continue
+            response = {"id": "resp_greeting", "status": "in_progress", "output": []}
+            await ws.send_json({"type": "response.created", "event_id": "e", "response": response})
+            half = len(GREETING_AUDIO) // 2
+            for chunk in (GREETING_AUDIO[:half], GREETING_AUDIO[half:]):
+                await ws.send_json({
+                    "type": "response.audio.delta", "event_id": "e", "response_id": "resp_greeting",
+                    "item_id": "item_greeting", "output_index": 0, "content_index": 0,
+                    "delta": base64.b64encode(chunk).decode()})
+            await ws.send_json({
+                "type": "response.audio_transcript.done", "event_id": "e",
+                "response_id": "resp_greeting", "item_id": "item_greeting",
+                "output_index": 0, "content_index": 0, "transcript": "Hello there!"})
+            await ws.send_json({
+                "type": "response.done", "event_id": "e",
+                "response": dict(response, status="completed")})
+        return ws
+
+
+def _extension(port: int, cache_path: str) -> OpenAIV2VExtension:
+    ext = OpenAIV2VExtension("test")
+    ext.config.base_uri = f"http://127.0.0.1:{port}"
+    ext.config.api_key = "key"
+    ext.max_reconnect_attempts = 0
+    ext.greeting_cache_path = cache_path
+    ext._load_cached_greeting()
+    return ext
+
+
+async def _run_session(ext: OpenAIV2VExtension, env: TenEnvRecorder, until):
+    await ext._init_connection()
+    task = asyncio.create_task(ext._run_client_loop(env))
+    try:
+        await wait_for(until)
+    finally:
+        ext.stopped = True
+        await ext.conn.close()
+        await task
+        await close_shared_client_session()
+
+
+def test_greeting_is_cached_and_played_before_session(tmp_path):
+    async def run():
+        server = GreetingServer()
+        await server.start()
+        cache_path = str(tmp_path / "greetings")
+        try:
+            # first session, the model speaks the greeting and it is stored
+            ext = _extension(server.port, cache_path)
+            assert ext.cached_greeting is None
+            ext.remote_stream_id = 1
+            await _run_session(ext, TenEnvRecorder(),
+                               lambda: GreetingCache(cache_path).get(ext.greeting_key) is not None)
+            assert [e["type"] for e in server.sessions[0]] == [
+                "session.update", "conversation.item.create", "response.create"]
+
+            # second session, the greeting is played before connecting
+            ext = _extension(server.port, cache_path)
+            assert ext.cached_greeting == CachedGreeting(GREETING_AUDIO, "Hello there!")
+            env = TenEnvRecorder()
+            ext._play_cached_greeting(env)
+            assert b"".join(f.get_buf() for f in env.audio_frames) == GREETING_AUDIO
+            assert env.data[0].get_property_string("text") == "Hello there!"
+
+            ext.remote_stream_id = 1
+            await _run_session(ext, env, lambda: len(server.sessions) == 2 and len(server.sessions[1]) >= 3)
+            await asyncio.sleep(0.05)
+            second = server.sessions[1]
+            # recorded into the conversation, no response is generated
+            assert [e["type"] for e in second] == [
+                "session.update", "conversation.item.create", "conversation.item.create"]
+            assert second[2]["item"]["role"] == "assistant"
+            assert second[2]["item"]["content"] == [{"type": "text", "text": "Hello there!"}]
+        finally:
+            await server.stop()
+
+    asyncio.run(run())
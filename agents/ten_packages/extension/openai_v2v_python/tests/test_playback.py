@@ -0,0 +1,123 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import pytest
+
+from openai_v2v_python.playback import PlaybackTracker, TruncatePoint
+
+SAMPLE_RATE = 24000
+BYTES_PER_MS = SAMPLE_RATE * 2 // 1000
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_no_audio_no_truncate():
+    tracker = PlaybackTracker(SAMPLE_RATE)
+    assert tracker.interrupt("resp_1") is None
+    assert tracker.is_flushed("resp_1")
+
+
+@pytest.mark.parametrize("chunk_ms, interval_ms, chunks, played_ms", [
+    # deltas arrive faster than real time, the wall clock bounds the offset
+    (40, 10, 50, 500),
+    (100, 35, 7, 245),
+    # deltas arrive slower than real time, the sent audio bounds it
+    (20, 30, 10, 200),
+    (10, 25, 33, 330),
+])
+def test_truncate_at_played_offset(chunk_ms, interval_ms, chunks, played_ms):
+    clock = Clock()
+    tracker = PlaybackTracker(SAMPLE_RATE, clock=clock)
+
+    # a previous item fully played out
+    tracker.on_audio("item_0", 0, 2000 * BYTES_PER_MS)
+    clock.now += 5
+
+    for _ in range(chunks):
+        tracker.on_audio("item_1", 0, chunk_ms * BYTES_PER_MS)
+        clock.now += interval_ms / 1000
+
+    assert tracker.interrupt("resp_1") == TruncatePoint("item_1", 0, played_ms)
+    # nothing left to truncate until the next item starts
+    assert tracker.interrupt("resp_1") is None
+
+
+def test_truncate_sent_ahead_of_playback():
+    clock = Clock()
+    tracker = PlaybackTracker(SAMPLE_RATE, clock=clock)
+    # 3 s of audio arrive in a burst, the user interrupts 1.25 s in
+    tracker.on_audio("item_1", 0, 3000 * BYTES_PER_MS)
+    clock.now += 1.25
+    assert tracker.interrupt("resp_1") == TruncatePoint("item_1", 0, 1250)
+
+
+def test_truncate_at_sent_audio():
+    clock = Clock()
+    tracker = PlaybackTracker(SAMPLE_RATE, clock=clock)
+    # audio streams slower than real time, only what was sent has been heard
+    for _ in range(10):
+        tracker.on_audio("item_1", 1, 100 * BYTES_PER_MS)
+        clock.now += 0.2
+    assert tracker.interrupt("resp_1") == TruncatePoint("item_1", 1, 1000)
+
+
+def test_truncate_does_not_pass_the_sent_audio():
+    clock = Clock()
+    tracker = PlaybackTracker(SAMPLE_RATE, clock=clock)
+    # 1249.98 ms of audio, a partial sample short of 1250
+    tracker.on_audio("item_1", 0, 59999)
+    clock.now += 1.3
+    assert tracker.interrupt("resp_1") == TruncatePoint("item_1", 0, 1249)
+
+    tracker.on_audio("item_2", 0, 59999)
+    clock.now += 0.5
+    assert tracker.interrupt("resp_2") == TruncatePoint("item_2", 0, 500)
+
+
+def test_no_truncate_once_played_out():
+    clock = Clock()
+    tracker = PlaybackTracker(SAMPLE_RATE, clock=clock)
+    tracker.on_audio("item_1", 0, 59999, "resp_1")
+    tracker.on_done("resp_1")
+    clock.now += 0.6
+    # still playing
+    assert tracker.interrupt("resp_2") == TruncatePoint("item_1", 0, 600)
+
+    tracker.on_audio("item_2", 0, 59999, "resp_3")
+    tracker.on_done("resp_3")
+    clock.now += 2
+    assert tracker.interrupt("resp_4") is None
+    assert tracker.interrupt("resp_4") is None
+
+    # more audio may come until the response is done
+    tracker.on_audio("item_3", 0, 1000 * BYTES_PER_MS, "resp_5")
+    clock.now += 2
+    assert tracker.interrupt("resp_6") == TruncatePoint("item_3", 0, 1000)
+
+
+def test_new_content_index_restarts_offset():
+    clock = Clock()
+    tracker = PlaybackTracker(SAMPLE_RATE, clock=clock)
+    tracker.on_audio("item_1", 0, 500 * BYTES_PER_MS)
+    clock.now += 1
+    tracker.on_audio("item_1", 1, 300 * BYTES_PER_MS)
+    clock.now += 1
+    assert tracker.interrupt() == TruncatePoint("item_1", 1, 300)
+
+
+def test_flushed_responses_are_bounded():
+    tracker = PlaybackTracker(SAMPLE_RATE, max_flushed=4)
+    for i in range(10):
+        tracker.interrupt(f"resp_{i}")
+    assert len(tracker.flushed) == 4
+    assert not tracker.is_flushed("resp_5")
+    assert all(tracker.is_flushed(f"resp_{i}") for i in range(6, 10))
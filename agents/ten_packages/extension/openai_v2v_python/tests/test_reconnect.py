@@ -0,0 +1,219 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import asyncio
+import json
+import threading
+import time
+
+from aiohttp import web
+
+from openai_v2v_python.extension import OpenAIV2VExtension
+from openai_v2v_python.realtime.connection import close_shared_client_session
+from openai_v2v_python.tools import ToolCallScheduler, ToolRegistry
+
+from helpers import TenEnvRecorder, wait_for
+
+
+class RealtimeServer:
+    """Local stand-in for the realtime API, drops the first connection once
+    a response is done."""
+
+    def __init__(self):
+        self.sessions: list[list[dict]] = []
+        self.runner: web.AppRunner = None
+        self.port = 0
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/v1/realtime", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    async def handle(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        received = []
+        self.sessions.append(received)
+        session_id = f"sess_{len(self.sessions)}"
+        await ws.send_json({
+            "type": "session.created", "event_id": "e",
+            "session": {"id": session_id, "model": "m", "expires_at": 0}})
+
+        async for msg in ws:
+            event = json.loads(msg.data)
+            received.append(event)
+            if len(self.sessions) == 1 and event["type"] == "response.create":
+                await ws.send_json({
+                    "type": "conversation.item.created", "event_id": "e",
+                    "item": {"id": "item_user", "type": "message", "role": "user",
+                             "status": "completed",
+                             "content": [{"type": "input_audio", "transcript": None}]}})
+                await ws.send_json({
+                    "type": "conversation.item.input_audio_transcription.completed",
+                    "event_id": "e", "item_id": "item_user", "content_index": 0,
+                    "transcript": "what's the weather"})
+                await ws.send_json({
+                    "type": "response.done", "event_id": "e",
+                    "response": {"id": "resp_1", "status": "completed", "output": [
+                        {"id": "item_assistant", "type": "message", "role": "assistant",
+                         "status": "completed",
+                         "content": [{"type": "audio", "transcript": "It is sunny."}]}]}})
+                await ws.close()
+        return ws
+
+
+def _extension(port: int) -> OpenAIV2VExtension:
+    ext = OpenAIV2VExtension("test")
+    ext.config.base_uri = f"http://127.0.0.1:{port}"
+    ext.config.api_key = "key"
+    ext.max_history = 10
+    ext.reconnect_delay = 0.01
+    return ext
+
+
+def test_reconnect_replays_history():
+    async def run():
+        server = RealtimeServer()
+        await server.start()
+        ext = _extension(server.port)
+        ext.remote_stream_id = 1
+        await ext._init_connection()
+        task = asyncio.create_task(ext._run_client_loop(TenEnvRecorder()))
+        try:
+            await wait_for(lambda: len(server.sessions) == 2 and len(server.sessions[1]) >= 3)
+        finally:
+            ext.stopped = True
+            await ext.conn.close()
+            await task
+            await close_shared_client_session()
+            await server.stop()
+
+        first, second = server.sessions
+        assert [e["type"] for e in first[:3]] == [
+            "session.update", "conversation.item.create", "response.create"]
+
+        assert [e["type"] for e in second] == [
+            "session.update", "conversation.item.create", "conversation.item.create"]
+        user, assistant = second[1]["item"], second[2]["item"]
+        assert user["id"] == "item_user"
+        assert user["content"] == [{"type": "input_text", "text": "what's the weather"}]
+        assert assistant["id"] == "item_assistant"
+        assert assistant["role"] == "assistant"
+        assert assistant["content"] == [{"type": "text", "text": "It is sunny."}]
+        assert second[2]["previous_item_id"] == "item_user"
+
+    asyncio.run(run())
+
+
+def test_prewarm_greets_when_user_joins():
+    async def run():
+        server = RealtimeServer()
+        await server.start()
+        ext = _extension(server.port)
+        ext.max_reconnect_attempts = 0
+        await ext._init_connection()
+        task = asyncio.create_task(ext._run_client_loop(TenEnvRecorder()))
+        try:
+            await wait_for(lambda: ext.session_id != "" and server.sessions and server.sessions[0])
+            await asyncio.sleep(0.05)
+            # connected and configured, but no greeting without a user
+            assert [e["type"] for e in server.sessions[0]] == ["session.update"]
+
+            ext.remote_stream_id = 1
+            await ext._greet()
+            await wait_for(lambda: len(server.sessions[0]) >= 3)
+            assert [e["type"] for e in server.sessions[0][1:3]] == [
+                "conversation.item.create", "response.create"]
+        finally:
+            ext.stopped = True
+            await ext.conn.close()
+            await task
+            await close_shared_client_session()
+            await server.stop()
+
+    asyncio.run(run())
+
+
+def test_reconnect_resets_session_state():
+    async def run():
+        server = RealtimeServer()
+        await server.start()
+        ext = _extension(server.port)
+        ext.remote_stream_id = 1
+        registry = ToolRegistry()
+
+        async def hang(name: str, args: str) -> str:
+            await asyncio.sleep(10)
+            return "late"
+
+        registry.register(name="hang", description="hang", callback=hang)
+        ext.tool_scheduler = ToolCallScheduler(registry, ext._on_tool_output)
+        await ext._init_connection()
+        # a call in flight and an item being played in the first session
+        ext.tool_calls_pending += 1
+        ext.tool_scheduler.submit("c1", "hang", "{}")
+        call = ext.tool_scheduler.pending[0][1]
+        ext.playback.on_audio("item_assistant", 0, 4800)
+        task = asyncio.create_task(ext._run_client_loop(TenEnvRecorder()))
+        try:
+            await wait_for(lambda: ext.session_id == "sess_2")
+            assert call.cancelled()
+            assert not ext.tool_scheduler.pending
+            assert ext.tool_calls_pending == 0
+            # nothing of the first session is truncated on the next barge-in
+            assert ext.playback.interrupt("resp_2") is None
+        finally:
+            ext.stopped = True
+            await ext.conn.close()
+            await task
+            await close_shared_client_session()
+            await server.stop()
+
+        assert not any(e["type"] == "conversation.item.create" and e["item"]["type"] == "function_call_output"
+                       for e in server.sessions[1])
+
+    asyncio.run(run())
+
+
+def test_stop_closes_client_session():
+    server_loop = asyncio.new_event_loop()
+    server_thread = threading.Thread(target=server_loop.run_forever)
+    server_thread.start()
+    server = RealtimeServer()
+    asyncio.run_coroutine_threadsafe(server.start(), server_loop).result()
+
+    class Env(TenEnvRecorder):
+        def on_stop_done(self) -> None:
+            pass
+
+    ext = _extension(server.port)
+    ext.max_reconnect_attempts = 0
+    ext.thread = threading.Thread(target=ext.loop.run_forever)
+    ext.thread.start()
+    try:
+        asyncio.run_coroutine_threadsafe(ext._init_connection(), ext.loop).result()
+        ext._start_client_loop(Env())
+        deadline = time.monotonic() + 5
+        while not ext.session_id and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert ext.session_id == "sess_1"
+        session = ext.conn.session
+        ext.on_stop(Env())
+        assert session.closed
+        assert ext.conn.websocket is None
+    finally:
+        asyncio.run_coroutine_threadsafe(server.stop(), server_loop).result()
+        server_loop.call_soon_threadsafe(server_loop.stop)
+        server_thread.join()
+        server_loop.close()
+        ext.loop.close()
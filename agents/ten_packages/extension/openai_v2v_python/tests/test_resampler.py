@@ -0,0 +1,81 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import numpy as np
+import pytest
+
+from openai_v2v_python.extension import OpenAIV2VExtension
+from openai_v2v_python.resampler import PcmConverter, Resampler
+from ten import AudioFrame
+
+RATES = [(16000, 24000), (24000, 16000), (48000, 16000), (22050, 16000), (32000, 24000), (44100, 48000)]
+
+
+def _tone(rate: int, freq: float, seconds: float = 1, channels: int = 1) -> np.ndarray:
+    t = np.arange(int(rate * seconds)) / rate
+    return np.repeat((10000 * np.sin(2 * np.pi * freq * t))[:, None], channels, axis=1)
+
+
+def _stream(r: Resampler, x: np.ndarray, frame: int) -> np.ndarray:
+    return np.concatenate([r.process(x[i:i + frame]) for i in range(0, len(x), frame)])
+
+
+@pytest.mark.parametrize("in_rate,out_rate", RATES)
+def test_tone_quality(in_rate, out_rate):
+    r = Resampler(in_rate, out_rate)
+    y = _stream(r, _tone(in_rate, 1000), in_rate // 100)[:, 0]
+    assert abs(len(y) - out_rate) <= 1
+
+    ideal = 10000 * np.sin(2 * np.pi * 1000 * (np.arange(len(y)) - r.delay) / out_rate)
+    s = slice(out_rate // 10, len(y) - out_rate // 10)
+    snr = 10 * np.log10(np.mean(ideal[s] ** 2) / np.mean((y[s] - ideal[s]) ** 2))
+    assert snr > 80
+
+
+def test_rejects_aliases():
+    # 12 kHz is above the 8 kHz nyquist of 16 kHz
+    y = _stream(Resampler(48000, 16000), _tone(48000, 12000), 480)[1600:]
+    assert 20 * np.log10(np.abs(y).max() / 10000) < -60
+
+
+def test_chunking_does_not_change_output():
+    x = _tone(44100, 440, channels=2)
+    whole = Resampler(44100, 48000, channels=2).process(x)
+    for frame in (1, 441, 1000):
+        assert np.allclose(_stream(Resampler(44100, 48000, channels=2), x, frame), whole, atol=1e-3)
+
+
+def test_converter_layout_and_width():
+    stereo32 = (_tone(48000, 500, 0.1, channels=2) * 65536).astype(np.int32)
+    c = PcmConverter(48000, 16000, in_channels=2, in_width=4)
+    data = stereo32.tobytes()
+    # split inside a sample
+    out = c.process(data[:1001]) + c.process(data[1001:])
+    mono16 = np.frombuffer(out, dtype=np.int16)
+    assert abs(len(mono16) - 1600) <= 1
+    assert 9900 < np.abs(mono16[200:]).max() <= 10001
+
+    c = PcmConverter(16000, 16000, out_channels=2, out_width=1)
+    out = np.frombuffer(c.process(np.array([0, 256, -256], dtype=np.int16).tobytes()), dtype=np.uint8)
+    assert out.tolist() == [128, 128, 129, 129, 127, 127]
+
+    c = PcmConverter(24000, 24000)
+    assert c.passthrough and c.process(b"\x01\x02") == b"\x01\x02"
+
+
+def test_input_frames_are_converted():
+    ext = OpenAIV2VExtension("test")
+    frame = AudioFrame.create("pcm_frame")
+    frame.set_sample_rate(48000)
+    frame.set_number_of_channels(2)
+    frame.set_bytes_per_sample(2)
+    frame.alloc_buf(480 * 2 * 2)
+    assert len(ext._convert_input(frame)) == 240 * 2
+
+    frame.set_sample_rate(24000)
+    frame.set_number_of_channels(1)
+    frame.alloc_buf(480)
+    assert len(ext._convert_input(frame)) == 480
@@ -0,0 +1,142 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import base64
+import json
+from dataclasses import asdict
+
+import pytest
+
+from openai_v2v_python.realtime.struct import (
+    SERVER_MESSAGE_TYPES,
+    SERVER_MESSAGE_VIEWS,
+    ContentType,
+    EventType,
+    FunctionCallOutputItemParam,
+    InputAudioBufferAppend,
+    InputAudioBufferCommit,
+    InputAudioTranscription,
+    ItemCreate,
+    ItemTruncate,
+    NULL,
+    ResponseAudioDelta,
+    ResponseAudioTranscriptDelta,
+    ResponseCreate,
+    ResponseDone,
+    ServerVADUpdateParams,
+    SessionCreated,
+    SessionUpdate,
+    SessionUpdateParams,
+    UserMessageItemParam,
+    Voices,
+    from_dict,
+    input_audio_buffer_append_json,
+    parse_server_message,
+    to_json,
+)
+
+
+def _delta(event_type: str, delta: str) -> dict:
+    return {
+        "type": event_type,
+        "event_id": "event_1",
+        "response_id": "resp_1",
+        "item_id": "item_1",
+        "output_index": 0,
+        "content_index": 0,
+        "delta": delta,
+    }
+
+
+@pytest.mark.parametrize("event_type", list(SERVER_MESSAGE_VIEWS))
+def test_view_matches_dataclass(event_type):
+    data = _delta(event_type, "AAAA" * 1024)
+    message = parse_server_message(json.dumps(data))
+    expected = from_dict(SERVER_MESSAGE_TYPES[event_type], data)
+
+    assert isinstance(message, SERVER_MESSAGE_TYPES[event_type])
+    assert type(message) is not SERVER_MESSAGE_TYPES[event_type]
+    for name in expected.__dataclass_fields__:
+        assert getattr(message, name) == getattr(expected, name)
+
+
+def test_view_works_with_match():
+    message = parse_server_message(
+        json.dumps(_delta(EventType.RESPONSE_AUDIO_TRANSCRIPT_DELTA, "hi")))
+    match message:
+        case ResponseAudioDelta():
+            matched = "audio"
+        case ResponseAudioTranscriptDelta():
+            matched = "transcript"
+        case _:
+            matched = None
+    assert matched == "transcript"
+    assert message.delta == "hi"
+
+
+def test_rare_events_use_dataclasses():
+    message = parse_server_message(json.dumps({
+        "type": "session.created",
+        "event_id": "event_2",
+        "session": {"id": "sess_1", "model": "m", "expires_at": 0},
+    }))
+    assert type(message) is SessionCreated
+    assert message.session.id == "sess_1"
+
+    message = parse_server_message(json.dumps({
+        "type": "response.done",
+        "event_id": "event_3",
+        "response": {"id": "resp_1", "status": "completed", "output": []},
+    }))
+    assert type(message) is ResponseDone
+    assert message.response.status == "completed"
+
+
+def test_unknown_event():
+    with pytest.raises(ValueError):
+        parse_server_message(json.dumps({"type": "no.such.event", "event_id": ""}))
+
+
+def _legacy_to_json(obj) -> str:
+    return json.dumps(asdict(
+        obj, dict_factory=lambda x: {k: v for (k, v) in x if v is not None}))
+
+
+@pytest.mark.parametrize("message", [
+    InputAudioBufferAppend(audio="AAAA"),
+    InputAudioBufferCommit(),
+    ItemTruncate(item_id="item_1", content_index=0, audio_end_ms=1234),
+    ItemCreate(item=UserMessageItemParam(
+        content=[{"type": ContentType.InputText, "text": "你好"}])),
+    ItemCreate(item=FunctionCallOutputItemParam(call_id="c", output="{}")),
+    ResponseCreate(),
+    SessionUpdate(session=SessionUpdateParams(
+        instructions="be nice",
+        modalities=["text"],
+        voice=Voices.Alloy,
+        tool_choice="auto",
+        tools=[{"type": "function", "name": "f", "parameters": {"a": None}}],
+        input_audio_transcription=InputAudioTranscription(model="whisper-1"),
+        turn_detection=ServerVADUpdateParams(threshold=0.5),
+    )),
+])
+def test_to_json_matches_asdict(message):
+    assert to_json(message) == _legacy_to_json(message)
+
+
+def test_audio_append_template():
+    pcm = bytes(range(256)) * 19
+    message = input_audio_buffer_append_json(pcm)
+    data = json.loads(message)
+    expected = InputAudioBufferAppend(
+        event_id=data["event_id"], audio=base64.b64encode(pcm).decode("utf-8"))
+    assert message == _legacy_to_json(expected)
+
+
+def test_explicit_null():
+    message = SessionUpdate(session=SessionUpdateParams(voice=Voices.Alloy, turn_detection=NULL))
+    session = json.loads(to_json(message))["session"]
+    assert session == {"voice": "alloy", "turn_detection": None}
@@ -0,0 +1,208 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import asyncio
+import json
+
+from ten import Cmd
+from openai_v2v_python.extension import OpenAIV2VExtension
+from openai_v2v_python.realtime.struct import (
+    ItemCreate, ResponseCreate, parse_server_message)
+from openai_v2v_python.tools import ToolCallScheduler, ToolRegistry
+
+from helpers import TenEnvRecorder, wait_for
+
+
+class Tools:
+    def __init__(self, delays: dict[str, float]):
+        self.delays = delays
+        self.calls: list[tuple[str, str]] = []
+        self.running = 0
+        self.max_running = 0
+        self.registry = ToolRegistry()
+        for name in delays:
+            self.registry.register(name=name, description=name, callback=self.call)
+
+    async def call(self, name: str, args: str) -> str:
+        self.calls.append((name, args))
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delays[name])
+        finally:
+            self.running -= 1
+        return f"{name}:{json.loads(args)['n']}"
+
+
+def _scheduler(tools: Tools, outputs: list, **kwargs) -> ToolCallScheduler:
+    async def on_output(call_id: str, result: str | None):
+        outputs.append((call_id, result))
+
+    return ToolCallScheduler(tools.registry, on_output, **kwargs)
+
+
+async def _drain(scheduler: ToolCallScheduler):
+    while scheduler.pending:
+        await asyncio.sleep(0.01)
+
+
+def test_results_posted_in_call_order():
+    async def run():
+        tools = Tools({"slow": 0.2, "fast": 0.01})
+        outputs = []
+        scheduler = _scheduler(tools, outputs)
+        scheduler.submit("c1", "slow", '{"n": 1}')
+        scheduler.submit("c2", "fast", '{"n": 2}')
+        scheduler.submit("c3", "fast", '{"n": 3}')
+        start = asyncio.get_running_loop().time()
+        await _drain(scheduler)
+        elapsed = asyncio.get_running_loop().time() - start
+
+        assert outputs == [("c1", "slow:1"), ("c2", "fast:2"), ("c3", "fast:3")]
+        # ran concurrently, not one after another
+        assert tools.max_running == 3
+        assert elapsed < 0.3
+
+    asyncio.run(run())
+
+
+def test_concurrency_cap():
+    async def run():
+        tools = Tools({"t": 0.02})
+        outputs = []
+        scheduler = _scheduler(tools, outputs, max_concurrent=2)
+        for i in range(6):
+            scheduler.submit(f"c{i}", "t", json.dumps({"n": i}))
+        await _drain(scheduler)
+        assert tools.max_running == 2
+        assert [o[0] for o in outputs] == [f"c{i}" for i in range(6)]
+
+    asyncio.run(run())
+
+
+def test_timeout_and_unknown_tool():
+    async def run():
+        tools = Tools({"hang": 10, "fast": 0})
+        outputs = []
+        scheduler = _scheduler(tools, outputs, timeout=10)
+        tools.registry.timeouts["hang"] = 0.05
+        scheduler.submit("c1", "hang", '{"n": 1}')
+        scheduler.submit("c2", "missing", '{}')
+        scheduler.submit("c3", "fast", '{"n": 3}')
+        await _drain(scheduler)
+        assert outputs == [("c1", None), ("c2", None), ("c3", "fast:3")]
+
+    asyncio.run(run())
+
+
+def test_cache_by_canonical_args():
+    async def run():
+        now = [0.0]
+        tools = Tools({"t": 0})
+        outputs = []
+        scheduler = _scheduler(tools, outputs, cache_ttl=5, clock=lambda: now[0])
+        scheduler.submit("c1", "t", '{"n": 1, "city": "LA"}')
+        await _drain(scheduler)
+        scheduler.submit("c2", "t", '{"city":"LA","n":1}')
+        await _drain(scheduler)
+        assert len(tools.calls) == 1
+
+        now[0] = 6
+        scheduler.submit("c3", "t", '{"city":"LA","n":1}')
+        await _drain(scheduler)
+        assert len(tools.calls) == 2
+        assert outputs == [("c1", "t:1"), ("c2", "t:1"), ("c3", "t:1")]
+
+    asyncio.run(run())
+
+
+def test_registries_are_separate():
+    a, b = ToolRegistry(), ToolRegistry()
+    a.register(name="weather", description="weather", callback=None)
+    assert "weather" in a.tools
+    assert b.tools == {}
+
+
+def test_tool_timeout_registered_before_start():
+    ext = OpenAIV2VExtension("test")
+    cmd = Cmd.create("tool_register")
+    cmd.set_property_string("name", "weather")
+    cmd.set_property_string("description", "weather")
+    cmd.set_property_string("parameters", "{}")
+    cmd.set_property_int("timeout_ms", 2500)
+    ext._on_tool_register(TenEnvRecorder(), cmd)
+    assert ext.registry.timeouts == {"weather": 2.5}
+    assert "timeout" not in ext.registry.get_tools()[0]
+
+    ext.registry.unregister("weather")
+    assert ext.registry.timeouts == {}
+
+
+class FakeConnection:
+    def __init__(self):
+        self.sent = []
+        self.messages: asyncio.Queue = asyncio.Queue()
+
+    async def send_request(self, message) -> None:
+        self.sent.append(message)
+
+    async def listen(self):
+        while (message := await self.messages.get()) is not None:
+            yield message
+
+    def receive(self, event: dict) -> None:
+        self.messages.put_nowait(parse_server_message(json.dumps({"event_id": "e", **event})))
+
+
+def _call_done(call_id: str) -> dict:
+    return {"type": "response.function_call_arguments.done", "response_id": "resp_1",
+            "item_id": f"item_{call_id}", "output_index": 0, "call_id": call_id,
+            "name": "fast", "arguments": '{"n": 1}'}
+
+
+def test_response_created_once_the_tool_response_is_done():
+    async def run():
+        tools = Tools({"fast": 0})
+        ext = OpenAIV2VExtension("test")
+        ext.conn = conn = FakeConnection()
+        ext.tool_scheduler = ToolCallScheduler(tools.registry, ext._on_tool_output)
+        session = asyncio.create_task(ext._run_session(TenEnvRecorder()))
+
+        # the first call is done before the second one is received
+        conn.receive(_call_done("c1"))
+        await wait_for(lambda: len(conn.sent) == 1)
+        conn.receive(_call_done("c2"))
+        await wait_for(lambda: len(conn.sent) == 2)
+        await asyncio.sleep(0.05)
+        assert all(isinstance(m, ItemCreate) for m in conn.sent)
+
+        conn.receive({"type": "response.done", "response": {"id": "resp_1", "status": "completed"}})
+        await wait_for(lambda: len(conn.sent) == 3)
+        conn.messages.put_nowait(None)
+        await session
+        assert isinstance(conn.sent[2], ResponseCreate)
+        assert [m.item.call_id for m in conn.sent[:2]] == ["c1", "c2"]
+
+    asyncio.run(run())
+
+
+def test_outputs_after_the_response_is_done():
+    async def run():
+        tools = Tools({"slow": 0.1})
+        ext = OpenAIV2VExtension("test")
+        ext.conn = conn = FakeConnection()
+        ext.tool_scheduler = ToolCallScheduler(tools.registry, ext._on_tool_output)
+        session = asyncio.create_task(ext._run_session(TenEnvRecorder()))
+
+        conn.receive({**_call_done("c1"), "name": "slow"})
+        conn.receive({"type": "response.done", "response": {"id": "resp_1", "status": "completed"}})
+        await wait_for(lambda: len(conn.sent) == 2)
+        await asyncio.sleep(0.05)
+        conn.messages.put_nowait(None)
+        await session
+        assert [type(m) for m in conn.sent] == [ItemCreate, ResponseCreate]
+
+    asyncio.run(run())
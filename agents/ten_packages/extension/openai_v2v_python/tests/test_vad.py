@@ -0,0 +1,152 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import asyncio
+
+import numpy as np
+
+from openai_v2v_python.audio_buffer import AudioRingBuffer
+from openai_v2v_python.extension import OpenAIV2VExtension
+from openai_v2v_python.realtime.struct import to_json
+from openai_v2v_python.vad import EnergyVad
+
+SAMPLE_RATE = 24000
+
+
+def _pcm(segments: list[tuple[int, float]]) -> bytes:
+    """(duration ms, amplitude) segments of a 300 Hz tone."""
+    rng = np.random.default_rng(0)
+    out = []
+    for ms, amplitude in segments:
+        t = np.arange(SAMPLE_RATE * ms // 1000) / SAMPLE_RATE
+        tone = amplitude * 32767 * np.sin(2 * np.pi * 300 * t)
+        noise = rng.normal(0, 10, t.shape)
+        out.append((tone + noise).astype(np.int16))
+    return np.concatenate(out).tobytes()
+
+
+def _ms(n: int) -> int:
+    return SAMPLE_RATE * n // 1000 * 2
+
+
+def _feed(vad: EnergyVad, pcm: bytes, chunk_ms: int):
+    events = []
+    for i in range(0, len(pcm), _ms(chunk_ms)):
+        events += vad.process(pcm[i:i + _ms(chunk_ms)])
+    return events
+
+
+def test_silence_sends_nothing():
+    vad = EnergyVad(SAMPLE_RATE)
+    assert _feed(vad, _pcm([(2000, 0)]), 10) == []
+
+
+def test_turn_with_preroll_and_hangover():
+    pcm = _pcm([(1000, 0), (800, 0.3), (1000, 0)])
+    vad = EnergyVad(SAMPLE_RATE, hangover_ms=400, preroll_ms=200)
+    events = _feed(vad, pcm, 10)
+
+    assert events[0].started and not any(e.started for e in events[1:])
+    assert events[-1].ended and not any(e.ended for e in events[:-1])
+    audio = b"".join(e.audio for e in events)
+    # contiguous audio from the pre-roll before the 60 ms of speech that start
+    # the turn to the end of the hangover
+    start = pcm.index(audio)
+    assert start == _ms(1000 + 60 - 200)
+    assert start + len(audio) == _ms(1800 + 400)
+
+
+def test_chunking_does_not_change_result():
+    pcm = _pcm([(300, 0), (500, 0.3), (700, 0), (400, 0.2), (800, 0)])
+    results = []
+    for chunk_ms in (10, 25, 1000):
+        events = _feed(EnergyVad(SAMPLE_RATE), pcm, chunk_ms)
+        turns, audio = [], b""
+        for e in events:
+            audio += e.audio
+            if e.ended:
+                turns.append(audio)
+                audio = b""
+        results.append(turns)
+    assert len(results[0]) == 2
+    assert results[0] == results[1] == results[2]
+
+
+class RecordingConnection:
+    def __init__(self):
+        self.sent: list = []
+
+    async def send_audio_data(self, audio_data: bytes):
+        self.sent.append(audio_data)
+
+    async def send_request(self, message):
+        self.sent.append(message.type)
+
+
+def test_end_of_turn_commits_after_audio():
+    async def run():
+        conn = RecordingConnection()
+        ext = OpenAIV2VExtension("test")
+        ext.out_audio_buff = AudioRingBuffer(ext._audio_bytes(1000))
+        ext.conn = conn
+        ext.session_id = "session"
+        ext.out_audio_flushed_at = float("inf")
+
+        await ext._on_audio(b"\x01" * 480)
+        await ext._on_audio(b"\x02" * 480, end_of_turn=True)
+        assert conn.sent == [
+            b"\x01" * 480 + b"\x02" * 480,
+            "input_audio_buffer.commit",
+            "response.create",
+        ]
+
+    asyncio.run(run())
+
+
+class BlockedConnection(RecordingConnection):
+    def __init__(self):
+        super().__init__()
+        self.released = asyncio.Event()
+
+    async def send_audio_data(self, audio_data: bytes):
+        await self.released.wait()
+        await super().send_audio_data(audio_data)
+
+
+def test_next_turn_is_not_committed_with_ended_turn():
+    async def run():
+        conn = BlockedConnection()
+        ext = OpenAIV2VExtension("test")
+        ext.out_audio_buff = AudioRingBuffer(ext._audio_bytes(1000))
+        ext.conn = conn
+        ext.session_id = "session"
+        ext.out_audio_flushed_at = float("-inf")
+
+        sending = asyncio.ensure_future(ext._on_audio(b"\x01" * 480))
+        await asyncio.sleep(0)
+        # end of the turn and pre-roll of the next one, while the send waits
+        await ext._on_audio(b"\x02" * 480, end_of_turn=True)
+        await ext._on_audio(b"\x03" * 480)
+        conn.released.set()
+        await sending
+        assert conn.sent == [
+            b"\x01" * 480,
+            b"\x02" * 480,
+            "input_audio_buffer.commit",
+            "response.create",
+        ]
+        # the next turn waits for its own flush
+        assert ext.out_audio_buff.peek() == b"\x03" * 480
+
+    asyncio.run(run())
+
+
+def test_client_vad_disables_server_turn_detection():
+    ext = OpenAIV2VExtension("test")
+    ext.config.server_vad = False
+    assert '"turn_detection": null' in to_json(ext._update_session())
+    ext.config.server_vad = True
+    assert "turn_detection" not in to_json(ext._update_session())
@@ -1,12 +1,19 @@
+import asyncio
 import copy
-from typing import Dict, Any
-from functools import partial
+import json
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Any
 
 from .log import logger
 
 class ToolRegistry:
-    tools: Dict[str, dict[str, Any]] = {}
-    def register(self, name:str, description: str, callback, parameters: Any = None) -> None:
+    def __init__(self):
+        self.tools: Dict[str, dict[str, Any]] = {}
+        # seconds a call of the tool may take, overriding the scheduler's
+        self.timeouts: Dict[str, float] = {}
+
+    def register(self, name:str, description: str, callback, parameters: Any = None, timeout: float = 0) -> None:
         info = {
             "type": "function",
             "name": name,
@@ -16,6 +23,10 @@ class ToolRegistry:
         if parameters:
             info["parameters"] = parameters
         self.tools[name] = info
+        if timeout > 0:
+            self.timeouts[name] = timeout
+        else:
+            self.timeouts.pop(name, None)
         logger.info(f"register tool {name} {description}")
 
     def to_prompt(self) -> str:
@@ -30,6 +41,7 @@ class ToolRegistry:
     def unregister(self, name:str) -> None:
         if name in self.tools:
             del self.tools[name]
+            self.timeouts.pop(name, None)
             logger.info(f"unregister tool {name}")
     
     def get_tools(self) -> list[dict[str, Any]]:
@@ -40,30 +52,109 @@ class ToolRegistry:
             result.append(info)
         return result
     
-    async def on_func_call(self, call_id: str, name: str, args: str, callback):
+    async def on_func_call(self, name: str, args: str) -> str | None:
+        """Call the tool and return its response, None if it can not be called."""
+        if name not in self.tools:
+            logger.warning(f"Failed to find func {name}")
+            return None
+        t = self.tools[name]
+        # FIXME add args check
+        if not t.get("callback"):
+            return None
+        return await t["callback"](name, args)
+
+
+class ToolCallScheduler:
+    """Runs tool calls as tasks so the realtime client loop never waits on them.
+
+    At most max_concurrent calls run at once, each bounded by its timeout.
+    Results are handed to on_output in the order the calls were made. With
+    cache_ttl set, a call repeated with the same canonical arguments within
+    the ttl reuses the earlier result."""
+
+    def __init__(
+        self,
+        registry: ToolRegistry,
+        on_output: Callable[[str, str | None], Awaitable[None]],
+        max_concurrent: int = 4,
+        timeout: float = 10,
+        cache_ttl: float = 0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.registry = registry
+        self.on_output = on_output
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.clock = clock
+        self.cache: Dict[tuple[str, str], tuple[float, str]] = {}
+        self.pending: deque[tuple[str, asyncio.Task]] = deque()
+        self._semaphore: asyncio.Semaphore = None
+        self._poster: asyncio.Task = None
+
+    def submit(self, call_id: str, name: str, args: str) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        task = asyncio.create_task(self._call(name, args))
+        self.pending.append((call_id, task))
+        if self._poster is None or self._poster.done():
+            self._poster = asyncio.create_task(self._post())
+
+    def cancel(self) -> None:
+        for _, task in self.pending:
+            task.cancel()
+        self.pending.clear()
+        if self._poster:
+            self._poster.cancel()
+            self._poster = None
+
+    async def _call(self, name: str, args: str) -> str | None:
+        key = (name, self._canonical(args))
+        cached = self.cache.get(key)
+        if cached and cached[0] > self.clock():
+            logger.info(f"tool call {name} served from cache")
+            return cached[1]
+
+        async with self._semaphore:
+            try:
+                result = await asyncio.wait_for(
+                    self.registry.on_func_call(name, args),
+                    self.registry.timeouts.get(name, self.timeout))
+            except asyncio.TimeoutError:
+                logger.warning(f"Timeout calling func {name}")
+                return None
+            except Exception:
+                logger.exception(f"Failed to call func {name}")
+                return None
+
+        if self.cache_ttl > 0 and result is not None:
+            self.cache[key] = (self.clock() + self.cache_ttl, result)
+        return result
+
+    async def _post(self) -> None:
+        while self.pending:
+            call_id, task = self.pending[0]
+            result = await task
+            self.pending.popleft()
+            try:
+                await self.on_output(call_id, result)
+            except Exception:
+                logger.exception(f"Failed to post output of {call_id}")
+
+    @staticmethod
+    def _canonical(args: str) -> str:
         try:
-            if name in self.tools:
-                t = self.tools[name]
-                # FIXME add args check
-                if t.get("callback"):
-                    p = partial(callback, call_id)
-                    await t["callback"](name, args, p)
-            else:
-                logger.warning(f"Failed to find func {name}")
-        except:
-            logger.exception(f"Failed to call func {name}")
-            # TODO What to do if func call is dead
-            callback(None)
+            return json.dumps(json.loads(args), sort_keys=True, separators=(",", ":"))
+        except ValueError:
+            return args
 
 if __name__ == "__main__":
     r = ToolRegistry()
     
-    def weather_check(location:str = "", datetime:str = ""):
-        logger.info(f"on weather check {location}, {datetime}")
-    
-    def on_tool_completion(result: Any):
-        logger.info(f"on tool completion {result}")
-    
+    async def weather_check(name: str, args: str) -> str:
+        logger.info(f"on weather check {name}, {args}")
+        return "sunny"
+
     r.register(
         name="weather", description="This is a weather check func, if the user is asking about the weather. you need to summarize location and time information from the context as parameters. if the information is lack, please ask for more detail before calling.",
         callback=weather_check,
@@ -83,9 +174,9 @@ if __name__ == "__main__":
         })
     print(r.to_prompt())
     print(r.get_tools())
-    print(r.on_func_call("weather", {"location":"LA", "datetime":"2024-10-01T16:43:01"}, on_tool_completion))
+    print(asyncio.run(r.on_func_call("weather", '{"location":"LA", "datetime":"2024-10-01T16:43:01"}')))
     r.unregister("weather")
     print(r.to_prompt())
     print(r.get_tools())
-    print(r.on_func_call("weather", {"location":"LA", "datetime":"2024-10-01T16:43:01"}, on_tool_completion))
+    print(asyncio.run(r.on_func_call("weather", '{"location":"LA", "datetime":"2024-10-01T16:43:01"}')))
     
\ No newline at end of file
@@ -0,0 +1,97 @@
+#
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0.
+# See the LICENSE file for more information.
+#
+from collections import deque
+from typing import NamedTuple
+
+import numpy as np
+
+
+class VadEvent(NamedTuple):
+    # speech to send, a turn starts with the pre-roll
+    audio: bytes
+    # the turn starts with this audio
+    started: bool
+    # the turn ends after this audio
+    ended: bool
+
+
+class EnergyVad:
+    """Endpointing on the energy of pcm16 mono audio.
+
+    Audio is analysed in windows of `window_ms`, all windows of a chunk are
+    measured at once with NumPy. A turn starts after `min_speech_ms` of windows
+    louder than `threshold_db` (dBFS) and ends after `hangover_ms` of quieter
+    ones. Nothing is emitted while there is no turn except the last `preroll_ms`
+    of audio, which is prepended to the turn so its onset is not clipped."""
+
+    def __init__(
+        self,
+        sample_rate: int,
+        threshold_db: float = -40.0,
+        hangover_ms: int = 500,
+        preroll_ms: int = 300,
+        min_speech_ms: int = 60,
+        window_ms: int = 20,
+    ):
+        self.window_bytes = sample_rate * window_ms // 1000 * 2
+        # compare mean squares instead of taking a log per window
+        self.threshold = (10 ** (threshold_db / 20) * 32768) ** 2
+        self.min_speech = max(1, min_speech_ms // window_ms)
+        self.hangover = max(1, hangover_ms // window_ms)
+        self.preroll: deque[bytes] = deque(maxlen=max(self.min_speech, preroll_ms // window_ms))
+
+        self.pending = b""
+        self.in_speech = False
+        # consecutive loud windows before a turn, quiet windows in a turn
+        self.run = 0
+
+    def process(self, buf: bytes) -> list[VadEvent]:
+        data = self.pending + buf if self.pending else buf
+        n = len(data) // self.window_bytes
+        self.pending = data[n * self.window_bytes:]
+        if n == 0:
+            return []
+
+        samples = np.frombuffer(data, dtype=np.int16, count=n * self.window_bytes // 2)
+        windows = samples.reshape(n, -1).astype(np.float32)
+        loud = np.einsum("ij,ij->i", windows, windows) / windows.shape[1] > self.threshold
+
+        events = []
+        audio = bytearray()
+        started = False
+        view = memoryview(data)
+        for i, is_loud in enumerate(loud.tolist()):
+            window = view[i * self.window_bytes:(i + 1) * self.window_bytes]
+            if not self.in_speech:
+                self.preroll.append(bytes(window))
+                self.run = self.run + 1 if is_loud else 0
+                if self.run >= self.min_speech:
+                    self.in_speech = True
+                    self.run = 0
+                    started = True
+                    for w in self.preroll:
+                        audio += w
+                    self.preroll.clear()
+                continue
+
+            audio += window
+            self.run = 0 if is_loud else self.run + 1
+            if self.run >= self.hangover:
+                events.append(VadEvent(bytes(audio), started, True))
+                audio.clear()
+                started = False
+                self.in_speech = False
+                self.run = 0
+
+        if audio:
+            events.append(VadEvent(bytes(audio), started, False))
+        return events
+
+    def reset(self) -> None:
+        self.pending = b""
+        self.in_speech = False
+        self.run = 0
+        self.preroll.clear()
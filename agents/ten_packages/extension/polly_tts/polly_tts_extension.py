@@ -9,13 +9,10 @@ from ten import (
     CmdResult,
 )
 
-import queue
-import threading
-from datetime import datetime
-import traceback
 from contextlib import closing
 
 from .log import logger
+from .pipeline import SynthesisJob, SynthesisPipeline
 from .polly_wrapper import PollyWrapper, PollyConfig
 
 PROPERTY_REGION = "region"  # Optional
@@ -25,16 +22,15 @@ PROPERTY_ENGINE = "engine"  # Optional
 PROPERTY_VOICE = "voice"  # Optional
 PROPERTY_SAMPLE_RATE = "sample_rate"  # Optional
 PROPERTY_LANG_CODE = "lang_code"  # Optional
+PROPERTY_PREFETCH_SENTENCES = "prefetch_sentences"  # Optional
 
 
 class PollyTTSExtension(Extension):
     def __init__(self, name: str):
         super().__init__(name)
 
-        self.outdateTs = datetime.now()
-        self.stopped = False
-        self.thread = None
-        self.queue = queue.Queue()
+        self.pipeline = None
+        self.prefetch_sentences = 2
         self.frame_size = None
 
         self.bytes_per_sample = 2
@@ -63,6 +59,15 @@ class PollyTTSExtension(Extension):
                     f"GetProperty optional {optional_param} failed, err: {err}. Using default value: {polly_config.__getattribute__(optional_param)}"
                 )
 
+        try:
+            value = ten.get_property_int(PROPERTY_PREFETCH_SENTENCES)
+            if value > 0:
+                self.prefetch_sentences = value
+        except Exception as err:
+            logger.debug(
+                f"GetProperty optional {PROPERTY_PREFETCH_SENTENCES} failed, err: {err}. Using default value: {self.prefetch_sentences}"
+            )
+
         self.polly = PollyWrapper(polly_config)
         self.frame_size = int(
             int(polly_config.sample_rate)
@@ -71,22 +76,23 @@ class PollyTTSExtension(Extension):
             / 100
         )
 
-        self.thread = threading.Thread(target=self.async_polly_handler, args=[ten])
-        self.thread.start()
+        # synthesize the next sentences while one is sent
+        self.pipeline = SynthesisPipeline(
+            self.synthesize,
+            lambda job, chunks: self.play(ten, job, chunks),
+            self.prefetch_sentences,
+        )
+        self.pipeline.start()
         ten.on_start_done()
 
     def on_stop(self, ten: TenEnv) -> None:
         logger.info("PollyTTSExtension on_stop")
 
-        self.stopped = True
-        self.queue.put(None)
-        self.flush()
-        self.thread.join()
+        if self.pipeline:
+            self.pipeline.stop()
+            logger.info(f"PollyTTSExtension {self.pipeline.stats()}")
         ten.on_stop_done()
 
-    def need_interrupt(self, ts: datetime.time) -> bool:
-        return (self.outdateTs - ts).total_seconds() > 1
-
     def __get_frame(self, data: bytes) -> AudioFrame:
         sample_rate = int(self.polly.config.sample_rate)
 
@@ -105,37 +111,28 @@ class PollyTTSExtension(Extension):
         f.unlock_buf(buff)
         return f
 
-    def async_polly_handler(self, ten: TenEnv):
-        while not self.stopped:
-            value = self.queue.get()
-            if value is None:
-                logger.warning("async_polly_handler: exit due to None value got.")
+    def synthesize(self, job: SynthesisJob):
+        audio_stream, visemes = self.polly.synthesize(job.item)
+        # closing the stream stops a read in progress
+        job.on_cancel(audio_stream.close)
+        with closing(audio_stream) as stream:
+            yield from stream.iter_chunks(chunk_size=self.frame_size)
+
+    def play(self, ten: TenEnv, job: SynthesisJob, chunks):
+        for chunk in chunks:
+            if job.cancelled:
+                logger.debug(
+                    "play: got interrupt cmd, stop sending pcm frame."
+                )
                 break
-            inputText, ts = value
-            if len(inputText) == 0:
-                logger.warning("async_polly_handler: empty input detected.")
-                continue
-            try:
-                audio_stream, visemes = self.polly.synthesize(inputText)
-                with closing(audio_stream) as stream:
-                    for chunk in stream.iter_chunks(chunk_size=self.frame_size):
-                        if self.need_interrupt(ts):
-                            logger.debug(
-                                "async_polly_handler: got interrupt cmd, stop sending pcm frame."
-                            )
-                            break
-
-                        f = self.__get_frame(chunk)
-                        ten.send_audio_frame(f)
-            except Exception as e:
-                logger.exception(e)
-                logger.exception(traceback.format_exc())
+
+            f = self.__get_frame(chunk)
+            ten.send_audio_frame(f)
 
     def flush(self):
         logger.info("PollyTTSExtension flush")
-        while not self.queue.empty():
-            self.queue.get()
-        self.queue.put(("", datetime.now()))
+        # drops the queued sentences and cancels the ones in flight
+        self.pipeline.flush()
 
     def on_data(self, ten: TenEnv, data: Data) -> None:
         logger.info("PollyTTSExtension on_data")
@@ -147,7 +144,7 @@ class PollyTTSExtension(Extension):
         is_end = data.get_property_bool("end_of_segment")
 
         logger.info("on data %s %d", inputText, is_end)
-        self.queue.put((inputText, datetime.now()))
+        self.pipeline.put(inputText)
 
     def on_cmd(self, ten: TenEnv, cmd: Cmd) -> None:
         logger.info("PollyTTSExtension on_cmd")
@@ -156,7 +153,6 @@ class PollyTTSExtension(Extension):
 
         cmdName = cmd.get_name()
         if cmdName == "flush":
-            self.outdateTs = datetime.now()
             self.flush()
             cmd_out = Cmd.create("flush")
             ten.send_cmd(
@@ -22,6 +22,7 @@ import threading
 import re
 from http import HTTPStatus
 from .log import logger
+from .speculation import Speculator, Turn
 
 DATA_OUT_TEXT_DATA_PROPERTY_TEXT = "text"
 DATA_OUT_TEXT_DATA_PROPERTY_TEXT_END_OF_SEGMENT = "end_of_segment"
@@ -44,6 +45,9 @@ class QWenLLMExtension(Extension):
         self.queue = queue.Queue()
         self.mutex = threading.Lock()
 
+        self.speculator = None
+        self.speculation_timer = None
+
     def on_msg(self, role: str, content: str) -> None:
         self.mutex.acquire()
         try:
@@ -69,27 +73,34 @@ class QWenLLMExtension(Extension):
         with self.outdate_ts_lock:
             return self.outdate_ts > ts
 
+    def turn_interrupted(self, ts: datetime.time, turn: Turn) -> bool:
+        if turn is not None and turn.speculative:
+            # speculative turns start before the flushes of the speech they answer
+            return turn.cancelled or turn.interrupted
+        return self.need_interrupt(ts)
+
     def get_outdate_ts(self) -> datetime:
         with self.outdate_ts_lock:
             return self.outdate_ts
 
-    def complete_with_history(self, ten: TenEnv, ts: datetime.time, input_text: str):
+    def complete_with_history(self, ten: TenEnv, ts: datetime.time, turn: Turn):
         """
         Complete input_text querying with built-in chat history.
+        Outputs and history updates go through the turn.
         """
 
         def callback(text: str, end_of_segment: bool):
             d = Data.create("text_data")
             d.set_property_string("text", text)
             d.set_property_bool("end_of_segment", end_of_segment)
-            ten.send_data(d)
+            turn.output(ten.send_data, d)
 
         messages = self.get_messages()
-        messages.append({"role": "user", "content": input_text})
-        total = self.stream_chat(ts, messages, callback)
-        self.on_msg("user", input_text)
-        if len(total) > 0:
-            self.on_msg("assistant", total)
+        messages.append({"role": "user", "content": turn.text})
+        total = self.stream_chat(ts, messages, callback, turn)
+        turn.output(self.on_msg, "user", turn.text)
+        if total:
+            turn.output(self.on_msg, "assistant", total)
 
     def call_chat(self, ten: TenEnv, ts: datetime.time, cmd: Cmd):
         """
@@ -133,10 +144,10 @@ class QWenLLMExtension(Extension):
             total = self.stream_chat(ts, messages, None)
             callback(total, True)  # callback once until full answer returned
 
-    def stream_chat(self, ts: datetime.time, messages: List[Any], callback):
+    def stream_chat(self, ts: datetime.time, messages: List[Any], callback, turn: Turn = None):
         logger.info("before stream_chat call {} {}".format(messages, ts))
 
-        if self.need_interrupt(ts):
+        if self.turn_interrupted(ts, turn):
             logger.warning("out of date, %s, %s", self.get_outdate_ts(), ts)
             return
 
@@ -151,7 +162,7 @@ class QWenLLMExtension(Extension):
         total = ""
         partial = ""
         for response in responses:
-            if self.need_interrupt(ts):
+            if self.turn_interrupted(ts, turn):
                 logger.warning("out of date, %s, %s", self.get_outdate_ts(), ts)
                 partial = ""  # discard not sent
                 break
@@ -194,6 +205,27 @@ class QWenLLMExtension(Extension):
         self.max_history = ten.get_property_int("max_memory_length")
         greeting = ten.get_property_string("greeting")
 
+        try:
+            if ten.get_property_bool("speculative"):
+                self.speculator = Speculator()
+        except Exception as e:
+            logger.info(f"speculative property not found, err: {e}")
+
+        if self.speculator:
+            # non-positive or missing values keep the defaults
+            try:
+                stable_ms = ten.get_property_int("speculative_stable_ms")
+                if stable_ms > 0:
+                    self.speculator.stable_ms = stable_ms
+            except Exception as e:
+                logger.info(f"speculative_stable_ms not found, using {self.speculator.stable_ms}, err: {e}")
+            try:
+                match_threshold = ten.get_property_float("speculative_match_threshold")
+                if match_threshold > 0:
+                    self.speculator.match_threshold = match_threshold
+            except Exception as e:
+                logger.info(f"speculative_match_threshold not found, using {self.speculator.match_threshold}, err: {e}")
+
         if greeting:
             try:
                 output_data = Data.create("text_data")
@@ -230,7 +262,7 @@ class QWenLLMExtension(Extension):
     def on_data(self, ten: TenEnv, data: Data) -> None:
         logger.info("on_data")
         is_final = data.get_property_bool("is_final")
-        if not is_final:
+        if not is_final and not self.speculator:
             logger.info("ignore non final")
             return
 
@@ -239,10 +271,41 @@ class QWenLLMExtension(Extension):
             logger.info("ignore empty text")
             return
 
+        if not is_final:
+            self.speculator.on_partial(input_text)
+            self.schedule_speculation(ten)
+            return
+
+        if self.speculator:
+            committed = self.speculator.on_final(input_text)
+            logger.info(self.speculator.stats())
+            if committed:
+                return
+
         ts = datetime.now()
         logger.info("on data %s, %s", input_text, ts)
         self.queue.put((input_text, ts))
 
+    def schedule_speculation(self, ten: TenEnv):
+        if self.speculation_timer is not None:
+            self.speculation_timer.cancel()
+        self.speculation_timer = threading.Timer(
+            self.speculator.stable_ms / 1000, self.speculate, args=[ten]
+        )
+        self.speculation_timer.daemon = True
+        self.speculation_timer.start()
+
+    def speculate(self, ten: TenEnv):
+        turn = self.speculator.poll()
+        if turn is None:
+            return
+        # not queued, the user is still speaking and the queue holds the
+        # previous turns which this one will replace
+        logger.info("speculative completion for partial {}".format(turn.text))
+        threading.Thread(
+            target=self.complete_with_history, args=[ten, datetime.now(), turn]
+        ).start()
+
     def async_handle(self, ten: TenEnv):
         while not self.stopped:
             try:
@@ -255,7 +318,7 @@ class QWenLLMExtension(Extension):
 
                 if isinstance(input, str):
                     logger.info("fetched from queue {}".format(input))
-                    self.complete_with_history(ten, ts, input)
+                    self.complete_with_history(ten, ts, Turn(input))
                 else:
                     logger.info("fetched from queue {}".format(input.get_name()))
                     self.call_chat(ten, ts, input)
@@ -269,6 +332,8 @@ class QWenLLMExtension(Extension):
 
         if cmd_name == "flush":
             self.flush()
+            if self.speculator is not None:
+                self.speculator.interrupt()
             cmd_out = Cmd.create("flush")
             ten.send_cmd(
                 cmd_out,
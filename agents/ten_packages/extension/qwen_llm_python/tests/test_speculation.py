@@ -0,0 +1,178 @@
+#
+# Copyright © 2024 Agora
+# This file is part of TEN Framework, an open source project.
+# Licensed under the Apache License, Version 2.0, with certain conditions.
+# Refer to the "LICENSE" file in the root directory for more information.
+#
+import time
+from http import HTTPStatus
+from types import SimpleNamespace
+
+import dashscope
+import pytest
+from ten import Cmd, Data
+
+from qwen_llm_python.qwen_llm_extension import QWenLLMExtension
+
+
+class StubGeneration:
+    """Stand-in for dashscope.Generation.call, streams a sentence per word
+    of the question and records the questions."""
+
+    def __init__(self, delay: float = 0.03):
+        self.delay = delay
+        self.requests: list[str] = []
+
+    def __call__(self, model, messages, **kwargs):
+        text = messages[-1]["content"]
+        self.requests.append(text)
+        for word in text.split():
+            time.sleep(self.delay)
+            message = {"role": "assistant", "content": f"{word}."}
+            yield SimpleNamespace(
+                status_code=HTTPStatus.OK, output=SimpleNamespace(choices=[{"message": message}]))
+
+
+class Env:
+    def __init__(self, **properties):
+        self.properties = {
+            "api_key": "key", "model": "qwen-max", "prompt": "", "max_memory_length": 10,
+            "greeting": "", "speculative": True, "speculative_stable_ms": 50, **properties}
+        self.texts: list[tuple[str, bool]] = []
+
+    def get_property(self, key):
+        return self.properties[key]
+
+    get_property_string = get_property_int = get_property_float = get_property_bool = get_property
+
+    def send_data(self, data: Data) -> None:
+        self.texts.append((data.get_property_string("text"), data.get_property_bool("end_of_segment")))
+
+    def send_cmd(self, cmd: Cmd, callback) -> None:
+        pass
+
+    def return_result(self, result, cmd: Cmd) -> None:
+        pass
+
+    def on_start_done(self) -> None:
+        pass
+
+    on_stop_done = on_start_done
+
+
+@pytest.fixture
+def generation(monkeypatch):
+    generation = StubGeneration()
+    monkeypatch.setattr(dashscope.Generation, "call", generation)
+    return generation
+
+
+def _text(text: str, is_final: bool) -> Data:
+    data = Data.create("text_data")
+    data.set_property_string("text", text)
+    data.set_property_bool("is_final", is_final)
+    return data
+
+
+def _asr(ext: QWenLLMExtension, env: Env, text: str, is_final: bool) -> None:
+    # the interrupt detector flushes before every result
+    ext.on_cmd(env, Cmd.create("flush"))
+    ext.on_data(env, _text(text, is_final))
+
+
+def _run(env: Env, scenario) -> QWenLLMExtension:
+    ext = QWenLLMExtension("qwen_llm")
+    ext.on_start(env)
+    try:
+        scenario(ext)
+    finally:
+        ext.on_stop(env)
+    return ext
+
+
+def test_regular_turn(generation):
+    env = Env(speculative=False)
+
+    def scenario(ext):
+        ext.on_data(env, _text("what", False))
+        _asr(ext, env, "what time", True)
+        time.sleep(0.2)
+
+    ext = _run(env, scenario)
+    assert generation.requests == ["what time"]
+    assert env.texts == [("what.", False), ("time.", False), ("", True)]
+    assert ext.history == [
+        {"role": "user", "content": "what time"}, {"role": "assistant", "content": "what.time."}]
+
+
+def test_matching_final_commits(generation):
+    env = Env()
+
+    def scenario(ext):
+        _asr(ext, env, "what", False)
+        time.sleep(0.02)
+        _asr(ext, env, "what time", False)
+        time.sleep(0.2)
+        # started on the stable partial, nothing sent yet
+        assert generation.requests == ["what time"]
+        assert env.texts == [] and ext.history == []
+
+        _asr(ext, env, "What time?", True)
+        time.sleep(0.1)
+
+    ext = _run(env, scenario)
+    assert generation.requests == ["what time"]
+    assert env.texts == [("what.", False), ("time.", False), ("", True)]
+    assert ext.history == [
+        {"role": "user", "content": "what time"}, {"role": "assistant", "content": "what.time."}]
+    assert ext.speculator.hits == 1 and ext.speculator.started == 1
+
+
+def test_different_final_cancels(generation):
+    env = Env()
+
+    def scenario(ext):
+        _asr(ext, env, "play some music", False)
+        time.sleep(0.1)
+        _asr(ext, env, "tell me a joke", True)
+        time.sleep(0.3)
+
+    ext = _run(env, scenario)
+    assert generation.requests == ["play some music", "tell me a joke"]
+    assert env.texts == [("tell.", False), ("me.", False), ("a.", False), ("joke.", False), ("", True)]
+    assert ext.history == [
+        {"role": "user", "content": "tell me a joke"}, {"role": "assistant", "content": "tell.me.a.joke."}]
+    assert ext.speculator.hits == 0 and ext.speculator.started == 1
+
+
+def test_flush_interrupts_committed_turn(generation):
+    env = Env()
+    generation.delay = 0.05
+
+    def scenario(ext):
+        _asr(ext, env, "one two three four five six", False)
+        time.sleep(0.07)
+        _asr(ext, env, "One two three four five six.", True)
+        time.sleep(0.12)
+        # the user barges in
+        _asr(ext, env, "stop", False)
+        time.sleep(0.4)
+
+    _run(env, scenario)
+    sent = [text for text, _ in env.texts]
+    assert 0 < len(sent) < 6 and "six." not in sent
+    assert generation.requests[0] == "one two three four five six"
+
+
+@pytest.mark.parametrize("stable_ms, match_threshold, expected", [
+    # missing or non-positive values keep the defaults
+    (None, 0.8, (300, 0.8)),
+    (0, 0.8, (300, 0.8)),
+    (200, 0.0, (200, 0.9)),
+    (200, None, (200, 0.9)),
+])
+def test_speculative_properties(stable_ms, match_threshold, expected):
+    env = Env(speculative_stable_ms=stable_ms, speculative_match_threshold=match_threshold)
+    env.properties = {k: v for k, v in env.properties.items() if v is not None}
+    ext = _run(env, lambda ext: None)
+    assert (ext.speculator.stable_ms, ext.speculator.match_threshold) == expected